@@ -0,0 +1,101 @@
+"""
+Benchmark: sisal/bulk_load.py on a synthetic release.
+
+    python benchmarks/bench_bulk_load.py --scale 1 --prepare-only
+    python benchmarks/bench_bulk_load.py --scale 10 --database sisal_bulk_bench --methods infile insert
+
+Per table: CSV parse, preparation (rounding / display precision) and writing
+the LOAD DATA file, i.e. the client side of the load. Unless --prepare-only,
+the whole release is then loaded with each --method into --database (on the
+server of the sisal/db.py settings; the database is created if needed and
+its tables replaced) and the rows on the server are checked.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+from sisal.bulk_load import MEASUREMENT_ROUNDING, load_release, prepare_table, release_files, write_infile  # noqa: E402
+from sisal.loader import read_csv_typed  # noqa: E402
+from sisal.synthetic import write_synthetic  # noqa: E402
+
+
+def time_prepare(files, workdir) -> list:
+    records = []
+    for name, path in sorted(files.items()):
+        t0 = time.perf_counter()
+        df = read_csv_typed(path, name)
+        t1 = time.perf_counter()
+        prepare_table(df, MEASUREMENT_ROUNDING)
+        t2 = time.perf_counter()
+        out = os.path.join(workdir, f"{name}.tsv")
+        write_infile(df, out)
+        t3 = time.perf_counter()
+        rec = {"table": name, "rows": len(df), "parse_s": t1 - t0, "prepare_s": t2 - t1, "write_s": t3 - t2,
+               "infile_mb": os.path.getsize(out) / 2**20}
+        records.append(rec)
+        print(f"  {name:<30} {len(df):>9,} rows  parse {rec['parse_s']:.3f}s  prepare {rec['prepare_s']:.3f}s  "
+              f"write {rec['write_s']:.3f}s  ({rec['infile_mb']:.1f} MB)")
+    return records
+
+
+def time_load(folder, database, method, workers) -> dict:
+    from sisal.db import Database, db_config, make_engine
+
+    t0 = time.perf_counter()
+    rows = load_release(folder, database=database, method=method, max_workers=workers)
+    elapsed = time.perf_counter() - t0
+    db = Database(make_engine(db_config(database=database), pool_size=1))
+    try:
+        mismatched = {name: n for name, n in rows.items()
+                      if int(db.query(f"SELECT COUNT(*) AS n FROM `{name}`")["n"].iloc[0]) != n}
+    finally:
+        db.engine.dispose()
+    total = sum(rows.values())
+    print(f"  {method:<7} {total:,} rows in {elapsed:.1f}s ({total / elapsed:,.0f} rows/s)"
+          + (f"  ROW COUNT MISMATCH: {', '.join(mismatched)}" if mismatched else ""))
+    return {"method": method, "workers": workers, "rows": total, "seconds": elapsed,
+            "mismatched": sorted(mismatched)}
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--scale", type=float, default=1.0)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--database", default="sisal_bulk_bench", help="MySQL database to load into")
+    ap.add_argument("--methods", nargs="+", choices=("auto", "infile", "insert"), default=["auto"])
+    ap.add_argument("--workers", type=int, default=4)
+    ap.add_argument("--prepare-only", action="store_true", help="no server: only the client-side stages")
+    ap.add_argument("--out", default=None, help="write the results as JSON")
+    args = ap.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="sisal_bulk_")
+    try:
+        folder = os.path.join(workdir, "db")
+        write_synthetic(folder, scale=args.scale, seed=args.seed)
+        files = release_files(folder)
+        print(f"[prepare] scale {args.scale:g}")
+        prepare = time_prepare(files, workdir)
+        loads = []
+        if not args.prepare_only:
+            print(f"[load] {args.database}, {args.workers} workers")
+            loads = [time_load(folder, args.database, method, args.workers) for method in args.methods]
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.out:
+        with open(args.out, "w") as fh:
+            json.dump({"scale": args.scale, "seed": args.seed, "prepare": prepare, "load": loads}, fh, indent=2)
+        print("Wrote", args.out)
+    if any(rec["mismatched"] for rec in loads):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Benchmark: cold-start time of the `sisal` command line (a fresh interpreter
+per call, as when a workflow engine runs it thousands of times).
+
+    python benchmarks/bench_cold_start.py --repeat 10 --out cold_start.json
+
+A synthetic folder (sisal.synthetic, --scale) is generated and its Arrow /
+derived caches are filled once, so the timings are the warm-cache per-call
+overhead: interpreter start + imports + the command itself. Every command is
+also run once under `python -X importtime`; the report lists its total import
+time and the slowest top-level imports (to spot a heavy library that a
+command should not need).
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+from sisal.synthetic import write_synthetic  # noqa: E402
+
+
+def commands(folder, out):
+    """name -> argv after `python`"""
+    return {
+        "import sisal": ["-c", "import sisal"],
+        "--version": ["-m", "sisal", "--version"],
+        "--help": ["-m", "sisal", "--help"],
+        "load site": ["-m", "sisal", "load", folder, "--tables", "site"],
+        "derive full_year_both": ["-m", "sisal", "derive", folder, "full_year_both"],
+        "query duckdb": ["-m", "sisal", "query", "site_entity_counts", "--backend", "duckdb",
+                         "--folder", folder, "--out", os.path.join(out, "counts.parquet")],
+        "export duckdb xlsx": ["-m", "sisal", "export", "--backend", "duckdb", "--folder", folder,
+                               "--out", os.path.join(out, "export.xlsx")],
+        "maps global": ["-m", "sisal", "maps", folder, "--regions", "global", "--out", out],
+    }
+
+
+def run(argv, env):
+    t0 = time.perf_counter()
+    subprocess.run([sys.executable, *argv], cwd=ROOT, env=env, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - t0
+
+
+def import_profile(argv, env, top=5):
+    """(total import seconds, [(module, seconds)] of the slowest top-level imports)"""
+    proc = subprocess.run([sys.executable, "-X", "importtime", *argv], cwd=ROOT, env=env, check=True,
+                          stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    top_level = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not name.startswith("  "):              # nested imports are indented further
+            top_level.append((name.strip(), int(cumulative) / 1e6))
+    total = sum(s for _, s in top_level)
+    return total, sorted(top_level, key=lambda t: -t[1])[:top]
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--scale", type=float, default=0.3)
+    ap.add_argument("--repeat", type=int, default=5, help="calls per command (median and best are kept)")
+    ap.add_argument("--only", nargs="+", default=None, help="only these commands")
+    ap.add_argument("--out", default=None, help="write the results as JSON")
+    args = ap.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="sisal_cold_")
+    try:
+        folder = os.path.join(workdir, "db")
+        write_synthetic(folder, scale=args.scale)
+        env = {**os.environ, "MPLBACKEND": "Agg", "SISAL_CACHE_DIR": os.path.join(workdir, "cache")}
+        env.pop("SISAL_PROFILE", None)
+        cmds = commands(folder, workdir)
+        if args.only:
+            cmds = {k: v for k, v in cmds.items() if k in args.only}
+        for argv in cmds.values():           # fill the caches (and the OS file cache)
+            run(argv, env)
+
+        records = []
+        for name, argv in cmds.items():
+            times = [run(argv, env) for _ in range(args.repeat)]
+            import_s, slowest = import_profile(argv, env)
+            rec = {"command": name, "median_s": statistics.median(times), "best_s": min(times),
+                   "import_s": import_s, "slowest_imports": slowest}
+            records.append(rec)
+            heavy = ", ".join(f"{m} {s * 1000:.0f}ms" for m, s in slowest[:3])
+            print(f"  {name:<22} median {rec['median_s']:.3f}s  best {rec['best_s']:.3f}s  "
+                  f"imports {import_s:.3f}s ({heavy})")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.out:
+        with open(args.out, "w") as fh:
+            json.dump({"python": sys.version.split()[0], "scale": args.scale, "results": records}, fh, indent=2)
+        print("Wrote", args.out)
+
+
+if __name__ == "__main__":
+    main()
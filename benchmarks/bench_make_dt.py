@@ -0,0 +1,103 @@
+"""
+Benchmark: sisal.dates.make_dt vs. the original string-based make_dt.
+
+    python benchmarks/bench_make_dt.py --rows 1000000
+
+Checks that both return the same timestamps (incl. NaT for missing years and
+invalid dates) and prints the timings.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from sisal.dates import make_dt  # noqa: E402
+
+
+def make_dt_legacy(yyyy, mm=None, dd=None, hhmm=None, tz="UTC",
+                   default_mm=6, default_dd=15, default_hhmm=1200) -> pd.Series:
+    """Original implementation (ISO string per row, re-parsed by pd.to_datetime)."""
+    y = pd.to_numeric(pd.Series(yyyy), errors="coerce")
+    n = len(y)
+
+    if mm is None:
+        m = pd.Series([np.nan] * n)
+    else:
+        m = pd.to_numeric(pd.Series(mm), errors="coerce")
+
+    if dd is None:
+        d = pd.Series([np.nan] * n)
+    else:
+        d = pd.to_numeric(pd.Series(dd), errors="coerce")
+
+    if hhmm is None:
+        hm = pd.Series([np.nan] * n)
+    else:
+        hm = pd.to_numeric(pd.Series(hhmm), errors="coerce")
+
+    m2 = m.fillna(default_mm).astype(int)
+    d2 = d.fillna(default_dd).astype(int)
+    hm2 = hm.fillna(default_hhmm).astype(int)
+
+    hh = (hm2 // 100).astype(int)
+    mi = (hm2 % 100).astype(int)
+
+    iso = (
+        y.astype("Int64").astype(str).str.zfill(4) + "-" +
+        m2.astype(str).str.zfill(2) + "-" +
+        d2.astype(str).str.zfill(2) + " " +
+        hh.astype(str).str.zfill(2) + ":" +
+        mi.astype(str).str.zfill(2) + ":00"
+    )
+
+    return pd.to_datetime(iso, errors="coerce", utc=True)
+
+
+def sample_columns(n, seed=0):
+    """Random yyyy/mm/dd/hhmm columns with missing values and a few invalid dates."""
+    rng = np.random.default_rng(seed)
+    yyyy = rng.integers(1960, 2025, n).astype("float64")
+    mm = rng.integers(1, 13, n).astype("float64")
+    dd = rng.integers(1, 32, n).astype("float64")          # includes 31 Feb etc.
+    hhmm = (rng.integers(0, 24, n) * 100 + rng.integers(0, 60, n)).astype("float64")
+    for arr, rate in ((yyyy, 0.02), (mm, 0.05), (dd, 0.05), (hhmm, 0.3)):
+        arr[rng.random(n) < rate] = np.nan
+    return yyyy, mm, dd, hhmm
+
+
+def timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    cols = sample_columns(args.rows)
+    t_old, old = timed(lambda: make_dt_legacy(*cols), args.repeat)
+    t_new, new = timed(lambda: make_dt(*cols), args.repeat)
+
+    old = old.astype("datetime64[ns, UTC]")
+    pd.testing.assert_series_equal(old, new, check_names=False)
+
+    print(f"rows:          {args.rows:,}")
+    print(f"NaT:           {int(new.isna().sum()):,}")
+    print(f"legacy make_dt {t_old:8.3f} s")
+    print(f"make_dt        {t_new:8.3f} s")
+    print(f"speedup        {t_old / t_new:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,316 @@
+"""
+Benchmark: the cookbook pipeline (sisal_monv1_extractCSVdata.py) on synthetic
+databases at several scales.
+
+    python benchmarks/bench_pipeline.py --scales 1 10 --out results.json
+    python benchmarks/bench_pipeline.py --scales 1 --compare results.json   # regression check
+
+For every scale a schema-faithful folder is generated (sisal.synthetic), then
+the cookbook stages run in order. Each stage is timed untraced (best of
+--repeat), then run once more under tracemalloc for its peak traced allocation
+(Python + numpy buffers; tracing slows the run, so it never enters the timing);
+the process max RSS is recorded afterwards (--no-memory skips the traced run):
+
+    load_csv, load_cached, clean, site_summary, flags, references, make_dt,
+    coverage, frequency_tables, qc, qc_raw, derived_serial, derived_parallel
+
+qc runs the sisal.qc rules on the loaded tables, qc_raw reads the CSVs as text
+(sisal.qc.raw_tables) and runs them on that.
+derived_serial / derived_parallel compute every derived table of
+sisal/derived.py (from an empty derived cache) with sisal.pipeline in order vs
+concurrently (--workers threads).
+
+Results are written as JSON (one record per scale x stage). With --compare,
+stages slower than --tolerance x the baseline are listed and the exit code is 1.
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from sisal.coverage import CoverageIndex  # noqa: E402
+from sisal.dates import make_dt  # noqa: E402
+from sisal.flags import site_flags  # noqa: E402
+from sisal.loader import normalize_strings  # noqa: E402
+from sisal.materialize import Materializer  # noqa: E402
+from sisal.pipeline import Pipeline  # noqa: E402
+from sisal.qc import raw_tables, run_qc  # noqa: E402
+from sisal.references import ReferenceIndex, collapse_unique_by  # noqa: E402
+from sisal.registry import SisalDB  # noqa: E402
+from sisal.resample import classify_freq  # noqa: E402
+from sisal.schema import CAVE_ENV_TABLES, REQUIRED_TABLES  # noqa: E402
+from sisal.synthetic import write_synthetic  # noqa: E402
+
+try:
+    import resource
+except ImportError:  # not on Windows
+    resource = None
+
+
+def max_rss_mb():
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 2**20 if sys.platform == "darwin" else rss / 2**10
+
+
+# -------------------------
+# stages (state dict in, state dict out)
+# -------------------------
+
+def reset_cache(st):
+    shutil.rmtree(st["cache_dir"], ignore_errors=True)
+
+
+def stage_load_csv(st):
+    db = SisalDB(st["folder"], cache_dir=st["cache_dir"], required=REQUIRED_TABLES)
+    st["tables"] = db.load_all()
+    return sum(len(t) for t in st["tables"].values())
+
+
+def stage_load_cached(st):
+    db = SisalDB(st["folder"], cache_dir=st["cache_dir"], required=REQUIRED_TABLES)
+    st["tables"] = db.load_all()
+    return sum(len(t) for t in st["tables"].values())
+
+
+def stage_clean(st):
+    # folded into the loader; re-running it shows the cost of a no-op pass
+    for df in st["tables"].values():
+        normalize_strings(df)
+    return len(st["tables"])
+
+
+def stage_site_summary(st):
+    t = st["tables"]
+    site = t["site"]
+    counts = [
+        t["cave_entity"].groupby("site_id")["cave_entity_id"].nunique().rename("cave_entity_count"),
+        t["drip_entity"].groupby("site_id")["drip_entity_id"].nunique().rename("drip_entity_count"),
+        t["site_link_precip"].groupby("site_id")["precip_entity_id"].nunique().rename("precip_entity_count"),
+    ]
+    summary = site.merge(pd.concat(counts, axis=1), left_on="site_id", right_index=True, how="left")
+    st["site_summary"] = summary
+    return len(summary)
+
+
+def stage_flags(st):
+    t = st["tables"]
+    flags = site_flags(
+        t["site"], t["drip_entity"], t["site_link_precip"], t.get("cave_entity"),
+        drip_iso_sample=t["drip_iso_sample"], drip_rate_sample=t["drip_rate_sample"],
+        mod_carb_sample=t["mod_carb_sample"], precip_sample=t["precip_sample"],
+        **{n: t[n] for n in CAVE_ENV_TABLES if n in t},
+    )
+    return int(flags.to_numpy().sum())
+
+
+def stage_references(st):
+    t = st["tables"]
+    refs = ReferenceIndex.build(t["reference"], t["site_link_reference"], t["entity_link_reference"])
+    n = 0
+    for key in refs.keys:
+        n += len(refs.citations(key))
+    n += len(collapse_unique_by(t["notes"], "site_id", "notes"))
+    return n
+
+
+def stage_make_dt(st):
+    n = 0
+    for name, prefix in (("precip_sample", "precip"), ("drip_iso_sample", "drip_iso"),
+                         ("drip_rate_sample", "drip_rate")):
+        df = st["tables"][name]
+        for side in ("start", "end"):
+            dt = make_dt(df[f"{prefix}_{side}_yyyy"], df[f"{prefix}_{side}_mm"],
+                         df[f"{prefix}_{side}_dd"], df[f"{prefix}_{side}_hhmm"])
+            n += int(dt.notna().sum())
+    return n
+
+
+def stage_coverage(st):
+    t = st["tables"]
+    cov = CoverageIndex.build({"drip_iso_sample": t["drip_iso_sample"],
+                               "drip_rate_sample": t["drip_rate_sample"]})
+    both = cov.overlap(["drip_iso_sample", "drip_rate_sample"], min_days=365)
+    return len(both)
+
+
+def stage_frequency_tables(st):
+    n = 0
+    for name, prefix, key in (("drip_iso_sample", "drip_iso", "drip_entity_id"),
+                              ("drip_rate_sample", "drip_rate", "drip_entity_id"),
+                              ("precip_sample", "precip", "precip_entity_id")):
+        df = st["tables"][name]
+        freq = (
+            df.assign(freq_class=classify_freq(df[f"{prefix}_accumulation_unit"],
+                                               df[f"{prefix}_accumulation_time"]))
+            .groupby([key, "freq_class"]).size().reset_index(name="n")
+            .sort_values([key, "n"], ascending=[True, False])
+            .drop_duplicates(key)
+        )
+        n += len(freq)
+    return n
+
+
+def stage_qc(st):
+    return int(run_qc(st["tables"]).summary["violations"].sum())
+
+
+def stage_qc_raw(st):
+    return int(run_qc(raw_tables(st["folder"])).summary["violations"].sum())
+
+
+def reset_derived(st):
+    # fresh registry with the (cached) tables already loaded and no derived results
+    # cached: only computing the derived tables is timed
+    shutil.rmtree(os.path.join(st["cache_dir"], "derived"), ignore_errors=True)
+    st["db"] = SisalDB(st["folder"], cache_dir=st["cache_dir"], required=REQUIRED_TABLES)
+    st["db"].load_all()
+
+
+def _derived(st, max_workers):
+    out = Pipeline(Materializer(st["db"]), max_workers=max_workers).run()
+    return sum(len(df) for df in out.values())
+
+
+def stage_derived_serial(st):
+    return _derived(st, 1)
+
+
+def stage_derived_parallel(st):
+    return _derived(st, st["workers"])
+
+
+# (name, stage, reset before every run)
+STAGES = [
+    ("load_csv", stage_load_csv, reset_cache),
+    ("load_cached", stage_load_cached, None),
+    ("clean", stage_clean, None),
+    ("site_summary", stage_site_summary, None),
+    ("flags", stage_flags, None),
+    ("references", stage_references, None),
+    ("make_dt", stage_make_dt, None),
+    ("coverage", stage_coverage, None),
+    ("frequency_tables", stage_frequency_tables, None),
+    ("qc", stage_qc, None),
+    ("qc_raw", stage_qc_raw, None),
+    ("derived_serial", stage_derived_serial, reset_derived),
+    ("derived_parallel", stage_derived_parallel, reset_derived),
+]
+
+
+def run_stage(fn, reset, st, repeat, memory):
+    """(best seconds, peak traced bytes or None, stage result)"""
+    best = result = None
+    for _ in range(repeat):
+        if reset:
+            reset(st)
+        t0 = time.perf_counter()
+        result = fn(st)
+        seconds = time.perf_counter() - t0
+        best = seconds if best is None else min(best, seconds)
+    peak = None
+    if memory:
+        if reset:
+            reset(st)
+        tracemalloc.start()
+        fn(st)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return best, peak, result
+
+
+def run_scale(scale, workdir, seed=0, repeat=1, memory=True, workers=4):
+    folder = os.path.join(workdir, f"scale_{scale:g}")
+    t0 = time.perf_counter()
+    write_synthetic(folder, scale=scale, seed=seed)
+    gen_s = time.perf_counter() - t0
+    print(f"scale {scale:g}: generated in {gen_s:.1f}s ({folder})")
+
+    records = []
+    st = {"folder": folder, "cache_dir": os.path.join(folder, ".sisal_cache"), "workers": workers}
+    for name, fn, reset in STAGES:
+        seconds, peak, result = run_stage(fn, reset, st, repeat, memory)
+        rec = {
+            "scale": scale,
+            "stage": name,
+            "seconds": round(seconds, 6),
+            "peak_traced_mb": round(peak / 2**20, 3) if peak is not None else None,
+            "max_rss_mb": round(max_rss_mb(), 1) if resource is not None else None,
+            "result": result,
+        }
+        records.append(rec)
+        mem = f"  peak {rec['peak_traced_mb']:9.1f} MB" if peak is not None else ""
+        print(f"  {name:<18} {rec['seconds']:9.3f}s{mem}")
+    return records
+
+
+def compare(records, baseline_path, tolerance):
+    with open(baseline_path) as fh:
+        base = {(r["scale"], r["stage"]): r for r in json.load(fh)["results"]}
+    slower = []
+    for r in records:
+        b = base.get((r["scale"], r["stage"]))
+        if b and b["seconds"] > 0 and r["seconds"] > tolerance * b["seconds"]:
+            slower.append((r["scale"], r["stage"], b["seconds"], r["seconds"]))
+    for scale, stage, old, new in slower:
+        print(f"REGRESSION scale {scale:g} {stage}: {old:.3f}s -> {new:.3f}s ({new / old:.2f}x)")
+    return slower
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--scales", type=float, nargs="+", default=[1.0])
+    ap.add_argument("--repeat", type=int, default=1, help="timed runs per stage (the best is kept)")
+    ap.add_argument("--no-memory", action="store_true", help="skip the tracemalloc run per stage")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--workers", type=int, default=4, help="threads for the derived_parallel stage")
+    ap.add_argument("--workdir", default=None, help="where to generate the folders (default: temp dir)")
+    ap.add_argument("--keep", action="store_true", help="keep the generated folders")
+    ap.add_argument("--out", default=None, help="write the results as JSON")
+    ap.add_argument("--compare", default=None, help="baseline JSON to compare against")
+    ap.add_argument("--tolerance", type=float, default=1.25)
+    args = ap.parse_args()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="sisal_bench_")
+    try:
+        records = []
+        for scale in args.scales:
+            records += run_scale(scale, workdir, seed=args.seed, repeat=args.repeat,
+                                 memory=not args.no_memory, workers=args.workers)
+    finally:
+        if not args.keep and args.workdir is None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "seed": args.seed,
+            "repeat": args.repeat,
+        },
+        "results": records,
+    }
+    if args.out:
+        with open(args.out, "w") as fh:
+            json.dump(report, fh, indent=2)
+        print("Wrote", args.out)
+    if args.compare and compare(records, args.compare, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,318 @@
+"""
+Harness: legacy vs rewritten report queries (sisal/queries.py) on a scaled
+synthetic database.
+
+    # local MySQL / MariaDB; credentials from DB_HOST / DB_PORT / DB_USER / DB_PASSWORD
+    # (sisal/db.py). The database --database is dropped, recreated and loaded.
+    python benchmarks/mysql_query_harness.py --scale 1 --database sisal_bench --out explain.json
+
+    # no server: the same checks in-process (sisal/duck.py)
+    python benchmarks/mysql_query_harness.py --backend duckdb --scale 1
+
+For every query in REPORT_SQL both versions must return the same rows (compared
+independent of row order); each is timed (best of --repeat) and profiled with
+EXPLAIN ANALYZE (MySQL 8.0.18+ tree / MariaDB ANALYZE FORMAT=JSON / DuckDB):
+estimated and actual rows per plan node, with the largest intermediate result
+as the fan-out indicator. The per-site sample queries (SITE_SAMPLE_SQL) are
+timed too. On MySQL / MariaDB everything runs twice: without and with the
+indexes of schema_SISAL_Monv1_v2_query_indexes.sql. GROUP_CONCAT results that
+reach group_concat_max_len (i.e. were truncated) are counted.
+
+Exit code 1 if any legacy / rewritten pair differs.
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from sisal.queries import DEFAULT_KINDS, LEGACY_REPORT_SQL, REPORT_SQL, site_sample_sql  # noqa: E402
+from sisal.schema import CAT, ID, NUM, PRIMARY_KEYS, TABLE_DTYPES  # noqa: E402
+from sisal.synthetic import generate_tables  # noqa: E402
+
+INDEX_FILE = os.path.join(os.path.dirname(__file__), "..", "schema_SISAL_Monv1_v2_query_indexes.sql")
+
+SAMPLE_SITES = 50          # sites per per-site sample query
+
+
+def read_statements(path) -> list:
+    """SQL statements of a migration file (-- comments dropped, split on ';')."""
+    with open(path, encoding="utf-8") as fh:
+        body = "\n".join(line.split("--", 1)[0] for line in fh)
+    return [stmt.strip() for stmt in body.split(";") if stmt.strip()]
+
+
+# -------------------------
+# EXPLAIN parsing
+# -------------------------
+
+_MYSQL_EST = re.compile(r"\(cost=[\d.e+]+(?:\.\.[\d.e+]+)? rows=([\d.e+]+)\)")
+_MYSQL_ACT = re.compile(r"\(actual time=[\d.e+]+\.\.([\d.e+]+) rows=([\d.e+]+) loops=(\d+)\)")
+_DUCK_ROWS = re.compile(r"(~?)([\d,]+) [Rr]ows")
+_DUCK_TIME = re.compile(r"Total Time: ([\d.]+)s")
+
+
+def summarize_mysql(plan) -> dict:
+    est = [float(v) for v in _MYSQL_EST.findall(plan)]
+    act = [(float(t), float(r) * int(n)) for t, r, n in _MYSQL_ACT.findall(plan)]
+    return {
+        "nodes": len(act) or len(est),
+        "est_rows_max": max(est, default=None),
+        "est_rows_total": sum(est),
+        "actual_rows_max": max((r for _, r in act), default=None),
+        "actual_rows_total": sum(r for _, r in act),
+        "actual_ms": act[0][0] if act else None,
+    }
+
+
+def summarize_mariadb(plan) -> dict:
+    est = [float(v) for v in re.findall(r'"rows":\s*([\d.e+]+)', plan)]
+    act = [float(v) for v in re.findall(r'"r_rows":\s*([\d.e+]+)', plan)]
+    ms = re.search(r'"r_total_time_ms":\s*([\d.e+]+)', plan)
+    return {
+        "nodes": len(est),
+        "est_rows_max": max(est, default=None),
+        "est_rows_total": sum(est),
+        "actual_rows_max": max(act, default=None),
+        "actual_rows_total": sum(act),
+        "actual_ms": float(ms.group(1)) if ms else None,
+    }
+
+
+def summarize_duckdb(plan) -> dict:
+    est, act = [], []
+    for tilde, n in _DUCK_ROWS.findall(plan):
+        (est if tilde else act).append(float(n.replace(",", "")))
+    total = _DUCK_TIME.search(plan)
+    return {
+        "nodes": len(act),
+        "est_rows_max": max(est, default=None),
+        "est_rows_total": sum(est),
+        "actual_rows_max": max(act, default=None),
+        "actual_rows_total": sum(act),
+        "actual_ms": float(total.group(1)) * 1000 if total else None,
+    }
+
+
+# -------------------------
+# backends
+# -------------------------
+
+class MySQLBackend:
+    """Loads the tables into a fresh database on the server from sisal/db.py settings."""
+
+    def __init__(self, database):
+        from sqlalchemy import text
+
+        from sisal.db import Database, db_config, make_engine
+
+        self.text = text
+        cfg = db_config()
+        server = make_engine({**cfg, "database": None}, pool_size=1)
+        with server.begin() as conn:
+            conn.execute(text(f"DROP DATABASE IF EXISTS `{database}`"))
+            conn.execute(text(f"CREATE DATABASE `{database}` CHARACTER SET utf8mb4"))
+            self.version = conn.execute(text("SELECT VERSION()")).scalar()
+        server.dispose()
+        self.db = Database(make_engine({**cfg, "database": database}))
+        self.mariadb = "mariadb" in self.version.lower()
+        self.name = "mariadb" if self.mariadb else "mysql"
+
+    def load(self, tables):
+        from sqlalchemy import types
+
+        sql_types = {ID: types.BigInteger(), NUM: types.Float(precision=53), CAT: types.String(255)}
+        for name, df in tables.items():
+            declared = TABLE_DTYPES.get(name, {})
+            dtype = {c: sql_types.get(declared.get(c), types.Text()) for c in df.columns}
+            df.to_sql(name, self.db.engine, index=False, if_exists="replace", dtype=dtype,
+                      chunksize=5_000, method="multi")
+            if name in PRIMARY_KEYS:
+                with self.db.engine.begin() as conn:
+                    conn.execute(self.text(f"ALTER TABLE `{name}` ADD PRIMARY KEY (`{PRIMARY_KEYS[name]}`)"))
+
+    def apply_indexes(self, path) -> int:
+        created = 0
+        for stmt in read_statements(path):
+            try:
+                with self.db.engine.begin() as conn:
+                    conn.execute(self.text(stmt))
+                created += 1
+            except Exception as err:           # 1061: duplicate key name
+                if "1061" not in str(err):
+                    raise
+        return created
+
+    def query(self, sql, params=None) -> pd.DataFrame:
+        return self.db.query(sql, params)
+
+    def explain(self, sql, params=None):
+        body = sql.text if hasattr(sql, "text") else sql
+        prefix = "ANALYZE FORMAT=JSON " if self.mariadb else "EXPLAIN ANALYZE "
+        stmt = self.text(prefix + body)
+        if hasattr(sql, "_bindparams"):
+            stmt = stmt.bindparams(*sql._bindparams.values())
+        with self.db.engine.connect() as conn:
+            plan = "\n".join(str(row[0]) for row in conn.execute(stmt, params or {}))
+        return plan, (summarize_mariadb if self.mariadb else summarize_mysql)(plan)
+
+    def group_concat_max_len(self):
+        return int(self.db.query("SELECT @@group_concat_max_len AS n")["n"].iloc[0])
+
+
+class DuckBackend:
+    def __init__(self):
+        from sisal.duck import DuckDatabase
+
+        self.DuckDatabase = DuckDatabase
+        self.name = "duckdb"
+        self.version = None
+        self.db = None
+
+    def load(self, tables):
+        import duckdb
+
+        self.version = duckdb.__version__
+        self.db = self.DuckDatabase.from_frames(tables)
+
+    def apply_indexes(self, path) -> int:
+        return 0                           # DuckDB: no secondary indexes used for joins
+
+    def query(self, sql, params=None) -> pd.DataFrame:
+        return self.db.query(sql, params)
+
+    def explain(self, sql, params=None):
+        from sisal.duck import _bound, mysql_to_duckdb
+
+        stmt = mysql_to_duckdb(sql)
+        rows = self.db.conn.cursor().execute("EXPLAIN ANALYZE " + stmt, _bound(stmt, params)).fetchall()
+        plan = "\n".join(str(r[-1]) for r in rows)
+        return plan, summarize_duckdb(plan)
+
+    def group_concat_max_len(self):
+        return None                        # string_agg is not capped
+
+
+# -------------------------
+# checks
+# -------------------------
+
+def same_rows(a, b) -> str:
+    """'' if a and b hold the same rows (any order), else a short reason."""
+    if sorted(a.columns) != sorted(b.columns):
+        return f"columns differ: {sorted(set(a.columns) ^ set(b.columns))}"
+    if len(a) != len(b):
+        return f"row counts differ: {len(a)} vs {len(b)}"
+    cols = list(a.columns)
+
+    def _norm(df):
+        df = df[cols].copy()
+        for c in cols:
+            if not pd.api.types.is_numeric_dtype(df[c]):
+                df[c] = df[c].astype("string")
+        return df.sort_values(cols, na_position="first").reset_index(drop=True)
+
+    try:
+        pd.testing.assert_frame_equal(_norm(a), _norm(b), check_dtype=False)
+    except AssertionError as err:
+        return str(err).splitlines()[0]
+    return ""
+
+
+def truncated(df, cap) -> int:
+    """Text values at least group_concat_max_len bytes long (= cut off by MySQL)."""
+    if not cap:
+        return 0
+    n = 0
+    for c in df.columns:
+        if not pd.api.types.is_numeric_dtype(df[c]):
+            n += int(df[c].dropna().astype(str).map(lambda v: len(v.encode("utf-8")) >= cap).sum())
+    return n
+
+
+def timed(backend, sql, params, repeat):
+    best, df = None, None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        df = backend.query(sql, params)
+        seconds = time.perf_counter() - t0
+        best = seconds if best is None else min(best, seconds)
+    return best, df
+
+
+def run_phase(backend, phase, repeat, sites):
+    records, failures = [], []
+    cap = backend.group_concat_max_len()
+    for name, new_sql in REPORT_SQL.items():
+        results = {}
+        for version, sql in (("legacy", LEGACY_REPORT_SQL[name]), ("rewritten", new_sql)):
+            seconds, df = timed(backend, sql, None, repeat)
+            plan, summary = backend.explain(sql)
+            results[version] = df
+            records.append({"phase": phase, "query": name, "version": version, "seconds": round(seconds, 6),
+                            "rows": len(df), "truncated_values": truncated(df, cap), **summary, "plan": plan})
+            print(f"  {name:<20} {version:<10} {seconds:9.4f}s rows={len(df):<8} "
+                  f"max intermediate rows={summary['actual_rows_max']}")
+        reason = same_rows(results["legacy"], results["rewritten"])
+        if reason:
+            failures.append((phase, name, reason))
+            print(f"  MISMATCH {name}: {reason}")
+
+    for kind in DEFAULT_KINDS:
+        sql = site_sample_sql(kind, by="site_id")
+        params = {"sites": sites}
+        seconds, df = timed(backend, sql, params, repeat)
+        plan, summary = backend.explain(sql, params)
+        records.append({"phase": phase, "query": f"site_sample:{kind}", "version": "current",
+                        "seconds": round(seconds, 6), "rows": len(df), **summary, "plan": plan})
+        print(f"  site_sample:{kind:<9} {'':<10} {seconds:9.4f}s rows={len(df)}")
+    return records, failures
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--backend", choices=("mysql", "duckdb"), default="mysql")
+    ap.add_argument("--database", default="sisal_query_harness", help="MySQL database to (re)create")
+    ap.add_argument("--scale", type=float, default=1.0)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--skip-indexes", action="store_true", help="MySQL: only run without the extra indexes")
+    ap.add_argument("--out", default=None, help="write the records (incl. plans) as JSON")
+    args = ap.parse_args()
+
+    backend = MySQLBackend(args.database) if args.backend == "mysql" else DuckBackend()
+    tables = generate_tables(scale=args.scale, seed=args.seed)
+    t0 = time.perf_counter()
+    backend.load(tables)
+    print(f"{backend.name} {backend.version}: loaded scale {args.scale:g} "
+          f"({sum(len(t) for t in tables.values()):,} rows) in {time.perf_counter() - t0:.1f}s")
+    sites = [int(v) for v in tables["site"]["site_id"].dropna().head(SAMPLE_SITES)]
+
+    phases = ["base"]
+    if args.backend == "mysql" and not args.skip_indexes:
+        phases.append("indexed")
+    records, failures = [], []
+    for phase in phases:
+        if phase == "indexed":
+            print(f"created {backend.apply_indexes(INDEX_FILE)} indexes")
+        print(f"[{phase}]")
+        recs, fails = run_phase(backend, phase, args.repeat, sites)
+        records += recs
+        failures += fails
+
+    if args.out:
+        with open(args.out, "w") as fh:
+            json.dump({"backend": backend.name, "version": backend.version, "scale": args.scale,
+                       "seed": args.seed, "results": records}, fh, indent=2, default=str)
+        print("Wrote", args.out)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
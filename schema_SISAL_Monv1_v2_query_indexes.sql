@@ -0,0 +1,45 @@
+-- ============================================================
+-- SISAL_monv1: supplementary indexes for the report / per-site queries
+-- (sisal/queries.py: SITE_ENTITY_COUNTS_SQL, SITE_REFS_SITEONLY_SQL,
+-- GLOBAL_SQL, SITE_SAMPLE_SQL).
+--
+-- Table names as in the exported database the Python / R scripts query
+-- (site, cave_entity, site_link_precip, drip_iso_sample, ...).
+-- Every index leads with the join key; the sample-table indexes continue with
+-- the ORDER BY columns, so per-site pulls read each entity's rows in order.
+--
+--   mysql sisal_monv1 < schema_SISAL_Monv1_v2_query_indexes.sql
+--
+-- Re-running reports "Duplicate key name" (error 1061) for indexes that
+-- already exist; benchmarks/mysql_query_harness.py skips those.
+-- ============================================================
+
+-- entity counts per site (pre-aggregated per site_id: index-only scans)
+CREATE INDEX ix_cave_entity_site ON cave_entity (site_id, cave_entity_id);
+CREATE INDEX ix_drip_entity_site ON drip_entity (site_id, drip_entity_id);
+CREATE INDEX ix_site_link_precip_site ON site_link_precip (site_id, precip_entity_id, precip_site_id);
+CREATE INDEX ix_site_link_precip_entity ON site_link_precip (precip_entity_id);
+CREATE INDEX ix_site_link_precip_precip_site ON site_link_precip (precip_site_id);
+
+-- site references
+CREATE INDEX ix_site_link_reference_site ON site_link_reference (site_id, ref_id);
+CREATE INDEX ix_site_link_reference_ref ON site_link_reference (ref_id);
+
+-- per-site sample pulls: entity + start date (the ORDER BY of SITE_SAMPLE_SQL)
+CREATE INDEX ix_drip_iso_entity_start ON drip_iso_sample
+  (drip_entity_id, drip_iso_start_yyyy, drip_iso_start_mm, drip_iso_start_dd);
+CREATE INDEX ix_drip_rate_entity_start ON drip_rate_sample
+  (drip_entity_id, drip_rate_start_yyyy, drip_rate_start_mm, drip_rate_start_dd);
+CREATE INDEX ix_mod_carb_entity_start ON mod_carb_sample
+  (drip_entity_id, mod_carb_start_yyyy, mod_carb_start_mm, mod_carb_start_dd);
+CREATE INDEX ix_precip_entity_start ON precip_sample
+  (precip_entity_id, precip_start_yyyy, precip_start_mm, precip_start_dd);
+
+-- cave environment loggers: entity + timestamp
+CREATE INDEX ix_cave_temperature_entity_time ON cave_temperature_sample
+  (cave_entity_id, cave_temperature_yyyy, cave_temperature_mm, cave_temperature_dd, cave_temperature_hhmm);
+CREATE INDEX ix_cave_relative_humidity_entity_time ON cave_relative_humidity_sample
+  (cave_entity_id, cave_relative_humidity_yyyy, cave_relative_humidity_mm, cave_relative_humidity_dd,
+   cave_relative_humidity_hhmm);
+CREATE INDEX ix_cave_pCO2_entity_time ON cave_pCO2_sample
+  (cave_entity_id, cave_pCO2_yyyy, cave_pCO2_mm, cave_pCO2_dd, cave_pCO2_hhmm);
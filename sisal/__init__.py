@@ -0,0 +1,41 @@
+"""
+SISAL_monv1 helpers shared by the flat-CSV cookbook and the MySQL scripts.
+
+Importing the package loads nothing heavy: the names below resolve on first
+use (pandas, pyarrow, sqlalchemy, ... are only imported by the modules that
+need them), so `import sisal` and the `sisal` command line start fast.
+"""
+
+__version__ = "0.1.0"
+
+# public name -> submodule that defines it
+_EXPORTS = {
+    "REQUIRED_TABLES": "schema",
+    "TABLE_DTYPES": "schema",
+    "load_tables": "loader",
+    "read_table": "loader",
+    "SisalDB": "registry",
+    "Materializer": "materialize",
+    "Pipeline": "pipeline",
+    "Database": "db",
+    "DuckDatabase": "duck",
+    "export_tables": "export",
+    "run_qc": "qc",
+    "load_release": "bulk_load",
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        import importlib
+
+        value = getattr(importlib.import_module(f".{_EXPORTS[name]}", __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
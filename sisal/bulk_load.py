@@ -0,0 +1,500 @@
+"""
+Bulk loader: a flat-CSV release -> the MySQL database the scripts query
+(data_loader_v2.R without the per-row / per-value R logic).
+
+    load_release("SISAL_monv1_csv", database="sisal_monv1_staging")
+    sisal bulk-load SISAL_monv1_csv --database sisal_monv1_staging --qc
+
+1. The tables are (re)created in the flat layout (site, drip_entity,
+   site_link_precip, ...; sisal.schema) with the column types of
+   schema_SISAL_Monv1_v2.sql, primary keys only.
+2. The CSVs are loaded in foreign-key order (sisal.schema.FOREIGN_KEYS); the
+   tables of one wave, which do not reference each other, load in parallel,
+   each on its own pooled connection with unique / foreign key checks off and
+   one COMMIT per table. A table is parsed with the typed loader, prepared
+   with vectorized column operations (rounding, NULL / escape encoding) and
+   sent with LOAD DATA LOCAL INFILE, or with multi-row INSERTs when the
+   server does not allow local files (method="auto" probes that once, before
+   the first table). Server warnings (e.g. truncated values) are counted per
+   statement and reported per table.
+3. Every reference is checked for ids missing from the referenced table
+   (one anti-join per foreign key); the load fails on the first table with
+   dangling ids. The FOREIGN KEY constraints are then added with the checks
+   on, so MySQL validates the rows as well.
+
+NOT NULL is only kept on the primary keys: flat releases have gaps in some
+NOT NULL columns of the workbook schema (sisal.qc reports them). The query
+indexes (schema_SISAL_Monv1_v2_query_indexes.sql) can be applied afterwards.
+"""
+
+# pip install sqlalchemy pymysql
+
+import csv
+import os
+import re
+import tempfile
+import threading
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from . import instrument
+from .loader import find_csv_files, read_csv_typed, table_name
+from .schema import CAT, FOREIGN_KEYS, ID, NUM, PRIMARY_KEYS, TABLE_DTYPES, TEXT
+
+# in a source checkout; an installed package does not ship it (pass schema_path / --schema)
+SCHEMA_SQL = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..",
+                                           "schema_SISAL_Monv1_v2.sql"))
+
+# flat table -> table of schema_SISAL_Monv1_v2.sql it takes its column types from
+SQL_TABLES = {
+    "site": "SITE",
+    "notes": "NOTES",
+    "reference": "REFERENCE",
+    "precip_site": "PRECIP_SITE_METADATA",
+    "precip_entity": "PRECIP_ENTITY_METADATA",
+    "precip_sample": "PRECIP",
+    "cave_entity": "CAVE_ENTITY_METADATA",
+    "cave_temperature_sample": "CAVE_TEMPERATURE",
+    "cave_relative_humidity_sample": "CAVE_RELATIVE_HUMIDITY",
+    "cave_pCO2_sample": "CAVE_pCO2",
+    "drip_entity": "DRIP_ENTITY_METADATA",
+    "drip_iso_sample": "DRIP_ISO",
+    "drip_rate_sample": "DRIP_RATE",
+    "mod_carb_sample": "MOD_CARB",
+    "entity_link_reference": "ENTITY_LINK_REFERENCE",
+}
+
+# sisal.schema dtype -> MySQL type, for columns the SQL schema does not have (link tables)
+FALLBACK_TYPES = {ID: "INT", NUM: "DOUBLE", TEXT: "TEXT", CAT: "VARCHAR(255)"}
+
+# column -> decimals applied before loading, as data_loader_v2.R does (round(x, 2));
+# a column may also be mapped to "display": per value, display_precision() (opt-in;
+# data_loader_v2.R defines display_precision but does not apply it to stored values)
+MEASUREMENT_ROUNDING = {
+    "precip_d18O_measurement": 2,
+    "precip_d2H_measurement": 2,
+    "drip_iso_d18O_measurement": 2,
+    "drip_iso_d2H_measurement": 2,
+    "drip_rate_measurement": 2,
+    "mod_carb_d18O_measurement": 2,
+    "mod_carb_d13C_measurement": 2,
+}
+
+# server / client refusing LOAD DATA LOCAL (-> INSERTs)
+_NO_LOCAL_INFILE = {1148, 2068, 3948, 3950}
+MAX_STATEMENT_BYTES = 1_024_000        # per multi-row INSERT (below the default max_allowed_packet)
+
+_CREATE_TABLE = re.compile(r"CREATE TABLE IF NOT EXISTS `[^`]+`\.`(\w+)` \((.*?)\n\)?\s*ENGINE", re.DOTALL)
+_COLUMN = re.compile(r"^\s*`(\w+)`\s+(.*?),?\s*$")
+
+
+# -------------------------
+# schema
+# -------------------------
+
+def _column_type(definition) -> str:
+    """'ENUM('a', 'b (c)') NULL DEFAULT NULL' -> "ENUM('a', 'b (c)')" (parentheses inside quotes kept)."""
+    m = re.match(r"[A-Za-z]+", definition)
+    end = m.end()
+    if definition[end:end + 1] == "(":
+        depth, quoted = 0, False
+        for i in range(end, len(definition)):
+            ch = definition[i]
+            if ch == "'":
+                quoted = not quoted
+            elif not quoted and ch == "(":
+                depth += 1
+            elif not quoted and ch == ")":
+                depth -= 1
+                if depth == 0:
+                    return definition[:i + 1]
+    return definition[:end]
+
+
+def sql_column_types(path=SCHEMA_SQL) -> dict:
+    """{SQL table: {column: type}} of the CREATE TABLE statements in `path`."""
+    with open(path, encoding="utf-8") as fh:
+        body = fh.read().replace("\r\n", "\n")
+    tables = {}
+    for name, block in _CREATE_TABLE.findall(body):
+        columns = {}
+        for line in block.split("\n"):
+            m = _COLUMN.match(line)
+            if m:
+                columns[m.group(1)] = _column_type(m.group(2))
+        tables[name] = columns
+    return tables
+
+
+def table_columns(name, csv_columns=(), sql_types=None) -> dict:
+    """
+    {column: MySQL type} of flat table `name`: the sisal.schema columns plus any
+    other column of the CSV, typed from the SQL schema where it has the column.
+    """
+    declared = TABLE_DTYPES.get(name, {})
+    sql = (sql_types or {}).get(SQL_TABLES.get(name), {})
+    columns = {}
+    for column in [*declared, *(c for c in csv_columns if c not in declared)]:
+        columns[column] = sql.get(column) or FALLBACK_TYPES.get(declared.get(column), "TEXT")
+    return columns
+
+
+def create_table_sql(name, columns) -> str:
+    key = PRIMARY_KEYS.get(name)
+    lines = [f"`{c}` {t} NOT NULL" if c == key else f"`{c}` {t} NULL DEFAULT NULL" for c, t in columns.items()]
+    if key in columns:
+        lines.append(f"PRIMARY KEY (`{key}`)")
+    return f"CREATE TABLE `{name}` (\n  " + ",\n  ".join(lines) + "\n) ENGINE = InnoDB"
+
+
+def foreign_key_sql(name, loaded) -> str:
+    """ALTER TABLE adding the foreign keys of `name` whose referenced table is in `loaded` (None if none)."""
+    parts = [f"ADD CONSTRAINT `fk_{name}_{column}` FOREIGN KEY (`{column}`) "
+             f"REFERENCES `{ref}` (`{column}`) ON DELETE CASCADE ON UPDATE CASCADE"
+             for column, ref in FOREIGN_KEYS.get(name, {}).items() if ref in loaded]
+    return f"ALTER TABLE `{name}` " + ", ".join(parts) if parts else None
+
+
+def orphan_sql(name, column, ref) -> str:
+    """Count of the non-NULL `column` values of `name` missing from `ref`."""
+    return (f"SELECT COUNT(*) FROM `{name}` AS c LEFT JOIN `{ref}` AS p ON p.`{column}` = c.`{column}` "
+            f"WHERE c.`{column}` IS NOT NULL AND p.`{column}` IS NULL")
+
+
+def load_order(names) -> list:
+    """Waves of tables: every table comes after the tables it references (in `names`)."""
+    names = set(names)
+    deps = {n: {ref for ref in FOREIGN_KEYS.get(n, {}).values() if ref in names and ref != n} for n in names}
+    waves, done = [], set()
+    while len(done) < len(names):
+        wave = sorted(n for n in names - done if deps[n] <= done)
+        if not wave:
+            raise ValueError(f"Foreign key cycle among: {', '.join(sorted(names - done))}")
+        waves.append(wave)
+        done.update(wave)
+    return waves
+
+
+# -------------------------
+# preparing the data
+# -------------------------
+
+def display_precision(values) -> np.ndarray:
+    """
+    Decimals to show per value (display_precision of data_loader_v2.R, for a
+    whole column at once; float array, NaN = undefined):
+    - whole numbers >= 10 -> 0
+    - 1 <= x < 10 -> 1
+    - 0 <= x < 1 -> position of the second non-zero decimal (of the value
+      written with 7 significant digits), of the first if there is only one,
+      0 for zero
+    - anything else (negative, fractional >= 10, missing) -> NaN
+    """
+    x = np.asarray(values, dtype=float)
+    out = np.full(x.shape, np.nan)
+    with np.errstate(invalid="ignore"):
+        out[(x >= 10) & (x == np.floor(x))] = 0
+        out[(x >= 1) & (x < 10)] = 1
+        out[x == 0] = 0
+        frac = (x > 0) & (x < 1)
+    if not frac.any():
+        return out
+
+    v = x[frac]
+    # first non-zero decimal p1 (v * 10**p1 in [1, 10)), then 7 significant digits as an integer
+    p1 = np.ceil(-np.log10(v)).astype(np.int64)
+    p1 -= v * 10.0 ** (p1 - 1) >= 1          # log10 rounding at exact powers of ten
+    p1 += v * 10.0 ** p1 < 1
+    digits = np.rint(v * 10.0 ** (p1 + 6)).astype(np.int64)
+    carried = digits >= 10_000_000           # e.g. 0.099999999 is written 0.1
+    p1[carried] -= 1
+    digits[carried] //= 10
+    rest = digits % 1_000_000                # the 6 digits after the first non-zero one
+    # leading zeros of `rest` (as 6 digits) = decimals between the first and second non-zero digit
+    width = np.searchsorted(10 ** np.arange(1, 7), rest, side="right") + 1
+    out[frac] = np.where(rest == 0, p1, p1 + 7 - width)
+    return out
+
+
+def round_display(values) -> np.ndarray:
+    """Values rounded to their display_precision() (unchanged where it is undefined)."""
+    x = np.asarray(values, dtype=float)
+    p = display_precision(x)
+    scale = 10.0 ** np.nan_to_num(p)
+    return np.where(np.isnan(p), x, np.round(x * scale) / scale)
+
+
+def prepare_table(df, rounding=None) -> pd.DataFrame:
+    """Apply `rounding` ({column: decimals or "display"}) to the columns of `df` that have one."""
+    for column, decimals in (rounding or {}).items():
+        if column in df.columns:
+            x = df[column].to_numpy(dtype=float, na_value=np.nan)
+            df[column] = round_display(x) if decimals == "display" else np.round(x, decimals)
+    return df
+
+
+def _escape(s) -> pd.Series:
+    """Backslash, tab and line breaks escaped as LOAD DATA reads them (categoricals: per category)."""
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        return s.cat.rename_categories(_escape(s.cat.categories.to_series()).to_numpy())
+    for ch, esc in (("\\", "\\\\"), ("\t", "\\t"), ("\n", "\\n"), ("\r", "\\r")):
+        s = s.str.replace(ch, esc, regex=False)
+    return s
+
+
+def write_infile(df, path=None):
+    """
+    The frame as LOAD DATA text (to `path`, or returned): tab separated, \\N = NULL, text columns
+    escaped (vectorized) beforehand, so the writer needs no quoting.
+    """
+    text = {c: _escape(df[c]) for c in df.columns
+            if not pd.api.types.is_numeric_dtype(df[c].dtype) and not pd.api.types.is_bool_dtype(df[c].dtype)}
+    out = df.assign(**text) if text else df
+    return out.to_csv(path, encoding="utf-8", sep="\t", na_rep="\\N", header=False, index=False,
+                      quoting=csv.QUOTE_NONE, quotechar=None, lineterminator="\n")
+
+
+def _rows(df):
+    """Row tuples for the INSERT parameters (None = NULL, numpy scalars as Python values)."""
+    return list(df.astype(object).where(df.notna(), None).itertuples(index=False, name=None))
+
+
+def insert_statements(name, columns, rows, mogrify, max_bytes=MAX_STATEMENT_BYTES):
+    """
+    Multi-row INSERTs of `rows` into `name`, each up to max_bytes (like pymysql's
+    executemany, but one statement at a time, so the warnings of each are seen).
+    mogrify(sql, params) -> SQL text with the values escaped (cursor.mogrify).
+    """
+    head = f"INSERT INTO `{name}` ({', '.join(f'`{c}`' for c in columns)}) VALUES "
+    placeholders = "(" + ", ".join(["%s"] * len(columns)) + ")"
+    values, size = [], len(head.encode())
+    for row in rows:
+        value = mogrify(placeholders, row)
+        nbytes = len(value.encode()) + 1
+        if values and size + nbytes > max_bytes:
+            yield head + ",".join(values)
+            values, size = [], len(head.encode())
+        values.append(value)
+        size += nbytes
+    if values:
+        yield head + ",".join(values)
+
+
+# -------------------------
+# loading
+# -------------------------
+
+class BulkLoader:
+    """
+    Loads CSV tables into one MySQL database.
+    - method: "infile" (LOAD DATA LOCAL INFILE), "insert" (multi-row INSERTs)
+      or "auto" (infile if a probe finds the server accepts local files, else insert)
+    - max_workers: tables loaded at the same time (one connection each)
+    """
+
+    def __init__(self, config=None, method="auto", max_workers=4, batch_size=50_000,
+                 rounding=MEASUREMENT_ROUNDING, schema_path=SCHEMA_SQL):
+        from .db import db_config, make_engine
+
+        if method not in ("auto", "infile", "insert"):
+            raise ValueError(f"Unknown method: {method} (expected auto, infile or insert)")
+        self.config = config or db_config()
+        self.method = method
+        self.max_workers = max_workers
+        self.batch_size = batch_size
+        self.rounding = rounding
+        if not os.path.exists(schema_path):
+            raise FileNotFoundError(f"Schema not found: {schema_path} (pass the path of "
+                                    "schema_SISAL_Monv1_v2.sql, e.g. sisal bulk-load --schema)")
+        self.sql_types = sql_column_types(schema_path)
+        missing = sorted(set(SQL_TABLES.values()) - set(self.sql_types))
+        if missing:
+            warnings.warn(f"{schema_path} has no CREATE TABLE for {', '.join(missing)}; "
+                          "their columns get generic types")
+        # key checks off on every connection of this engine (it is only used for the load)
+        self.engine = make_engine(self.config, pool_size=max_workers, max_overflow=0,
+                                  session_settings={"unique_checks": 0, "foreign_key_checks": 0},
+                                  connect_args={"local_infile": True})
+        self._infile = {"auto": None, "infile": True, "insert": False}[method]
+        self._lock = threading.Lock()
+
+    def create_database(self):
+        from .db import make_engine
+
+        server = make_engine({**self.config, "database": None}, pool_size=1, session_settings={})
+        try:
+            with server.begin() as conn:
+                conn.exec_driver_sql(f"CREATE DATABASE IF NOT EXISTS `{self.config['database']}` "
+                                     "CHARACTER SET utf8mb4")
+        finally:
+            server.dispose()
+
+    def _execute(self, statements):
+        with self.engine.begin() as conn:
+            for stmt in statements:
+                conn.exec_driver_sql(stmt)
+
+    def create_tables(self, files) -> dict:
+        """Drop and recreate the tables of {name: csv path}; returns {name: {column: type}}."""
+        from .duck import _csv_header
+
+        columns = {name: table_columns(name, _csv_header(path), self.sql_types) for name, path in files.items()}
+        self._execute([f"DROP TABLE IF EXISTS `{name}`" for name in files]
+                      + [create_table_sql(name, cols) for name, cols in columns.items()])
+        return columns
+
+    def use_infile(self) -> bool:
+        """LOAD DATA LOCAL INFILE (True) or INSERTs; method="auto" probes the server once."""
+        with self._lock:
+            if self._infile is None:
+                self._infile = self._probe_infile()
+            return self._infile
+
+    def _probe_infile(self) -> bool:
+        """Load an empty file into a temporary table: does the server accept local files?"""
+        fd, path = tempfile.mkstemp(prefix="sisal_probe_", suffix=".tsv")
+        os.close(fd)
+        conn = self.engine.raw_connection()
+        try:
+            cur = conn.cursor()
+            cur.execute("CREATE TEMPORARY TABLE `_sisal_infile_probe` (`x` INT)")
+            try:
+                cur.execute("LOAD DATA LOCAL INFILE %s INTO TABLE `_sisal_infile_probe`", (path,))
+            except Exception as err:
+                if (err.args[0] if err.args else None) not in _NO_LOCAL_INFILE:
+                    raise
+                warnings.warn(f"LOAD DATA LOCAL INFILE refused ({err}); loading with INSERTs")
+                return False
+            finally:
+                cur.execute("DROP TEMPORARY TABLE IF EXISTS `_sisal_infile_probe`")
+            return True
+        finally:
+            conn.close()
+            os.remove(path)
+
+    def _warnings(self, cur, found):
+        """Add the warnings of the last statement to found = [count, examples]."""
+        if cur.warning_count:
+            found[0] += cur.warning_count
+            if not found[1]:
+                cur.execute("SHOW WARNINGS LIMIT 3")
+                found[1] = [str(row[2]) for row in cur.fetchall()]
+
+    def _load_infile(self, cur, name, df, found):
+        fd, path = tempfile.mkstemp(prefix=f"sisal_{name}_", suffix=".tsv")
+        try:
+            os.close(fd)
+            write_infile(df, path)
+            columns = ", ".join(f"`{c}`" for c in df.columns)
+            cur.execute(f"LOAD DATA LOCAL INFILE %s INTO TABLE `{name}` CHARACTER SET utf8mb4 "
+                        f"FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\' LINES TERMINATED BY '\\n' ({columns})",
+                        (path,))
+            self._warnings(cur, found)
+        finally:
+            os.remove(path)
+
+    def _load_insert(self, cur, name, df, found):
+        for start in range(0, len(df), self.batch_size):      # bounds the Python row tuples
+            for stmt in insert_statements(name, df.columns, _rows(df.iloc[start:start + self.batch_size]),
+                                          cur.mogrify):
+                cur.execute(stmt)
+                self._warnings(cur, found)
+
+    def load_table(self, name, path) -> int:
+        """Parse, prepare and load one CSV (one transaction); returns the rows loaded."""
+        with instrument.stage(f"bulk_load:{name}") as st:
+            df = prepare_table(read_csv_typed(path, name), self.rounding)
+            infile = self.use_infile()
+            found = [0, []]                 # server warnings: count, first examples
+            conn = self.engine.raw_connection()
+            try:
+                cur = conn.cursor()
+                (self._load_infile if infile else self._load_insert)(cur, name, df, found)
+                if found[0]:
+                    warnings.warn(f"{name}: {found[0]} warning(s) while loading, e.g. {'; '.join(found[1])}")
+                conn.commit()
+            finally:
+                conn.close()
+            st.rows_out = len(df)
+        return len(df)
+
+    def load(self, files, foreign_keys=True) -> dict:
+        """
+        Create and load the tables of {name: csv path} in foreign-key order;
+        returns {name: rows}.
+        """
+        self.create_tables(files)
+        self.use_infile()                   # probe once, before the threads start
+        rows = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            for wave in load_order(files):
+                for name, n in zip(wave, pool.map(lambda n: self.load_table(n, files[n]), wave)):
+                    rows[name] = n
+        if foreign_keys:
+            with instrument.stage("bulk_load:foreign_keys"):
+                self.add_foreign_keys(files)
+        return rows
+
+    def add_foreign_keys(self, loaded):
+        """
+        Check the references between the `loaded` tables, then add the FOREIGN
+        KEY constraints with foreign_key_checks on (the load connections have it
+        off, and MySQL would then add the constraints without looking at the rows).
+        Raises ValueError listing the dangling references.
+        """
+        refs = [(name, column, ref) for name in loaded
+                for column, ref in FOREIGN_KEYS.get(name, {}).items() if ref in loaded]
+        with self.engine.connect() as conn:
+            conn.exec_driver_sql("SET SESSION foreign_key_checks = 1")
+            try:
+                orphans = [f"{name}.{column}: {n} id(s) not in {ref}" for name, column, ref in refs
+                           if (n := conn.exec_driver_sql(orphan_sql(name, column, ref)).scalar())]
+                if orphans:
+                    raise ValueError("Dangling references, foreign keys not added (run sisal qc): "
+                                     + "; ".join(orphans))
+                for stmt in filter(None, (foreign_key_sql(name, loaded) for name in loaded)):
+                    conn.exec_driver_sql(stmt)
+                conn.commit()
+            finally:
+                conn.exec_driver_sql("SET SESSION foreign_key_checks = 0")
+
+    def dispose(self):
+        self.engine.dispose()
+
+
+def release_files(folder_path, names=None) -> dict:
+    """{table: csv path} of the sisal.schema tables in a folder (other CSVs are reported and skipped)."""
+    files = {table_name(f): f for f in find_csv_files(folder_path)}
+    unknown = sorted(set(files) - set(TABLE_DTYPES))
+    if unknown:
+        warnings.warn(f"Not a SISAL_monv1 table, not loaded: {', '.join(unknown)}")
+    files = {n: f for n, f in files.items() if n in TABLE_DTYPES and (names is None or n in names)}
+    if not files:
+        raise FileNotFoundError(f"No SISAL_monv1 CSV tables in {folder_path}")
+    return files
+
+
+def load_release(folder_path, database=None, config=None, names=None, method="auto", max_workers=4,
+                 rounding=MEASUREMENT_ROUNDING, foreign_keys=True, schema_path=SCHEMA_SQL) -> dict:
+    """
+    Load a flat-CSV release into MySQL (settings of sisal.db: DB_HOST, ... or
+    SISAL_DB_CONFIG; `database` overrides DB_NAME). The database is created
+    if needed; the loaded tables are dropped and recreated. Returns {table: rows}.
+    schema_path: schema_SISAL_Monv1_v2.sql (default: the copy of a source checkout)
+    """
+    from .db import db_config
+
+    files = release_files(folder_path, names)
+    loader = BulkLoader(config or db_config(database=database), method=method,
+                        max_workers=max_workers, rounding=rounding, schema_path=schema_path)
+    try:
+        loader.create_database()
+        with instrument.stage("bulk_load", tables=len(files)) as st:
+            rows = loader.load(files, foreign_keys=foreign_keys)
+            st.rows_out = sum(rows.values())
+    finally:
+        loader.dispose()
+    return rows
@@ -0,0 +1,315 @@
+"""
+Command line tool (installed as `sisal`, or python -m sisal).
+
+    sisal load FOLDER                          # parse the CSVs once, fill the Arrow cache
+    sisal derive FOLDER full_year_both --out results/     # only the stages it needs
+    sisal query site_entity_counts --out counts.parquet   # MySQL (sisal/db.py settings)
+    sisal query "SELECT * FROM site" --backend duckdb --folder FOLDER
+    sisal export --sites Obir --out SISAL_monv1_export.xlsx
+    sisal maps FOLDER --out maps/
+    sisal qc FOLDER --raw --out qc/                       # QC script_v5.3.R checks
+    sisal bulk-load FOLDER --database sisal_monv1 --qc    # rebuild the MySQL tables
+
+Every subcommand imports its libraries (pandas, sqlalchemy, matplotlib, ...)
+when it runs, so `sisal --help` and argument errors return immediately and
+each command only pays for what it uses. --profile FILE writes a sisal.instrument
+report (time, rows and memory per stage / query).
+"""
+
+import argparse
+import os
+import sys
+
+from . import __version__
+
+
+def _cache_dir(args):
+    if args.no_cache:
+        return None
+    if args.cache_dir:
+        return args.cache_dir
+    from .loader import default_cache_dir
+
+    return default_cache_dir(args.folder)
+
+
+def _open_db(args):
+    """Query backend: MySQL (environment / SISAL_DB_CONFIG) or DuckDB on --folder."""
+    if args.backend == "duckdb":
+        if not args.folder:
+            raise ValueError("--backend duckdb needs --folder")
+        from .duck import DuckDatabase
+
+        return DuckDatabase.from_folder(args.folder)
+    from .db import Database
+
+    return Database.from_env()
+
+
+# -------------------------
+# subcommands
+# -------------------------
+
+def cmd_load(args):
+    from .registry import SisalDB, frame_nbytes
+
+    db = SisalDB(args.folder, cache_dir=_cache_dir(args), required=None)
+    names = args.tables or db.names
+    for name in names:
+        df = db[name]
+        print(f"{name}\t{len(df)} rows\t{df.shape[1]} cols\t{frame_nbytes(df) / 2**20:.1f} MB")
+    return 0
+
+
+def cmd_derive(args):
+    from .materialize import Materializer
+    from .pipeline import Pipeline
+    from .registry import SisalDB
+
+    db = SisalDB(args.folder, cache_dir=_cache_dir(args))
+    pipeline = Pipeline(Materializer(db), max_workers=args.workers)
+    if args.list:
+        print(pipeline.status(args.outputs or None).to_string(index=False))
+        return 0
+    if not args.outputs:
+        raise ValueError(f"Name the outputs to compute (any of: {', '.join(pipeline.outputs)})")
+    results = pipeline.run(args.outputs)
+    if args.out:
+        from .export import export_tables
+
+        for name, rows in export_tables(results, args.out, fmt=args.format).items():
+            print(f"{name}\t{rows} rows")
+    else:
+        for name, df in results.items():
+            print(f"{name}\t{len(df)} rows")
+    return 0
+
+
+def cmd_query(args):
+    from .queries import REPORT_SQL
+
+    sql = REPORT_SQL.get(args.sql, args.sql)
+    db = _open_db(args)
+    try:
+        if args.out:
+            n = db.stream_to(sql, args.out, chunksize=args.chunksize, fmt=args.format)
+            print(f"Wrote {n} rows to {args.out}")
+        else:
+            db.query(sql).to_csv(sys.stdout, index=False)
+    finally:
+        if args.backend == "duckdb":
+            db.dispose()
+    return 0
+
+
+def cmd_export(args):
+    from .export import export_tables
+    from .report import report_tables
+
+    db = _open_db(args)
+    sheets = report_tables(db, site_names=args.sites, site_ids=args.site_ids,
+                           include_global=not args.no_global)
+    for name, rows in export_tables(sheets, args.out, fmt=args.format).items():
+        print(f"{name}\t{rows} rows")
+    print("Wrote export:", args.out)
+    return 0
+
+
+def cmd_maps(args):
+    import matplotlib
+
+    matplotlib.use("Agg")                       # files only, no windows
+    from .maps import plot_maps, save_maps, site_layers
+    from .materialize import Materializer
+    from .pipeline import Pipeline
+    from .registry import SisalDB
+
+    db = SisalDB(args.folder, cache_dir=_cache_dir(args))
+    names = ["sites_drip_iso_map", "sites_drip_rate_map", "sites_mod_carb_map", "site_precip_map"]
+    tables = Pipeline(Materializer(db)).run(names)
+    figs = plot_maps(site_layers(*(tables[n] for n in names)), regions=args.regions)
+    for path in save_maps(figs, args.out, fmt=args.format, dpi=args.dpi):
+        print(path)
+    return 0
+
+
+def cmd_qc(args):
+    from .qc import raw_tables, run_qc
+
+    if args.raw:
+        tables = raw_tables(args.folder, names=args.tables)
+    else:
+        from .registry import SisalDB
+
+        db = SisalDB(args.folder, cache_dir=_cache_dir(args), required=None)
+        tables = {name: db[name] for name in args.tables or db.names}
+    report = run_qc(tables, max_per_rule=args.max_per_rule)
+    failed = report.failed()
+    if len(failed):
+        print(failed.drop(columns="message").to_string(index=False))
+    print(report)
+    if args.out:
+        from .export import export_tables
+
+        export_tables({"qc_summary": report.summary, "qc_violations": report.violations},
+                      args.out, fmt=args.format)
+        print("Wrote QC report:", args.out)
+    return 0 if report.ok else 1
+
+
+def cmd_bulk_load(args):
+    from .bulk_load import MEASUREMENT_ROUNDING, SCHEMA_SQL, load_release
+
+    if args.qc:
+        from .qc import run_qc
+        from .registry import SisalDB
+
+        db = SisalDB(args.folder, cache_dir=_cache_dir(args), required=None)
+        report = run_qc({name: db[name] for name in args.tables or db.names})
+        print(report)
+        if not report.ok:
+            print(report.failed().drop(columns="message").to_string(index=False))
+            return 1
+    rounding = None if args.no_rounding else dict(MEASUREMENT_ROUNDING)
+    if rounding is not None and args.display_precision:
+        rounding["drip_rate_measurement"] = "display"
+    rows = load_release(args.folder, database=args.database, names=args.tables, method=args.method,
+                        max_workers=args.workers, rounding=rounding,
+                        foreign_keys=not args.no_foreign_keys, schema_path=args.schema or SCHEMA_SQL)
+    for name, n in rows.items():
+        print(f"{name}\t{n} rows")
+    return 0
+
+
+# -------------------------
+# parser
+# -------------------------
+
+def _folder_args(p):
+    p.add_argument("folder", help="folder with the SISAL_monv1 CSV tables")
+    p.add_argument("--cache-dir", default=None,
+                   help="Arrow cache (default: per folder under $SISAL_CACHE_DIR or the user cache directory)")
+    p.add_argument("--no-cache", action="store_true", help="always parse the CSVs")
+
+
+def _backend_args(p):
+    p.add_argument("--backend", choices=("mysql", "duckdb"), default="mysql",
+                   help="mysql: DB_HOST / DB_USER / ... or SISAL_DB_CONFIG; duckdb: the files in --folder")
+    p.add_argument("--folder", default=None, help="CSV / Parquet folder for --backend duckdb")
+
+
+def build_parser():
+    ap = argparse.ArgumentParser(prog="sisal", description="SISAL_monv1 flat-CSV and MySQL tools")
+    ap.add_argument("--version", action="version", version=f"%(prog)s {__version__}")
+    ap.add_argument("--profile", default=None, metavar="FILE",
+                    help="write a timing / memory report (JSON) to FILE")
+    sub = ap.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("load", help="load tables (fills the Arrow cache) and print their sizes")
+    _folder_args(p)
+    p.add_argument("--tables", nargs="+", default=None, help="only these tables (default: all)")
+    p.set_defaults(func=cmd_load)
+
+    p = sub.add_parser("derive", help="compute derived tables (sisal/derived.py) and what they need")
+    _folder_args(p)
+    p.add_argument("outputs", nargs="*", help="derived tables, e.g. full_year_both site_summary")
+    p.add_argument("--out", default=None, help="directory for the results (default: only report rows)")
+    p.add_argument("--format", default="parquet", help="parquet, feather, csv, csv.gz or xlsx")
+    p.add_argument("--workers", type=int, default=None, help="threads (default: let the executor decide)")
+    p.add_argument("--list", action="store_true", help="show the stages (all, or of the outputs) and exit")
+    p.set_defaults(func=cmd_derive)
+
+    p = sub.add_parser("query", help="run a report query (by name) or any SQL statement")
+    p.add_argument("sql", help="site_entity_counts, site_refs_siteonly, global, or SQL text")
+    _backend_args(p)
+    p.add_argument("--out", default=None, help="stream the result into a file (default: CSV to stdout)")
+    p.add_argument("--format", default=None, help="output format (default: from the --out extension)")
+    p.add_argument("--chunksize", type=int, default=50_000)
+    p.set_defaults(func=cmd_query)
+
+    p = sub.add_parser("export", help="the report workbook of sisal_connect2db_v3.py")
+    _backend_args(p)
+    sites = p.add_mutually_exclusive_group()
+    sites.add_argument("--sites", nargs="+", default=None, help="site names for the sample sheets")
+    sites.add_argument("--site-ids", nargs="+", type=int, default=None, help="site ids for the sample sheets")
+    p.add_argument("--no-global", action="store_true", help="skip the global metadata sheet")
+    p.add_argument("--out", default="SISAL_monv1_export_examples_PY.xlsx")
+    p.add_argument("--format", default="xlsx", help="xlsx (one workbook) or parquet / feather / csv / csv.gz (a directory)")
+    p.set_defaults(func=cmd_export)
+
+    p = sub.add_parser("maps", help="site maps (global + regions) as image files")
+    _folder_args(p)
+    p.add_argument("--out", default="maps", help="output directory")
+    p.add_argument("--regions", nargs="+", default=None,
+                   help="global, north_america, europe, east_asia (default: all)")
+    p.add_argument("--format", default="png")
+    p.add_argument("--dpi", type=int, default=150)
+    p.set_defaults(func=cmd_maps)
+
+    p = sub.add_parser("qc", help="input QC (the checks of QC script_v5.3.R); exit code 1 on errors")
+    _folder_args(p)
+    p.add_argument("--raw", action="store_true", help="check the CSV text as written (spaces, digits), not the loaded tables")
+    p.add_argument("--tables", nargs="+", default=None, help="only these tables (default: all)")
+    p.add_argument("--max-per-rule", type=int, default=None, help="list at most N violating rows per rule")
+    p.add_argument("--out", default=None, help="write the summary and the violations (directory, or .xlsx workbook)")
+    p.add_argument("--format", default="csv", help="csv, csv.gz, parquet, feather or xlsx")
+    p.set_defaults(func=cmd_qc)
+
+    p = sub.add_parser("bulk-load", help="(re)create the MySQL tables from the CSVs (sisal/bulk_load.py)")
+    _folder_args(p)
+    p.add_argument("--database", default=None, help="target database (default: DB_NAME / SISAL_DB_CONFIG)")
+    p.add_argument("--schema", default=None,
+                   help="schema_SISAL_Monv1_v2.sql for the column types (default: the one of a source checkout)")
+    p.add_argument("--tables", nargs="+", default=None, help="only these tables (default: all)")
+    p.add_argument("--method", choices=("auto", "infile", "insert"), default="auto",
+                   help="LOAD DATA LOCAL INFILE, multi-row INSERTs, or infile if the server allows it")
+    p.add_argument("--workers", type=int, default=4, help="tables loaded in parallel")
+    p.add_argument("--no-rounding", action="store_true", help="load the measurements as written")
+    p.add_argument("--display-precision", action="store_true",
+                   help="round drip rates to their display precision instead of 2 decimals")
+    p.add_argument("--no-foreign-keys", action="store_true", help="do not add the FOREIGN KEY constraints")
+    p.add_argument("--qc", action="store_true", help="run sisal qc first; load nothing if it finds errors")
+    p.set_defaults(func=cmd_bulk_load)
+    return ap
+
+
+def _backend_errors() -> tuple:
+    """
+    Database errors reported like the others (server down, bad SQL, ...): only
+    of the libraries the command imported, so the start-up stays import-free.
+    """
+    errors = []
+    if "sqlalchemy" in sys.modules:
+        from sqlalchemy.exc import SQLAlchemyError
+
+        errors.append(SQLAlchemyError)
+    if "pymysql" in sys.modules:
+        from pymysql.err import Error as PyMySQLError
+
+        errors.append(PyMySQLError)
+    if "duckdb" in sys.modules:
+        import duckdb
+
+        errors.append(duckdb.Error)
+    return tuple(errors)
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    from . import instrument
+
+    if args.profile:
+        instrument.enable(report=args.profile)
+    else:
+        instrument.enable_from_env()
+    try:
+        return args.func(args)
+    except BrokenPipeError:                     # e.g. `sisal query ... | head`
+        sys.stdout = open(os.devnull, "w")
+        return 0
+    except Exception as err:
+        if not isinstance(err, (KeyError, ValueError, ImportError, OSError) + _backend_errors()):
+            raise
+        message = str(err).strip().splitlines()
+        print(f"sisal {args.command}: error: {message[0] if message else type(err).__name__}", file=sys.stderr)
+        return 1
@@ -0,0 +1,204 @@
+"""
+Gap-aware time-coverage index over the sample tables.
+
+Built once: every sample becomes a [start_dt, end_dt] interval, intervals are
+sorted per entity and overlapping ones (or ones closer than `gap_tolerance`)
+are merged. Queries then only touch the merged intervals:
+
+Reversed samples (start after end, e.g. a missing start month defaulting to
+June while the end month is known) keep their raw dates for the first / last
+timestamp of an entity (min(start) / max(end), as the cookbook computes them)
+but count as a point at their start in the merged intervals, i.e. they add
+nothing to covered_days or to overlaps.
+
+    cov = CoverageIndex.build({"drip_iso_sample": drip_iso_sample,
+                               "drip_rate_sample": drip_rate_sample})
+    cov.coverage("drip_iso_sample")                     # per-entity summary
+    cov.overlap(["drip_iso_sample", "drip_rate_sample"],
+                min_days=365, window=("2010-01-01", "2020-01-01"))
+"""
+
+import numpy as np
+import pandas as pd
+
+from .dates import sample_start_end
+
+NS_PER_DAY = 86_400 * 10**9
+
+# sample table -> entity key
+ENTITY_KEYS = {
+    "drip_iso_sample": "drip_entity_id",
+    "drip_rate_sample": "drip_entity_id",
+    "mod_carb_sample": "drip_entity_id",
+    "precip_sample": "precip_entity_id",
+    "cave_temperature_sample": "cave_entity_id",
+    "cave_relative_humidity_sample": "cave_entity_id",
+    "cave_pCO2_sample": "cave_entity_id",
+}
+
+
+def _ns(value) -> int:
+    """Timestamp -> ns since epoch (UTC wall time, like the stored intervals)."""
+    ts = pd.Timestamp(value)
+    if ts.tzinfo is not None:
+        ts = ts.tz_convert("UTC").tz_localize(None)
+    return ts.value
+
+
+def merge_intervals(entity, start, end, gap_tolerance=0) -> pd.DataFrame:
+    """
+    Merge overlapping intervals per entity (vectorized).
+    entity/start/end: equal-length int64 arrays (start/end in ns).
+    Intervals closer than gap_tolerance (ns) are merged too.
+    """
+    order = np.lexsort((start, entity))
+    entity, start, end = entity[order], start[order], end[order]
+    if len(entity) == 0:
+        return pd.DataFrame({"entity": entity, "start": start, "end": end,
+                             "n_samples": np.zeros(0, "int64")})
+
+    # running max of `end` within each entity
+    new_entity = np.r_[True, entity[1:] != entity[:-1]]
+    run_end = pd.Series(end).groupby(np.cumsum(new_entity)).cummax().to_numpy()
+
+    # a block starts at a new entity or where the start lies beyond everything seen so far
+    new_block = new_entity.copy()
+    new_block[1:] |= start[1:] > run_end[:-1] + gap_tolerance
+    block = np.cumsum(new_block) - 1
+
+    first = np.flatnonzero(new_block)
+    block_end = np.maximum.reduceat(end, first)
+    return pd.DataFrame({
+        "entity": entity[first],
+        "start": start[first],
+        "end": block_end,
+    }).assign(n_samples=np.bincount(block))
+
+
+def _clip_bounds(window):
+    lo = _ns(window[0]) if window[0] is not None else np.iinfo("int64").min
+    hi = _ns(window[1]) if window[1] is not None else np.iinfo("int64").max
+    return lo, hi
+
+
+def _clip(iv, window):
+    if window is None:
+        return iv
+    lo, hi = _clip_bounds(window)
+    start = np.maximum(iv["start"].to_numpy(), lo)
+    end = np.minimum(iv["end"].to_numpy(), hi)
+    keep = start <= end
+    return pd.DataFrame({"entity": iv["entity"].to_numpy()[keep],
+                         "start": start[keep], "end": end[keep]})
+
+
+class CoverageIndex:
+    """Merged sample intervals per entity, per sample table."""
+
+    def __init__(self, intervals, gap_tolerance=0, spans=None):
+        self._iv = intervals              # table -> DataFrame(entity, start, end, n_samples)
+        self._span = spans or {}          # table -> DataFrame(entity, first, last) of the raw dates
+        self.gap_tolerance = gap_tolerance
+
+    @classmethod
+    def build(cls, samples, gap_tolerance="0D", point_duration="0D"):
+        """
+        samples: {table name: sample DataFrame}
+        - gap_tolerance: gaps up to this long still count as covered
+        - point_duration: length given to samples whose end equals their start
+        Reversed samples (start > end) become points at their start in the
+        merged intervals; the per-entity first / last keep their raw dates.
+        """
+        gap = pd.Timedelta(gap_tolerance).value
+        point = pd.Timedelta(point_duration).value
+        intervals, spans = {}, {}
+        for table, df in samples.items():
+            start_dt, end_dt = sample_start_end(df, table)
+            ok = start_dt.notna().to_numpy() & end_dt.notna().to_numpy()
+            ok &= df[ENTITY_KEYS[table]].notna().to_numpy()
+
+            start = start_dt.dt.tz_localize(None).to_numpy("datetime64[ns]").view("int64")[ok]
+            end = end_dt.dt.tz_localize(None).to_numpy("datetime64[ns]").view("int64")[ok]
+            entity = df[ENTITY_KEYS[table]].to_numpy(dtype="int64", na_value=-1)[ok]
+            g = pd.DataFrame({"entity": entity, "first": start, "last": end}).groupby("entity", sort=True)
+            spans[table] = g.agg({"first": "min", "last": "max"}).reset_index()
+            intervals[table] = merge_intervals(entity, start, np.maximum(end, start + point), gap)
+        return cls(intervals, gap, spans)
+
+    @property
+    def tables(self):
+        return list(self._iv)
+
+    def intervals(self, table, entity_id=None) -> pd.DataFrame:
+        """Merged intervals (as timestamps) of one table, optionally of one entity."""
+        iv = self._iv[table]
+        if entity_id is not None:
+            ent = iv["entity"].to_numpy()
+            lo, hi = np.searchsorted(ent, entity_id, "left"), np.searchsorted(ent, entity_id, "right")
+            iv = iv.iloc[lo:hi]
+        return pd.DataFrame({
+            ENTITY_KEYS[table]: iv["entity"].to_numpy(),
+            "start_dt": pd.to_datetime(iv["start"].to_numpy(), utc=True),
+            "end_dt": pd.to_datetime(iv["end"].to_numpy(), utc=True),
+            "n_samples": iv["n_samples"].to_numpy(),
+        })
+
+    def coverage(self, table, window=None) -> pd.DataFrame:
+        """
+        Per-entity coverage of one table:
+        first/last timestamp (min start / max end of the raw sample dates, clipped
+        to `window`), span_days (last - first), covered_days (merged intervals,
+        gaps excluded), n_gaps (number of gaps between merged intervals).
+        """
+        iv = _clip(self._iv[table], window)
+        g = iv.assign(dur=iv["end"] - iv["start"]).groupby("entity", sort=True)
+        out = g.agg(first=("start", "min"), last=("end", "max"), covered=("dur", "sum"),
+                    n_intervals=("dur", "size"))
+        if table in self._span:
+            span = self._span[table].set_index("entity").reindex(out.index)
+            if window is not None:
+                lo, hi = _clip_bounds(window)
+                span = span.clip(lower=lo, upper=hi)
+            out[["first", "last"]] = span[["first", "last"]].to_numpy()
+        return pd.DataFrame({
+            ENTITY_KEYS[table]: out.index.to_numpy(),
+            "first": pd.to_datetime(out["first"].to_numpy(), utc=True),
+            "last": pd.to_datetime(out["last"].to_numpy(), utc=True),
+            "span_days": (out["last"] - out["first"]).to_numpy() / NS_PER_DAY,
+            "covered_days": out["covered"].to_numpy() / NS_PER_DAY,
+            "n_gaps": out["n_intervals"].to_numpy() - 1,
+        })
+
+    def overlap(self, tables, min_days=0, window=None) -> pd.DataFrame:
+        """
+        Entities covered by ALL `tables` at the same time for >= min_days
+        (within `window` = (start, end), either side may be None).
+        The tables must share the entity key (e.g. drip_iso/drip_rate/mod_carb).
+        Returns entity id + overlap_days, sorted by overlap_days (descending).
+        """
+        tables = list(dict.fromkeys(tables))
+        keys = {ENTITY_KEYS[t] for t in tables}
+        if len(keys) != 1:
+            raise ValueError(f"Tables do not share an entity key: {sorted(keys)}")
+        key = keys.pop()
+
+        # sweep: +1 at every start, -1 at every end; time where the count == len(tables)
+        # is covered by all of them (the merged intervals of one table never overlap)
+        parts = [_clip(self._iv[t], window) for t in tables]
+        ent = np.concatenate([np.r_[p["entity"], p["entity"]] for p in parts])
+        time = np.concatenate([np.r_[p["start"], p["end"]] for p in parts])
+        step = np.concatenate([np.r_[np.ones(len(p), "int64"), -np.ones(len(p), "int64")] for p in parts])
+
+        order = np.lexsort((step, time, ent))          # ends before starts at equal times
+        ent, time, step = ent[order], time[order], step[order]
+        level = np.cumsum(step)                          # back to 0 after every entity
+        full = level[:-1] == len(tables)
+        dur = np.where(full, time[1:] - time[:-1], 0)
+
+        days = pd.Series(dur).groupby(ent[:-1]).sum() / NS_PER_DAY if len(dur) else pd.Series(dtype=float)
+        days = days[days >= min_days] if min_days else days[days > 0]
+        return (
+            pd.DataFrame({key: days.index.to_numpy(dtype="int64"), "overlap_days": days.to_numpy()})
+            .sort_values("overlap_days", ascending=False)
+            .reset_index(drop=True)
+        )
@@ -0,0 +1,325 @@
+"""
+MySQL connection handling for the SISAL_monv1 database.
+
+- Credentials come from the environment (DB_HOST, DB_PORT, DB_USER, DB_PASSWORD,
+  DB_NAME) and/or an INI file (section [mysql]; path in SISAL_DB_CONFIG)
+- One pooled SQLAlchemy engine per process and connection settings: every
+  Database.from_env() with the same settings shares it (shared_engine; disposed
+  at exit); pool size / recycle are configurable
+- Session settings (e.g. group_concat_max_len) are applied by an on-connect
+  event, i.e. to EVERY pooled connection, not only the first one
+
+    db = Database.from_env()
+    with db.session() as s:          # one connection for a batch of queries
+        sites = s.query("SELECT * FROM site;")
+        iso = s.query(drip_iso_sample_sql, {"site_name": "..."})
+
+    # many sites at once: one query per data type, optionally in parallel
+    frames = db.query_sites(site_names=names, max_workers=3)
+
+    # large result sets: server-side cursor, DataFrame chunks of bounded size
+    for chunk in db.stream("SELECT * FROM precip_sample", chunksize=100_000):
+        ...
+    db.stream_to("SELECT * FROM precip_sample", "precip_sample.parquet")
+"""
+
+# pip install sqlalchemy pymysql
+
+import atexit
+import configparser
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import pandas as pd
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import URL
+
+from . import instrument
+from .export import write_chunks
+from .queries import DEFAULT_KINDS, site_batches, site_sample_sql
+
+DEFAULT_CONFIG = {
+    "host": "localhost",
+    "port": 3306,
+    "user": "root",
+    "password": "",
+    "database": "sisal_monv1",
+}
+
+ENV_VARS = {
+    "host": "DB_HOST",
+    "port": "DB_PORT",
+    "user": "DB_USER",
+    "password": "DB_PASSWORD",
+    "database": "DB_NAME",
+}
+
+# applied to every new DBAPI connection (allow long GROUP_CONCAT results for citations)
+DEFAULT_SESSION_SETTINGS = {
+    "group_concat_max_len": 100000,
+}
+
+
+def db_config(config_file=None, section="mysql", **overrides) -> dict:
+    """
+    Connection settings: defaults < config file < environment < overrides.
+    config_file defaults to $SISAL_DB_CONFIG (if set).
+    """
+    cfg = dict(DEFAULT_CONFIG)
+
+    config_file = config_file or os.environ.get("SISAL_DB_CONFIG")
+    if config_file:
+        parser = configparser.ConfigParser()
+        if not parser.read(config_file):
+            raise FileNotFoundError(f"DB config file not found: {config_file}")
+        if parser.has_section(section):
+            cfg.update({k: v for k, v in parser.items(section) if k in DEFAULT_CONFIG})
+
+    for key, var in ENV_VARS.items():
+        if os.environ.get(var):
+            cfg[key] = os.environ[var]
+
+    cfg.update({k: v for k, v in overrides.items() if v is not None})
+    cfg["port"] = int(cfg["port"])
+    return cfg
+
+
+def _session_sql(settings) -> list:
+    return [f"SET SESSION {name} = {value}" for name, value in settings.items()]
+
+
+def make_engine(config=None, pool_size=5, max_overflow=10, pool_recycle=3600,
+                pool_pre_ping=True, session_settings=None, **engine_kw):
+    """
+    Pooled SQLAlchemy engine (PyMySQL driver).
+    session_settings: {variable: value} run on every new connection
+                      (default: DEFAULT_SESSION_SETTINGS)
+    """
+    cfg = config or db_config()
+    url = URL.create(
+        "mysql+pymysql",
+        username=cfg["user"],
+        password=cfg["password"],
+        host=cfg["host"],
+        port=cfg["port"],
+        database=cfg["database"],
+        query={"charset": "utf8mb4"},
+    )
+    engine = create_engine(
+        url,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_recycle=pool_recycle,
+        pool_pre_ping=pool_pre_ping,
+        **engine_kw,
+    )
+
+    statements = _session_sql(DEFAULT_SESSION_SETTINGS if session_settings is None else session_settings)
+    if statements:
+        @event.listens_for(engine, "connect")
+        def _apply_session_settings(dbapi_conn, _record):
+            cur = dbapi_conn.cursor()
+            try:
+                for stmt in statements:
+                    cur.execute(stmt)
+            finally:
+                cur.close()
+
+    return engine
+
+
+# engines shared by Database.from_env(): (config, session settings, pool options) -> engine
+_ENGINES = {}
+_ENGINES_LOCK = threading.Lock()
+_atexit_registered = False
+
+
+def _frozen(mapping) -> tuple:
+    return tuple(sorted((k, str(v)) for k, v in mapping.items()))
+
+
+def shared_engine(config=None, session_settings=None, **pool_kw):
+    """
+    The process-wide engine of these settings (see make_engine), created on
+    first use and disposed at exit: callers with the same settings share one
+    connection pool instead of opening a pool each.
+    """
+    global _atexit_registered
+    cfg = config or db_config()
+    settings = DEFAULT_SESSION_SETTINGS if session_settings is None else session_settings
+    key = (_frozen(cfg), _frozen(settings), _frozen(pool_kw))
+    with _ENGINES_LOCK:
+        engine = _ENGINES.get(key)
+        if engine is None:
+            engine = _ENGINES[key] = make_engine(cfg, session_settings=settings, **pool_kw)
+            if not _atexit_registered:
+                atexit.register(dispose_engines)
+                _atexit_registered = True
+    return engine
+
+
+def dispose_engines():
+    """Close the pools of all shared engines (later shared_engine() calls create new ones)."""
+    with _ENGINES_LOCK:
+        engines = list(_ENGINES.values())
+        _ENGINES.clear()
+    for engine in engines:
+        engine.dispose()
+
+
+# MySQL column type codes (pymysql.constants.FIELD_TYPE) -> pandas dtype, so that
+# every streamed chunk gets the same dtypes (also when a chunk is all NULL)
+_INT_TYPES = {1, 2, 3, 8, 9, 13}           # TINY, SHORT, LONG, LONGLONG, INT24, YEAR
+_FLOAT_TYPES = {0, 4, 5, 246}              # DECIMAL, FLOAT, DOUBLE, NEWDECIMAL
+
+
+def _as_sql(sql):
+    return text(sql) if isinstance(sql, str) else sql
+
+
+def _chunk_dtypes(description) -> dict:
+    dtypes = {}
+    for col in description or ():
+        name, code = col[0], col[1]
+        if code in _INT_TYPES:
+            dtypes[name] = "Int64"
+        elif code in _FLOAT_TYPES:
+            dtypes[name] = "float64"
+    return dtypes
+
+
+def _chunk_frame(rows, columns, dtypes) -> pd.DataFrame:
+    df = pd.DataFrame.from_records(rows, columns=columns)
+    for name, dtype in dtypes.items():
+        df[name] = pd.to_numeric(df[name], errors="coerce").astype(dtype)
+    return df
+
+
+class Session:
+    """Queries on one checked-out connection."""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def query(self, sql, params=None) -> pd.DataFrame:
+        with instrument.query(sql, params) as q:
+            df = q.rows_out = pd.read_sql(_as_sql(sql), self.conn, params=params)
+        return df
+
+    def execute(self, sql, params=None):
+        return self.conn.execute(_as_sql(sql), params or {})
+
+    def query_sites(self, kind, sites, by="site_name") -> pd.DataFrame:
+        """One data type (see queries.SITE_SAMPLE_SQL) for a list of sites."""
+        sql = site_sample_sql(kind, by)
+        with instrument.stage(f"query_sites:{kind}", rows_in=len(sites)) as st:
+            parts = [self.query(sql, {"sites": batch}) for batch in site_batches(sites)]
+            if not parts:
+                parts = [self.query(sql, {"sites": []})]
+            df = st.rows_out = parts[0] if len(parts) == 1 else pd.concat(parts, ignore_index=True)
+        return df
+
+    def iter_query(self, sql, params=None, chunksize=50_000):
+        """
+        Yield the result as DataFrame chunks of <= chunksize rows, using a
+        server-side cursor (stream_results -> SSCursor), so client memory is
+        bounded by the chunk size. The connection can run no other query until
+        the iteration is finished.
+        """
+        # timed from execute to the last chunk (incl. the time the caller spends per chunk)
+        with instrument.query(sql, params, name="stream", chunksize=chunksize) as q:
+            result = self.conn.execution_options(stream_results=True, max_row_buffer=chunksize) \
+                .execute(_as_sql(sql), params or {})
+            n = 0
+            try:
+                columns = list(result.keys())
+                dtypes = _chunk_dtypes(result.cursor.description if result.cursor is not None else None)
+                while True:
+                    rows = result.fetchmany(chunksize)
+                    if not rows:
+                        break
+                    n += len(rows)
+                    yield _chunk_frame(rows, columns, dtypes)
+            finally:
+                result.close()
+                q.rows_out = n
+
+
+class Database:
+    """Entry point for queries against the SISAL_monv1 MySQL database."""
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    @classmethod
+    def from_env(cls, config_file=None, pool_size=5, max_overflow=10, pool_recycle=3600,
+                 session_settings=None, **overrides):
+        """Database on the shared engine of these settings (see shared_engine)."""
+        config = db_config(config_file, **overrides)
+        return cls(shared_engine(config, pool_size=pool_size, max_overflow=max_overflow,
+                                 pool_recycle=pool_recycle, session_settings=session_settings))
+
+    @contextmanager
+    def session(self):
+        """One pooled connection for a batch of queries (returned to the pool afterwards)."""
+        with self.engine.connect() as conn:
+            yield Session(conn)
+
+    def query(self, sql, params=None) -> pd.DataFrame:
+        """Single query on a pooled connection."""
+        with self.session() as s:
+            return s.query(sql, params)
+
+    def stream(self, sql, params=None, chunksize=50_000):
+        """DataFrame chunks of a large result (see Session.iter_query)."""
+        with self.session() as s:
+            yield from s.iter_query(sql, params, chunksize)
+
+    def stream_to(self, sql, path, params=None, chunksize=50_000, fmt=None) -> int:
+        """
+        Stream a query result straight into a file (.parquet, .csv, .csv.gz)
+        without materializing it; returns the number of rows written.
+        """
+        return write_chunks(self.stream(sql, params, chunksize), path, fmt=fmt)
+
+    def query_sites(self, site_names=None, site_ids=None, kinds=None, max_workers=1) -> dict:
+        """
+        Sample data of many sites: {data type: DataFrame} (site_id + site_name on every row).
+        - site_names or site_ids: the sites (expanding IN-list, batched)
+        - kinds: data types to fetch (keys of queries.SITE_SAMPLE_SQL; default DEFAULT_KINDS)
+        - max_workers > 1: data types run concurrently, each on its own pooled connection
+        """
+        if (site_names is None) == (site_ids is None):
+            raise ValueError("Pass exactly one of site_names / site_ids")
+        if site_ids is not None:
+            by, sites = "site_id", [int(v) for v in site_ids]
+        else:
+            by, sites = "site_name", [str(v) for v in site_names]
+        kinds = list(DEFAULT_KINDS if kinds is None else kinds)
+
+        def _run(kind):
+            with self.session() as s:
+                return s.query_sites(kind, sites, by)
+
+        if max_workers and max_workers > 1 and len(kinds) > 1:
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(kinds))) as pool:
+                return dict(zip(kinds, pool.map(_run, kinds)))
+        with self.session() as s:
+            return {kind: s.query_sites(kind, sites, by) for kind in kinds}
+
+    def query_many(self, queries) -> dict:
+        """
+        Run several queries on ONE connection.
+        queries: {name: sql} or {name: (sql, params)}
+        """
+        out = {}
+        with self.session() as s:
+            for name, q in queries.items():
+                sql, params = q if isinstance(q, tuple) else (q, None)
+                out[name] = s.query(sql, params)
+        return out
+
+    def dispose(self):
+        self.engine.dispose()
@@ -0,0 +1,326 @@
+"""
+Derived tables of the flat-CSV cookbook, registered for materialization
+(see sisal/materialize.py): the parameter names are the input tables.
+
+    mat = Materializer(db)
+    mat["site_summary"], mat["drip_iso_coverage"], mat["precip_freq_by_entity"], ...
+"""
+
+import pandas as pd
+
+from .coverage import CoverageIndex
+from .dates import make_dt
+from .flags import site_flags, sites_with_flag
+from .materialize import derived
+from .references import ReferenceIndex, collapse_unique_by
+from .resample import classify_freq, resample_precip, resample_table
+from .spatial import nearest_precip_sites
+
+
+# -------------------------
+# 5) site summary
+# -------------------------
+
+@derived()
+def site_summary(site, cave_entity, drip_entity, site_link_precip):
+    """Entities per site (cave / drip / precip and total)."""
+    counts = [
+        cave_entity.groupby("site_id", dropna=False)["cave_entity_id"].nunique().rename("cave_entity_count"),
+        drip_entity.groupby("site_id", dropna=False)["drip_entity_id"].nunique().rename("drip_entity_count"),
+        site_link_precip.groupby("site_id", dropna=False)["precip_entity_id"].nunique().rename("precip_entity_count"),
+    ]
+    out = site
+    for c in counts:
+        out = out.merge(c.reset_index(), on="site_id", how="left")
+    for c in counts:
+        out[c.name] = out[c.name].fillna(0).astype(int)
+    out["entity_count"] = out["cave_entity_count"] + out["drip_entity_count"] + out["precip_entity_count"]
+    return out.sort_values("site_id").reset_index(drop=True)
+
+
+# -------------------------
+# 6) entry checks: rows with each measurement
+# -------------------------
+
+def _presence(sample, counts):
+    """One row: n_rows + the number of rows where each (combination of) column(s) is set."""
+    row = {"n_rows": len(sample)}
+    for label, cols in counts.items():
+        row[label] = int(sample[list(cols)].notna().all(axis=1).sum())
+    return pd.DataFrame([row])
+
+
+@derived()
+def drip_iso_presence_global(drip_iso_sample):
+    d18O, d2H = "drip_iso_d18O_measurement", "drip_iso_d2H_measurement"
+    return _presence(drip_iso_sample, {"n_d18O": [d18O], "n_d2H": [d2H], "n_both": [d18O, d2H]})
+
+
+@derived()
+def mod_carb_presence_global(mod_carb_sample):
+    d18O, d13C = "mod_carb_d18O_measurement", "mod_carb_d13C_measurement"
+    return _presence(mod_carb_sample, {"n_d18O": [d18O], "n_d13C": [d13C], "n_both": [d18O, d13C]})
+
+
+@derived()
+def precip_presence_global(precip_sample):
+    return _presence(precip_sample, {"n_amount": ["precip_amount"],
+                                     "n_d18O": ["precip_d18O_measurement"],
+                                     "n_d2H": ["precip_d2H_measurement"]})
+
+
+# -------------------------
+# 7-8) flags + map tables
+# -------------------------
+
+@derived()
+def site_data_counts(site, drip_entity, site_link_precip, cave_entity, drip_iso_sample,
+                     drip_rate_sample, mod_carb_sample, precip_sample,
+                     cave_temperature_sample=None, cave_relative_humidity_sample=None,
+                     cave_pCO2_sample=None):
+    """site_flags as a table: site_id + one boolean column per flag."""
+    cave_env = {
+        "cave_temperature_sample": cave_temperature_sample,
+        "cave_relative_humidity_sample": cave_relative_humidity_sample,
+        "cave_pCO2_sample": cave_pCO2_sample,
+    }
+    return site_flags(
+        site, drip_entity, site_link_precip,
+        drip_iso_sample=drip_iso_sample,
+        drip_rate_sample=drip_rate_sample,
+        mod_carb_sample=mod_carb_sample,
+        precip_sample=precip_sample,
+        cave_entity=cave_entity,
+        **{name: df for name, df in cave_env.items() if df is not None},
+    ).reset_index()
+
+
+def _flag_map(site, site_data_counts, flag):
+    return sites_with_flag(site, site_data_counts.set_index("site_id"), flag)
+
+
+@derived()
+def sites_drip_iso_map(site, site_data_counts):
+    return _flag_map(site, site_data_counts, "has_drip_iso_any")
+
+
+@derived()
+def sites_drip_rate_map(site, site_data_counts):
+    return _flag_map(site, site_data_counts, "has_drip_rate")
+
+
+@derived()
+def sites_mod_carb_map(site, site_data_counts):
+    return _flag_map(site, site_data_counts, "has_mod_carb_any")
+
+
+@derived()
+def site_precip_map(site, site_link_precip, precip_site, precip_entity):
+    """Sites with their linked precip sites / entities."""
+    return (
+        site.merge(site_link_precip, on="site_id", how="inner")
+            .merge(precip_site, on="precip_site_id", how="left")
+            .merge(precip_entity, on="precip_entity_id", how="left")
+            [[
+                "site_id", "site_name", "latitude", "longitude", "elevation",
+                "precip_site_id", "precip_site_name", "precip_latitude", "precip_longitude", "precip_elevation",
+                "precip_entity_id", "precip_entity_name", "precip_method"
+            ]]
+            .drop_duplicates()
+    )
+
+
+# -------------------------
+# 9) references + notes
+# -------------------------
+
+@derived()
+def site_notes(notes):
+    return collapse_unique_by(notes, "site_id", "notes")
+
+
+@derived()
+def site_citations(reference, site_link_reference, entity_link_reference):
+    return ReferenceIndex.build(reference, site_link_reference, entity_link_reference) \
+        .citations("site_id", prefix="site_")
+
+
+@derived()
+def drip_entity_citations(reference, site_link_reference, entity_link_reference):
+    return ReferenceIndex.build(reference, site_link_reference, entity_link_reference) \
+        .citations("drip_entity_id", prefix="drip_")
+
+
+@derived()
+def precip_entity_citations(reference, site_link_reference, entity_link_reference):
+    return ReferenceIndex.build(reference, site_link_reference, entity_link_reference) \
+        .citations("precip_entity_id", prefix="precip_")
+
+
+# -------------------------
+# 10) modern carbonate
+# -------------------------
+
+@derived()
+def mod_carb_records(drip_entity, mod_carb_sample, site, site_notes, site_citations,
+                     drip_entity_citations):
+    """mod_carb samples with site, notes and citations; year-only dates cover the full year."""
+    out = (
+        drip_entity[["site_id", "drip_entity_id", "drip_entity_name", "entity_id"]]
+        .merge(mod_carb_sample, on="drip_entity_id", how="inner")
+        .merge(site, on="site_id", how="left")
+        .merge(site_notes, on="site_id", how="left")
+        .merge(site_citations, on="site_id", how="left")
+        .merge(drip_entity_citations, on="drip_entity_id", how="left")
+    )
+    out["start_dt"] = make_dt(out["mod_carb_start_yyyy"], out.get("mod_carb_start_mm"),
+                              out.get("mod_carb_start_dd"),
+                              default_mm=1, default_dd=1, default_hhmm=0)
+    out["end_dt"] = make_dt(out["mod_carb_end_yyyy"], out.get("mod_carb_end_mm"),
+                            out.get("mod_carb_end_dd"),
+                            default_mm=12, default_dd=31, default_hhmm=2359)
+    out["end_dt"] = out["end_dt"].fillna(out["start_dt"])
+    out["freq_class"] = classify_freq(out["mod_carb_accumulation_unit"], out["mod_carb_accumulation_time"])
+    return out.sort_values(["site_id", "drip_entity_id", "start_dt"]).reset_index(drop=True)
+
+
+# -------------------------
+# 11) SISAL entities
+# -------------------------
+
+@derived()
+def sisal_sites(site):
+    return site[site["site_id"] < 1000].copy()
+
+
+# -------------------------
+# 12) drip coverage: first / last sample per entity (as the cookbook), and the
+#     gap-aware overlap of both sample tables (see sisal/coverage.py)
+# -------------------------
+
+OVERLAP_GAP_TOLERANCE = "31D"     # monthly sampling still counts as continuous
+OVERLAP_POINT_DURATION = "1D"     # spot samples (start == end) cover their day
+
+
+def _coverage(drip_entity, sample, table, prefix):
+    cov = CoverageIndex.build({table: sample}).coverage(table)
+    out = drip_entity[["site_id", "drip_entity_id", "drip_entity_name"]].merge(
+        cov.rename(columns={"first": f"{prefix}_start", "last": f"{prefix}_end"})
+        [["drip_entity_id", f"{prefix}_start", f"{prefix}_end"]],
+        on="drip_entity_id", how="inner",
+    ).sort_values(["site_id", "drip_entity_id"]).reset_index(drop=True)
+    out[f"{prefix}_days"] = (out[f"{prefix}_end"] - out[f"{prefix}_start"]).dt.days + 1
+    return out
+
+
+@derived()
+def drip_iso_coverage(drip_entity, drip_iso_sample):
+    return _coverage(drip_entity, drip_iso_sample, "drip_iso_sample", "iso")
+
+
+@derived()
+def drip_rate_coverage(drip_entity, drip_rate_sample):
+    return _coverage(drip_entity, drip_rate_sample, "drip_rate_sample", "rate")
+
+
+@derived()
+def full_year_both(site, drip_iso_coverage, drip_rate_coverage):
+    """Drip entities whose drip_iso AND drip_rate samples each span >= 365 days (by min_days)."""
+    out = drip_iso_coverage.merge(drip_rate_coverage, on=["site_id", "drip_entity_id", "drip_entity_name"],
+                                  how="inner")
+    out = out[(out["iso_days"] >= 365) & (out["rate_days"] >= 365)]
+    out = out.merge(site, on="site_id", how="left")
+    out["min_days"] = out[["iso_days", "rate_days"]].min(axis=1)
+    return out.sort_values("min_days", ascending=False).reset_index(drop=True)
+
+
+@derived()
+def full_year_overlap(site, drip_iso_sample, drip_rate_sample, drip_iso_coverage, drip_rate_coverage):
+    """
+    Drip entities with >= 365 days during which drip_iso AND drip_rate samples
+    overlap (gaps up to OVERLAP_GAP_TOLERANCE bridged, spot samples last
+    OVERLAP_POINT_DURATION), with the covered days of each table, by overlap_days.
+    """
+    samples = {"drip_iso_sample": drip_iso_sample, "drip_rate_sample": drip_rate_sample}
+    index = CoverageIndex.build(samples, gap_tolerance=OVERLAP_GAP_TOLERANCE,
+                                point_duration=OVERLAP_POINT_DURATION)
+    covered = [
+        index.coverage(table)[["drip_entity_id", "covered_days"]].rename(
+            columns={"covered_days": f"{prefix}_covered_days"})
+        for table, prefix in (("drip_iso_sample", "iso"), ("drip_rate_sample", "rate"))
+    ]
+    return (
+        index.overlap(list(samples), min_days=365)
+        .merge(drip_iso_coverage, on="drip_entity_id", how="inner")
+        .merge(drip_rate_coverage, on=["site_id", "drip_entity_id", "drip_entity_name"], how="inner")
+        .merge(covered[0], on="drip_entity_id", how="left")
+        .merge(covered[1], on="drip_entity_id", how="left")
+        .merge(site, on="site_id", how="left")
+        .sort_values("overlap_days", ascending=False, kind="stable")
+        .reset_index(drop=True)
+    )
+
+
+# -------------------------
+# 13) nearest precipitation station per cave site
+# -------------------------
+
+@derived()
+def site_nearest_precip(site, precip_site):
+    return nearest_precip_sites(site, precip_site, k=1)
+
+
+# -------------------------
+# 14) frequency tables: most common freq_class per entity
+# -------------------------
+
+def _freq_by_entity(sample, prefix, key):
+    return (
+        sample.assign(freq_class=classify_freq(sample[f"{prefix}_accumulation_unit"],
+                                               sample[f"{prefix}_accumulation_time"]))
+        .groupby([key, "freq_class"])
+        .size()
+        .reset_index(name="n")
+        .sort_values([key, "n"], ascending=[True, False])
+        .drop_duplicates(key, keep="first")
+        .reset_index(drop=True)
+    )
+
+
+@derived()
+def drip_iso_freq_by_entity(drip_iso_sample):
+    return _freq_by_entity(drip_iso_sample, "drip_iso", "drip_entity_id")
+
+
+@derived()
+def drip_rate_freq_by_entity(drip_rate_sample):
+    return _freq_by_entity(drip_rate_sample, "drip_rate", "drip_entity_id")
+
+
+@derived()
+def precip_freq_by_entity(precip_sample):
+    return _freq_by_entity(precip_sample, "precip", "precip_entity_id")
+
+
+# monthly / annual series (duration-weighted; precip amount summed, isotopes amount-weighted)
+
+@derived()
+def drip_iso_monthly(drip_iso_sample):
+    return resample_table(drip_iso_sample, "drip_iso_sample", "monthly",
+                          ["drip_iso_d18O_measurement", "drip_iso_d2H_measurement"])
+
+
+@derived()
+def drip_rate_monthly(drip_rate_sample):
+    return resample_table(drip_rate_sample, "drip_rate_sample", "monthly", ["drip_rate_measurement"])
+
+
+@derived()
+def mod_carb_annual(mod_carb_sample):
+    return resample_table(mod_carb_sample, "mod_carb_sample", "annual",
+                          ["mod_carb_d18O_measurement", "mod_carb_d13C_measurement"])
+
+
+@derived()
+def precip_monthly(precip_sample):
+    return resample_precip(precip_sample, "monthly")
@@ -0,0 +1,237 @@
+"""
+In-process DuckDB backend: the MySQL queries run directly on the flat files.
+
+Every CSV (or Parquet) table of a folder is registered as a view, typed with
+sisal.schema and with text trimmed / "" read as NULL like the pandas loader.
+DuckDatabase has the query API of sisal.db.Database (session, query,
+query_sites, query_many, stream, stream_to), and the MySQL statements run
+with a small dialect translation (mysql_to_duckdb):
+
+- GROUP_CONCAT([DISTINCT] x [ORDER BY y] [SEPARATOR 's'])
+  -> string_agg([DISTINCT] x, 's' [ORDER BY y])
+- :name bind parameters -> $name (list values, e.g. the IN-lists of
+  queries.site_sample_sql, bind as DuckDB lists)
+- `quoted` identifiers -> "quoted"
+
+    db = DuckDatabase.from_folder(folder_path)            # no MySQL server needed
+    counts = db.query(SITE_ENTITY_COUNTS_SQL)
+    frames = db.query_sites(site_names=["Obir"])
+"""
+
+# pip install duckdb
+
+import csv
+import glob
+import os
+import re
+from contextlib import contextmanager
+
+import pandas as pd
+from sqlalchemy.sql.elements import TextClause
+
+from . import instrument
+from .db import Database, Session
+from .schema import CAT, ID, NUM, TEXT, table_dtypes
+
+try:
+    import duckdb
+except ImportError:  # optional backend
+    duckdb = None
+
+# pandas dtype (sisal.schema) -> DuckDB column type
+DUCKDB_TYPES = {
+    ID: "BIGINT",
+    NUM: "DOUBLE",
+    TEXT: "VARCHAR",
+    CAT: "VARCHAR",
+}
+
+# DuckDB data chunks per streamed DataFrame chunk are sized from this
+_VECTOR_SIZE = 2048
+
+_STRING_LITERAL = re.compile(r"('(?:[^']|'')*')")
+_BIND = re.compile(r"(?<![:\w]):([A-Za-z_]\w*)(?!:)")
+_GROUP_CONCAT = re.compile(r"\bGROUP_CONCAT\s*\(", re.IGNORECASE)
+_GROUP_CONCAT_ARGS = re.compile(
+    r"^\s*(?P<distinct>DISTINCT\s+)?(?P<expr>.*?)"
+    r"(?:\s+ORDER\s+BY\s+(?P<order>.*?))?"
+    r"(?:\s+SEPARATOR\s+(?P<sep>'(?:[^']|'')*'))?\s*$",
+    re.IGNORECASE | re.DOTALL,
+)
+
+
+def _closing_paren(sql, start) -> int:
+    """Position of the ')' matching the '(' at sql[start - 1] (string literals skipped)."""
+    depth, i, quoted = 1, start, False
+    while i < len(sql):
+        ch = sql[i]
+        if ch == "'":
+            quoted = not quoted
+        elif not quoted:
+            if ch == "(":
+                depth += 1
+            elif ch == ")":
+                depth -= 1
+                if depth == 0:
+                    return i
+        i += 1
+    raise ValueError("Unbalanced parentheses in GROUP_CONCAT(...)")
+
+
+def _group_concat(sql) -> str:
+    out, pos = [], 0
+    for m in _GROUP_CONCAT.finditer(sql):
+        if m.start() < pos:          # nested inside an already rewritten call
+            continue
+        end = _closing_paren(sql, m.end())
+        args = _GROUP_CONCAT_ARGS.match(_group_concat(sql[m.end():end]))
+        order = f" ORDER BY {args['order']}" if args["order"] else ""
+        sep = args["sep"] or "','"               # MySQL's default separator
+        out.append(sql[pos:m.start()])
+        out.append(f"string_agg({args['distinct'] or ''}{args['expr']}, {sep}{order})")
+        pos = end + 1
+    out.append(sql[pos:])
+    return "".join(out)
+
+
+def mysql_to_duckdb(sql) -> str:
+    """Translate a MySQL statement (string or sqlalchemy text()) to DuckDB SQL."""
+    if isinstance(sql, TextClause):
+        sql = sql.text
+    parts = _STRING_LITERAL.split(sql)
+    for i in range(0, len(parts), 2):          # outside string literals only
+        parts[i] = _BIND.sub(r"$\1", parts[i].replace("`", '"'))
+    return _group_concat("".join(parts))
+
+
+def _bound(sql, params) -> dict:
+    """Only the parameters the statement uses (DuckDB rejects extra ones); tuples -> lists."""
+    if not params:
+        return None
+    names = set(re.findall(r"\$([A-Za-z_]\w*)", sql))
+    return {k: list(v) if isinstance(v, tuple) else v for k, v in params.items() if k in names}
+
+
+def _csv_header(path) -> list:
+    with open(path, newline="", encoding="utf-8-sig") as fh:
+        return next(csv.reader(fh), [])
+
+
+def _quote(name) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _literal(value) -> str:
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def csv_view_sql(name, path) -> str:
+    """CREATE VIEW over one CSV: declared column types, text trimmed and '' -> NULL."""
+    dtypes = table_dtypes(name)
+    header = _csv_header(path)
+    types = {c: DUCKDB_TYPES.get(dtypes.get(c), "VARCHAR") for c in header}
+    columns = ", ".join(f"{_literal(c)}: {_literal(t)}" for c, t in types.items())
+    select = ", ".join(
+        f"NULLIF(TRIM({_quote(c)}), '') AS {_quote(c)}" if t == "VARCHAR" else _quote(c)
+        for c, t in types.items()
+    )
+    return (f"CREATE OR REPLACE VIEW {_quote(name)} AS SELECT {select} FROM "
+            f"read_csv({_literal(path)}, header = true, columns = {{{columns}}})")
+
+
+class DuckSession(Session):
+    """Queries on one DuckDB cursor (same interface as sisal.db.Session)."""
+
+    def query(self, sql, params=None) -> pd.DataFrame:
+        with instrument.query(sql, params, backend="duckdb") as q:
+            stmt = mysql_to_duckdb(sql)
+            df = q.rows_out = self.conn.execute(stmt, _bound(stmt, params)).df()
+        return df
+
+    def execute(self, sql, params=None):
+        stmt = mysql_to_duckdb(sql)
+        return self.conn.execute(stmt, _bound(stmt, params))
+
+    def iter_query(self, sql, params=None, chunksize=50_000):
+        """DataFrame chunks of ~chunksize rows (whole DuckDB vectors)."""
+        vectors = max(1, -(-chunksize // _VECTOR_SIZE))
+        with instrument.query(sql, params, name="stream", chunksize=chunksize, backend="duckdb") as q:
+            self.execute(sql, params)
+            n = 0
+            while True:
+                chunk = self.conn.fetch_df_chunk(vectors)
+                if chunk.empty:
+                    break
+                n += len(chunk)
+                yield chunk
+            q.rows_out = n
+
+
+class DuckDatabase(Database):
+    """
+    sisal.db.Database on an in-process DuckDB (in memory by default).
+    - threads: DuckDB worker threads (None = all cores)
+    """
+
+    def __init__(self, path=":memory:", threads=None):
+        if duckdb is None:
+            raise ImportError("DuckDatabase needs duckdb (pip install duckdb)")
+        self.conn = duckdb.connect(path)
+        if threads:
+            self.conn.execute(f"SET threads = {int(threads)}")
+        self.tables = []
+
+    @classmethod
+    def from_folder(cls, folder_path, names=None, threads=None, path=":memory:"):
+        """Views over every <table>.csv / <table>.parquet of a folder (Parquet wins)."""
+        files = {}
+        for ext in ("csv", "parquet"):
+            for f in sorted(glob.glob(os.path.join(folder_path, f"*.{ext}"))):
+                files[os.path.splitext(os.path.basename(f))[0]] = f
+        if names is not None:
+            files = {n: f for n, f in files.items() if n in set(names)}
+        if not files:
+            raise FileNotFoundError(f"No .csv / .parquet tables in {folder_path}")
+        db = cls(path, threads=threads)
+        for name, f in files.items():
+            db.register_file(name, f)
+        return db
+
+    @classmethod
+    def from_frames(cls, tables, threads=None):
+        """Tables from in-memory DataFrames, e.g. SisalDB.load_all() or sisal.synthetic."""
+        db = cls(threads=threads)
+        for name, df in tables.items():
+            db.register_frame(name, df)
+        return db
+
+    def register_file(self, name, path):
+        if path.endswith(".parquet"):
+            sql = f"CREATE OR REPLACE VIEW {_quote(name)} AS SELECT * FROM read_parquet({_literal(path)})"
+        else:
+            sql = csv_view_sql(name, path)
+        self.conn.execute(sql)
+        self.tables.append(name)
+
+    def register_frame(self, name, df):
+        # copied into a DuckDB table: registered frames are only visible on this
+        # connection, not on the per-session cursors
+        tmp = f"__frame_{name}"
+        self.conn.register(tmp, df)
+        try:
+            self.conn.execute(f"CREATE OR REPLACE TABLE {_quote(name)} AS SELECT * FROM {_quote(tmp)}")
+        finally:
+            self.conn.unregister(tmp)
+        self.tables.append(name)
+
+    @contextmanager
+    def session(self):
+        """A cursor of the shared database (one per thread / concurrent query)."""
+        cur = self.conn.cursor()
+        try:
+            yield DuckSession(cur)
+        finally:
+            cur.close()
+
+    def dispose(self):
+        self.conn.close()
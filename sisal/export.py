@@ -0,0 +1,338 @@
+"""
+Writers for query results / derived tables.
+
+Formats: parquet, feather (Arrow IPC), csv, csv.gz and xlsx. Every writer takes
+an iterator of DataFrame chunks (e.g. Database.stream) and appends them to one
+file, so memory stays bounded by the chunk size.
+
+- write_chunks(chunks, path)       one table -> one file
+- export_tables({name: df}, out)   many tables: one file per table in the
+                                   directory `out` (written in parallel), or for
+                                   xlsx one workbook with a sheet per table
+- xlsx is written with xlsxwriter in constant_memory mode (rows are streamed
+  to disk); tables longer than Excel's row limit continue on extra sheets
+  (name, name_2, name_3, ...)
+- register_writer() adds a format
+"""
+
+import gzip
+import itertools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from . import instrument
+
+EXCEL_MAX_ROWS = 1_048_576        # incl. the header row
+EXCEL_SHEET_NAME_LEN = 31
+XLSX_BLOCK_ROWS = 50_000          # rows converted to Python values at a time
+SCHEMA_PEEK_ROWS = 500_000        # rows held back to type the columns empty in the first chunk
+
+# file name suffix -> format (longest suffixes first)
+SUFFIXES = (
+    (".parquet", "parquet"),
+    (".feather", "feather"),
+    (".arrow", "feather"),
+    (".csv.gz", "csv.gz"),
+    (".csv", "csv"),
+    (".xlsx", "xlsx"),
+)
+
+
+def guess_format(path) -> str:
+    name = os.path.basename(path).lower()
+    for suffix, fmt in SUFFIXES:
+        if name.endswith(suffix):
+            return fmt
+    raise ValueError(f"Cannot tell the output format from {path!r}; pass fmt=")
+
+
+def file_suffix(fmt) -> str:
+    for suffix, f in SUFFIXES:
+        if f == fmt:
+            return suffix
+    return f".{fmt}"
+
+
+def _as_chunks(data):
+    """A DataFrame or an iterator of DataFrame chunks -> iterator of chunks."""
+    return iter([data]) if isinstance(data, pd.DataFrame) else iter(data)
+
+
+# the writer libraries are imported on first use (only needed for their formats,
+# and `import sisal.export` stays cheap for the command line)
+
+def _pyarrow(fmt):
+    try:
+        import pyarrow as pa
+        import pyarrow.ipc  # noqa: F401
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError(f"Writing {fmt} needs pyarrow (pip install pyarrow)") from None
+    return pa, pq
+
+
+def _missing_columns(df) -> set:
+    """Columns without a single value (their dtype says nothing about later chunks)."""
+    return {c for c in df.columns if not df[c].notna().any()}
+
+
+def _arrow_schema(pa, chunks, peek_rows=SCHEMA_PEEK_ROWS):
+    """
+    (schema, chunks) for an Arrow writer: the schema of the first chunk, with the
+    columns that are all missing there typed from the first later chunk that has
+    values (up to peek_rows rows are held back for that); columns still empty
+    are written as strings. The returned iterator yields every chunk again.
+    """
+    first = next(chunks, None)
+    if first is None:
+        return None, iter(())
+    schema = pa.Schema.from_pandas(first, preserve_index=False)
+    pending, held, rows = _missing_columns(first), [first], len(first)
+    while pending and rows < peek_rows:
+        df = next(chunks, None)
+        if df is None:
+            break
+        held.append(df)
+        rows += len(df)
+        found = pending - _missing_columns(df)
+        if found:
+            typed = pa.Schema.from_pandas(df[sorted(found)], preserve_index=False)
+            for field in typed:
+                schema = schema.set(schema.get_field_index(field.name), field)
+            pending -= found
+    for i, field in enumerate(schema):
+        if field.name in pending or pa.types.is_null(field.type):
+            schema = schema.set(i, field.with_type(pa.string()))
+    return schema, itertools.chain(held, chunks)
+
+
+def _arrow_table(pa, df, schema):
+    """
+    One chunk as a table of `schema`. Values of a column the schema types as
+    string (because it was empty in the leading chunks) are written as text.
+    """
+    for field in schema:
+        if (pa.types.is_string(field.type) or pa.types.is_large_string(field.type)) and field.name in df.columns:
+            s = df[field.name]
+            if not (pd.api.types.is_string_dtype(s.dtype) or isinstance(s.dtype, pd.CategoricalDtype)):
+                df = df.assign(**{field.name: s.astype(object).where(s.isna(), s.astype(str))})
+    try:
+        return pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError) as err:
+        raise ValueError(f"Chunk does not fit the column types of the first chunks: {err}") from None
+
+
+def _write_parquet_chunks(chunks, path, compression="zstd"):
+    pa, pq = _pyarrow("parquet")
+    schema, chunks = _arrow_schema(pa, chunks)
+    if schema is None:                 # no rows at all
+        pq.write_table(pa.table({}), path)
+        return 0
+    n = 0
+    with pq.ParquetWriter(path, schema, compression=compression) as writer:
+        for df in chunks:
+            writer.write_table(_arrow_table(pa, df, schema))
+            n += len(df)
+    return n
+
+
+def _write_feather_chunks(chunks, path, compression="zstd"):
+    pa, _ = _pyarrow("feather")
+    schema, chunks = _arrow_schema(pa, chunks)
+    n = 0
+    with pa.OSFile(path, "wb") as sink:
+        if schema is None:
+            with pa.ipc.new_file(sink, pa.schema([])):
+                return 0
+        options = pa.ipc.IpcWriteOptions(compression=compression)
+        with pa.ipc.new_file(sink, schema, options=options) as writer:
+            for df in chunks:
+                writer.write_table(_arrow_table(pa, df, schema))
+                n += len(df)
+    return n
+
+
+def _write_csv_chunks(chunks, path, compress):
+    opener = gzip.open if compress else open
+    n = 0
+    with opener(path, "wt", newline="", encoding="utf-8") as fh:
+        for i, df in enumerate(chunks):
+            df.to_csv(fh, header=(i == 0), index=False)
+            n += len(df)
+    return n
+
+
+# -------------------------
+# xlsx (streaming, with sheet splitting)
+# -------------------------
+
+def _excel_values(df) -> list:
+    """Rows as lists of cell values xlsxwriter can write (NA -> None, naive datetimes)."""
+    df = df.copy(deep=False)
+    for col in df.columns:
+        s = df[col]
+        if isinstance(s.dtype, pd.DatetimeTZDtype):
+            df[col] = s.dt.tz_localize(None)
+    obj = df.astype(object)
+    return obj.where(df.notna(), None).to_numpy().tolist()
+
+
+def _sheet_names(name, taken):
+    """name, name_2, name_3, ... (<= 31 chars, unique within the workbook)."""
+    name = str(name)[:EXCEL_SHEET_NAME_LEN]
+    i = 1
+    while True:
+        if i == 1:
+            candidate = name
+        else:
+            tag = f"_{i}"
+            candidate = name[:EXCEL_SHEET_NAME_LEN - len(tag)] + tag
+        i += 1
+        if candidate.lower() not in taken:
+            taken.add(candidate.lower())
+            yield candidate
+
+
+def _slices(chunks, size=XLSX_BLOCK_ROWS):
+    """Chunks cut into blocks of <= size rows (bounds the Python row lists)."""
+    for df in chunks:
+        for start in range(0, max(len(df), 1), size):
+            yield df.iloc[start:start + size]
+
+
+def _write_xlsx_sheets(workbook, name, chunks, taken, max_rows=EXCEL_MAX_ROWS):
+    """Stream chunks into sheet `name`, opening a new sheet whenever one is full."""
+    names = _sheet_names(name, taken)
+    ws, row, n = None, 0, 0
+    for df in _slices(chunks):
+        values = _excel_values(df)
+        pos = 0
+        while ws is None or pos < len(values):
+            if ws is None or row >= max_rows:
+                ws = workbook.add_worksheet(next(names))
+                ws.write_row(0, 0, [str(c) for c in df.columns])
+                row = 1
+            for rec in values[pos:pos + max_rows - row]:
+                ws.write_row(row, 0, rec)
+                row += 1
+                pos += 1
+        n += len(values)
+    if ws is None:                        # no chunks at all
+        workbook.add_worksheet(next(names))
+    return n
+
+
+def _open_workbook(path):
+    try:
+        import xlsxwriter
+    except ImportError:
+        raise ImportError("Writing xlsx needs xlsxwriter (pip install xlsxwriter)") from None
+    return xlsxwriter.Workbook(path, {
+        "constant_memory": True,          # rows are flushed to disk as they are written
+        "strings_to_urls": False,         # DOIs/URLs stay plain text (and fast)
+        "strings_to_formulas": False,
+        "default_date_format": "yyyy-mm-dd hh:mm:ss",
+    })
+
+
+def _write_xlsx_chunks(chunks, path, sheet_name="data"):
+    workbook = _open_workbook(path)
+    try:
+        return _write_xlsx_sheets(workbook, sheet_name, chunks, set())
+    finally:
+        workbook.close()
+
+
+# -------------------------
+# format registry
+# -------------------------
+
+# format -> writer(chunks, path) -> rows written
+WRITERS = {
+    "parquet": _write_parquet_chunks,
+    "feather": _write_feather_chunks,
+    "csv": lambda chunks, path: _write_csv_chunks(chunks, path, compress=False),
+    "csv.gz": lambda chunks, path: _write_csv_chunks(chunks, path, compress=True),
+    "xlsx": _write_xlsx_chunks,
+}
+
+
+def register_writer(fmt, writer, suffix=None):
+    """Add an output format: writer(chunks, path) -> number of rows written."""
+    global SUFFIXES
+    WRITERS[fmt] = writer
+    if suffix:
+        SUFFIXES = tuple(sorted(SUFFIXES + ((suffix, fmt),), key=lambda t: -len(t[0])))
+
+
+def _atomic(path, write):
+    # write to a temp file + rename, so readers never see a half-written file
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        n = write(tmp)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return n
+
+
+def write_chunks(chunks, path, fmt=None) -> int:
+    """
+    Append DataFrame chunks (same columns) to one file; returns the row count.
+    chunks: iterator of DataFrames (or one DataFrame)
+    fmt: one of WRITERS (default: from the file extension)
+    """
+    fmt = fmt or guess_format(path)
+    if fmt not in WRITERS:
+        raise ValueError(f"Unknown format: {fmt} (expected one of {', '.join(WRITERS)})")
+    with instrument.stage(f"write:{os.path.basename(path)}", fmt=fmt) as st:
+        n = st.rows_out = _atomic(path, lambda tmp: WRITERS[fmt](_as_chunks(chunks), tmp))
+    return n
+
+
+def write_excel(tables, path) -> dict:
+    """
+    One workbook, a sheet per table (split into name_2, ... past the row limit).
+    tables: {sheet name: DataFrame or iterator of chunks}; returns {name: rows}.
+    """
+    def _write(tmp):
+        workbook = _open_workbook(tmp)
+        taken, counts = set(), {}
+        try:
+            for name, data in tables.items():
+                with instrument.stage(f"xlsx:{name}") as st:
+                    counts[name] = st.rows_out = _write_xlsx_sheets(workbook, name, _as_chunks(data), taken)
+        finally:
+            workbook.close()
+        return counts
+
+    return _atomic(path, _write)
+
+
+def export_tables(tables, out, fmt="parquet", max_workers=None) -> dict:
+    """
+    Write several tables; returns {name: rows}.
+    - xlsx: `out` is the workbook, one sheet per table (sequential: one file)
+    - other formats: `out` is a directory, one <name><suffix> file per table,
+      written in parallel (max_workers threads; the Arrow/gzip writers release the GIL)
+    """
+    if fmt == "xlsx":
+        return write_excel(tables, out)
+    if fmt not in WRITERS:
+        raise ValueError(f"Unknown format: {fmt} (expected one of {', '.join(WRITERS)})")
+
+    os.makedirs(out, exist_ok=True)
+    suffix = file_suffix(fmt)
+
+    def _one(item):
+        name, data = item
+        return name, write_chunks(data, os.path.join(out, f"{name}{suffix}"), fmt=fmt)
+
+    items = list(tables.items())
+    if max_workers == 1 or len(items) <= 1:
+        return dict(map(_one, items))
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        return dict(pool.map(_one, items))
@@ -0,0 +1,130 @@
+"""
+Per-site data-availability flags.
+
+Every sample table is reduced once: notna() masks of the measurement columns,
+grouped by entity with the built-in `any`, then mapped to sites through the
+entity -> site link table. The result is a single site x flag boolean matrix
+that also feeds the map tables (`sites_with_flag`).
+"""
+
+import pandas as pd
+
+# flag name -> measurement columns (flag is True if ANY of them has a value)
+FLAG_SPECS = {
+    "drip_iso_sample": {
+        "link": "drip_entity",
+        "key": "drip_entity_id",
+        "flags": {
+            "has_drip_iso_d18O": ["drip_iso_d18O_measurement"],
+            "has_drip_iso_d2H": ["drip_iso_d2H_measurement"],
+            "has_drip_iso_any": ["drip_iso_d18O_measurement", "drip_iso_d2H_measurement"],
+        },
+    },
+    "drip_rate_sample": {
+        "link": "drip_entity",
+        "key": "drip_entity_id",
+        "flags": {
+            "has_drip_rate": ["drip_rate_measurement"],
+        },
+    },
+    "mod_carb_sample": {
+        "link": "drip_entity",
+        "key": "drip_entity_id",
+        "flags": {
+            "has_mod_carb_d18O": ["mod_carb_d18O_measurement"],
+            "has_mod_carb_d13C": ["mod_carb_d13C_measurement"],
+            "has_mod_carb_any": ["mod_carb_d18O_measurement", "mod_carb_d13C_measurement"],
+        },
+    },
+    "precip_sample": {
+        "link": "site_link_precip",
+        "key": "precip_entity_id",
+        "flags": {
+            "has_precip_amount": ["precip_amount"],
+            "has_precip_d18O": ["precip_d18O_measurement"],
+            "has_precip_d2H": ["precip_d2H_measurement"],
+            "has_precip_anyiso": ["precip_d18O_measurement", "precip_d2H_measurement"],
+        },
+    },
+    "cave_temperature_sample": {
+        "link": "cave_entity",
+        "key": "cave_entity_id",
+        "flags": {"has_cave_temperature": ["cave_temperature_measurement"]},
+    },
+    "cave_relative_humidity_sample": {
+        "link": "cave_entity",
+        "key": "cave_entity_id",
+        "flags": {"has_cave_relative_humidity": ["cave_relative_humidity_measurement"]},
+    },
+    "cave_pCO2_sample": {
+        "link": "cave_entity",
+        "key": "cave_entity_id",
+        "flags": {"has_cave_pCO2": ["cave_pCO2_measurement"]},
+    },
+}
+
+SITE_MAP_COLS = ["site_id", "site_name", "latitude", "longitude", "elevation"]
+
+
+def sample_site_flags(sample, link, key, flags) -> pd.DataFrame:
+    """
+    Flags of one sample table, indexed by site_id (only sites with samples).
+    - sample: sample table with the entity `key` column
+    - link:   table with site_id + `key` (drip_entity / site_link_precip)
+    - flags:  {flag_name: [measurement columns]}
+    """
+    cols = list(dict.fromkeys(c for cs in flags.values() for c in cs))
+
+    # 1 pass over the (large) sample table: notna -> any() per entity
+    present = sample[cols].notna()
+    present[key] = sample[key].to_numpy()
+    by_entity = present.groupby(key, sort=False).any()
+
+    # small entity -> site step
+    by_site = (
+        link[["site_id", key]].drop_duplicates()
+        .merge(by_entity, left_on=key, right_index=True, how="inner")
+        .drop(columns=key)
+        .groupby("site_id")
+        .any()
+    )
+    return pd.DataFrame({flag: by_site[cs].any(axis=1) for flag, cs in flags.items()},
+                        index=by_site.index)
+
+
+def site_flags(site, drip_entity=None, site_link_precip=None, cave_entity=None, **samples) -> pd.DataFrame:
+    """
+    Site x flag boolean matrix (one row per site in `site`, False = no data).
+
+        site_flags(site, drip_entity, site_link_precip,
+                   drip_iso_sample=..., drip_rate_sample=...,
+                   mod_carb_sample=..., precip_sample=...,
+                   cave_entity=..., cave_temperature_sample=...)
+
+    Only the sample tables that are passed get their flag columns.
+    """
+    links = {"drip_entity": drip_entity, "site_link_precip": site_link_precip, "cave_entity": cave_entity}
+    unknown = sorted(set(samples) - set(FLAG_SPECS))
+    if unknown:
+        raise KeyError(f"No flag definition for table(s): {', '.join(unknown)}")
+
+    site_ids = pd.Index(site["site_id"].drop_duplicates(), name="site_id")
+    parts = []
+    for name, sample in samples.items():
+        spec = FLAG_SPECS[name]
+        link = links[spec["link"]]
+        if link is None:
+            raise ValueError(f"{name} flags need the {spec['link']} table")
+        parts.append(
+            sample_site_flags(sample, link, spec["key"], spec["flags"])
+            .reindex(site_ids, fill_value=False)
+        )
+    if not parts:
+        return pd.DataFrame(index=site_ids)
+    return pd.concat(parts, axis=1).astype(bool)
+
+
+def sites_with_flag(site, flags, flag, columns=SITE_MAP_COLS) -> pd.DataFrame:
+    """Rows of `site` whose `flag` is True (e.g. the sites_*_map tables)."""
+    ids = flags.index[flags[flag].to_numpy()]
+    return site.loc[site["site_id"].isin(ids), columns].reset_index(drop=True)
@@ -0,0 +1,351 @@
+"""
+Per-stage / per-query instrumentation for the extraction scripts.
+
+Off by default: every hook is a single check of a module global and returns a
+shared no-op record, so instrumented code runs at full speed until enable().
+
+    from sisal import instrument
+    instrument.enable(report="profile.json", slow_query_s=1.0)   # or SISAL_PROFILE=profile.json
+    with instrument.stage("merge", rows_in=df) as st:
+        out = df.merge(...)
+        st.rows_out = len(out)
+
+    @instrument.timed("make_dt")            # rows_in/out from the args / result
+    def make_dt(...): ...
+
+    instrument.section("5) site summary")   # flat scripts: closes the previous section
+
+Each record: name, kind (stage / query / section), parent, wall_s, cpu_s
+(process CPU time, all threads), rows_in, rows_out, rss_peak_mb (process high
+water mark), peak_traced_mb (only with trace_memory=True: tracemalloc slows
+allocation-heavy code several times over), + extra fields. Records go to the
+"sisal.instrument" logger as one JSON line each and into report(); queries
+slower than slow_query_s are logged to "sisal.slow_query" with their bound
+parameters.
+"""
+
+import atexit
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from functools import wraps
+
+try:
+    import resource
+except ImportError:  # not on Windows
+    resource = None
+
+logger = logging.getLogger("sisal.instrument")
+slow_logger = logging.getLogger("sisal.slow_query")
+
+PARAM_REPR_MAX = 500        # chars of the bound parameters kept in the slow-query log
+
+
+class _NullRecord:
+    """Returned by every hook while disabled: swallows attribute writes."""
+
+    __slots__ = ()
+
+    def __setattr__(self, name, value):
+        pass
+
+    def set(self, **fields):
+        pass
+
+
+_NULL = _NullRecord()
+
+
+class _NullContext:
+    __slots__ = ()
+
+    def __enter__(self):
+        return _NULL
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_CONTEXT = _NullContext()
+
+
+def _count(obj):
+    """Row count of a DataFrame / array / dict of frames; None if unknown."""
+    if obj is None:
+        return None
+    if isinstance(obj, int):
+        return obj
+    if isinstance(obj, dict):
+        counts = [_count(v) for v in obj.values()]
+        return sum(c for c in counts if c is not None) if counts else 0
+    try:
+        return len(obj)
+    except TypeError:
+        return None
+
+
+def max_rss_mb():
+    """Process peak resident set size (MB); None where unavailable."""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 2**20 if sys.platform == "darwin" else rss / 2**10
+
+
+def _short(value, limit=PARAM_REPR_MAX):
+    text = repr(value)
+    return text if len(text) <= limit else text[:limit] + f"... ({len(text)} chars)"
+
+
+def _sql_text(sql):
+    return " ".join(str(sql).split())
+
+
+class Record:
+    """One timed stage / query (attributes are written by the instrumented code)."""
+
+    def __init__(self, name, kind, parent, rows_in=None, **extra):
+        self.name = name
+        self.kind = kind
+        self.parent = parent
+        self.rows_in = _count(rows_in)
+        self.rows_out = None
+        self.extra = dict(extra)
+        self.peak_traced = 0
+
+    def set(self, **fields):
+        """Extra fields for the report (e.g. table=..., fmt=...)."""
+        self.extra.update(fields)
+
+    def as_dict(self):
+        out = {
+            "name": self.name,
+            "kind": self.kind,
+            "parent": self.parent,
+            "wall_s": round(self.wall_s, 6),
+            "cpu_s": round(self.cpu_s, 6),
+            "rows_in": self.rows_in,
+            "rows_out": _count(self.rows_out),
+            "rss_peak_mb": self.rss_peak_mb,
+        }
+        if self.peak_traced_mb is not None:
+            out["peak_traced_mb"] = self.peak_traced_mb
+        out.update(self.extra)
+        return out
+
+
+class Profiler:
+    """Collects the records of one run (thread-safe; nesting is tracked per thread)."""
+
+    def __init__(self, report=None, trace_memory=False, slow_query_s=1.0):
+        self.report_path = report
+        self.trace_memory = trace_memory
+        self.slow_query_s = slow_query_s
+        self.records = []
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._section = None
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def _stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    @contextmanager
+    def span(self, name, kind="stage", rows_in=None, **extra):
+        stack = self._stack()
+        rec = Record(name, kind, stack[-1].name if stack else None, rows_in, **extra)
+        if self.trace_memory:
+            # parents keep the peak seen so far, the child starts a fresh one
+            peak = tracemalloc.get_traced_memory()[1]
+            for frame in stack:
+                frame.peak_traced = max(frame.peak_traced, peak)
+            tracemalloc.reset_peak()
+            rec.traced_start = tracemalloc.get_traced_memory()[0]
+        stack.append(rec)
+        wall0, cpu0 = time.perf_counter(), time.process_time()
+        try:
+            yield rec
+        finally:
+            rec.wall_s = time.perf_counter() - wall0
+            rec.cpu_s = time.process_time() - cpu0
+            stack.remove(rec)      # not pop(): a streamed query may end after stages opened inside it
+            rec.peak_traced_mb = None
+            if self.trace_memory:
+                peak = tracemalloc.get_traced_memory()[1]
+                rec.peak_traced = max(rec.peak_traced, peak)
+                for frame in stack:
+                    frame.peak_traced = max(frame.peak_traced, peak)
+                rec.peak_traced_mb = round((rec.peak_traced - rec.traced_start) / 2**20, 3)
+            rss = max_rss_mb()
+            rec.rss_peak_mb = round(rss, 1) if rss is not None else None
+            self._add(rec)
+
+    def _add(self, rec):
+        data = rec.as_dict()
+        with self._lock:
+            self.records.append(data)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps(data, default=str))
+        if rec.kind == "query" and self.slow_query_s is not None and rec.wall_s >= self.slow_query_s:
+            slow_logger.warning("%.3fs rows=%s sql=%s params=%s", rec.wall_s, data["rows_out"],
+                                data.get("sql"), data.get("params"))
+
+    def section(self, name):
+        self.end_section()
+        ctx = self.span(name, kind="section")
+        ctx.__enter__()
+        self._section = ctx
+
+    def end_section(self):
+        ctx, self._section = self._section, None
+        if ctx is not None:
+            ctx.__exit__(None, None, None)
+
+    def report(self) -> dict:
+        with self._lock:
+            records = list(self.records)
+        return {
+            "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+            "wall_s": round(time.time() - self.started, 3),
+            "rss_peak_mb": max_rss_mb(),
+            "trace_memory": self.trace_memory,
+            "slow_query_s": self.slow_query_s,
+            "records": records,
+        }
+
+    def write_report(self, path=None) -> str:
+        path = path or self.report_path
+        self.end_section()
+        with open(path, "w", encoding="utf-8") as fh:
+            json.dump(self.report(), fh, indent=2, default=str)
+        return path
+
+
+_profiler = None
+_exit_profiler = None        # the latest profiler with a report path (written at exit)
+_exit_registered = False
+
+
+def enable(report=None, trace_memory=False, slow_query_s=1.0) -> Profiler:
+    """
+    Start collecting records.
+    - report: JSON file written at interpreter exit (or call write_report());
+      a profiler enabled earlier writes its report now
+    - trace_memory: peak traced allocation per stage (tracemalloc; slow)
+    - slow_query_s: queries at least this slow go to the "sisal.slow_query" logger
+    """
+    global _profiler, _exit_profiler, _exit_registered
+    _write_at_exit()                            # the previous run's report is complete now
+    _profiler = Profiler(report=report, trace_memory=trace_memory, slow_query_s=slow_query_s)
+    if report:
+        if not _exit_registered:                # one handler per process, for the latest profiler
+            atexit.register(_write_at_exit)
+            _exit_registered = True
+        _exit_profiler = _profiler
+    return _profiler
+
+
+def enable_from_env() -> Profiler:
+    """
+    enable() if SISAL_PROFILE is set (its value is the report path); also reads
+    SISAL_PROFILE_MEMORY=1 and SISAL_SLOW_QUERY_S. Returns None when disabled.
+    """
+    path = os.environ.get("SISAL_PROFILE")
+    if not path:
+        return None
+    return enable(report=path,
+                  trace_memory=os.environ.get("SISAL_PROFILE_MEMORY", "") not in ("", "0"),
+                  slow_query_s=float(os.environ.get("SISAL_SLOW_QUERY_S", 1.0)))
+
+
+def disable() -> Profiler:
+    """Stop collecting; returns the profiler (its records stay available)."""
+    global _profiler
+    prof, _profiler = _profiler, None
+    if prof is not None:
+        prof.end_section()
+        if prof.trace_memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+    return prof
+
+
+def _write_at_exit():
+    global _exit_profiler
+    prof, _exit_profiler = _exit_profiler, None
+    if prof is not None and prof.report_path and prof.records:
+        prof.write_report()
+
+
+def enabled() -> bool:
+    return _profiler is not None
+
+
+def profiler() -> Profiler:
+    return _profiler
+
+
+def stage(name, rows_in=None, **extra):
+    """Context manager timing a block; set .rows_out (and .set(...)) on the yielded record."""
+    if _profiler is None:
+        return _NULL_CONTEXT
+    return _profiler.span(name, "stage", rows_in, **extra)
+
+
+def query(sql, params=None, **extra):
+    """Like stage() for one SQL statement; slow ones are logged with their parameters."""
+    if _profiler is None:
+        return _NULL_CONTEXT
+    return _profiler.span(extra.pop("name", "query"), "query", None,
+                          sql=_sql_text(sql), params=_short(params), **extra)
+
+
+def section(name):
+    """Flat scripts: start section `name`, closing the previous one (no indentation needed)."""
+    if _profiler is not None:
+        _profiler.section(name)
+
+
+def end_section():
+    if _profiler is not None:
+        _profiler.end_section()
+
+
+def timed(name=None):
+    """
+    Decorator: a stage per call; rows_in = rows of the first argument,
+    rows_out = rows of the result.
+    """
+    def deco(fn):
+        label = name or fn.__qualname__
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _profiler is None:
+                return fn(*args, **kwargs)
+            with _profiler.span(label, "stage", args[0] if args else None) as rec:
+                result = fn(*args, **kwargs)
+                rec.rows_out = result
+                return result
+        return wrapper
+    return deco
+
+
+def report() -> dict:
+    return _profiler.report() if _profiler is not None else None
+
+
+def write_report(path=None) -> str:
+    """Write the JSON report (default: the path given to enable())."""
+    if _profiler is None:
+        return None
+    return _profiler.write_report(path)
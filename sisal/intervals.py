@@ -0,0 +1,182 @@
+"""
+Interval join: drip samples -> the precipitation samples that fed them.
+
+Drip samples are matched to the precip samples of the precip entities linked to
+their site (drip_entity.site_id -> site_link_precip), optionally through a lag
+window: a precip sample feeds a drip interval [start, end] if it overlaps
+[start - lag_max, end - lag_min].
+
+No cartesian product: the precip intervals are sorted once per entity and
+every window is located by binary search (start <= window end, running max
+of end >= window start), so the work grows with the number of samples plus
+the number of matching pairs.
+
+    pairs = drip_precip_pairs(drip_iso_sample, precip_sample, drip_entity,
+                              site_link_precip, lag=("0D", "90D"))
+    fed = drip_precip_means(drip_iso_sample, precip_sample, drip_entity,
+                            site_link_precip, lag=("0D", "90D"))
+"""
+
+import numpy as np
+import pandas as pd
+
+from .dates import sample_start_end
+
+NS_PER_S = 10**9
+NS_PER_DAY = 86_400 * NS_PER_S
+_TIME_BITS = 36            # seconds relative to the earliest timestamp (< 2**36 s ~ 2177 years)
+
+
+def _lag_ns(lag):
+    """lag: None, one Timedelta-like (fixed shift) or (lag_min, lag_max)."""
+    if lag is None:
+        return 0, 0
+    if isinstance(lag, (tuple, list)):
+        lo, hi = (pd.Timedelta(v).value for v in lag)
+    else:
+        lo = hi = pd.Timedelta(lag).value
+    if lo > hi:
+        raise ValueError(f"lag_min > lag_max: {lag}")
+    return lo, hi
+
+
+def overlap_join(left_entity, left_start, left_end, right_entity, right_start, right_end):
+    """
+    All (left, right) position pairs with the same entity and overlapping
+    closed intervals [start, end] (int64 ns). Returns (left_pos, right_pos).
+    """
+    left_entity, left_start, left_end = (np.asarray(a, dtype="int64") for a in (left_entity, left_start, left_end))
+    right_entity, right_start, right_end = (np.asarray(a, dtype="int64") for a in (right_entity, right_start, right_end))
+    empty = np.zeros(0, "int64")
+    if len(left_entity) == 0 or len(right_entity) == 0:
+        return empty, empty
+
+    order = np.lexsort((right_start, right_entity))
+    r_ent, r_start, r_end = right_entity[order], right_start[order], right_end[order]
+    new_ent = np.r_[True, r_ent[1:] != r_ent[:-1]]
+    run_end = pd.Series(r_end).groupby(np.cumsum(new_ent)).cummax().to_numpy()
+
+    # entity rank + time (s) packed into one sortable int64
+    ents = np.unique(r_ent)
+    t0 = min(r_start.min(), left_start.min()) // NS_PER_S
+
+    def _key(rank, ns):
+        sec = np.clip(ns // NS_PER_S - t0, 0, (1 << _TIME_BITS) - 1)
+        return (rank.astype("int64") << _TIME_BITS) | sec
+
+    r_rank = np.searchsorted(ents, r_ent)
+    key_start = _key(r_rank, r_start)
+    key_end = _key(r_rank, run_end)              # non-decreasing within each entity
+
+    # left rows whose entity has no right rows cannot match
+    l_rank = np.searchsorted(ents, left_entity)
+    known = (l_rank < len(ents)) & (ents[np.minimum(l_rank, len(ents) - 1)] == left_entity)
+    lpos = np.flatnonzero(known)
+    l_rank = l_rank[lpos]
+
+    lo = np.searchsorted(key_end, _key(l_rank, left_start[lpos]), "left")
+    hi = np.searchsorted(key_start, _key(l_rank, left_end[lpos]), "right")
+    n = np.maximum(hi - lo, 0)
+
+    li = np.repeat(lpos, n)
+    ri = np.repeat(lo, n) + (np.arange(n.sum()) - np.repeat(np.cumsum(n) - n, n))
+    # second-resolution keys only narrow the candidates: exact test in ns
+    keep = (r_start[ri] <= left_end[li]) & (r_end[ri] >= left_start[li])
+    return li[keep], order[ri[keep]]
+
+
+def _drip_windows(drip_sample, table, drip_entity, site_link_precip, lag):
+    """Drip sample windows expanded over the precip entities linked to their site."""
+    start_dt, end_dt = sample_start_end(drip_sample, table)
+    lag_min, lag_max = _lag_ns(lag)
+    d = pd.DataFrame({
+        "drip_row": np.arange(len(drip_sample)),
+        "drip_entity_id": drip_sample["drip_entity_id"].to_numpy(),
+        "win_start": start_dt.dt.tz_localize(None).to_numpy("datetime64[ns]").view("int64") - lag_max,
+        "win_end": end_dt.dt.tz_localize(None).to_numpy("datetime64[ns]").view("int64") - lag_min,
+    })[start_dt.notna().to_numpy() & drip_sample["drip_entity_id"].notna().to_numpy()]
+
+    links = (
+        drip_entity[["drip_entity_id", "site_id"]].dropna().drop_duplicates()
+        .merge(site_link_precip[["site_id", "precip_entity_id"]].dropna().drop_duplicates(), on="site_id")
+    )
+    return d.merge(links, on="drip_entity_id", how="inner")
+
+
+def _precip_intervals(precip_sample):
+    start_dt, end_dt = sample_start_end(precip_sample, "precip_sample")
+    ok = start_dt.notna().to_numpy() & precip_sample["precip_entity_id"].notna().to_numpy()
+    pos = np.flatnonzero(ok)
+    return (
+        pos,
+        precip_sample["precip_entity_id"].to_numpy(dtype="int64", na_value=-1)[pos],
+        start_dt.dt.tz_localize(None).to_numpy("datetime64[ns]").view("int64")[pos],
+        end_dt.dt.tz_localize(None).to_numpy("datetime64[ns]").view("int64")[pos],
+    )
+
+
+def drip_precip_pairs(drip_sample, precip_sample, drip_entity, site_link_precip,
+                      lag=None, table="drip_iso_sample") -> pd.DataFrame:
+    """
+    Matching (drip sample, precip sample) pairs.
+    - lag: None (plain overlap), a fixed shift, or (lag_min, lag_max)
+    - table: the drip sample table (drip_iso_sample / drip_rate_sample / mod_carb_sample)
+    Rows: drip_row, precip_row (positions in the input frames), site_id,
+    drip_entity_id, precip_entity_id, overlap_days, precip_fraction
+    (share of the precip interval inside the drip window; 1 for point samples).
+    """
+    win = _drip_windows(drip_sample, table, drip_entity, site_link_precip, lag)
+    p_pos, p_ent, p_start, p_end = _precip_intervals(precip_sample)
+    w_start, w_end = win["win_start"].to_numpy(), win["win_end"].to_numpy()
+
+    li, ri = overlap_join(win["precip_entity_id"].to_numpy(dtype="int64"), w_start, w_end,
+                          p_ent, p_start, p_end)
+    overlap = np.minimum(p_end[ri], w_end[li]) - np.maximum(p_start[ri], w_start[li])
+    duration = p_end[ri] - p_start[ri]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        fraction = np.where(duration > 0, overlap / duration, 1.0)
+
+    return pd.DataFrame({
+        "drip_row": win["drip_row"].to_numpy()[li],
+        "precip_row": p_pos[ri],
+        "site_id": win["site_id"].to_numpy()[li],
+        "drip_entity_id": win["drip_entity_id"].to_numpy()[li],
+        "precip_entity_id": p_ent[ri],
+        "overlap_days": overlap / NS_PER_DAY,
+        "precip_fraction": fraction,
+    })
+
+
+def drip_precip_means(drip_sample, precip_sample, drip_entity, site_link_precip,
+                      lag=None, table="drip_iso_sample") -> pd.DataFrame:
+    """
+    Per drip sample and linked precip entity: the precipitation that fed it.
+    - precip_amount: amount falling in the window (time-proportional share)
+    - precip_d18O / precip_d2H: amount-weighted means (weights = allocated amount)
+    - n_precip_samples
+    """
+    pairs = drip_precip_pairs(drip_sample, precip_sample, drip_entity, site_link_precip, lag, table)
+    rows = pairs["precip_row"].to_numpy()
+
+    def _col(name):
+        return pd.to_numeric(precip_sample[name], errors="coerce").to_numpy("float64", na_value=np.nan)[rows]
+
+    amount = _col("precip_amount") * pairs["precip_fraction"].to_numpy()
+    frame = {"n_precip_samples": np.ones(len(pairs)), "precip_amount": np.nan_to_num(amount)}
+    for iso, col in (("precip_d18O", "precip_d18O_measurement"), ("precip_d2H", "precip_d2H_measurement")):
+        v = _col(col)
+        ok = ~np.isnan(v) & ~np.isnan(amount)
+        frame[f"{iso}__num"] = np.where(ok, v * amount, 0.0)
+        frame[f"{iso}__den"] = np.where(ok, amount, 0.0)
+
+    keys = ["drip_row", "site_id", "drip_entity_id", "precip_entity_id"]
+    agg = pd.DataFrame(frame).set_index(pd.MultiIndex.from_frame(pairs[keys])).groupby(level=keys).sum()
+    out = agg.index.to_frame(index=False)
+    out["n_precip_samples"] = agg["n_precip_samples"].to_numpy(dtype="int64")
+    out["precip_amount"] = agg["precip_amount"].to_numpy()
+    for iso in ("precip_d18O", "precip_d2H"):
+        num, den = agg[f"{iso}__num"].to_numpy(), agg[f"{iso}__den"].to_numpy()
+        with np.errstate(invalid="ignore", divide="ignore"):
+            out[iso] = np.where(den > 0, num / den, np.nan)
+    out["precip_d_excess"] = out["precip_d2H"] - 8 * out["precip_d18O"]
+    return out
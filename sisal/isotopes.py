@@ -0,0 +1,114 @@
+"""
+Water-isotope lines (d2H on d18O) for every entity at once.
+
+All fits come from grouped sufficient statistics (np.bincount over the entity
+codes): group means in one pass, centred sums of squares / cross-products in a
+second pass, so no Python loop per entity. Methods:
+
+- ols:  ordinary least squares (slope = Sxy / Sxx), with the slope's standard error
+- rma:  reduced major axis (slope = sign(Sxy) * sqrt(Syy / Sxx))
+- pwls: precipitation-amount-weighted least squares (weights = precip_amount)
+
+    lmwl(precip_sample)              # local meteoric water line per precip entity
+    drip_water_line(drip_iso_sample) # drip water line per drip entity
+"""
+
+import numpy as np
+import pandas as pd
+
+METHODS = ("ols", "rma", "pwls")
+
+
+def _moments(codes, x, y, w, n_groups):
+    """Weighted n, means and centred sums per group."""
+    sw = np.bincount(codes, weights=w, minlength=n_groups)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mx = np.bincount(codes, weights=w * x, minlength=n_groups) / sw
+        my = np.bincount(codes, weights=w * y, minlength=n_groups) / sw
+    dx, dy = x - mx[codes], y - my[codes]
+    sxx = np.bincount(codes, weights=w * dx * dx, minlength=n_groups)
+    syy = np.bincount(codes, weights=w * dy * dy, minlength=n_groups)
+    sxy = np.bincount(codes, weights=w * dx * dy, minlength=n_groups)
+    return sw, mx, my, sxx, syy, sxy
+
+
+def fit_lines(group, x, y, weight=None, method="ols", min_n=3) -> pd.DataFrame:
+    """
+    Regression of y on x per group.
+    - group: group labels (e.g. entity ids); rows with a missing group/x/y
+      (or a missing / non-positive weight) are skipped
+    - weight: per-row weights (required for pwls, ignored otherwise)
+    Returns one row per group: n, slope, intercept, r2 (+ slope_se for ols);
+    NaN for groups with fewer than min_n points or no spread in x.
+    """
+    if method not in METHODS:
+        raise ValueError(f"method must be one of {', '.join(METHODS)}, not {method!r}")
+    if method == "pwls" and weight is None:
+        raise ValueError("pwls needs weights (e.g. precip_amount)")
+
+    group = pd.Series(group).reset_index(drop=True)
+    x = pd.to_numeric(pd.Series(x).reset_index(drop=True), errors="coerce").to_numpy("float64", na_value=np.nan)
+    y = pd.to_numeric(pd.Series(y).reset_index(drop=True), errors="coerce").to_numpy("float64", na_value=np.nan)
+    ok = group.notna().to_numpy() & ~np.isnan(x) & ~np.isnan(y)
+    if method == "pwls":
+        w = pd.to_numeric(pd.Series(weight).reset_index(drop=True), errors="coerce") \
+            .to_numpy("float64", na_value=np.nan)
+        ok &= ~np.isnan(w) & (w > 0)
+    else:
+        w = np.ones(len(x))
+
+    codes, labels = pd.factorize(group[ok], sort=True)
+    x, y, w = x[ok], y[ok], w[ok]
+    g = len(labels)
+
+    n = np.bincount(codes, minlength=g)
+    sw, mx, my, sxx, syy, sxy = _moments(codes, x, y, w, g)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        if method == "rma":
+            slope = np.sign(sxy) * np.sqrt(syy / sxx)
+        else:
+            slope = sxy / sxx
+        intercept = my - slope * mx
+        r2 = sxy * sxy / (sxx * syy)
+
+    valid = (n >= min_n) & (sxx > 0)
+    out = pd.DataFrame({
+        "n": n,
+        "slope": np.where(valid, slope, np.nan),
+        "intercept": np.where(valid, intercept, np.nan),
+        "r2": np.where(valid, r2, np.nan),
+    }, index=pd.Index(labels, name=group.name))
+    if method == "ols":
+        with np.errstate(invalid="ignore", divide="ignore"):
+            resid = np.maximum(syy - slope * sxy, 0.0) / (n - 2)
+            out["slope_se"] = np.where(valid & (n > 2), np.sqrt(resid / sxx), np.nan)
+    return out
+
+
+def fit_all(df, key, x, y, weight=None, methods=None, min_n=3) -> pd.DataFrame:
+    """
+    Several methods side by side: one row per `key`, columns <method>_n,
+    <method>_slope, <method>_intercept, <method>_r2 (, ols_slope_se).
+    pwls is only fitted if `weight` is given.
+    """
+    if methods is None:
+        methods = [m for m in METHODS if m != "pwls" or weight is not None]
+    parts = [
+        fit_lines(df[key], df[x], df[y], df[weight] if weight is not None else None,
+                  method=m, min_n=min_n).add_prefix(f"{m}_")
+        for m in methods
+    ]
+    return pd.concat(parts, axis=1).rename_axis(key).reset_index()
+
+
+def lmwl(precip_sample, methods=None, min_n=3) -> pd.DataFrame:
+    """Local meteoric water line per precip_entity_id (ols, rma, pwls)."""
+    return fit_all(precip_sample, "precip_entity_id", "precip_d18O_measurement",
+                   "precip_d2H_measurement", weight="precip_amount", methods=methods, min_n=min_n)
+
+
+def drip_water_line(drip_iso_sample, methods=("ols", "rma"), min_n=3) -> pd.DataFrame:
+    """Drip water line per drip_entity_id (ols, rma)."""
+    return fit_all(drip_iso_sample, "drip_entity_id", "drip_iso_d18O_measurement",
+                   "drip_iso_d2H_measurement", methods=methods, min_n=min_n)
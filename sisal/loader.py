@@ -0,0 +1,315 @@
+"""
+Typed, parallel CSV loader for the SISAL_monv1 flat tables.
+
+- Each table is parsed with the dtypes declared in `sisal.schema`
+- Text is normalized while loading (trimmed, empty -> NA), low-cardinality
+  columns are categoricals; the cache stores the normalized table
+- Tables are read concurrently in a thread pool
+- Optional columnar cache (Arrow IPC, uncompressed so it can be memory-mapped):
+  the first load parses the CSV and writes <cache_dir>/<table>.arrow, later
+  loads map the cached file as long as the CSV is unchanged. default_cache_dir()
+  keeps it in the user cache directory, not in the (often synced or read-only)
+  release folder; a cache that cannot be written is skipped with a warning.
+"""
+
+import glob
+import hashlib
+import json
+import os
+import sys
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from . import instrument
+from .schema import ID, NUM, TEXT, table_dtypes
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+except ImportError:  # cache is optional
+    pa = None
+
+CACHE_VERSION = 2
+CACHE_KEY_FIELD = b"sisal_cache_key"
+CACHE_DIR_ENV = "SISAL_CACHE_DIR"
+
+
+def user_cache_root() -> str:
+    """$SISAL_CACHE_DIR, else the platform's per-user cache directory + /sisal."""
+    if os.environ.get(CACHE_DIR_ENV):
+        return os.environ[CACHE_DIR_ENV]
+    if os.name == "nt":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser(r"~\AppData\Local")
+        return os.path.join(base, "sisal", "Cache")
+    if sys.platform == "darwin":
+        return os.path.expanduser("~/Library/Caches/sisal")
+    return os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "sisal")
+
+
+def default_cache_dir(folder_path) -> str:
+    """Cache directory of one data folder: <user cache>/<folder name>-<hash of its absolute path>."""
+    folder = os.path.abspath(folder_path)
+    tag = hashlib.blake2b(os.path.normcase(folder).encode(), digest_size=6).hexdigest()
+    return os.path.join(user_cache_root(), f"{os.path.basename(folder.rstrip(os.sep)) or 'data'}-{tag}")
+
+
+# ========================================================
+# Cache keys
+# ========================================================
+
+def file_hash(path, chunk_size=1 << 20) -> str:
+    """blake2b digest of the file content."""
+    h = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(chunk_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def cache_key(path, use_hash=False) -> dict:
+    """
+    Fingerprint of a CSV file.
+    - size + mtime by default (cheap: one stat call)
+    - use_hash=True adds the content hash, so touching a file without
+      changing it does not invalidate the cache
+    """
+    st = os.stat(path)
+    key = {"version": CACHE_VERSION, "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+    if use_hash:
+        key["hash"] = file_hash(path)
+    return key
+
+
+def _key_matches(stored, current) -> bool:
+    if stored.get("version") != current["version"] or stored.get("size") != current["size"]:
+        return False
+    if "hash" in current:
+        return stored.get("hash") == current["hash"]
+    return stored.get("mtime_ns") == current["mtime_ns"]
+
+
+def _cache_path(cache_dir, name):
+    return os.path.join(cache_dir, f"{name}.arrow")
+
+
+def read_cached(cache_dir, name, key, usecols=None, match=None):
+    """
+    Memory-map <cache_dir>/<name>.arrow; return None if missing or stale.
+    With usecols only those columns are materialized.
+    match(stored_key, key) decides freshness (default: the CSV fingerprint test).
+    """
+    if pa is None:
+        return None
+    path = _cache_path(cache_dir, name)
+    if not os.path.exists(path):
+        return None
+    try:
+        with pa.memory_map(path, "r") as source:
+            reader = pa.ipc.open_file(source)
+            meta = reader.schema.metadata or {}
+            stored = json.loads(meta.get(CACHE_KEY_FIELD, b"{}"))
+            if not (match or _key_matches)(stored, key):
+                return None
+            table = reader.read_all()
+            if usecols is not None:
+                table = table.select(list(usecols))
+            return table.to_pandas()
+    except (OSError, KeyError, pa.ArrowInvalid, ValueError):
+        return None
+
+
+def cached_key(cache_dir, name):
+    """The key stored with <cache_dir>/<name>.arrow (schema only, no data read); None if absent."""
+    if pa is None:
+        return None
+    path = _cache_path(cache_dir, name)
+    if not os.path.exists(path):
+        return None
+    try:
+        with pa.memory_map(path, "r") as source:
+            meta = pa.ipc.open_file(source).schema.metadata or {}
+        return json.loads(meta.get(CACHE_KEY_FIELD, b"{}"))
+    except (OSError, pa.ArrowInvalid, ValueError):
+        return None
+
+
+def write_cached(cache_dir, name, key, df) -> bool:
+    """
+    Write df as an uncompressed Arrow IPC file tagged with the cache key.
+    Returns False (with a warning) when the cache directory is not writable.
+    """
+    if pa is None:
+        return False
+    try:
+        _write_cached(cache_dir, name, key, df)
+    except OSError as err:
+        warnings.warn(f"Arrow cache not written ({err}); {name} is not cached")
+        return False
+    return True
+
+
+def _write_cached(cache_dir, name, key, df):
+    os.makedirs(cache_dir, exist_ok=True)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    meta = dict(table.schema.metadata or {})
+    meta[CACHE_KEY_FIELD] = json.dumps(key).encode()
+    table = table.replace_schema_metadata(meta)
+
+    # write to a temp file + rename, so concurrent jobs never see a partial file
+    path = _cache_path(cache_dir, name)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with pa.OSFile(tmp, "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+# ========================================================
+# CSV parsing
+# ========================================================
+
+def table_name(path) -> str:
+    """Table name = file name without .csv"""
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def _strip_categories(s) -> pd.Series:
+    """Trim a categorical by trimming its categories (no pass over the rows)."""
+    cats = s.cat.categories
+    if not pd.api.types.is_string_dtype(cats.dtype):
+        return s
+    new = cats.str.strip()
+    if new.equals(cats) and not (new == "").any():
+        return s
+    new = new.where(new != "", None)
+    if new.notna().all() and new.is_unique:
+        # keep the categories sorted (read_csv sorts them; sort order of the column)
+        return s.cat.rename_categories(new).cat.reorder_categories(new.sort_values())
+    # trimming merged categories (or emptied one): recode through the small category map
+    codes = s.cat.codes.to_numpy()
+    uniq = pd.Index(new.dropna().unique()).sort_values()
+    remap = uniq.get_indexer(new)                  # old code -> new code (-1 = NA)
+    new_codes = np.where(codes >= 0, remap[np.maximum(codes, 0)], -1)
+    return pd.Series(pd.Categorical.from_codes(new_codes, categories=uniq), index=s.index, name=s.name)
+
+
+def normalize_strings(df, columns=None) -> pd.DataFrame:
+    """
+    In place: trim whitespace and turn empty strings into NA in the text /
+    category columns (default: every string-like column). Categoricals only
+    touch their categories.
+    """
+    if columns is None:
+        columns = [c for c in df.columns
+                   if isinstance(df[c].dtype, pd.CategoricalDtype) or pd.api.types.is_string_dtype(df[c].dtype)]
+    for c in columns:
+        if c not in df.columns:
+            continue
+        s = df[c]
+        if isinstance(s.dtype, pd.CategoricalDtype):
+            df[c] = _strip_categories(s)
+        elif pd.api.types.is_string_dtype(s.dtype):
+            s = s.str.strip()
+            df[c] = s.mask(s == "")
+    return df
+
+
+def _coerce_numeric(df, dtypes, name) -> pd.DataFrame:
+    """
+    In place: convert the declared numeric columns (read as text) one by one;
+    values that are not numbers (or not whole numbers in an id column) become
+    NA, with one warning naming the affected columns.
+    """
+    failed = []
+    for c, t in dtypes.items():
+        s = df[c]
+        num = pd.to_numeric(s, errors="coerce")
+        if t == ID:
+            num = num.where(num == np.floor(num))
+        n_bad = int((num.isna() & s.notna()).sum())
+        if n_bad:
+            failed.append(f"{c} ({n_bad:,} values)")
+        df[c] = num.astype(t)
+    if failed:
+        warnings.warn(f"{name}: not numeric, read as missing: {', '.join(failed)}")
+    return df
+
+
+def read_csv_typed(path, name=None, usecols=None) -> pd.DataFrame:
+    """
+    Parse one CSV with its declared dtypes, then normalize the text columns.
+    A numeric column with values that do not parse is converted on its own
+    (bad values -> NA, with a warning); every other column keeps its type.
+    """
+    name = name or table_name(path)
+    dtypes = table_dtypes(name)
+    if usecols is not None:
+        usecols = list(usecols)
+        dtypes = {c: t for c, t in dtypes.items() if c in usecols}
+    try:
+        df = pd.read_csv(path, dtype=dtypes or None, usecols=usecols, low_memory=False)
+    except (ValueError, TypeError):
+        numeric = {c: t for c, t in dtypes.items() if t in (ID, NUM)}
+        df = pd.read_csv(path, dtype={**dtypes, **dict.fromkeys(numeric, TEXT)}, usecols=usecols,
+                         low_memory=False)
+        _coerce_numeric(df, {c: t for c, t in numeric.items() if c in df.columns}, name)
+    return normalize_strings(df)
+
+
+def read_table(path, cache_dir=None, use_hash=False, usecols=None) -> pd.DataFrame:
+    """
+    Read one table, via the Arrow cache when it is valid.
+    - usecols: only parse/materialize these columns. A projected read never
+      writes the cache (it would hold an incomplete table).
+    """
+    name = table_name(path)
+    with instrument.stage(f"load:{name}") as st:
+        if cache_dir is None or pa is None:
+            df = read_csv_typed(path, name, usecols=usecols)
+            cached = False
+        else:
+            key = cache_key(path, use_hash=use_hash)
+            df = read_cached(cache_dir, name, key, usecols=usecols)
+            cached = df is not None
+            if df is None:
+                df = read_csv_typed(path, name, usecols=usecols)
+                if usecols is None:
+                    write_cached(cache_dir, name, key, df)
+        st.rows_out = len(df)
+        st.set(cached=cached)
+    return df
+
+
+def find_csv_files(folder_path):
+    csv_files = sorted(glob.glob(os.path.join(folder_path, "*.csv")))
+    if len(csv_files) == 0:
+        raise FileNotFoundError("No .csv files found in folder_path. Check the path and contents.")
+    return csv_files
+
+
+def load_tables(folder_path, names=None, cache_dir=None, use_hash=False,
+                max_workers=None, verbose=True) -> dict:
+    """
+    Read all (or only `names`) CSV tables of a folder into a dict {name: DataFrame}.
+    - cache_dir: where to keep the Arrow cache (None = no cache)
+    - max_workers: thread pool size (None = let the executor decide)
+    """
+    csv_files = find_csv_files(folder_path)
+    if names is not None:
+        wanted = set(names)
+        csv_files = [f for f in csv_files if table_name(f) in wanted]
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {}
+        for file in csv_files:
+            if verbose:
+                print(f"Reading: {table_name(file)}")
+            futures[table_name(file)] = pool.submit(read_table, file, cache_dir, use_hash)
+        return {name: fut.result() for name, fut in futures.items()}
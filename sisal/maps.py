@@ -0,0 +1,141 @@
+"""
+Site maps: every site with drip iso / drip rate / mod carb / precip data,
+globally and zoomed on three regions (section 8.1 of the cookbook).
+
+- Drip Iso: hollow BLUE triangle
+- Drip Rate: hollow ORANGE square
+- Mod Carb: smaller FILLED red dot
+- Precip: BLACK cross
+
+    layers = site_layers(mat["sites_drip_iso_map"], mat["sites_drip_rate_map"],
+                         mat["sites_mod_carb_map"], mat["site_precip_map"])
+    figs = plot_maps(layers)                 # {region: Figure}
+    save_maps(figs, "maps", fmt="png")
+
+matplotlib is imported on first plot (pip install matplotlib).
+"""
+
+import os
+
+import pandas as pd
+
+TYPE_COLORS = {
+    "Drip Iso":  "blue",
+    "Drip Rate": "orange",
+    "Mod Carb":  "red",
+    "Precip":    "black",
+}
+# Matplotlib marker codes:
+# triangle up: '^', square: 's', filled circle: 'o', cross: 'x'
+TYPE_MARKERS = {
+    "Drip Iso":  "^",
+    "Drip Rate": "s",
+    "Mod Carb":  "o",
+    "Precip":    "x",
+}
+
+MARKER_LW = 0.5
+SIZE_DEFAULT = 22   # points^2 (scatter uses area)
+SIZE_MODCARB = 16
+
+# region -> (xlim, ylim, title)
+REGIONS = {
+    "global": ((-180, 180), (-60, 85),
+               "Site locations with different data types (flat CSV)\n"
+               "Hollow: Drip Iso / Drip Rate; Filled: Mod Carb; Cross: Precip"),
+    "north_america": ((-140, -50), (0, 60), "North America"),
+    "europe": ((-10, 30), (30, 70), "Europe"),
+    "east_asia": ((95, 130), (15, 45), "East Asia"),
+}
+
+
+def site_layers(sites_drip_iso_map, sites_drip_rate_map, sites_mod_carb_map, site_precip_map) -> pd.DataFrame:
+    """The map tables stacked with a data_type column (deduplicated within each layer)."""
+    return pd.concat([
+        sites_drip_iso_map.drop_duplicates("site_id").assign(data_type="Drip Iso"),
+        sites_drip_rate_map.drop_duplicates("site_id").assign(data_type="Drip Rate"),
+        sites_mod_carb_map.drop_duplicates("site_id").assign(data_type="Mod Carb"),
+        site_precip_map.drop_duplicates("site_id").assign(data_type="Precip"),
+    ], ignore_index=True)
+
+
+def plot_world_sites(layers, xlim=(-180, 180), ylim=(-60, 85), title=""):
+    """One map of the site_layers() table; returns (fig, ax)."""
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(12, 6))
+
+    # no basemap; just plot points
+    ax.set_xlim(xlim)
+    ax.set_ylim(ylim)
+
+    # Hollow layers
+    for dtype in ["Drip Iso", "Drip Rate"]:
+        df = layers[layers["data_type"].eq(dtype)]
+        ax.scatter(
+            df["longitude"], df["latitude"],
+            s=SIZE_DEFAULT,
+            marker=TYPE_MARKERS[dtype],
+            facecolors="none",                # hollow
+            edgecolors=TYPE_COLORS[dtype],
+            linewidths=MARKER_LW,
+            label=dtype,
+            alpha=0.9
+        )
+
+    # Mod Carb: filled smaller dot
+    df = layers[layers["data_type"].eq("Mod Carb")]
+    ax.scatter(
+        df["longitude"], df["latitude"],
+        s=SIZE_MODCARB,
+        marker=TYPE_MARKERS["Mod Carb"],
+        c=TYPE_COLORS["Mod Carb"],
+        edgecolors=TYPE_COLORS["Mod Carb"],
+        linewidths=0,
+        label="Mod Carb",
+        alpha=0.9
+    )
+
+    # Precip: black cross
+    df = layers[layers["data_type"].eq("Precip")]
+    ax.scatter(
+        df["longitude"], df["latitude"],
+        s=SIZE_DEFAULT,
+        marker=TYPE_MARKERS["Precip"],
+        c=TYPE_COLORS["Precip"],
+        linewidths=MARKER_LW,
+        label="Precip",
+        alpha=0.9
+    )
+
+    ax.set_title(title)
+    ax.set_xlabel("Longitude [deg]")
+    ax.set_ylabel("Latitude [deg]")
+    ax.grid(True, alpha=0.2)
+    ax.legend(loc="best", frameon=True)
+    return fig, ax
+
+
+def plot_maps(layers, regions=None) -> dict:
+    """{region: Figure} for `regions` (default: all of REGIONS)."""
+    figs = {}
+    for region in (regions or REGIONS):
+        if region not in REGIONS:
+            raise KeyError(f"Unknown region: {region} (expected one of {', '.join(REGIONS)})")
+        xlim, ylim, title = REGIONS[region]
+        figs[region], _ = plot_world_sites(layers, xlim=xlim, ylim=ylim, title=title)
+    return figs
+
+
+def save_maps(figs, out_dir, fmt="png", dpi=150) -> list:
+    """Write every figure to <out_dir>/sites_<region>.<fmt> and close it; returns the paths."""
+    import matplotlib.pyplot as plt
+
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    for region, fig in figs.items():
+        path = os.path.join(out_dir, f"sites_{region}.{fmt}")
+        fig.savefig(path, dpi=dpi, bbox_inches="tight")
+        plt.close(fig)
+        paths.append(path)
+    return paths
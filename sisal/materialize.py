@@ -0,0 +1,333 @@
+"""
+Materialized derived tables with dependency-based invalidation.
+
+A derived table is a function whose parameter names are its inputs: source
+tables of the SisalDB (site, drip_iso_sample, ...) or other derived tables.
+
+    @derived()
+    def site_summary(site, cave_entity, drip_entity, site_link_precip):
+        ...
+
+    mat = Materializer(db)                 # cache: <db.cache_dir>/derived
+    mat["site_summary"]                    # computed once, then read from the cache
+    mat.status()                           # which tables are fresh / stale
+
+Every result is stored as an Arrow file tagged with a key: the content hashes
+of the source CSVs it reads (directly or through other derived tables), the
+keys of its derived inputs and a hash of the code: the function plus the
+source of its module and of every sisal module that imports (transitively),
+so an edit of a helper (sisal/coverage.py, sisal/resample.py, ...) also
+invalidates the tables. A table is only recomputed (and its sources only
+loaded) when that key changes, i.e. after a data release or a code edit.
+`version` is still part of the key, for changes outside the sisal sources. Content hashes are remembered per
+(size, mtime) in <cache>/source_hashes.json, so unchanged CSVs are not re-read.
+
+Parameters with a default (e.g. `cave_pCO2_sample=None`) are optional sources:
+the default is passed when the table is not in the folder.
+"""
+
+import functools
+import hashlib
+import inspect
+import json
+import os
+import re
+import warnings
+
+import pandas as pd
+
+from . import instrument
+from .loader import CACHE_VERSION, cached_key, file_hash, read_cached, write_cached
+
+# name -> DerivedTable (the tables defined in sisal/derived.py register here)
+DERIVED = {}
+
+HASHES_FILE = "source_hashes.json"
+
+_PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+_RELATIVE_IMPORT = re.compile(r"^\s*from \.(\w*) import ([\w, ()]+)", re.MULTILINE)
+
+
+def _module_source(module) -> str:
+    path = os.path.join(_PACKAGE_DIR, module.replace(".", os.sep) + ".py")
+    try:
+        with open(path, encoding="utf-8") as fh:
+            return fh.read()
+    except OSError:
+        return ""
+
+
+@functools.lru_cache(maxsize=None)
+def module_closure(module) -> tuple:
+    """The sisal modules (names relative to the package) `module` imports, transitively, itself included."""
+    seen, todo = set(), [module]
+    while todo:
+        mod = todo.pop()
+        if mod in seen:
+            continue
+        seen.add(mod)
+        for target, names in _RELATIVE_IMPORT.findall(_module_source(mod)):
+            if target:                                   # from .coverage import CoverageIndex
+                todo.append(target)
+            else:                                        # from . import instrument
+                todo += [n.strip() for n in names.strip("()").split(",") if n.strip()]
+    return tuple(sorted(m for m in seen if os.path.exists(os.path.join(_PACKAGE_DIR, m + ".py"))))
+
+
+@functools.lru_cache(maxsize=None)
+def _closure_hash(module) -> str:
+    h = hashlib.blake2b(digest_size=10)
+    for mod in module_closure(module):
+        h.update(f"{mod}\0{_module_source(mod)}\0".encode())
+    return h.hexdigest()
+
+
+class DerivedTable:
+    """One definition: name, function, its parameters (input name -> optional?)."""
+
+    def __init__(self, name, fn, version=1):
+        self.name = name
+        self.fn = fn
+        self.version = version
+        self.params = {
+            p.name: p.default is not inspect.Parameter.empty
+            for p in inspect.signature(fn).parameters.values()
+        }
+
+    @functools.cached_property
+    def code_hash(self) -> str:
+        """Hash of the function and of the sisal modules it can reach (see module_closure)."""
+        try:
+            code = inspect.getsource(self.fn)
+        except (OSError, TypeError):
+            code = self.fn.__code__.co_code.hex()
+        module = self.fn.__module__ or ""
+        if module.startswith(__package__ + "."):
+            code += _closure_hash(module[len(__package__) + 1:])
+        return hashlib.blake2b(code.encode(), digest_size=10).hexdigest()
+
+    def __repr__(self):
+        return f"DerivedTable({self.name!r}, inputs={list(self.params)})"
+
+
+def derived(name=None, registry=None, version=1):
+    """Decorator registering a derived table (default name: the function name)."""
+    def deco(fn):
+        table = DerivedTable(name or fn.__name__, fn, version=version)
+        (DERIVED if registry is None else registry)[table.name] = table
+        return fn
+    return deco
+
+
+def _digest(obj) -> str:
+    return hashlib.blake2b(json.dumps(obj, sort_keys=True).encode(), digest_size=20).hexdigest()
+
+
+def _digest_matches(stored, current) -> bool:
+    return stored.get("digest") == current["digest"]
+
+
+class Materializer:
+    """
+    Derived tables of one SisalDB, cached on disk.
+    - cache_dir: where the results go (default <db.cache_dir>/derived;
+      None and no db.cache_dir = in-memory only)
+    - registry: {name: DerivedTable} (default: DERIVED, i.e. sisal/derived.py)
+    """
+
+    def __init__(self, db, cache_dir=None, registry=None, verbose=False):
+        if registry is None:
+            from . import derived as _definitions  # noqa: F401  (fills DERIVED)
+            registry = DERIVED
+        self.db = db
+        self.registry = registry
+        if cache_dir is None and db.cache_dir is not None:
+            cache_dir = os.path.join(db.cache_dir, "derived")
+        self.cache_dir = cache_dir
+        self.verbose = verbose
+        self._frames = {}
+        self._keys = {}
+        self._visiting = set()
+        self._source_hashes = None
+
+    # -------------------------
+    # dependency graph
+    # -------------------------
+
+    def _definition(self, name):
+        if name not in self.registry:
+            raise KeyError(f"Unknown derived table: {name}")
+        return self.registry[name]
+
+    def inputs(self, name) -> dict:
+        """{input: "derived" | "source" | "missing"} of one derived table."""
+        out = {}
+        for param, optional in self._definition(name).params.items():
+            if param in self.registry:
+                out[param] = "derived"
+            elif param in self.db:
+                out[param] = "source"
+            elif optional:
+                out[param] = "missing"
+            else:
+                raise KeyError(f"{name}: input {param!r} is neither a table in "
+                               f"{self.db.folder_path} nor a derived table")
+        return out
+
+    def sources(self, name) -> list:
+        """All source tables `name` depends on (through derived inputs too)."""
+        found, stack, seen = set(), [name], set()
+        while stack:
+            current = stack.pop()
+            if current in seen:
+                continue
+            seen.add(current)
+            for param, kind in self.inputs(current).items():
+                if kind == "source":
+                    found.add(param)
+                elif kind == "derived":
+                    stack.append(param)
+        return sorted(found)
+
+    # -------------------------
+    # keys
+    # -------------------------
+
+    def _hashes_path(self):
+        return os.path.join(self.cache_dir, HASHES_FILE) if self.cache_dir else None
+
+    def source_hash(self, table) -> str:
+        """Content hash of a source CSV (re-hashed only when its size / mtime change)."""
+        if self._source_hashes is None:
+            self._source_hashes = {}
+            path = self._hashes_path()
+            if path and os.path.exists(path):
+                try:
+                    with open(path, encoding="utf-8") as fh:
+                        self._source_hashes = json.load(fh)
+                except (OSError, ValueError):
+                    pass
+        csv = self.db.path(table)
+        st = os.stat(csv)
+        entry = self._source_hashes.get(table)
+        if entry and entry["size"] == st.st_size and entry["mtime_ns"] == st.st_mtime_ns:
+            return entry["hash"]
+        digest = file_hash(csv)
+        self._source_hashes[table] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "hash": digest}
+        path = self._hashes_path()
+        if path:
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                tmp = f"{path}.{os.getpid()}.tmp"
+                with open(tmp, "w", encoding="utf-8") as fh:
+                    json.dump(self._source_hashes, fh, indent=1, sort_keys=True)
+                os.replace(tmp, path)
+            except OSError:                     # read-only cache: hash again next time
+                pass
+        return digest
+
+    def key(self, name) -> dict:
+        """Cache key: code hash + source content hashes + keys of the derived inputs."""
+        if name not in self._keys:
+            if name in self._visiting:
+                raise ValueError(f"Dependency cycle through derived table {name!r}")
+            self._visiting.add(name)
+            table = self._definition(name)
+            inputs = {}
+            for param, kind in self.inputs(name).items():
+                if kind == "source":
+                    inputs[param] = self.source_hash(param)
+                elif kind == "derived":
+                    inputs[param] = self.key(param)["digest"]
+                else:
+                    inputs[param] = None
+            parts = {"cache_version": CACHE_VERSION, "version": table.version,
+                     "code": table.code_hash, "inputs": inputs}
+            self._keys[name] = {"digest": _digest(parts), **parts}
+            self._visiting.discard(name)
+        return self._keys[name]
+
+    # -------------------------
+    # results
+    # -------------------------
+
+    def _read(self, name, key):
+        if self.cache_dir is None:
+            return None
+        return read_cached(self.cache_dir, name, key, match=_digest_matches)
+
+    def _compute(self, name):
+        table = self._definition(name)
+        kwargs = {}
+        for param, kind in self.inputs(name).items():
+            if kind == "source":
+                kwargs[param] = self.db[param]
+            elif kind == "derived":
+                kwargs[param] = self.get(param)
+        if self.verbose:
+            print(f"Computing: {name}")
+        with instrument.stage(f"derive:{name}") as st:
+            df = st.rows_out = table.fn(**kwargs)
+        return df
+
+    def get(self, name) -> pd.DataFrame:
+        """The derived table `name`: from memory, the cache, or computed (and cached)."""
+        if name in self._frames:
+            return self._frames[name]
+        key = self.key(name)
+        df = self._read(name, key)
+        if df is None:
+            df = self._compute(name)
+            if self.cache_dir is not None:
+                try:
+                    write_cached(self.cache_dir, name, key, df)
+                except (TypeError, ValueError) as err:   # e.g. object columns Arrow cannot type
+                    warnings.warn(f"{name}: not cached ({err})")
+        self._frames[name] = df
+        return df
+
+    def __getitem__(self, name):
+        return self.get(name)
+
+    def __contains__(self, name):
+        return name in self.registry
+
+    def get_many(self, names=None) -> dict:
+        """{name: DataFrame} for `names` (default: all registered tables)."""
+        return {name: self.get(name) for name in (names or self.names)}
+
+    @property
+    def names(self):
+        return list(self.registry)
+
+    def is_fresh(self, name) -> bool:
+        """True if the cached result matches the current inputs (nothing to recompute)."""
+        if name in self._frames:
+            return True
+        if self.cache_dir is None:
+            return False
+        stored = cached_key(self.cache_dir, name)
+        return stored is not None and _digest_matches(stored, self.key(name))
+
+    def status(self) -> pd.DataFrame:
+        """One row per derived table: fresh?, its source tables and derived inputs."""
+        rows = []
+        for name in self.names:
+            inputs = self.inputs(name)
+            rows.append({
+                "table": name,
+                "fresh": self.is_fresh(name),
+                "sources": ", ".join(self.sources(name)),
+                "derived_inputs": ", ".join(p for p, k in inputs.items() if k == "derived"),
+            })
+        return pd.DataFrame(rows)
+
+    def invalidate(self, names=None):
+        """Forget (and delete the cached files of) `names` (default: all)."""
+        for name in (names or self.names):
+            self._frames.pop(name, None)
+            if self.cache_dir is not None:
+                path = os.path.join(self.cache_dir, f"{name}.arrow")
+                if os.path.exists(path):
+                    os.remove(path)
+        self._keys.clear()
@@ -0,0 +1,111 @@
+"""
+Dependency-aware runner for the derived tables (sections 5-14 of the cookbook).
+
+Every derived table of sisal/derived.py is a stage: its parameters are the
+inputs (source tables or other stages), its name is the output. A run only
+includes the stages the requested outputs need, and stages whose inputs are
+ready run concurrently in a thread pool:
+
+    mat = Materializer(db)
+    out = Pipeline(mat, max_workers=4).run(["full_year_both"])
+    # -> drip_iso_coverage and drip_rate_coverage in parallel, then full_year_both;
+    #    only site, drip_entity, drip_iso_sample and drip_rate_sample are loaded
+
+    Pipeline(mat).plan(["site_summary", "precip_monthly"])   # the stages, in waves
+
+All stages share the tables of one SisalDB (threads, no copies); the pandas /
+numpy / Arrow kernels release the GIL for most of the work. Results go
+through the Materializer, so stages that are fresh in its cache are only read.
+"""
+
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import pandas as pd
+
+from . import instrument
+
+
+class Pipeline:
+    """
+    Stages = the derived tables of a Materializer.
+    - max_workers: thread pool size (None = let the executor decide; 1 = in order)
+    """
+
+    def __init__(self, mat, max_workers=None):
+        self.mat = mat
+        self.max_workers = max_workers
+
+    @property
+    def outputs(self):
+        return self.mat.names
+
+    def stages(self, outputs=None) -> dict:
+        """{stage: derived inputs} of everything `outputs` (default: all) needs."""
+        needed, stack = {}, list(outputs or self.outputs)
+        while stack:
+            name = stack.pop()
+            if name in needed:
+                continue
+            deps = [p for p, kind in self.mat.inputs(name).items() if kind == "derived"]
+            needed[name] = deps
+            stack.extend(deps)
+        return needed
+
+    def plan(self, outputs=None) -> list:
+        """Stages grouped in waves: every stage only needs stages of earlier waves."""
+        pending = self.stages(outputs)
+        done, waves = set(), []
+        while pending:
+            wave = sorted(n for n, deps in pending.items() if done.issuperset(deps))
+            if not wave:
+                raise ValueError(f"Dependency cycle among derived tables: {', '.join(sorted(pending))}")
+            waves.append(wave)
+            done.update(wave)
+            for n in wave:
+                del pending[n]
+        return waves
+
+    def run(self, outputs=None) -> dict:
+        """
+        Compute `outputs` (default: all stages) and what they need;
+        returns {output: DataFrame} for the requested outputs.
+        """
+        outputs = list(outputs or self.outputs)
+        pending = self.stages(outputs)
+        self.plan(outputs)                       # fails early on cycles
+        # cache keys (and source hashes) once, before any thread starts
+        for name in pending:
+            self.mat.key(name)
+
+        with instrument.stage("pipeline", stages=len(pending), outputs=len(outputs)):
+            if self.max_workers == 1:
+                for wave in self.plan(outputs):
+                    for name in wave:
+                        self.mat.get(name)
+            else:
+                self._run_parallel(pending)
+        return {name: self.mat.get(name) for name in outputs}
+
+    def _run_parallel(self, pending):
+        pending = dict(pending)
+        done, running = set(), {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            while pending or running:
+                for name in sorted(pending):
+                    if done.issuperset(pending[name]):
+                        running[pool.submit(self.mat.get, name)] = name
+                        del pending[name]
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    fut.result()                 # re-raise a failed stage
+                    done.add(running.pop(fut))
+
+    def status(self, outputs=None) -> pd.DataFrame:
+        """The stages `outputs` needs: wave, derived inputs, fresh in the cache?"""
+        stages = self.stages(outputs)
+        rows = []
+        for i, wave in enumerate(self.plan(outputs)):
+            for name in wave:
+                rows.append({"stage": name, "wave": i, "inputs": ", ".join(sorted(stages[name])),
+                             "fresh": self.mat.is_fresh(name)})
+        return pd.DataFrame(rows)
@@ -0,0 +1,687 @@
+"""
+Input QC of the SISAL_monv1 tables: the checks of QC script_v5.3.R as
+declarative, vectorized rules.
+
+Every check is a Rule whose `mask(view)` is ONE boolean array over the rows of
+its table (True = violation), built from whole-column operations (to_numeric,
+str.fullmatch, isin, duplicated, groupby) instead of per-value helpers.
+run_qc() evaluates a rule list and returns a QCReport: a per-rule summary and
+one row per violating row.
+
+    report = run_qc(SisalDB(folder))          # the loaded (typed, trimmed) tables
+    report = run_qc(raw_tables(folder))       # the CSVs as text, before loading
+    print(report.failed().to_string(index=False))
+    report.violations.to_csv("qc_violations.csv", index=False)
+
+Rule ids follow the R script (T01 site ... T13 mod_carb_sample, T15 across
+tables); checks the R script does not have carry an `x` number (T05.x1:
+start <= end, T15.x1: primary keys), and one R check covering several columns
+gets a letter per column (T01.03a latitude, T01.03b longitude), so every rule
+id is unique. Differences from the workbook QC:
+- tables and columns are the flat-CSV ones (sisal.schema): the links are ids
+  instead of site / entity names, `geology` is `drip_entity_metadata_geology`, ...
+- a rule whose table or column is not there is reported as skipped
+- hhmm must be a real time (0000..2359, minutes < 60); the R range 0001..2359
+  also rejected midnight logger readings
+- the loader trims text and drops leading zeros of numbers, so the leading /
+  trailing space and digit-count checks only bite on raw_tables()
+"""
+
+import numpy as np
+import pandas as pd
+
+from . import instrument
+from .loader import find_csv_files, table_name
+from .schema import PRIMARY_KEYS
+
+YEAR_RANGE = (1800, 2024)
+MONTH_RANGE = (1, 12)
+DAY_RANGE = (1, 31)
+HHMM_RANGE = (0, 2359)
+
+# drop-down menus of the workbook (= the ENUMs of schema_SISAL_Monv1_v2.sql)
+PRECIP_METHODS = ["IAEA/GNIP", "other (see notes)", "unknown"]
+PRECIP_UNITS = ["days", "hours", "minutes", "unknown"]
+DRIP_UNITS = ["days", "hours", "minutes", "seconds", "unknown"]
+MOD_CARB_UNITS = ["years", "months", "days", "unknown"]
+YES_NO_UNKNOWN = ["yes", "no", "unknown"]
+FREQUENCIES = ["regular", "sporadic (see notes)", "other (see notes)", "unknown"]
+INSTRUMENTS = ["logger", "hand-held", "other (see notes)", "unknown"]
+GEOLOGIES = ["limestone", "dolomite", "marble", "dolomite limestone", "marly limestone",
+             "calcarenite", "mixed (see notes)", "other (see notes)", "unknown"]
+ROCK_AGES = ["Holocene", "Pleistocene", "Pliocene", "Miocene", "Oligocene", "Eocene",
+             "Palaeocene", "Cretaceous", "Jurassic", "Triassic", "Permian", "Carboniferous",
+             "Devonian", "Silurian", "Ordovician", "Cambrian", "Precambrian",
+             "mixed (see notes)", "other (see notes)", "unknown"]
+SURFACES = ["stalagmite", "stalagmite scar", "glass plate", "other (see notes)", "unknown"]
+MINERALOGIES = ["calcite", "aragonite", "mixed (see notes)", "other (see notes)", "unknown"]
+
+INVALID_CITATIONS = ["unknown", "N/A", "not known"]
+DOI_PATTERN = r"unpublished$|https?://|10"      # matched at the start
+
+SUMMARY_COLUMNS = ["rule", "table", "column", "severity", "message", "rows", "violations", "status"]
+VIOLATION_COLUMNS = ["rule", "table", "column", "severity", "row", "key", "value"]
+
+
+# -------------------------
+# column access
+# -------------------------
+
+def _is_text(s) -> bool:
+    return isinstance(s.dtype, pd.CategoricalDtype) or not pd.api.types.is_numeric_dtype(s.dtype)
+
+
+def _per_value(s):
+    """(codes, distinct values as str) of a text / categorical column; code -1 = missing."""
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        return s.cat.codes.to_numpy(), pd.Series(s.cat.categories.astype("str"))
+    codes, uniques = pd.factorize(s)
+    return codes, pd.Series(uniques).astype("str")
+
+
+def _text_mask(s, test) -> np.ndarray:
+    """
+    test(str Series without NA) -> bool array, spread back over `s` (False where
+    missing). Each distinct value is tested once (logger columns repeat a few
+    years / hhmm values over millions of rows).
+    """
+    codes, values = _per_value(s)
+    per_value = np.append(np.asarray(test(values), dtype=bool), False)
+    return per_value[codes]
+
+
+class TableView:
+    """
+    The tables a rule set runs on ({name: DataFrame}, a SisalDB, or raw_tables()),
+    with the per-column conversions (missing mask, to_numeric) computed once
+    and shared by every rule on that column.
+    """
+
+    def __init__(self, tables):
+        self.tables = tables
+        self._frames = {}
+        self._missing = {}
+        self._numeric = {}
+
+    def __contains__(self, name):
+        return name in self.tables
+
+    def frame(self, name) -> pd.DataFrame:
+        if name not in self._frames:
+            self._frames[name] = self.tables[name]
+        return self._frames[name]
+
+    def has(self, name, column) -> bool:
+        return name in self.tables and column in self.frame(name).columns
+
+    def missing(self, name, column) -> np.ndarray:
+        key = (name, column)
+        if key not in self._missing:
+            self._missing[key] = self.frame(name)[column].isna().to_numpy()
+        return self._missing[key]
+
+    def numeric(self, name, column) -> np.ndarray:
+        """float values, NaN where missing or not a number."""
+        key = (name, column)
+        if key not in self._numeric:
+            s = self.frame(name)[column]
+            if _is_text(s):
+                codes, values = _per_value(s)
+                values = pd.to_numeric(values.str.strip(), errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+                self._numeric[key] = np.append(values, np.nan)[codes]
+            else:
+                self._numeric[key] = s.to_numpy(dtype=float, na_value=np.nan)
+        return self._numeric[key]
+
+    def digits(self, name, column, lo, hi) -> np.ndarray:
+        """
+        True where the value is written with lo..hi digits only. Typed (numeric)
+        columns, and CSVs written from them ("930.0"), have lost their leading
+        zeros: there it means a non-negative whole number.
+        """
+        s = self.frame(name)[column]
+        if _is_text(s):
+            return _text_mask(s, lambda t: t.str.fullmatch(rf"\d{{{lo},{hi}}}|\d+\.0*"))
+        x = self.numeric(name, column)
+        return (x >= 0) & (x % 1 == 0)
+
+
+# -------------------------
+# rules
+# -------------------------
+
+class Rule:
+    """One check on `table`; mask(view) is True on the violating rows."""
+
+    table_level = False
+
+    def __init__(self, rule_id, table, columns, message, severity="error"):
+        self.rule_id = rule_id
+        self.table = table
+        self.columns = [columns] if isinstance(columns, str) else list(columns)
+        self.message = message
+        self.severity = severity
+
+    @property
+    def column(self) -> str:
+        return ", ".join(self.columns)
+
+    def missing_input(self, view):
+        """Why the rule cannot run on `view` (None if it can)."""
+        if self.table not in view:
+            return f"no table {self.table}"
+        absent = [c for c in self.columns if not view.has(self.table, c)]
+        if absent:
+            return f"no column {', '.join(absent)}"
+        return None
+
+    def mask(self, view) -> np.ndarray:
+        raise NotImplementedError
+
+    def describe(self, view, rows) -> np.ndarray:
+        """The offending values of `rows` as text (several columns joined by ' | ')."""
+        df = view.frame(self.table)
+        parts = [df[c].iloc[rows].astype("str").fillna("").to_numpy(dtype=object) for c in self.columns]
+        if len(parts) == 1:
+            return parts[0]
+        return np.array([" | ".join(vals) for vals in zip(*parts)], dtype=object)
+
+    def __repr__(self):
+        return f"<{type(self).__name__} {self.rule_id} {self.table}.{self.column}>"
+
+
+class Required(Rule):
+    """The value must be present."""
+
+    def __init__(self, rule_id, table, column, message=None, severity="error"):
+        super().__init__(rule_id, table, column, message or f"{column} is required", severity)
+
+    def mask(self, view):
+        return view.missing(self.table, self.columns[0])
+
+
+class Range(Rule):
+    """
+    Missing, or a number within [lo, hi]:
+    - whole: must be a whole number
+    - digits: (min, max) digit count (check_4digit / check_1or2digit of the R script)
+    - required: missing values are violations too
+    """
+
+    def __init__(self, rule_id, table, column, lo=None, hi=None, whole=False, digits=None,
+                 required=False, message=None, severity="error"):
+        if message is None:
+            if digits:
+                n = str(digits[0]) if digits[0] == digits[1] else f"{digits[0]}-{digits[1]}"
+                what = f"a {n} digit whole number"
+            else:
+                what = "a whole number" if whole else "a number"
+            bounds = f" in {lo}..{hi}" if lo is not None and hi is not None else ""
+            message = f"{column} must be {what}{bounds}" + (" (required)" if required else "")
+        super().__init__(rule_id, table, column, message, severity)
+        self.lo, self.hi, self.whole, self.digits, self.required = lo, hi, whole, digits, required
+
+    def mask(self, view):
+        column = self.columns[0]
+        x = view.numeric(self.table, column)
+        ok = ~np.isnan(x)
+        if self.lo is not None:
+            ok &= x >= self.lo
+        if self.hi is not None:
+            ok &= x <= self.hi
+        if self.whole:
+            ok &= x % 1 == 0
+        if self.digits:
+            ok &= view.digits(self.table, column, *self.digits)
+        missing = view.missing(self.table, column)
+        return ~ok if self.required else ~missing & ~ok
+
+
+class Hhmm(Range):
+    """A 4 digit hhmm time: 0000..2359 with minutes below 60."""
+
+    def __init__(self, rule_id, table, column, required=False, severity="error"):
+        super().__init__(rule_id, table, column, *HHMM_RANGE, whole=True, digits=(4, 4), required=required,
+                         message=f"{column} must be a 4 digit hhmm time (0000..2359)", severity=severity)
+
+    def mask(self, view):
+        x = view.numeric(self.table, self.columns[0])
+        with np.errstate(invalid="ignore"):
+            bad_minutes = x % 100 >= 60
+        return super().mask(view) | bad_minutes
+
+
+class OneOf(Rule):
+    """Missing (unless required), or one of `values` (a drop-down menu / ENUM)."""
+
+    def __init__(self, rule_id, table, column, values, required=False, message=None, severity="error"):
+        super().__init__(rule_id, table, column,
+                         message or f"{column} must be one of: {', '.join(values)}", severity)
+        self.values = list(values)
+        self.required = required
+
+    def mask(self, view):
+        column = self.columns[0]
+        bad = ~view.frame(self.table)[column].isin(self.values).to_numpy(dtype=bool)
+        return bad if self.required else bad & ~view.missing(self.table, column)
+
+
+class Text(Rule):
+    """
+    Free-text checks on the present values:
+    - edge_space: no leading / trailing whitespace
+    - not_numeric: not only digits (contact names)
+    - invalid: placeholder values that are not allowed
+    - pattern: must match this regex at the start
+    """
+
+    def __init__(self, rule_id, table, column, edge_space=True, not_numeric=False, invalid=(),
+                 pattern=None, message=None, severity="error"):
+        if message is None:
+            what = (["no leading/trailing spaces"] if edge_space else []) + (["not numeric"] if not_numeric else [])
+            what += [f"not {', '.join(invalid)}"] if invalid else []
+            what += [f"must match '{pattern}'"] if pattern else []
+            message = f"{column}: {'; '.join(what)}"
+        super().__init__(rule_id, table, column, message, severity)
+        self.edge_space, self.not_numeric, self.invalid, self.pattern = edge_space, not_numeric, list(invalid), pattern
+
+    def _test(self, t):
+        bad = np.zeros(len(t), dtype=bool)
+        if self.edge_space:
+            bad |= t.str.contains(r"^\s|\s$").to_numpy(dtype=bool)
+        if self.not_numeric:
+            bad |= t.str.fullmatch(r"[0-9]+").to_numpy(dtype=bool)
+        if self.invalid:
+            bad |= t.isin(self.invalid).to_numpy(dtype=bool)
+        if self.pattern:
+            bad |= ~t.str.match(self.pattern).to_numpy(dtype=bool)
+        return bad
+
+    def mask(self, view):
+        return _text_mask(view.frame(self.table)[self.columns[0]], self._test)
+
+
+class Unique(Rule):
+    """Present values (combinations of `columns`) must not repeat; `ignore` values may."""
+
+    def __init__(self, rule_id, table, columns, ignore=(), message=None, severity="error"):
+        columns = [columns] if isinstance(columns, str) else list(columns)
+        super().__init__(rule_id, table, columns, message or f"{', '.join(columns)} must be unique", severity)
+        self.ignore = list(ignore)
+
+    def mask(self, view):
+        df = view.frame(self.table)
+        present = ~np.logical_or.reduce([view.missing(self.table, c) for c in self.columns])
+        if self.ignore:
+            present &= ~df[self.columns[0]].isin(self.ignore).to_numpy(dtype=bool)
+        keys = df[self.columns[0]] if len(self.columns) == 1 else df[self.columns]
+        return _duplicated_among(keys, present)
+
+
+def _duplicated_among(keys, present) -> np.ndarray:
+    """duplicated(keep=False) counting only the `present` rows."""
+    out = np.zeros(len(keys), dtype=bool)
+    out[present] = keys[present].duplicated(keep=False).to_numpy()
+    return out
+
+
+class PrimaryKey(Rule):
+    """The row id must be present and unique."""
+
+    def __init__(self, rule_id, table, column, severity="error"):
+        super().__init__(rule_id, table, column, f"{column} must be present and unique", severity)
+
+    def mask(self, view):
+        column = self.columns[0]
+        return view.missing(self.table, column) | view.frame(self.table)[column].duplicated(keep=False).to_numpy()
+
+
+class Consistent(Rule):
+    """Rows sharing a `key` value must share the `value` too (e.g. citation -> DOI)."""
+
+    def __init__(self, rule_id, table, key, value, message=None, severity="error"):
+        super().__init__(rule_id, table, [key, value],
+                         message or f"the same {key} must always have the same {value}", severity)
+
+    def mask(self, view):
+        key, value = self.columns
+        n = view.frame(self.table).groupby(key, observed=True, sort=False)[value].transform("nunique")
+        return n.fillna(0).to_numpy() > 1
+
+
+class StartBeforeEnd(Rule):
+    """
+    The start date must not be after the end date. Missing start parts count as
+    the earliest (Jan / 1st / 0000), missing end parts as the latest possible
+    value, so only a certain inversion is flagged; rows without both years pass.
+    """
+
+    PARTS = (("mm", 1e6, 1, 12), ("dd", 1e4, 1, 31), ("hhmm", 1, 0, 2359))
+
+    def __init__(self, rule_id, table, prefix, severity="error"):
+        super().__init__(rule_id, table, [f"{prefix}_start_yyyy", f"{prefix}_end_yyyy"],
+                         f"{prefix} start must not be after its end", severity)
+        self.prefix = prefix
+
+    def _stamp(self, view, side):
+        """yyyymmddhhmm as one float (exact: < 2**53)."""
+        stamp = view.numeric(self.table, f"{self.prefix}_{side}_yyyy") * 1e8
+        for part, scale, first, last in self.PARTS:
+            column = f"{self.prefix}_{side}_{part}"
+            fill = first if side == "start" else last
+            x = view.numeric(self.table, column) if view.has(self.table, column) else np.nan
+            stamp = stamp + np.where(np.isnan(x), fill, x) * scale
+        return stamp
+
+    def mask(self, view):
+        return self._stamp(view, "start") > self._stamp(view, "end")
+
+    def describe(self, view, rows):
+        df = view.frame(self.table)
+
+        def side(name):
+            cols = [f"{self.prefix}_{name}_{p}" for p in ("yyyy", "mm", "dd", "hhmm")]
+            parts = [df[c].iloc[rows].astype("str").fillna("-").to_numpy(dtype=object)
+                     for c in cols if c in df.columns]
+            return ["/".join(vals) for vals in zip(*parts)]
+
+        return np.array([f"{s} > {e}" for s, e in zip(side("start"), side("end"))], dtype=object)
+
+
+class ForeignKey(Rule):
+    """Present values of `column` must exist in ref_table.ref_column."""
+
+    def __init__(self, rule_id, table, column, ref_table, ref_column=None, severity="error"):
+        ref_column = ref_column or column
+        super().__init__(rule_id, table, column, f"{column} must exist in {ref_table}.{ref_column}", severity)
+        self.ref_table, self.ref_column = ref_table, ref_column
+
+    def missing_input(self, view):
+        if not view.has(self.ref_table, self.ref_column):
+            return f"no column {self.ref_table}.{self.ref_column}"
+        return super().missing_input(view)
+
+    def mask(self, view):
+        ref = pd.unique(view.numeric(self.ref_table, self.ref_column))
+        x = pd.Series(view.numeric(self.table, self.columns[0]))
+        # a non-numeric id is also a dangling reference
+        return ~view.missing(self.table, self.columns[0]) & ~x.isin(ref[~np.isnan(ref)]).to_numpy()
+
+
+class Referenced(Rule):
+    """Every id of `column` must be used by at least one of the `by` (table, column) pairs."""
+
+    def __init__(self, rule_id, table, column, by, message=None, severity="error"):
+        self.by = list(by)
+        message = message or f"{column} must appear in " + " / ".join(t for t, _ in self.by)
+        super().__init__(rule_id, table, column, message, severity)
+
+    def _present_children(self, view):
+        return [(t, c) for t, c in self.by if view.has(t, c)]
+
+    def missing_input(self, view):
+        if not self._present_children(view):
+            return "no " + " / ".join(t for t, _ in self.by)
+        return super().missing_input(view)
+
+    def mask(self, view):
+        used = np.concatenate([pd.unique(view.numeric(t, c)) for t, c in self._present_children(view)])
+        x = pd.Series(view.numeric(self.table, self.columns[0]))
+        return ~view.missing(self.table, self.columns[0]) & ~x.isin(used[~np.isnan(used)]).to_numpy()
+
+
+class NotEmpty(Rule):
+    """The table must have at least one row (a table-level check)."""
+
+    table_level = True
+
+    def __init__(self, rule_id, table, severity="error"):
+        super().__init__(rule_id, table, [], f"{table} must not be empty", severity)
+
+    def mask(self, view):
+        return np.array([len(view.frame(self.table)) == 0])
+
+    def describe(self, view, rows):
+        return np.array(["0 rows"], dtype=object)
+
+
+# -------------------------
+# the rules of QC script_v5.3.R
+# -------------------------
+
+def _date_rules(t, table, prefix, first, hhmm=True):
+    """yyyy / mm / dd / hhmm of one date, numbered T<t>.<first>...<first + 3>."""
+    rules = [
+        Range(f"{t}.{first:02d}", table, f"{prefix}_yyyy", *YEAR_RANGE, digits=(4, 4)),
+        Range(f"{t}.{first + 1:02d}", table, f"{prefix}_mm", *MONTH_RANGE, digits=(1, 2)),
+        Range(f"{t}.{first + 2:02d}", table, f"{prefix}_dd", *DAY_RANGE, digits=(1, 2)),
+    ]
+    if hhmm:
+        rules.append(Hhmm(f"{t}.{first + 3:02d}", table, f"{prefix}_hhmm"))
+    return rules
+
+
+def _numeric_rules(t, table, first, columns):
+    return [Range(f"{t}.{first + i:02d}", table, column) for i, column in enumerate(columns)]
+
+
+def _sample_rules(t, table, prefix, unit_rules, numeric, hhmm=True):
+    """Accumulation unit (.01), start (.02-.05) and end (.06-.09) dates, numbers (.10...), start <= end."""
+    return [
+        *unit_rules,
+        *_date_rules(t, table, f"{prefix}_start", 2, hhmm=hhmm),
+        *_date_rules(t, table, f"{prefix}_end", 6, hhmm=hhmm),
+        *_numeric_rules(t, table, 10, numeric),
+        StartBeforeEnd(f"{t}.x1", table, prefix),
+    ]
+
+
+def _logger_rules(t, prefix, measurement, precision):
+    """Cave logger tables: date (.01-.04), _number (.05), measurement (.06), precision (.07)."""
+    table = f"{prefix}_sample"
+    return [
+        *_date_rules(t, table, prefix, 1),
+        Range(f"{t}.05", table, f"{prefix}_number", whole=True),
+        Range(f"{t}.06", table, f"{prefix}_measurement", *measurement),
+        Range(f"{t}.07", table, f"{prefix}_precision", *precision),
+    ]
+
+
+def _lettered(rules) -> list:
+    """Unique rule ids: the rules sharing an id get a, b, c, ... in list order."""
+    counts = pd.Series([r.rule_id for r in rules]).value_counts()
+    seen = {}
+    for rule in rules:
+        if counts[rule.rule_id] > 1:
+            i = seen[rule.rule_id] = seen.get(rule.rule_id, -1) + 1
+            rule.rule_id += "abcdefghijklmnopqrstuvwxyz"[i]
+    return rules
+
+
+QC_RULES = _lettered([
+    # T01 site
+    Unique("T01.01", "site", "site_name"),
+    Required("T01.02", "site", "site_name"),
+    Text("T01.02", "site", "site_name"),
+    Range("T01.03", "site", "latitude", -90, 90, required=True),
+    Range("T01.03", "site", "longitude", -180, 180, required=True),
+    Required("T01.04", "site", "elevation"),
+
+    # T02 reference
+    Consistent("T02.02", "reference", "citation", "publication_DOI"),
+    Unique("T02.04", "reference", "citation"),
+    Unique("T02.04", "reference", "publication_DOI", ignore=["unpublished"]),
+    Text("T02.05", "reference", "publication_DOI", pattern=DOI_PATTERN,
+         message="publication_DOI: no leading/trailing spaces; 'unpublished', http(s)://... or 10...."),
+    Text("T02.05", "reference", "citation", invalid=INVALID_CITATIONS),
+    Required("T02.x1", "reference", "citation"),
+
+    # T03 precip site (T03.01: the entity names live in precip_entity)
+    Unique("T03.01", "precip_entity", "precip_entity_name"),
+    Text("T03.02", "precip_site", "precip_site_name"),
+    Range("T03.03", "precip_site", "precip_latitude", -90, 90, required=True),
+    Range("T03.03", "precip_site", "precip_longitude", -180, 180, required=True),
+    Required("T03.04", "precip_site", "precip_elevation"),
+    Required("T03.05", "precip_site", "precip_distance_cave_entrance"),
+
+    # T04 precip entity
+    OneOf("T04.01", "precip_entity", "precip_method", PRECIP_METHODS, required=True),
+    Text("T04.02", "precip_entity", "precip_entity_contact", not_numeric=True),
+
+    # T05 precip sample
+    *_sample_rules("T05", "precip_sample", "precip",
+                   [OneOf("T05.01", "precip_sample", "precip_accumulation_unit", PRECIP_UNITS, required=True)],
+                   ["precip_accumulation_time", "precip_amount", "precip_d18O_measurement",
+                    "precip_d18O_precision", "precip_d2H_measurement", "precip_d2H_precision"]),
+
+    # T06 cave entity (drip_rate_* live in drip_entity)
+    Unique("T06.01", "cave_entity", "cave_entity_name"),
+    *[OneOf("T06.02", "cave_entity", f"{var}{suffix}", values)
+      for var in ("cave_temperature", "cave_relative_humidity", "cave_pCO2")
+      for suffix, values in (("", YES_NO_UNKNOWN), ("_frequency", FREQUENCIES), ("_instrument", INSTRUMENTS))],
+    OneOf("T06.02", "drip_entity", "drip_rate_frequency", FREQUENCIES),
+    OneOf("T06.02", "drip_entity", "drip_rate_instrument", INSTRUMENTS),
+    Text("T06.03", "cave_entity", "cave_entity_contact", not_numeric=True),
+
+    # T07 - T09 cave logger samples
+    *_logger_rules("T07", "cave_temperature", (-60, 50), (0, 5)),
+    *_logger_rules("T08", "cave_relative_humidity", (0, 100), (0, 20)),
+    *_logger_rules("T09", "cave_pCO2", (0, 100000), (None, None)),
+
+    # T10 drip entity
+    Unique("T10.01", "drip_entity", "drip_entity_name"),
+    Range("T10.02", "drip_entity", "entity_id", 1, 2000, whole=True),
+    OneOf("T10.03", "drip_entity", "geology", GEOLOGIES),
+    OneOf("T10.03", "drip_entity", "rock_age", ROCK_AGES),
+    *[OneOf("T10.03", "drip_entity", column, YES_NO_UNKNOWN) for column in ("drip_iso", "drip_rate", "mod_carb")],
+    Text("T10.04", "drip_entity", "drip_entity_contact", not_numeric=True),
+
+    # T11 - T13 drip samples
+    *_sample_rules("T11", "drip_iso_sample", "drip_iso",
+                   [OneOf("T11.01", "drip_iso_sample", "drip_iso_accumulation_unit", DRIP_UNITS)],
+                   ["drip_iso_accumulation_time", "drip_iso_d18O_measurement", "drip_iso_d18O_precision",
+                    "drip_iso_d2H_measurement", "drip_iso_d2H_precision"]),
+    *_sample_rules("T12", "drip_rate_sample", "drip_rate",
+                   [OneOf("T12.01", "drip_rate_sample", "drip_rate_accumulation_unit", DRIP_UNITS)],
+                   ["drip_rate_accumulation_time", "drip_rate_measurement", "drip_rate_precision"]),
+    *_sample_rules("T13", "mod_carb_sample", "mod_carb",
+                   [OneOf("T13.01", "mod_carb_sample", "mod_carb_accumulation_unit", MOD_CARB_UNITS),
+                    OneOf("T13.01", "mod_carb_sample", "mod_carb_surface", SURFACES),
+                    OneOf("T13.01", "mod_carb_sample", "mod_carb_mineralogy", MINERALOGIES)],
+                   ["mod_carb_accumulation_time", "mod_carb_d18O_measurement", "mod_carb_d18O_precision",
+                    "mod_carb_d13C_measurement", "mod_carb_d13C_precision"], hhmm=False),
+
+    # T15 across tables
+    *[ForeignKey("T15.01", table, "site_id", "site")
+      for table in ("notes", "site_link_reference", "site_link_precip", "cave_entity", "drip_entity")],
+    ForeignKey("T15.02", "site_link_precip", "precip_site_id", "precip_site"),
+    *[ForeignKey("T15.02", table, "precip_entity_id", "precip_entity")
+      for table in ("site_link_precip", "precip_sample", "entity_link_reference")],
+    Referenced("T15.02", "precip_entity", "precip_entity_id", [("site_link_precip", "precip_entity_id")]),
+    *[ForeignKey("T15.03", table, "cave_entity_id", "cave_entity")
+      for table in ("cave_temperature_sample", "cave_relative_humidity_sample", "cave_pCO2_sample",
+                    "entity_link_reference")],
+    Referenced("T15.03", "cave_entity", "cave_entity_id",
+               [(t, "cave_entity_id") for t in ("cave_temperature_sample", "cave_relative_humidity_sample",
+                                                "cave_pCO2_sample")]),
+    *[ForeignKey("T15.04", table, "drip_entity_id", "drip_entity")
+      for table in ("drip_iso_sample", "drip_rate_sample", "mod_carb_sample", "entity_link_reference")],
+    Referenced("T15.04", "drip_entity", "drip_entity_id",
+               [(t, "drip_entity_id") for t in ("drip_iso_sample", "drip_rate_sample", "mod_carb_sample")]),
+    NotEmpty("T15.05", "reference"),
+    *[ForeignKey("T15.05", table, "ref_id", "reference") for table in ("site_link_reference", "entity_link_reference")],
+    *[PrimaryKey("T15.x1", table, key) for table, key in PRIMARY_KEYS.items()],
+])
+
+
+# -------------------------
+# running the rules
+# -------------------------
+
+class QCReport:
+    """
+    Result of run_qc():
+    - summary: one row per rule (rows checked, violations, ok / fail / skipped)
+    - violations: one row per violating row of a rule (row position, its id, the value)
+    """
+
+    def __init__(self, summary, violations):
+        self.summary = summary
+        self.violations = violations
+
+    def count(self, severity="error") -> int:
+        return int(self.summary.loc[self.summary["severity"].eq(severity), "violations"].sum())
+
+    @property
+    def ok(self) -> bool:
+        return self.count("error") == 0
+
+    def failed(self) -> pd.DataFrame:
+        """The summary rows of the rules with violations."""
+        return self.summary[self.summary["violations"] > 0]
+
+    def skipped(self) -> pd.DataFrame:
+        return self.summary[self.summary["status"].str.startswith("skipped")]
+
+    def __repr__(self):
+        return (f"<QCReport {len(self.summary)} rules: {len(self.failed())} failed, {len(self.skipped())} skipped; "
+                f"{self.count('error')} errors, {self.count('warning')} warnings>")
+
+
+def run_qc(tables, rules=None, max_per_rule=None) -> QCReport:
+    """
+    Run `rules` (default QC_RULES) on `tables`: {name: DataFrame}, a SisalDB
+    (tables load on first use) or raw_tables(). max_per_rule caps the rows
+    listed per rule in `violations` (the summary always has the full counts).
+    """
+    view = tables if isinstance(tables, TableView) else TableView(tables)
+    summary, found = [], []
+    with instrument.stage("qc", rules=len(rules if rules is not None else QC_RULES)) as st:
+        for rule in QC_RULES if rules is None else rules:
+            row = {"rule": rule.rule_id, "table": rule.table, "column": rule.column,
+                   "severity": rule.severity, "message": rule.message}
+            reason = rule.missing_input(view)
+            if reason:
+                summary.append({**row, "rows": 0, "violations": 0, "status": f"skipped ({reason})"})
+                continue
+            bad = np.asarray(rule.mask(view), dtype=bool)
+            rows = np.flatnonzero(bad)
+            summary.append({**row, "rows": len(view.frame(rule.table)), "violations": len(rows),
+                            "status": "fail" if len(rows) else "ok"})
+            if len(rows):
+                found.append(_violation_rows(view, rule, rows[:max_per_rule]))
+        st.rows_out = sum(len(v) for v in found)
+
+    violations = (pd.concat(found, ignore_index=True) if found
+                  else pd.DataFrame({c: pd.Series(dtype="Int64" if c == "row" else object) for c in VIOLATION_COLUMNS}))
+    return QCReport(pd.DataFrame(summary, columns=SUMMARY_COLUMNS), violations)
+
+
+def _violation_rows(view, rule, rows) -> pd.DataFrame:
+    if rule.table_level:
+        position = key = [None]
+    else:
+        position = rows
+        key_col = PRIMARY_KEYS.get(rule.table)
+        df = view.frame(rule.table)
+        key = (df[key_col].iloc[rows].astype("str").to_numpy(dtype=object) if key_col in df.columns
+               else [None] * len(rows))
+    return pd.DataFrame({
+        "rule": rule.rule_id, "table": rule.table, "column": rule.column, "severity": rule.severity,
+        "row": pd.array(position, dtype="Int64"), "key": key, "value": rule.describe(view, rows),
+    })
+
+
+def raw_tables(folder_path, names=None) -> dict:
+    """
+    {name: DataFrame} of the CSVs as untrimmed text (empty cells missing), for
+    QC before loading: what the file says, not what the typed loader makes of it.
+    """
+    tables = {}
+    for path in find_csv_files(folder_path):
+        name = table_name(path)
+        if names is None or name in names:
+            with instrument.stage(f"read_raw:{name}") as st:
+                tables[name] = pd.read_csv(path, dtype=str, keep_default_na=False, na_values=[""])
+                st.rows_out = len(tables[name])
+    return tables
@@ -0,0 +1,302 @@
+"""
+Per-site sample queries, batched over many sites.
+
+The original queries filter on one `:site_name`, i.e. one round trip (and one
+run of the site/entity joins) per site and data type. Here the site filter is
+an expanding IN-list over site names or site_ids, so a list of sites costs one
+query per data type (or a few, for very long lists: see MAX_IN_LIST). Every
+row carries site_id + site_name.
+
+    sql = site_sample_sql("drip_iso", by="site_id")
+    with db.session() as s:
+        iso = s.query(sql, {"sites": [12, 15, 40]})
+
+    db.query_sites(site_names=["Grotta di Ernesto", "Obir"])   # DEFAULT_KINDS
+    db.query_sites(site_ids=[12], kinds=["cave_temperature", "cave_pCO2"])
+
+The whole-database queries of sisal_connect2db_v3.py (SITE_ENTITY_COUNTS_SQL,
+SITE_REFS_SITEONLY_SQL, GLOBAL_SQL) live here too, so the MySQL and the DuckDB
+backend (sisal/duck.py) run the same statements.
+"""
+
+from sqlalchemy import bindparam, text
+
+# site filter column per `by`
+SITE_KEYS = {
+    "site_name": "s.site_name",
+    "site_id": "s.site_id",
+}
+
+# keep single statements bounded; longer lists run as several batches
+MAX_IN_LIST = 1000
+
+SITE_SAMPLE_SQL = {
+    # drip isotope samples
+    "drip_iso": """
+SELECT
+  s.site_id,
+  s.site_name,
+  d.drip_entity_id,
+  d.drip_entity_name,
+  di.drip_iso_start_yyyy, di.drip_iso_start_mm, di.drip_iso_start_dd,
+  di.drip_iso_end_yyyy,   di.drip_iso_end_mm,   di.drip_iso_end_dd,
+  di.drip_iso_d18O_measurement,
+  di.drip_iso_d2H_measurement,
+  (di.drip_iso_d2H_measurement - 8 * di.drip_iso_d18O_measurement) AS d_excess
+FROM site s
+JOIN drip_entity d ON d.site_id = s.site_id
+JOIN drip_iso_sample di ON di.drip_entity_id = d.drip_entity_id
+WHERE {site_filter}
+ORDER BY s.site_id, d.drip_entity_id, di.drip_iso_start_yyyy, di.drip_iso_start_mm, di.drip_iso_start_dd;
+""",
+    # drip rate samples
+    "drip_rate": """
+SELECT
+  s.site_id,
+  s.site_name,
+  d.drip_entity_id,
+  d.drip_entity_name,
+  dr.drip_rate_start_yyyy, dr.drip_rate_start_mm, dr.drip_rate_start_dd,
+  dr.drip_rate_end_yyyy,   dr.drip_rate_end_mm,   dr.drip_rate_end_dd,
+  dr.drip_rate_measurement,
+  dr.drip_rate_precision
+FROM site s
+JOIN drip_entity d
+  ON d.site_id = s.site_id
+JOIN drip_rate_sample dr
+  ON dr.drip_entity_id = d.drip_entity_id
+WHERE {site_filter}
+ORDER BY
+  s.site_id,
+  d.drip_entity_id,
+  dr.drip_rate_start_yyyy,
+  dr.drip_rate_start_mm,
+  dr.drip_rate_start_dd;
+""",
+    # precip samples (using site_link_precip logic)
+    "precip": """
+SELECT
+  s.site_id,
+  s.site_name,
+  psm.precip_site_name,
+  pem.precip_entity_id,
+  pem.precip_entity_name,
+  p.precip_start_yyyy, p.precip_start_mm, p.precip_start_dd,
+  p.precip_end_yyyy,   p.precip_end_mm,   p.precip_end_dd,
+  p.precip_amount,
+  p.precip_d18O_measurement,
+  p.precip_d2H_measurement,
+  (p.precip_d2H_measurement - 8 * p.precip_d18O_measurement) AS d_excess
+FROM site s
+JOIN site_link_precip slp
+  ON slp.site_id = s.site_id
+JOIN precip_site psm
+  ON psm.precip_site_id = slp.precip_site_id
+JOIN precip_entity pem
+  ON pem.precip_entity_id = slp.precip_entity_id
+JOIN precip_sample p
+  ON p.precip_entity_id = pem.precip_entity_id
+WHERE {site_filter}
+ORDER BY
+  s.site_id,
+  pem.precip_entity_id,
+  p.precip_start_yyyy,
+  p.precip_start_mm,
+  p.precip_start_dd;
+""",
+}
+
+# cave environment logger data (one timestamp per row), e.g. kind="cave_temperature"
+_LOGGER_SQL = """
+SELECT
+  s.site_id,
+  s.site_name,
+  c.cave_entity_id,
+  c.cave_entity_name,
+  x.{p}_yyyy, x.{p}_mm, x.{p}_dd, x.{p}_hhmm,
+  x.{p}_number,
+  x.{p}_measurement,
+  x.{p}_precision
+FROM site s
+JOIN cave_entity c ON c.site_id = s.site_id
+JOIN {p}_sample x ON x.cave_entity_id = c.cave_entity_id
+WHERE {{site_filter}}
+ORDER BY s.site_id, c.cave_entity_id, x.{p}_yyyy, x.{p}_mm, x.{p}_dd, x.{p}_hhmm;
+"""
+for _p in ("cave_temperature", "cave_relative_humidity", "cave_pCO2"):
+    SITE_SAMPLE_SQL[_p] = _LOGGER_SQL.format(p=_p)
+
+# fetched by Database.query_sites unless kinds= is given
+DEFAULT_KINDS = ("drip_iso", "drip_rate", "precip")
+
+
+def site_sample_sql(kind, by="site_name"):
+    """
+    Query of one data type (drip_iso / drip_rate / precip) for a LIST of sites,
+    bound as :sites (expanding IN-list of site names or site_ids).
+    """
+    if kind not in SITE_SAMPLE_SQL:
+        raise KeyError(f"Unknown data type: {kind} (expected one of {', '.join(SITE_SAMPLE_SQL)})")
+    if by not in SITE_KEYS:
+        raise ValueError(f"by must be one of {', '.join(SITE_KEYS)}, not {by!r}")
+    sql = SITE_SAMPLE_SQL[kind].format(site_filter=f"{SITE_KEYS[by]} IN :sites")
+    return text(sql).bindparams(bindparam("sites", expanding=True))
+
+
+def site_batches(sites, size=None) -> list:
+    """Unique sites (order kept) in lists of <= size (default MAX_IN_LIST)."""
+    size = size or MAX_IN_LIST
+    sites = list(dict.fromkeys(sites))
+    return [sites[i:i + size] for i in range(0, len(sites), size)]
+
+
+# -------------------------
+# whole-database queries
+# -------------------------
+# Every child table is aggregated (or de-duplicated) in a derived table first
+# and joined to `site` afterwards, so no join multiplies the rows of another
+# child table. LEGACY_REPORT_SQL keeps the original statements;
+# benchmarks/mysql_query_harness.py checks that both return the same rows.
+# Supporting indexes: schema_SISAL_Monv1_v2_query_indexes.sql
+
+# entities per site
+SITE_ENTITY_COUNTS_SQL = """
+SELECT
+  s.site_id, s.site_name, s.latitude, s.longitude, s.elevation,
+  COALESCE(ce.n, 0) AS cave_entity_count,
+  COALESCE(de.n, 0) AS drip_entity_count,
+  COALESCE(pe.n, 0) AS precip_entity_count,
+  COALESCE(ce.n, 0) + COALESCE(de.n, 0) + COALESCE(pe.n, 0) AS entity_count
+FROM site s
+LEFT JOIN (
+  SELECT site_id, COUNT(DISTINCT cave_entity_id) AS n
+  FROM cave_entity GROUP BY site_id
+) ce ON ce.site_id = s.site_id
+LEFT JOIN (
+  SELECT site_id, COUNT(DISTINCT drip_entity_id) AS n
+  FROM drip_entity GROUP BY site_id
+) de ON de.site_id = s.site_id
+LEFT JOIN (
+  SELECT slp.site_id, COUNT(DISTINCT pem.precip_entity_id) AS n
+  FROM site_link_precip slp
+  JOIN precip_entity pem ON pem.precip_entity_id = slp.precip_entity_id
+  GROUP BY slp.site_id
+) pe ON pe.site_id = s.site_id
+ORDER BY s.site_id;
+"""
+
+# site-only references for ALL sites: aggregated per site_id over the link table,
+# then joined to site (no GROUP BY over the site columns). GROUP_CONCAT output is
+# capped by group_concat_max_len (set per connection in sisal/db.py); the harness
+# reports values that reach the cap.
+SITE_REFS_SITEONLY_SQL = """
+SELECT
+  s.site_id,
+  s.site_name,
+  s.latitude,
+  s.longitude,
+  s.elevation,
+  sr.citations,
+  sr.publication_DOI
+FROM site s
+LEFT JOIN (
+  SELECT
+    slr.site_id,
+    GROUP_CONCAT(DISTINCT r.citation ORDER BY r.citation SEPARATOR ' ; ')        AS citations,
+    GROUP_CONCAT(DISTINCT r.publication_DOI ORDER BY r.publication_DOI SEPARATOR ' ; ') AS publication_DOI
+  FROM site_link_reference slr
+  JOIN reference r ON r.ref_id = slr.ref_id
+  GROUP BY slr.site_id
+) sr ON sr.site_id = s.site_id
+ORDER BY s.site_id;
+"""
+
+# global metadata (as Global_sql in sisal_connect2db_v3.R). The result is still one
+# row per site x precip site x cave entity x drip entity: the cave x drip (x precip)
+# product per site IS the output shape of the R script's Global_sql (one row per
+# combination), so those joins are not pre-aggregated; only the fan-out that the
+# original collapsed with DISTINCT is removed. The precip side is de-duplicated
+# first (site_link_precip has one row per precip ENTITY), cave_entity / drip_entity
+# rows are unique per id, so every joined row is already distinct and no DISTINCT
+# over the wide result is needed.
+GLOBAL_SQL = """
+SELECT s.site_name, s.site_id,
+precip.precip_site_id,
+precip.precip_site_name,
+cave_entity.cave_entity_id,
+cave_entity.cave_entity_name,
+cave_entity.cave_entity_location,
+cave_entity.cave_entity_contact,
+drip_entity.*, s.latitude, s.longitude
+FROM site s
+LEFT JOIN (
+  SELECT DISTINCT sp_link.site_id, ps.precip_site_id, ps.precip_site_name
+  FROM site_link_precip sp_link
+  LEFT JOIN precip_site ps ON ps.precip_site_id = sp_link.precip_site_id
+) precip ON precip.site_id = s.site_id
+LEFT JOIN cave_entity ON s.site_id = cave_entity.site_id
+LEFT JOIN drip_entity ON s.site_id = drip_entity.site_id
+WHERE 1 = 1  and s.latitude between -90 and 90
+and s.longitude between -180 and 180
+"""
+
+REPORT_SQL = {
+    "site_entity_counts": SITE_ENTITY_COUNTS_SQL,
+    "site_refs_siteonly": SITE_REFS_SITEONLY_SQL,
+    "global": GLOBAL_SQL,
+}
+
+# the original statements (one join over all child tables, collapsed by
+# COUNT(DISTINCT ...) / GROUP BY / SELECT DISTINCT)
+LEGACY_REPORT_SQL = {
+    "site_entity_counts": """
+SELECT
+  s.site_id, s.site_name, s.latitude, s.longitude, s.elevation,
+  COUNT(DISTINCT cem.cave_entity_id)   AS cave_entity_count,
+  COUNT(DISTINCT dem.drip_entity_id)   AS drip_entity_count,
+  COUNT(DISTINCT pem.precip_entity_id) AS precip_entity_count,
+  ( COUNT(DISTINCT cem.cave_entity_id)
+  + COUNT(DISTINCT dem.drip_entity_id)
+  + COUNT(DISTINCT pem.precip_entity_id)
+  ) AS entity_count
+FROM site s
+LEFT JOIN cave_entity cem  ON cem.site_id = s.site_id
+LEFT JOIN drip_entity dem  ON dem.site_id = s.site_id
+LEFT JOIN site_link_precip slp      ON slp.site_id = s.site_id
+LEFT JOIN precip_entity pem ON pem.precip_entity_id = slp.precip_entity_id
+GROUP BY s.site_id, s.site_name, s.latitude, s.longitude, s.elevation
+ORDER BY s.site_id;
+""",
+    "site_refs_siteonly": """
+SELECT
+  s.site_id,
+  s.site_name,
+  s.latitude,
+  s.longitude,
+  s.elevation,
+  GROUP_CONCAT(DISTINCT r.citation ORDER BY r.citation SEPARATOR ' ; ')        AS citations,
+  GROUP_CONCAT(DISTINCT r.publication_DOI ORDER BY r.publication_DOI SEPARATOR ' ; ') AS publication_DOI
+FROM site s
+LEFT JOIN site_link_reference slr ON slr.site_id = s.site_id
+LEFT JOIN reference r             ON r.ref_id   = slr.ref_id
+GROUP BY s.site_id, s.site_name, s.latitude, s.longitude, s.elevation
+ORDER BY s.site_id;
+""",
+    "global": """
+SELECT DISTINCT s.site_name, s.site_id,
+precip.precip_site_id,
+precip.precip_site_name,
+cave_entity.cave_entity_id,
+cave_entity.cave_entity_name,
+cave_entity.cave_entity_location,
+cave_entity.cave_entity_contact,
+drip_entity.*, s.latitude, s.longitude
+FROM site s
+LEFT JOIN site_link_precip sp_link ON s.site_id = sp_link.site_id
+LEFT JOIN precip_site precip ON precip.precip_site_id = sp_link.precip_site_id
+LEFT JOIN cave_entity ON s.site_id = cave_entity.site_id
+LEFT JOIN drip_entity ON s.site_id = drip_entity.site_id
+WHERE 1 = 1  and s.latitude between -90 and 90
+and s.longitude between -180 and 180
+""",
+}
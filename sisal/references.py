@@ -0,0 +1,132 @@
+"""
+Reference index: citations / DOIs per site and per entity.
+
+reference is joined with site_link_reference and entity_link_reference ONCE,
+deduplicated per (key, value) and aggregated into " ; "-joined strings with
+one sorted pass (no Python call per group). Site links without a site_id are
+kept as their own (missing) key, as groupby(dropna=False) in the cookbook. Lookups by site_id,
+drip_entity_id, precip_entity_id or cave_entity_id then only read the
+precomputed tables.
+
+    refs = ReferenceIndex.build(reference, site_link_reference, entity_link_reference)
+    refs.citations("site_id", prefix="site_")      # site_id, site_citations, site_DOI
+    refs.lookup("drip_entity_id", [3, 7])          # citations/DOI of two entities
+    refs.refs("precip_entity_id", 12)              # the individual references
+"""
+
+import numpy as np
+import pandas as pd
+
+REFERENCE_KEYS = ("site_id", "drip_entity_id", "precip_entity_id", "cave_entity_id")
+REFERENCE_COLS = ["ref_id", "citation", "publication_DOI"]
+
+
+def _join_sorted(keys, values, sep):
+    """keys sorted, values grouped by key -> (unique keys, joined strings)."""
+    if len(keys) == 0:
+        return keys, np.array([], dtype=object)
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    ends = np.r_[starts[1:], len(keys)]
+    values = values.tolist()
+    return keys[starts], np.array([sep.join(values[a:b]) for a, b in zip(starts, ends)], dtype=object)
+
+
+def collapse_unique_by(df, key, columns, sep=" ; ", sort=False) -> pd.DataFrame:
+    """
+    Vectorized groupby(key, dropna=False).agg(collapse_unique) over several
+    columns: unique non-null values per key joined with `sep`, in order of first
+    appearance (sorted with sort=True). Every key of `df` gets a row (sorted,
+    missing key last); keys without values get NA.
+    """
+    if isinstance(columns, str):
+        columns = [columns]
+    all_keys = df[key].drop_duplicates().sort_values(na_position="last").reset_index(drop=True)
+    out = pd.DataFrame({key: all_keys})
+    key_codes = pd.Index(all_keys)
+
+    for col in columns:
+        part = df[[key, col]].dropna(subset=[col])
+        part = pd.DataFrame({
+            "code": key_codes.get_indexer(part[key]),
+            "value": part[col].astype(str).to_numpy(dtype=object),
+        }).drop_duplicates()
+        # stable sort: by key, then by value (or keep first-appearance order)
+        order = ["code", "value"] if sort else ["code"]
+        part = part.sort_values(order, kind="stable")
+        codes, joined = _join_sorted(part["code"].to_numpy(), part["value"].to_numpy(), sep)
+        values = np.full(len(all_keys), None, dtype=object)
+        values[codes] = joined
+        out[col] = pd.array(values, dtype="str")
+    return out
+
+
+class ReferenceIndex:
+    """References linked to sites and entities, joined once."""
+
+    def __init__(self, links):
+        # key -> DataFrame(id, ref_id, citation, publication_DOI), sorted by id
+        self._links = links
+        self._aggregated = {}
+
+    @classmethod
+    def build(cls, reference, site_link_reference=None, entity_link_reference=None):
+        ref = reference[REFERENCE_COLS].drop_duplicates("ref_id")
+        links = {}
+        sources = []
+        if site_link_reference is not None:
+            sources.append((site_link_reference, ["site_id"]))
+        if entity_link_reference is not None:
+            sources.append((entity_link_reference,
+                            [k for k in REFERENCE_KEYS if k != "site_id" and k in entity_link_reference]))
+        for table, keys in sources:
+            for key in keys:
+                # an entity link row names one kind of entity; a site link without site_id stays
+                link = table if key == "site_id" else table.loc[table[key].notna()]
+                link = link[[key, "ref_id"]].drop_duplicates()
+                links[key] = (
+                    link.merge(ref, on="ref_id", how="left")
+                    .sort_values([key, "ref_id"], kind="stable")
+                    .reset_index(drop=True)
+                )
+        return cls(links)
+
+    @property
+    def keys(self):
+        return list(self._links)
+
+    def _table(self, key):
+        if key not in self._links:
+            raise KeyError(f"No references indexed by {key} (have: {', '.join(self._links)})")
+        return self._links[key]
+
+    def refs(self, key, ids=None) -> pd.DataFrame:
+        """Individual references (one row per linked ref) of all or some ids."""
+        t = self._table(key)
+        if ids is None:
+            return t
+        ids = np.atleast_1d(ids)
+        return t[t[key].isin(ids)].reset_index(drop=True)
+
+    def citations(self, key, prefix="", sep=" ; ") -> pd.DataFrame:
+        """
+        One row per id: <prefix>citations, <prefix>DOI (unique values, sorted,
+        joined with `sep`). Computed once per key/sep.
+        """
+        if (key, sep) not in self._aggregated:
+            self._aggregated[key, sep] = collapse_unique_by(
+                self._table(key), key, ["citation", "publication_DOI"], sep=sep, sort=True
+            ).set_index(key)
+        agg = self._aggregated[key, sep]
+        return pd.DataFrame({
+            key: agg.index.array,
+            f"{prefix}citations": agg["citation"].to_numpy(),
+            f"{prefix}DOI": agg["publication_DOI"].to_numpy(),
+        })
+
+    def lookup(self, key, ids, sep=" ; ") -> pd.DataFrame:
+        """citations / DOI for the given ids (in that order; NA if none)."""
+        self.citations(key, sep=sep)
+        agg = self._aggregated[key, sep]
+        ids = np.atleast_1d(ids)
+        return agg.reindex(ids).rename(columns={"citation": "citations", "publication_DOI": "DOI"}) \
+            .rename_axis(key).reset_index()
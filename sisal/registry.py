@@ -0,0 +1,180 @@
+"""
+Lazy table registry for the SISAL_monv1 flat CSVs.
+
+    db = SisalDB(folder_path, cache_dir=...)
+    db.drip_iso_sample                      # read on first access, then kept
+    db.table("precip_sample", usecols=["precip_entity_id", "precip_amount"])
+    db.release("precip_sample")             # drop it again
+
+Nothing is read in the constructor (only the folder listing), so a process
+that needs one table only pays for that table.
+"""
+
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from .loader import find_csv_files, read_table, table_name
+from .schema import REQUIRED_TABLES
+
+
+def frame_nbytes(df) -> int:
+    """Resident size of a DataFrame (incl. string payloads)."""
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+class SisalDB:
+    """
+    Tables are loaded on first attribute/item access.
+    - usecols: column projection pushed into the reader (CSV or Arrow cache)
+    - memory_budget: bytes; least recently used tables are released when the
+      loaded tables exceed it (None = keep everything)
+    """
+
+    def __init__(self, folder_path, cache_dir=None, use_hash=False,
+                 required=REQUIRED_TABLES, memory_budget=None, verbose=False):
+        self.folder_path = folder_path
+        self.cache_dir = cache_dir
+        self.use_hash = use_hash
+        self.memory_budget = memory_budget
+        self.verbose = verbose
+        self._files = {table_name(f): f for f in find_csv_files(folder_path)}
+        self._loaded = OrderedDict()   # (name, usecols) -> DataFrame, in LRU order
+        self._sizes = {}               # key -> bytes, measured once when the frame is added
+        self._nbytes = 0               # sum of self._sizes
+        self._lock = threading.RLock()
+        self._loading = {}             # key -> Lock held while that table is read
+        if required:
+            self.check_required(required)
+
+    # -------------------------
+    # table access
+    # -------------------------
+
+    @property
+    def names(self):
+        return sorted(self._files)
+
+    def path(self, name) -> str:
+        """CSV file of table `name`."""
+        if name not in self._files:
+            raise KeyError(f"Unknown table: {name}")
+        return self._files[name]
+
+    def check_required(self, required_tables):
+        missing = sorted(set(required_tables) - set(self._files))
+        if missing:
+            raise KeyError(f"Missing required table(s): {', '.join(missing)}")
+
+    def table(self, name, usecols=None) -> pd.DataFrame:
+        """Return table `name` (optionally only `usecols`), loading it if needed."""
+        if name not in self._files:
+            raise KeyError(f"Unknown table: {name}")
+        key = (name, tuple(usecols) if usecols is not None else None)
+
+        df = self._lookup(key)
+        if df is not None:
+            return df
+        # one reader per table: different tables load concurrently (e.g. the
+        # stages of sisal/pipeline.py), a second caller of the same one waits
+        with self._lock:
+            loading = self._loading.setdefault(key, threading.Lock())
+        with loading:
+            df = self._lookup(key)
+            if df is not None:
+                return df
+            if self.verbose:
+                print(f"Reading: {name}")
+            df = read_table(self._files[name], cache_dir=self.cache_dir,
+                            use_hash=self.use_hash, usecols=usecols)
+            # measured outside the lock (deep size is O(text cells)), only when a budget needs it
+            nbytes = frame_nbytes(df) if self.memory_budget is not None else None
+            with self._lock:
+                self._loaded[key] = df
+                self._add_size(key, nbytes)
+                self._loading.pop(key, None)
+                self._enforce_budget(keep=key)
+            return df
+
+    def _lookup(self, key):
+        with self._lock:
+            if key in self._loaded:
+                self._loaded.move_to_end(key)
+                return self._loaded[key]
+            # a projection of an already loaded full table is just a column selection
+            name, usecols = key
+            full = self._loaded.get((name, None))
+            if full is not None and usecols is not None:
+                self._loaded.move_to_end((name, None))
+                return full[list(usecols)]
+        return None
+
+    def __getattr__(self, name):
+        # only called when normal attribute lookup fails
+        files = self.__dict__.get("_files", {})
+        if name in files:
+            return self.table(name)
+        raise AttributeError(name)
+
+    def __getitem__(self, name):
+        return self.table(name)
+
+    def __contains__(self, name):
+        return name in self._files
+
+    def __dir__(self):
+        return sorted(set(super().__dir__()) | set(self._files))
+
+    def load_all(self, names=None) -> dict:
+        """Eagerly load tables (default: all) into a dict, like the old `tables`."""
+        return {name: self.table(name) for name in (names or self.names)}
+
+    # -------------------------
+    # memory management
+    # -------------------------
+
+    @property
+    def loaded(self):
+        return [name if cols is None else (name, cols) for name, cols in self._loaded]
+
+    def memory_usage(self) -> int:
+        """Bytes held by the loaded tables (measured once per table)."""
+        with self._lock:
+            frames = [(key, df) for key, df in self._loaded.items() if key not in self._sizes]
+        for key, df in frames:                 # loaded without a budget: measure now, once
+            nbytes = frame_nbytes(df)
+            with self._lock:
+                if key in self._loaded and key not in self._sizes:
+                    self._add_size(key, nbytes)
+        with self._lock:
+            return self._nbytes
+
+    def release(self, name=None):
+        """Drop one table (all of its projections) or, with name=None, everything."""
+        with self._lock:
+            for key in list(self._loaded):
+                if name is None or key[0] == name:
+                    self._drop(key)
+
+    def _add_size(self, key, nbytes):
+        if nbytes is not None:
+            self._sizes[key] = nbytes
+            self._nbytes += nbytes
+
+    def _drop(self, key):
+        del self._loaded[key]
+        self._nbytes -= self._sizes.pop(key, 0)
+
+    def _enforce_budget(self, keep):
+        if self.memory_budget is None:
+            return
+        for key in list(self._loaded):     # oldest first
+            if self._nbytes <= self.memory_budget:
+                break
+            if key != keep:
+                self._drop(key)
+
+    def __repr__(self):
+        return (f"SisalDB({self.folder_path!r}, tables={len(self._files)}, "
+                f"loaded={len(self._loaded)})")
@@ -0,0 +1,51 @@
+"""
+The export of sisal_connect2db_v3.py as a library call: the whole-database
+report queries plus the sample data of some sites, as {sheet: DataFrame}.
+
+    db = Database.from_env()                  # or DuckDatabase.from_folder(...)
+    sheets = report_tables(db, site_names=["Obir"])
+    export_tables(sheets, "SISAL_monv1_export.xlsx", fmt="xlsx")
+"""
+
+from . import instrument
+from .queries import REPORT_SQL
+
+# sheet -> report query (sisal/queries.py)
+REPORT_SHEETS = {
+    "site_summary": "site_entity_counts",
+    "refs_siteonly": "site_refs_siteonly",
+    "global": "global",
+}
+
+# sheet -> data type of Database.query_sites
+SAMPLE_SHEETS = {
+    "drip_iso_example": "drip_iso",
+    "drip_rate_example": "drip_rate",
+    "precip_example": "precip",
+}
+
+SHEET_ORDER = ["site_summary", "drip_iso_example", "drip_rate_example", "precip_example",
+               "refs_siteonly", "global"]
+
+
+def report_tables(db, site_names=None, site_ids=None, include_global=True, max_workers=3) -> dict:
+    """
+    {sheet: DataFrame} in the order of the R script's workbook.
+    - site_names / site_ids: sites for the sample sheets (none = no sample sheets)
+    - include_global: the optional global metadata sheet
+    """
+    sheets = {}
+    with instrument.stage("report_queries"):
+        with db.session() as s:
+            for sheet, query in REPORT_SHEETS.items():
+                if sheet == "global" and not include_global:
+                    continue
+                sheets[sheet] = s.query(REPORT_SQL[query])
+
+    if site_names or site_ids:
+        # the three data types run concurrently on separate pooled connections
+        site_data = db.query_sites(site_names=site_names, site_ids=site_ids,
+                                   kinds=list(SAMPLE_SHEETS.values()), max_workers=max_workers)
+        for sheet, kind in SAMPLE_SHEETS.items():
+            sheets[sheet] = site_data[kind]
+    return {sheet: sheets[sheet] for sheet in SHEET_ORDER if sheet in sheets}
@@ -0,0 +1,178 @@
+"""
+Resampling of sample series onto a regular time grid (hourly/daily/monthly/annual).
+
+Every sample interval [start, end) is split into the grid bins it overlaps
+(one vectorized np.repeat over all entities), each piece weighted by the
+overlapped time; one grouped reduction per (entity, bin) then gives
+
+- how="mean": duration-weighted mean (times `weight_col`, e.g. the precip
+  amount for amount-weighted isotopes)
+- how="sum":  the value spread over the interval in proportion to time
+  (extensive quantities such as precip_amount)
+
+Point samples (end <= start, e.g. the cave loggers) fall into the bin of their
+timestamp with unit weight.
+
+    resample_table(drip_rate_sample, "drip_rate_sample", "monthly", ["drip_rate_measurement"])
+    resample_precip(precip_sample, "monthly")     # amount sum + amount-weighted d18O/d2H
+"""
+
+import numpy as np
+import pandas as pd
+
+from .coverage import ENTITY_KEYS
+from .dates import sample_start_end
+
+# grid name -> numpy datetime64 unit
+FREQS = {
+    "hourly": "h",
+    "daily": "D",
+    "monthly": "M",
+    "annual": "Y",
+}
+
+
+def classify_freq(unit, time) -> pd.Series:
+    """Label accumulation intervals (unit, time) as hourly / daily / monthly / other/unknown."""
+    unit = pd.Series(unit).astype("string").str.lower()
+    time = pd.to_numeric(pd.Series(time), errors="coerce")
+
+    out = pd.Series(["other/unknown"] * len(unit), index=unit.index, dtype="string")
+
+    out[(unit == "hours")   & (time == 1)] = "hourly"
+    out[(unit == "minutes") & (time == 60)] = "hourly"
+
+    out[(unit == "days")    & (time == 1)] = "daily"
+    out[(unit == "hours")   & (time == 24)] = "daily"
+
+    out[(unit == "months")  & (time == 1)] = "monthly"
+    out[(unit == "days")    & (time.between(28, 31, inclusive="both"))] = "monthly"
+    return out
+
+
+def _unit(freq) -> str:
+    if freq in FREQS:
+        return FREQS[freq]
+    if freq in FREQS.values():
+        return freq
+    raise ValueError(f"Unknown freq: {freq!r} (expected one of {', '.join(FREQS)})")
+
+
+def _bin_of(ns, unit) -> np.ndarray:
+    """Bin number (units since 1970, floored) of ns timestamps."""
+    return ns.view("datetime64[ns]").astype(f"datetime64[{unit}]").astype("int64")
+
+
+def _bin_start(b, unit) -> np.ndarray:
+    return b.astype(f"datetime64[{unit}]").astype("datetime64[ns]").view("int64")
+
+
+def split_intervals(start, end, freq):
+    """
+    Pieces of the intervals [start, end) on the grid (all arrays int64 ns).
+    Returns (row, bin, overlap_ns): row = position of the source interval.
+    Point samples (end <= start) give one piece with overlap 0.
+    """
+    unit = _unit(freq)
+    first = _bin_of(start, unit)
+    last = np.where(end > start, _bin_of(end - 1, unit), first)
+    n = last - first + 1
+
+    row = np.repeat(np.arange(len(start)), n)
+    offset = np.arange(len(row)) - np.repeat(np.cumsum(n) - n, n)
+    b = first[row] + offset
+    lo = np.maximum(start[row], _bin_start(b, unit))
+    hi = np.minimum(end[row], _bin_start(b + 1, unit))
+    return row, b, np.maximum(hi - lo, 0)
+
+
+def resample_intervals(entity, start, end, values, freq, weight=None, how="mean") -> pd.DataFrame:
+    """
+    Core: entity/start/end int64 arrays (ns), values {name: float array}.
+    Returns one row per (entity, bin) with data: entity, bin_start, bin (int),
+    n_samples, covered_fraction (overlapped time / bin length), + one column per value.
+    """
+    if how not in ("mean", "sum"):
+        raise ValueError(f"how must be 'mean' or 'sum', not {how!r}")
+    unit = _unit(freq)
+    row, b, overlap = split_intervals(start, end, freq)
+    point = (end <= start)[row]
+    duration = np.maximum(end - start, 1)[row]
+    # time share of the piece: overlap / duration (1 for point samples)
+    share = np.where(point, 1.0, overlap / duration)
+    w_time = np.where(point, 1.0, overlap.astype("float64"))
+    if weight is not None:
+        w_time = w_time * np.asarray(weight, dtype="float64")[row]
+
+    keys = pd.MultiIndex.from_arrays([entity[row], b], names=["entity", "bin"])
+    frame = {"n_samples": np.ones(len(row)), "covered": overlap.astype("float64")}
+    for name, v in values.items():
+        v = np.asarray(v, dtype="float64")[row]
+        ok = ~np.isnan(v) & ~np.isnan(w_time)
+        if how == "mean":
+            frame[f"{name}__num"] = np.where(ok, v * w_time, 0.0)
+            frame[f"{name}__den"] = np.where(ok, w_time, 0.0)
+        else:
+            frame[f"{name}__num"] = np.where(ok, v * share, 0.0)
+            frame[f"{name}__den"] = ok.astype("float64")
+    agg = pd.DataFrame(frame, index=keys).groupby(level=[0, 1], sort=True).sum()
+
+    ent = agg.index.get_level_values(0).to_numpy()
+    bins = agg.index.get_level_values(1).to_numpy()
+    bin_len = _bin_start(bins + 1, unit) - _bin_start(bins, unit)
+    out = pd.DataFrame({
+        "entity": ent,
+        "bin": bins,
+        "bin_start": pd.to_datetime(_bin_start(bins, unit), utc=True),
+        "n_samples": agg["n_samples"].to_numpy(dtype="int64"),
+        "covered_fraction": agg["covered"].to_numpy() / bin_len,
+    })
+    for name in values:
+        num, den = agg[f"{name}__num"].to_numpy(), agg[f"{name}__den"].to_numpy()
+        with np.errstate(invalid="ignore", divide="ignore"):
+            out[name] = np.where(den > 0, num / den if how == "mean" else num, np.nan)
+    return out
+
+
+def _table_arrays(df, table):
+    start_dt, end_dt = sample_start_end(df, table)
+    key = ENTITY_KEYS[table]
+    ok = start_dt.notna().to_numpy() & df[key].notna().to_numpy()
+    start = start_dt.dt.tz_localize(None).to_numpy("datetime64[ns]").view("int64")[ok]
+    end = end_dt.dt.tz_localize(None).to_numpy("datetime64[ns]").view("int64")[ok]
+    entity = df[key].to_numpy(dtype="int64", na_value=-1)[ok]
+    return key, ok, entity, start, end
+
+
+def resample_table(df, table, freq, columns, weight_col=None, how="mean") -> pd.DataFrame:
+    """
+    Resample columns of one sample table (all entities at once).
+    - freq: hourly / daily / monthly / annual
+    - weight_col: extra weight per sample (e.g. "precip_amount" for isotopes)
+    Rows: <entity key>, bin_start, n_samples, covered_fraction, <columns>
+    """
+    columns = [columns] if isinstance(columns, str) else list(columns)
+    key, ok, entity, start, end = _table_arrays(df, table)
+    values = {c: pd.to_numeric(df[c], errors="coerce").to_numpy("float64", na_value=np.nan)[ok]
+              for c in columns}
+    weight = None
+    if weight_col is not None:
+        weight = pd.to_numeric(df[weight_col], errors="coerce").to_numpy("float64", na_value=np.nan)[ok]
+    out = resample_intervals(entity, start, end, values, freq, weight=weight, how=how)
+    return out.drop(columns="bin").rename(columns={"entity": key})
+
+
+def resample_precip(precip_sample, freq) -> pd.DataFrame:
+    """
+    Precip on a grid: precip_amount summed (time-proportional), d18O / d2H as
+    amount- and duration-weighted means, d_excess from the weighted means.
+    """
+    amount = resample_table(precip_sample, "precip_sample", freq, ["precip_amount"], how="sum")
+    iso = resample_table(precip_sample, "precip_sample", freq,
+                         ["precip_d18O_measurement", "precip_d2H_measurement"],
+                         weight_col="precip_amount", how="mean")
+    out = amount.merge(iso[["precip_entity_id", "bin_start", "precip_d18O_measurement",
+                            "precip_d2H_measurement"]],
+                       on=["precip_entity_id", "bin_start"], how="left")
+    out["d_excess"] = out["precip_d2H_measurement"] - 8 * out["precip_d18O_measurement"]
+    return out
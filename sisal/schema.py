@@ -0,0 +1,233 @@
+"""
+Column types of the SISAL_monv1 flat-CSV tables.
+
+Derived from schema_SISAL_Monv1_v2.sql, following the flat-CSV layout used by
+the cookbooks (e.g. PRECIP_SITE_METADATA -> precip_site, with the site links
+moved into site_link_precip / site_link_reference).
+
+    INT                 -> "Int64"   (nullable; link tables contain empty ids)
+    DECIMAL / DOUBLE    -> "float64"
+    VARCHAR / TEXT      -> str       (Arrow-backed with pyarrow installed)
+    ENUM                -> category
+    low-cardinality VARCHAR (site/entity names, methods) -> category
+
+Text and category columns are whitespace-trimmed at load time, with empty
+strings read as missing (see loader.normalize_strings).
+"""
+
+ID = "Int64"
+NUM = "float64"
+TEXT = "str"
+CAT = "category"
+ENUM = CAT
+
+
+def _sample_cols(prefix, hhmm=True, extra=None):
+    """Start/end date columns + accumulation columns shared by the sample tables."""
+    cols = {}
+    for side in ("start", "end"):
+        cols[f"{prefix}_{side}_yyyy"] = NUM
+        cols[f"{prefix}_{side}_mm"] = NUM
+        cols[f"{prefix}_{side}_dd"] = NUM
+        if hhmm:
+            cols[f"{prefix}_{side}_hhmm"] = NUM
+    cols[f"{prefix}_accumulation_unit"] = ENUM
+    cols[f"{prefix}_accumulation_time"] = NUM
+    cols.update(extra or {})
+    return cols
+
+
+TABLE_DTYPES = {
+    "site": {
+        "site_id": ID,
+        "site_name": CAT,
+        "latitude": NUM,
+        "longitude": NUM,
+        "elevation": NUM,
+    },
+    "notes": {
+        "site_id": ID,
+        "notes": TEXT,
+    },
+    "reference": {
+        "ref_id": ID,
+        "citation": TEXT,
+        "publication_DOI": TEXT,
+    },
+    "site_link_precip": {
+        "site_id": ID,
+        "precip_site_id": ID,
+        "precip_entity_id": ID,
+    },
+    "site_link_reference": {
+        "site_id": ID,
+        "ref_id": ID,
+    },
+    "entity_link_reference": {
+        "precip_entity_id": ID,
+        "cave_entity_id": ID,
+        "drip_entity_id": ID,
+        "ref_id": ID,
+    },
+    "precip_site": {
+        "precip_site_id": ID,
+        "precip_site_name": CAT,
+        "precip_latitude": NUM,
+        "precip_longitude": NUM,
+        "precip_elevation": NUM,
+        "precip_distance_cave_entrance": NUM,
+    },
+    "precip_entity": {
+        "precip_entity_id": ID,
+        "precip_entity_name": CAT,
+        "precip_method": CAT,
+        "precip_entity_contact": TEXT,
+    },
+    "precip_sample": {
+        "precip_entity_id": ID,
+        "precip_sample_id": ID,
+        **_sample_cols("precip", extra={
+            "precip_amount": NUM,
+            "precip_d18O_measurement": NUM,
+            "precip_d18O_precision": NUM,
+            "precip_d2H_measurement": NUM,
+            "precip_d2H_precision": NUM,
+        }),
+    },
+    "cave_entity": {
+        "site_id": ID,
+        "cave_entity_id": ID,
+        "cave_entity_name": CAT,
+        "cave_entity_location": TEXT,
+        "cave_temperature": ENUM,
+        "cave_temperature_frequency": ENUM,
+        "cave_temperature_instrument": ENUM,
+        "cave_relative_humidity": ENUM,
+        "cave_relative_humidity_frequency": ENUM,
+        "cave_relative_humidity_instrument": ENUM,
+        "cave_pCO2": ENUM,
+        "cave_pCO2_frequency": ENUM,
+        "cave_pCO2_instrument": ENUM,
+        "cave_entity_contact": TEXT,
+    },
+    "drip_entity": {
+        "site_id": ID,
+        "drip_entity_id": ID,
+        "drip_entity_name": CAT,
+        "entity_id": ID,
+        "geology": ENUM,
+        "rock_age": ENUM,
+        "drip_entity_location": TEXT,
+        "drip_iso": ENUM,
+        "drip_iso_method": CAT,
+        "drip_rate": ENUM,
+        "drip_rate_frequency": ENUM,
+        "drip_rate_instrument": ENUM,
+        "mod_carb": ENUM,
+        "mod_carb_method": CAT,
+        "drip_entity_contact": TEXT,
+    },
+    "drip_iso_sample": {
+        "drip_entity_id": ID,
+        "drip_iso_sample_id": ID,
+        **_sample_cols("drip_iso", extra={
+            "drip_iso_d18O_measurement": NUM,
+            "drip_iso_d18O_precision": NUM,
+            "drip_iso_d2H_measurement": NUM,
+            "drip_iso_d2H_precision": NUM,
+        }),
+    },
+    "drip_rate_sample": {
+        "drip_entity_id": ID,
+        "drip_rate_sample_id": ID,
+        **_sample_cols("drip_rate", extra={
+            "drip_rate_measurement": NUM,
+            "drip_rate_precision": NUM,
+        }),
+    },
+    "mod_carb_sample": {
+        "drip_entity_id": ID,
+        "mod_carb_sample_id": ID,
+        **_sample_cols("mod_carb", hhmm=False, extra={
+            "mod_carb_surface": ENUM,
+            "mod_carb_mineralogy": ENUM,
+            "mod_carb_d18O_measurement": NUM,
+            "mod_carb_d18O_precision": NUM,
+            "mod_carb_d13C_measurement": NUM,
+            "mod_carb_d13C_precision": NUM,
+        }),
+    },
+}
+
+def _logger_cols(prefix):
+    """Point-in-time logger columns of the cave environment tables (no start/end)."""
+    return {
+        "cave_entity_id": ID,
+        f"{prefix}_sample_id": ID,
+        f"{prefix}_yyyy": NUM,
+        f"{prefix}_mm": NUM,
+        f"{prefix}_dd": NUM,
+        f"{prefix}_hhmm": NUM,
+        f"{prefix}_number": NUM,
+        f"{prefix}_measurement": NUM,
+        f"{prefix}_precision": NUM,
+    }
+
+
+# cave environment logger data (CAVE_TEMPERATURE, CAVE_RELATIVE_HUMIDITY, CAVE_pCO2)
+TABLE_DTYPES.update({
+    "cave_temperature_sample": _logger_cols("cave_temperature"),
+    "cave_relative_humidity_sample": _logger_cols("cave_relative_humidity"),
+    "cave_pCO2_sample": _logger_cols("cave_pCO2"),
+})
+
+REQUIRED_TABLES = [
+    "site", "notes", "reference",
+    "site_link_precip", "site_link_reference", "entity_link_reference",
+    "precip_site", "precip_entity", "precip_sample",
+    "cave_entity",
+    "drip_entity", "drip_iso_sample", "drip_rate_sample", "mod_carb_sample"
+]
+
+
+# table -> its id column (link tables have none)
+PRIMARY_KEYS = {
+    "site": "site_id",
+    "reference": "ref_id",
+    "precip_site": "precip_site_id",
+    "precip_entity": "precip_entity_id",
+    "cave_entity": "cave_entity_id",
+    "drip_entity": "drip_entity_id",
+    **{name: f"{name[:-len('_sample')]}_sample_id" for name in TABLE_DTYPES if name.endswith("_sample")},
+}
+
+# table -> {column: referenced table} (the referenced column has the same name);
+# the FOREIGN KEYs of schema_SISAL_Monv1_v2.sql in the flat layout
+FOREIGN_KEYS = {
+    "notes": {"site_id": "site"},
+    "site_link_reference": {"site_id": "site", "ref_id": "reference"},
+    "site_link_precip": {"site_id": "site", "precip_site_id": "precip_site", "precip_entity_id": "precip_entity"},
+    "precip_sample": {"precip_entity_id": "precip_entity"},
+    "cave_entity": {"site_id": "site"},
+    "cave_temperature_sample": {"cave_entity_id": "cave_entity"},
+    "cave_relative_humidity_sample": {"cave_entity_id": "cave_entity"},
+    "cave_pCO2_sample": {"cave_entity_id": "cave_entity"},
+    "drip_entity": {"site_id": "site"},
+    "drip_iso_sample": {"drip_entity_id": "drip_entity"},
+    "drip_rate_sample": {"drip_entity_id": "drip_entity"},
+    "mod_carb_sample": {"drip_entity_id": "drip_entity"},
+    "entity_link_reference": {"precip_entity_id": "precip_entity", "cave_entity_id": "cave_entity",
+                              "drip_entity_id": "drip_entity", "ref_id": "reference"},
+}
+
+
+# loaded when present (not every flat-CSV release ships the logger tables)
+CAVE_ENV_TABLES = [
+    "cave_temperature_sample", "cave_relative_humidity_sample", "cave_pCO2_sample",
+]
+OPTIONAL_TABLES = CAVE_ENV_TABLES
+
+
+def table_dtypes(name):
+    """Declared dtypes for table `name` ({} for tables we don't know)."""
+    return dict(TABLE_DTYPES.get(name, {}))
@@ -0,0 +1,210 @@
+"""
+Spatial index for cave sites and precipitation sites.
+
+Points are stored as unit vectors (x, y, z) in a KD-tree (scipy, optional;
+without scipy the same queries run as chunked brute force), so great-circle
+radius and k-nearest queries are tree lookups. Bounding boxes use a latitude-
+sorted array and handle boxes that cross the antimeridian (lon_min > lon_max).
+
+    sites = SpatialIndex.from_sites(site)
+    sites.bbox(30, 70, 170, -170)                 # crosses the antimeridian
+    sites.within(47.5, 19.0, radius_km=100)
+    nearest_precip_sites(site, precip_site, k=1)  # nearest station per cave site
+"""
+
+import numpy as np
+import pandas as pd
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def _kdtree_class():
+    """scipy's cKDTree, imported on first use (None without scipy: brute force)."""
+    try:
+        from scipy.spatial import cKDTree
+    except ImportError:  # optional
+        return None
+    return cKDTree
+
+
+def to_unit_xyz(lat, lon) -> np.ndarray:
+    lat = np.radians(np.asarray(lat, dtype="float64"))
+    lon = np.radians(np.asarray(lon, dtype="float64"))
+    cos_lat = np.cos(lat)
+    return np.column_stack([cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)])
+
+
+def km_to_chord(km):
+    return 2.0 * np.sin(np.minimum(np.asarray(km, dtype="float64") / EARTH_RADIUS_KM, np.pi) / 2.0)
+
+
+def chord_to_km(chord):
+    return 2.0 * EARTH_RADIUS_KM * np.arcsin(np.clip(np.asarray(chord) / 2.0, 0.0, 1.0))
+
+
+def _query_points(lat, lon):
+    """Unit vectors of the query points with coordinates + their positions."""
+    lat = np.atleast_1d(np.asarray(lat, dtype="float64"))
+    lon = np.atleast_1d(np.asarray(lon, dtype="float64"))
+    qpos = np.flatnonzero(np.isfinite(lat) & np.isfinite(lon))
+    return to_unit_xyz(lat[qpos], lon[qpos]), qpos
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance(s) in km."""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype="float64")) for v in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+class SpatialIndex:
+    """
+    Index over the rows of `frame` (positions with missing coordinates are skipped).
+    Results are rows of `frame`; radius/nearest results get a distance_km column.
+    """
+
+    def __init__(self, frame, lat_col="latitude", lon_col="longitude"):
+        self.frame = frame
+        self.lat_col = lat_col
+        self.lon_col = lon_col
+        lat = pd.to_numeric(frame[lat_col], errors="coerce").to_numpy(dtype="float64")
+        lon = pd.to_numeric(frame[lon_col], errors="coerce").to_numpy(dtype="float64")
+        self._pos = np.flatnonzero(~np.isnan(lat) & ~np.isnan(lon))   # row positions in frame
+        self._lat = lat[self._pos]
+        self._lon = lon[self._pos]
+        self._xyz = to_unit_xyz(self._lat, self._lon)
+        cKDTree = _kdtree_class() if len(self._pos) else None
+        self._tree = cKDTree(self._xyz) if cKDTree is not None else None
+        self._lat_order = np.argsort(self._lat, kind="stable")
+
+    @classmethod
+    def from_sites(cls, site):
+        return cls(site, "latitude", "longitude")
+
+    @classmethod
+    def from_precip_sites(cls, precip_site):
+        return cls(precip_site, "precip_latitude", "precip_longitude")
+
+    def __len__(self):
+        return len(self._pos)
+
+    def _rows(self, idx, distance_km=None):
+        out = self.frame.iloc[self._pos[idx]].copy()
+        if distance_km is not None:
+            out["distance_km"] = distance_km
+        return out
+
+    # -------------------------
+    # bounding box
+    # -------------------------
+
+    def bbox_positions(self, lat_min, lat_max, lon_min, lon_max) -> np.ndarray:
+        """Index positions inside the box; lon_min > lon_max means the box crosses 180 deg."""
+        sorted_lat = self._lat[self._lat_order]
+        lo = np.searchsorted(sorted_lat, lat_min, "left")
+        hi = np.searchsorted(sorted_lat, lat_max, "right")
+        cand = self._lat_order[lo:hi]
+        lon = self._lon[cand]
+        if lon_min <= lon_max:
+            keep = (lon >= lon_min) & (lon <= lon_max)
+        else:
+            keep = (lon >= lon_min) | (lon <= lon_max)
+        return np.sort(cand[keep])
+
+    def bbox(self, lat_min, lat_max, lon_min, lon_max) -> pd.DataFrame:
+        return self._rows(self.bbox_positions(lat_min, lat_max, lon_min, lon_max))
+
+    # -------------------------
+    # great-circle radius / nearest neighbours
+    # -------------------------
+
+    def query_radius(self, lat, lon, radius_km) -> pd.DataFrame:
+        """
+        Batch radius query. lat/lon: scalars or arrays of query points.
+        Returns a long frame: query (position of the query point), row (position
+        in `frame`), distance_km; sorted by query, distance.
+        Query points without coordinates get no rows.
+        """
+        q, qpos = _query_points(lat, lon)
+        r = km_to_chord(radius_km)
+        if self._tree is not None:
+            hits = self._tree.query_ball_point(q, r)
+            qi = np.repeat(np.arange(len(q)), [len(h) for h in hits])
+            idx = np.fromiter((i for h in hits for i in h), dtype="int64", count=len(qi))
+        else:
+            qi, idx = [], []
+            for start in range(0, len(q), 1024):
+                d = np.linalg.norm(q[start:start + 1024, None, :] - self._xyz[None, :, :], axis=2)
+                a, b = np.nonzero(d <= r)
+                qi.append(a + start)
+                idx.append(b)
+            qi = np.concatenate(qi) if qi else np.zeros(0, "int64")
+            idx = np.concatenate(idx) if idx else np.zeros(0, "int64")
+        dist = chord_to_km(np.linalg.norm(q[qi] - self._xyz[idx], axis=1))
+        out = pd.DataFrame({"query": qpos[qi], "row": self._pos[idx], "distance_km": dist})
+        return out.sort_values(["query", "distance_km"], kind="stable").reset_index(drop=True)
+
+    def query_nearest(self, lat, lon, k=1, max_km=None) -> pd.DataFrame:
+        """
+        Batch k-nearest query. Returns a long frame: query, rank (1..k), row, distance_km.
+        Neighbours further than max_km (if given) are dropped, as are query
+        points without coordinates.
+        """
+        q, qpos = _query_points(lat, lon)
+        k = min(k, len(self._pos))
+        if k == 0 or len(q) == 0:
+            return pd.DataFrame({"query": [], "rank": [], "row": [], "distance_km": []})
+        if self._tree is not None:
+            chord, idx = self._tree.query(q, k=k)
+            chord, idx = chord.reshape(len(q), k), idx.reshape(len(q), k)
+        else:
+            chord = np.empty((len(q), k))
+            idx = np.empty((len(q), k), dtype="int64")
+            for start in range(0, len(q), 1024):
+                d = np.linalg.norm(q[start:start + 1024, None, :] - self._xyz[None, :, :], axis=2)
+                part = np.argpartition(d, k - 1, axis=1)[:, :k]
+                dp = np.take_along_axis(d, part, axis=1)
+                order = np.argsort(dp, axis=1)
+                idx[start:start + 1024] = np.take_along_axis(part, order, axis=1)
+                chord[start:start + 1024] = np.take_along_axis(dp, order, axis=1)
+        out = pd.DataFrame({
+            "query": np.repeat(qpos, k),
+            "rank": np.tile(np.arange(1, k + 1), len(q)),
+            "row": self._pos[idx.ravel()],
+            "distance_km": chord_to_km(chord.ravel()),
+        })
+        if max_km is not None:
+            out = out[out["distance_km"] <= max_km].reset_index(drop=True)
+        return out
+
+    def within(self, lat, lon, radius_km) -> pd.DataFrame:
+        """Rows within radius_km of one point, nearest first."""
+        hits = self.query_radius(lat, lon, radius_km)
+        out = self.frame.iloc[hits["row"].to_numpy()].copy()
+        out["distance_km"] = hits["distance_km"].to_numpy()
+        return out
+
+    def nearest(self, lat, lon, k=1) -> pd.DataFrame:
+        """The k rows nearest to one point, nearest first."""
+        hits = self.query_nearest(lat, lon, k=k)
+        out = self.frame.iloc[hits["row"].to_numpy()].copy()
+        out["distance_km"] = hits["distance_km"].to_numpy()
+        return out
+
+
+def nearest_precip_sites(site, precip_site, k=1, max_km=None) -> pd.DataFrame:
+    """
+    For every cave site, its k nearest precipitation sites:
+    site_id, precip_site_id, rank, distance_km (+ the names/coordinates).
+    """
+    index = SpatialIndex.from_precip_sites(precip_site)
+    hits = index.query_nearest(site["latitude"], site["longitude"], k=k, max_km=max_km)
+
+    left = site[["site_id", "site_name", "latitude", "longitude"]].iloc[hits["query"].to_numpy()]
+    right = precip_site[["precip_site_id", "precip_site_name", "precip_latitude", "precip_longitude"]] \
+        .iloc[hits["row"].to_numpy()]
+    return pd.concat([
+        left.reset_index(drop=True),
+        right.reset_index(drop=True),
+        hits[["rank", "distance_km"]].reset_index(drop=True),
+    ], axis=1)
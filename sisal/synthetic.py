@@ -0,0 +1,290 @@
+"""
+Synthetic SISAL_monv1 flat-CSV database (for benchmarks and smoke tests).
+
+Tables and columns follow sisal.schema (i.e. schema_SISAL_Monv1_v2.sql):
+ids link up (sites -> entities -> samples, site_link_*, entity_link_reference),
+ENUM columns take values from the SQL ENUMs, sample series are contiguous
+per entity (daily/weekly/monthly accumulation, ending by LAST_DATE), logger
+series are regular 15/30/60-minute hhmm timestamps, and every table has
+missing values at typical rates, except in the columns sisal.qc requires.
+A generated folder passes `sisal qc`. Sizes scale linearly with `scale`
+(1.0 ~ the current release).
+
+    tables = generate_tables(scale=10, seed=1)
+    write_synthetic("/tmp/sisal_x10", scale=10)
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from .schema import TABLE_DTYPES
+
+# rows at scale 1.0
+BASE_SIZES = {
+    "site": 300,
+    "precip_site": 250,
+    "reference": 600,
+    "cave_entity": 350,
+    "drip_entity": 900,
+    "precip_sample": 60_000,
+    "drip_iso_sample": 25_000,
+    "drip_rate_sample": 60_000,
+    "mod_carb_sample": 4_000,
+    "cave_temperature_sample": 200_000,
+    "cave_relative_humidity_sample": 80_000,
+    "cave_pCO2_sample": 40_000,
+}
+
+YES_NO = ["yes", "no", "unknown"]
+FREQUENCY = ["regular", "sporadic (see notes)", "other (see notes)", "unknown"]
+INSTRUMENT = ["logger", "hand-held", "other (see notes)", "unknown"]
+GEOLOGY = ["limestone", "dolomite", "marble", "dolomite limestone", "marly limestone",
+           "calcarenite", "mixed (see notes)", "other (see notes)", "unknown"]
+ROCK_AGE = ["Holocene", "Pleistocene", "Pliocene", "Miocene", "Oligocene", "Eocene", "Cretaceous",
+            "Jurassic", "Triassic", "Permian", "Carboniferous", "Devonian", "unknown"]
+SURFACE = ["stalagmite", "stalagmite scar", "glass plate", "other (see notes)", "unknown"]
+MINERALOGY = ["calcite", "aragonite", "mixed (see notes)", "other (see notes)", "unknown"]
+PRECIP_METHOD = ["IAEA/GNIP", "other (see notes)", "unknown"]
+
+# sample series start from 1995 and end by this date (the year range of sisal.qc)
+FIRST_DATE = pd.Timestamp("1995-01-01")
+LAST_DATE = pd.Timestamp("2024-12-31")
+
+# accumulation step (days) -> (unit, time) as recorded
+STEPS = {1: ("days", 1), 7: ("days", 7), 30: ("days", 30)}
+
+
+def _n(name, scale) -> int:
+    return max(int(round(BASE_SIZES[name] * scale)), 1)
+
+
+def _missing(rng, values, rate):
+    """values with a fraction `rate` set to NaN (float) / None (object)."""
+    values = np.asarray(values)
+    mask = rng.random(len(values)) < rate
+    if values.dtype.kind == "f":
+        return np.where(mask, np.nan, values)
+    out = values.astype(object)
+    out[mask] = None
+    return out
+
+
+def _names(prefix, n):
+    return np.array([f"{prefix} {i + 1}" for i in range(n)], dtype=object)
+
+
+def _frame(name, cols) -> pd.DataFrame:
+    """Columns in schema order (every declared column present)."""
+    return pd.DataFrame({c: cols.get(c, np.full(len(next(iter(cols.values()))), np.nan))
+                         for c in TABLE_DTYPES[name]})
+
+
+def _series_times(rng, entity, step_days, t0):
+    """Contiguous intervals per entity: start_k = t0 + k * step, end = start + step (ns)."""
+    order = np.argsort(entity, kind="stable")
+    ent = entity[order]
+    first = np.r_[True, ent[1:] != ent[:-1]]
+    k = np.arange(len(ent)) - np.maximum.accumulate(np.where(first, np.arange(len(ent)), 0))
+    step = step_days[ent] * 86_400 * 10**9
+    start = t0[ent] + k * step
+    return order, start, start + step
+
+
+def _split_dt(prefix, side, ns, rng, hhmm=True, miss_md=0.02, miss_hhmm=0.4):
+    t = pd.DatetimeIndex(ns.view("datetime64[ns]"))
+    p = f"{prefix}_{side}_" if side else f"{prefix}_"
+    cols = {
+        f"{p}yyyy": t.year.to_numpy(dtype="float64"),
+        f"{p}mm": _missing(rng, t.month.to_numpy(dtype="float64"), miss_md),
+        f"{p}dd": _missing(rng, t.day.to_numpy(dtype="float64"), miss_md),
+    }
+    if hhmm:
+        cols[f"{p}hhmm"] = _missing(rng, (t.hour * 100 + t.minute).to_numpy(dtype="float64"), miss_hhmm)
+    return cols
+
+
+def _sample_table(rng, name, prefix, key, entity_ids, n, values, hhmm=True, units=None, unit_missing=0.05):
+    """Sample table with contiguous accumulation series per entity, within FIRST_DATE .. LAST_DATE."""
+    entity = rng.choice(len(entity_ids), n)
+    step_days = rng.choice(list(STEPS), len(entity_ids), p=[0.3, 0.3, 0.4])
+    # series too long for the date range use a shorter step; the start is drawn so the series ends in time
+    days = (LAST_DATE - FIRST_DATE).days
+    counts = np.bincount(entity, minlength=len(entity_ids))
+    step_days = np.where(counts * step_days > days, np.maximum(days // np.maximum(counts, 1), 1), step_days)
+    slack = np.maximum(days - counts * step_days, 0)
+    t0 = FIRST_DATE.value + (rng.random(len(entity_ids)) * slack).astype("int64") * 86_400 * 10**9
+    order, start, end = _series_times(rng, entity, step_days, t0)
+    ent = entity[order]
+
+    cols = {key: entity_ids[ent], f"{prefix}_sample_id": np.arange(1, n + 1)}
+    cols.update(_split_dt(prefix, "start", start, rng, hhmm))
+    cols.update(_split_dt(prefix, "end", end, rng, hhmm, miss_md=0.05))
+    unit_time = [STEPS.get(s, ("days", s)) for s in step_days[ent]]
+    cols[f"{prefix}_accumulation_unit"] = _missing(
+        rng, np.array([u for u, _ in unit_time], dtype=object) if units is None else rng.choice(units, n),
+        unit_missing)
+    cols[f"{prefix}_accumulation_time"] = _missing(rng, np.array([t for _, t in unit_time], dtype="float64"), 0.05)
+    for col, (mean, sd, miss) in values.items():
+        cols[col] = _missing(rng, rng.normal(mean, sd, n).round(2), miss)
+    return _frame(name, cols)
+
+
+def _logger_table(rng, name, prefix, cave_ids, n, mean, sd, bounds=(None, None)):
+    """Regular 15/30/60-minute logger series per cave entity."""
+    entity = rng.choice(len(cave_ids), n)
+    minutes = rng.choice([15, 30, 60], len(cave_ids))
+    t0 = pd.Timestamp("2008-01-01").value + rng.integers(0, 10 * 365, len(cave_ids)) * 86_400 * 10**9
+    order = np.argsort(entity, kind="stable")
+    ent = entity[order]
+    first = np.r_[True, ent[1:] != ent[:-1]]
+    k = np.arange(n) - np.maximum.accumulate(np.where(first, np.arange(n), 0))
+    ns = t0[ent] + k * minutes[ent] * 60 * 10**9
+
+    cols = {"cave_entity_id": cave_ids[ent], f"{prefix}_sample_id": np.arange(1, n + 1)}
+    cols.update(_split_dt(prefix, None, ns, rng, miss_md=0.0, miss_hhmm=0.01))
+    cols[f"{prefix}_number"] = np.ones(n)
+    # slow seasonal signal + noise, with logger gaps
+    season = np.sin(2 * np.pi * (ns / (365.25 * 86_400 * 10**9)))
+    values = (mean + sd * season + rng.normal(0, sd / 5, n)).clip(*bounds).round(3)
+    cols[f"{prefix}_measurement"] = _missing(rng, values, 0.02)
+    cols[f"{prefix}_precision"] = _missing(rng, np.full(n, sd / 20), 0.3)
+    return _frame(name, cols)
+
+
+def generate_tables(scale=1.0, seed=0) -> dict:
+    """All tables of the flat-CSV database as DataFrames {name: df}."""
+    rng = np.random.default_rng(seed)
+    n_site, n_psite = _n("site", scale), _n("precip_site", scale)
+    n_ref, n_cave, n_drip = _n("reference", scale), _n("cave_entity", scale), _n("drip_entity", scale)
+
+    site_id = np.arange(1, n_site + 1)
+    lat, lon = rng.uniform(-50, 70, n_site).round(4), rng.uniform(-180, 180, n_site).round(4)
+    t = {}
+    t["site"] = _frame("site", {
+        "site_id": site_id, "site_name": _names("Cave", n_site),
+        "latitude": lat, "longitude": lon, "elevation": rng.uniform(0, 3000, n_site).round(1),
+    })
+    t["notes"] = _frame("notes", {
+        "site_id": rng.choice(site_id, n_site // 2),
+        "notes": _missing(rng, _names("note", n_site // 2), 0.1),
+    })
+    ref_id = np.arange(1, n_ref + 1)
+    t["reference"] = _frame("reference", {
+        "ref_id": ref_id,
+        "citation": np.array([f"Author {i} et al. ({1990 + i % 35})" for i in ref_id], dtype=object),
+        "publication_DOI": _missing(rng, np.array([f"10.{1000 + i % 50}/sisal.{i}" for i in ref_id], dtype=object), 0.2),
+    })
+
+    # precipitation stations near the caves
+    psite_id = np.arange(1, n_psite + 1)
+    near = rng.choice(n_site, n_psite)
+    t["precip_site"] = _frame("precip_site", {
+        "precip_site_id": psite_id, "precip_site_name": _names("Station", n_psite),
+        "precip_latitude": (lat[near] + rng.normal(0, 0.5, n_psite)).clip(-90, 90).round(4),
+        "precip_longitude": ((lon[near] + rng.normal(0, 0.5, n_psite) + 180) % 360 - 180).round(4),
+        "precip_elevation": rng.uniform(0, 3000, n_psite).round(1),
+        "precip_distance_cave_entrance": rng.exponential(20, n_psite).round(1),
+    })
+    pent_id = psite_id.copy()                                  # one entity per station
+    t["precip_entity"] = _frame("precip_entity", {
+        "precip_entity_id": pent_id, "precip_entity_name": _names("Precip entity", n_psite),
+        "precip_method": rng.choice(PRECIP_METHOD, n_psite),
+        "precip_entity_contact": _missing(rng, _names("contact", n_psite), 0.5),
+    })
+    t["site_link_precip"] = _frame("site_link_precip", {
+        "site_id": site_id[near], "precip_site_id": psite_id, "precip_entity_id": pent_id,
+    })
+
+    cave_id = np.arange(1, n_cave + 1)
+    t["cave_entity"] = _frame("cave_entity", {
+        "site_id": rng.choice(site_id, n_cave), "cave_entity_id": cave_id,
+        "cave_entity_name": _names("Cave entity", n_cave),
+        "cave_entity_location": _missing(rng, _names("chamber", n_cave), 0.3),
+        **{f"cave_{v}": rng.choice(YES_NO, n_cave) for v in ("temperature", "relative_humidity", "pCO2")},
+        **{f"cave_{v}_frequency": rng.choice(FREQUENCY, n_cave) for v in ("temperature", "relative_humidity", "pCO2")},
+        **{f"cave_{v}_instrument": rng.choice(INSTRUMENT, n_cave) for v in ("temperature", "relative_humidity", "pCO2")},
+        "cave_entity_contact": _missing(rng, _names("contact", n_cave), 0.5),
+    })
+    drip_id = np.arange(1, n_drip + 1)
+    t["drip_entity"] = _frame("drip_entity", {
+        "site_id": rng.choice(site_id, n_drip), "drip_entity_id": drip_id,
+        "drip_entity_name": _names("Drip", n_drip),
+        "entity_id": _missing(rng, rng.integers(1, 2001, n_drip).astype("float64"), 0.7),   # SISAL entity
+        "geology": rng.choice(GEOLOGY, n_drip), "rock_age": rng.choice(ROCK_AGE, n_drip),
+        "drip_entity_location": _missing(rng, _names("gallery", n_drip), 0.3),
+        "drip_iso": rng.choice(YES_NO, n_drip), "drip_iso_method": _missing(rng, rng.choice(["IRMS", "CRDS"], n_drip), 0.2),
+        "drip_rate": rng.choice(YES_NO, n_drip), "drip_rate_frequency": rng.choice(FREQUENCY, n_drip),
+        "drip_rate_instrument": rng.choice(INSTRUMENT, n_drip),
+        "mod_carb": rng.choice(YES_NO, n_drip), "mod_carb_method": _missing(rng, rng.choice(["IRMS"], n_drip), 0.4),
+        "drip_entity_contact": _missing(rng, _names("contact", n_drip), 0.5),
+    })
+
+    t["site_link_reference"] = _frame("site_link_reference", {
+        "site_id": rng.choice(site_id, n_site * 2), "ref_id": rng.choice(ref_id, n_site * 2),
+    }).drop_duplicates()
+    n_elr = n_drip + n_psite + n_cave
+    kind = rng.choice(3, n_elr)
+    t["entity_link_reference"] = _frame("entity_link_reference", {
+        "precip_entity_id": np.where(kind == 0, rng.choice(pent_id, n_elr), np.nan),
+        "cave_entity_id": np.where(kind == 1, rng.choice(cave_id, n_elr), np.nan),
+        "drip_entity_id": np.where(kind == 2, rng.choice(drip_id, n_elr), np.nan),
+        "ref_id": rng.choice(ref_id, n_elr),
+    })
+
+    t["precip_sample"] = _sample_table(rng, "precip_sample", "precip", "precip_entity_id", pent_id,
+                                       _n("precip_sample", scale), {
+                                           "precip_amount": (60, 40, 0.1),
+                                           "precip_d18O_measurement": (-8, 3, 0.1),
+                                           "precip_d18O_precision": (0.1, 0.02, 0.4),
+                                           "precip_d2H_measurement": (-55, 20, 0.3),
+                                           "precip_d2H_precision": (1, 0.2, 0.5),
+                                       }, unit_missing=0.0)
+    t["precip_sample"]["precip_amount"] = t["precip_sample"]["precip_amount"].abs()
+    t["drip_iso_sample"] = _sample_table(rng, "drip_iso_sample", "drip_iso", "drip_entity_id", drip_id,
+                                         _n("drip_iso_sample", scale), {
+                                             "drip_iso_d18O_measurement": (-6, 1.5, 0.05),
+                                             "drip_iso_d18O_precision": (0.1, 0.02, 0.4),
+                                             "drip_iso_d2H_measurement": (-40, 10, 0.3),
+                                             "drip_iso_d2H_precision": (1, 0.2, 0.5),
+                                         })
+    t["drip_rate_sample"] = _sample_table(rng, "drip_rate_sample", "drip_rate", "drip_entity_id", drip_id,
+                                          _n("drip_rate_sample", scale), {
+                                              "drip_rate_measurement": (5, 2, 0.05),
+                                              "drip_rate_precision": (0.1, 0.05, 0.5),
+                                          })
+    t["mod_carb_sample"] = _sample_table(rng, "mod_carb_sample", "mod_carb", "drip_entity_id", drip_id,
+                                         _n("mod_carb_sample", scale), {
+                                             "mod_carb_d18O_measurement": (-5, 1, 0.05),
+                                             "mod_carb_d18O_precision": (0.05, 0.01, 0.4),
+                                             "mod_carb_d13C_measurement": (-9, 2, 0.05),
+                                             "mod_carb_d13C_precision": (0.05, 0.01, 0.4),
+                                         }, hhmm=False, units=["years", "months", "days", "unknown"])
+    mc = t["mod_carb_sample"]
+    mc["mod_carb_surface"] = rng.choice(SURFACE, len(mc))
+    mc["mod_carb_mineralogy"] = rng.choice(MINERALOGY, len(mc))
+
+    for name, prefix, mean, sd, bounds in (
+            ("cave_temperature_sample", "cave_temperature", 12, 3, (None, None)),
+            ("cave_relative_humidity_sample", "cave_relative_humidity", 95, 3, (0, 100)),
+            ("cave_pCO2_sample", "cave_pCO2", 2000, 800, (0, None))):
+        t[name] = _logger_table(rng, name, prefix, cave_id, _n(name, scale), mean, sd, bounds)
+
+    # integer id columns as nullable ints (as the CSVs are read back)
+    for name, df in t.items():
+        for col, dtype in TABLE_DTYPES[name].items():
+            if dtype == "Int64":
+                df[col] = pd.array(np.asarray(df[col], dtype="float64"), dtype="Float64").astype("Int64")
+    return t
+
+
+def write_synthetic(folder, scale=1.0, seed=0, tables=None) -> dict:
+    """Write the synthetic tables as <folder>/<name>.csv; returns {name: path}."""
+    os.makedirs(folder, exist_ok=True)
+    tables = tables or generate_tables(scale, seed)
+    paths = {}
+    for name, df in tables.items():
+        paths[name] = os.path.join(folder, f"{name}.csv")
+        df.to_csv(paths[name], index=False)
+    return paths
@@ -0,0 +1,183 @@
+"""
+Long-format time-series store over all sample tables.
+
+Every measurement becomes one row (entity_id, variable, start, end, value,
+precision), built once and sorted by variable, entity and start time, so the
+rows of one (variable, entity) are a contiguous slice. Queries are binary
+searches on that order instead of merges over the wide tables:
+
+    ts = TimeSeriesStore.build({"cave_temperature_sample": cave_temperature_sample,
+                                "drip_iso_sample": drip_iso_sample})
+    ts.variables                                     # ['cave_temperature', 'drip_iso_d18O', ...]
+    ts.series("cave_temperature", entity_id=3, start="2015-01-01", end="2016-01-01")
+    ts.series("drip_iso_d18O")                       # all entities
+
+Timestamps are UTC (sample_start_end); point-time logger rows have start == end.
+"""
+
+import numpy as np
+import pandas as pd
+
+from .coverage import ENTITY_KEYS, _ns
+from .dates import sample_start_end
+
+# variable -> (sample table, value column, precision column or None)
+SERIES_SPECS = {
+    "drip_iso_d18O": ("drip_iso_sample", "drip_iso_d18O_measurement", "drip_iso_d18O_precision"),
+    "drip_iso_d2H": ("drip_iso_sample", "drip_iso_d2H_measurement", "drip_iso_d2H_precision"),
+    "drip_rate": ("drip_rate_sample", "drip_rate_measurement", "drip_rate_precision"),
+    "mod_carb_d18O": ("mod_carb_sample", "mod_carb_d18O_measurement", "mod_carb_d18O_precision"),
+    "mod_carb_d13C": ("mod_carb_sample", "mod_carb_d13C_measurement", "mod_carb_d13C_precision"),
+    "precip_amount": ("precip_sample", "precip_amount", None),
+    "precip_d18O": ("precip_sample", "precip_d18O_measurement", "precip_d18O_precision"),
+    "precip_d2H": ("precip_sample", "precip_d2H_measurement", "precip_d2H_precision"),
+    "cave_temperature": ("cave_temperature_sample", "cave_temperature_measurement", "cave_temperature_precision"),
+    "cave_relative_humidity": ("cave_relative_humidity_sample", "cave_relative_humidity_measurement",
+                               "cave_relative_humidity_precision"),
+    "cave_pCO2": ("cave_pCO2_sample", "cave_pCO2_measurement", "cave_pCO2_precision"),
+}
+
+# entity_id < 2**40 (the composite key is variable code << 40 | entity_id)
+_ENTITY_BITS = 40
+
+
+def _float(df, col) -> np.ndarray:
+    if col is None or col not in df:
+        return np.full(len(df), np.nan)
+    return pd.to_numeric(df[col], errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+
+
+class TimeSeriesStore:
+    """Columnar long-format store; one contiguous slice per (variable, entity)."""
+
+    def __init__(self, variables, var_code, entity, start, end, value, precision):
+        self.variables = list(variables)       # code -> variable name
+        self._var = var_code                   # int arrays, all sorted by (var, entity, start)
+        self._entity = entity
+        self._start = start                    # ns since epoch (UTC)
+        self._end = end
+        self._value = value
+        self._precision = precision
+        self._key = (var_code.astype("int64") << _ENTITY_BITS) | entity
+
+    @classmethod
+    def build(cls, tables, variables=None):
+        """
+        tables: {sample table name: DataFrame}; variables: subset of SERIES_SPECS
+        (default: every variable whose table is given). Rows without a value
+        or a valid timestamp are dropped.
+        """
+        if variables is None:
+            variables = [v for v, (t, _, _) in SERIES_SPECS.items() if t in tables]
+        unknown = sorted(set(variables) - set(SERIES_SPECS))
+        if unknown:
+            raise KeyError(f"Unknown variable(s): {', '.join(unknown)}")
+
+        times = {}                                  # table -> (start ns, end ns, ok mask, entity)
+        parts = []
+        for code, var in enumerate(variables):
+            table, value_col, precision_col = SERIES_SPECS[var]
+            df = tables[table]
+            if table not in times:
+                start_dt, end_dt = sample_start_end(df, table)
+                start = start_dt.dt.tz_localize(None).to_numpy("datetime64[ns]").view("int64")
+                end = end_dt.dt.tz_localize(None).to_numpy("datetime64[ns]").view("int64")
+                key = ENTITY_KEYS[table]
+                ok = start_dt.notna().to_numpy() & df[key].notna().to_numpy()
+                entity = df[key].to_numpy(dtype="int64", na_value=-1)
+                times[table] = (start, end, ok, entity)
+            start, end, ok, entity = times[table]
+
+            value = _float(df, value_col)
+            keep = np.flatnonzero(ok & ~np.isnan(value))
+            parts.append((
+                np.full(len(keep), code, dtype="int16"),
+                entity[keep], start[keep], end[keep],
+                value[keep], _float(df, precision_col)[keep],
+            ))
+
+        if parts:
+            var_code, entity, start, end, value, precision = (np.concatenate(c) for c in zip(*parts))
+        else:
+            var_code = np.zeros(0, "int16")
+            entity, start, end = (np.zeros(0, "int64") for _ in range(3))
+            value, precision = np.zeros(0), np.zeros(0)
+
+        order = np.lexsort((start, entity, var_code))
+        return cls(variables, var_code[order], entity[order], start[order], end[order],
+                   value[order], precision[order])
+
+    def __len__(self):
+        return len(self._value)
+
+    def _code(self, variable) -> int:
+        try:
+            return self.variables.index(variable)
+        except ValueError:
+            raise KeyError(f"Variable not in store: {variable} (have: {', '.join(self.variables)})") from None
+
+    def _slice(self, variable, entity_id=None):
+        """Row range of one variable (and entity) in the sorted arrays."""
+        code = np.int64(self._code(variable)) << _ENTITY_BITS
+        if entity_id is None:
+            lo, hi = code, code + (1 << _ENTITY_BITS) - 1
+        else:
+            lo = hi = code | int(entity_id)
+        return (int(np.searchsorted(self._key, lo, "left")),
+                int(np.searchsorted(self._key, hi, "right")))
+
+    def entities(self, variable) -> np.ndarray:
+        """Entity ids that have data for `variable`."""
+        lo, hi = self._slice(variable)
+        return np.unique(self._entity[lo:hi])
+
+    def series(self, variable, entity_id=None, start=None, end=None) -> pd.DataFrame:
+        """
+        Rows of one variable (optionally one entity) whose [start, end] overlaps
+        the window [start, end] (either side may be None); sorted by entity, time.
+        """
+        lo, hi = self._slice(variable, entity_id)
+        idx = np.arange(lo, hi)
+        if end is not None and entity_id is not None:
+            # one entity: starts are sorted, cut the tail by binary search
+            hi = lo + int(np.searchsorted(self._start[lo:hi], _ns(end), "right"))
+            idx = idx[:hi - lo]
+        mask = np.ones(len(idx), dtype=bool)
+        if end is not None:
+            mask &= self._start[idx] <= _ns(end)
+        if start is not None:
+            mask &= self._end[idx] >= _ns(start)
+        idx = idx[mask]
+        return pd.DataFrame({
+            "entity_id": self._entity[idx],
+            "variable": variable,
+            "start_dt": pd.to_datetime(self._start[idx], utc=True),
+            "end_dt": pd.to_datetime(self._end[idx], utc=True),
+            "value": self._value[idx],
+            "precision": self._precision[idx],
+        })
+
+    def to_frame(self) -> pd.DataFrame:
+        """The whole store as one long DataFrame (variable as a categorical)."""
+        return pd.DataFrame({
+            "entity_id": self._entity,
+            "variable": pd.Categorical.from_codes(self._var, categories=self.variables),
+            "start_dt": pd.to_datetime(self._start, utc=True),
+            "end_dt": pd.to_datetime(self._end, utc=True),
+            "value": self._value,
+            "precision": self._precision,
+        })
+
+    def summary(self) -> pd.DataFrame:
+        """Rows, first/last timestamp per (variable, entity)."""
+        df = pd.DataFrame({"code": self._var, "entity_id": self._entity,
+                           "start": self._start, "end": self._end})
+        g = df.groupby(["code", "entity_id"], sort=True)
+        out = g.agg(n=("start", "size"), first=("start", "min"), last=("end", "max")).reset_index()
+        return pd.DataFrame({
+            "variable": pd.Categorical.from_codes(out["code"].to_numpy(), categories=self.variables),
+            "entity_id": out["entity_id"].to_numpy(),
+            "n": out["n"].to_numpy(),
+            "first": pd.to_datetime(out["first"].to_numpy(), utc=True),
+            "last": pd.to_datetime(out["last"].to_numpy(), utc=True),
+        })
@@ -3,196 +3,96 @@
 # (translation of the provided R script)
 # ============================================================
 
-# pip install pandas sqlalchemy pymysql openpyxl
+# pip install pandas sqlalchemy pymysql xlsxwriter pyarrow
+#
+# Run as a script (python sisal_connect2db_v3.py) or from the command line tool:
+#   sisal export --sites "Obir" --out SISAL_monv1_export_examples_PY.xlsx
+# Importing this file runs nothing (main() does the work).
 
-import pandas as pd
-from sqlalchemy import create_engine, text
+from sisal import instrument
+from sisal.db import Database
+from sisal.export import export_tables
+from sisal.report import report_tables
 
 # -------------------------
 # 1) CONNECTION SETTINGS
 # -------------------------
-MYSQL_HOST = "localhost"
-MYSQL_PORT = 3306
-MYSQL_USER = "root"
-MYSQL_PASSWORD = "password"   # <- change this
-MYSQL_DB = "sisal_monv1"      # <- important
-
-# SQLAlchemy engine (PyMySQL driver)
-engine = create_engine(
-    f"mysql+pymysql://{MYSQL_USER}:{MYSQL_PASSWORD}@{MYSQL_HOST}:{MYSQL_PORT}/{MYSQL_DB}"
-    "?charset=utf8mb4"
-)
-
-# Optional: allow long GROUP_CONCAT results for citations
-with engine.begin() as conn:
-    conn.execute(text("SET SESSION group_concat_max_len = 100000;"))
-
-# Quick smoke test
-with engine.begin() as conn:
-    n_sites = pd.read_sql("SELECT COUNT(*) AS n_sites FROM site;", conn)
-print(n_sites)
+# Credentials are read from the environment (or an INI file given in SISAL_DB_CONFIG):
+#   DB_HOST=localhost  DB_PORT=3306  DB_USER=root  DB_PASSWORD=...  DB_NAME=sisal_monv1
+# Every pooled connection gets SET SESSION group_concat_max_len = 100000
+# (long GROUP_CONCAT results for citations).
+#
+# No MySQL server? The same queries run in-process on the flat CSV/Parquet files
+# (DuckDB; GROUP_CONCAT is translated to string_agg), with the same query API:
+# from sisal.duck import DuckDatabase
+# main(db=DuckDatabase.from_folder(r"E:/Google Drive/flat_csv_db_v8.0"))
 
 # -------------------------
 # 2) PARAMETERS
 # -------------------------
-site_name_example = "REPLACE_WITH_SITE_NAME"  # <- set this
+SITE_NAMES = ["REPLACE_WITH_SITE_NAME"]  # <- set this (any number of sites; or use site_ids=[...])
 
-# -------------------------
-# 3) SQL QUERIES
-# -------------------------
+# xlsx: streaming writer (xlsxwriter, constant memory); sheets longer than Excel's
+# 1,048,576 rows continue on <name>_2, <name>_3, ...
+# For large/global pulls prefer "parquet" (or "feather", "csv.gz"):
+# one file per sheet in the folder out_path, written in parallel.
+EXPORT_FORMAT = "xlsx"
 
-# 3.0) Site entity counts
-site_entity_counts_sql = """
-SELECT
-  s.site_id, s.site_name, s.latitude, s.longitude, s.elevation,
-  COUNT(DISTINCT cem.cave_entity_id)   AS cave_entity_count,
-  COUNT(DISTINCT dem.drip_entity_id)   AS drip_entity_count,
-  COUNT(DISTINCT pem.precip_entity_id) AS precip_entity_count,
-  ( COUNT(DISTINCT cem.cave_entity_id)
-  + COUNT(DISTINCT dem.drip_entity_id)
-  + COUNT(DISTINCT pem.precip_entity_id)
-  ) AS entity_count
-FROM site s
-LEFT JOIN cave_entity cem  ON cem.site_id = s.site_id
-LEFT JOIN drip_entity dem  ON dem.site_id = s.site_id
-LEFT JOIN site_link_precip slp      ON slp.site_id = s.site_id
-LEFT JOIN precip_entity pem ON pem.precip_entity_id = slp.precip_entity_id
-GROUP BY s.site_id, s.site_name, s.latitude, s.longitude, s.elevation
-ORDER BY s.site_id;
-"""
-
-# 3.1) Drip isotope sample for a site_name
-drip_iso_sample_sql = """
-SELECT
-  s.site_name,
-  d.drip_entity_id,
-  d.drip_entity_name,
-  di.drip_iso_start_yyyy, di.drip_iso_start_mm, di.drip_iso_start_dd,
-  di.drip_iso_end_yyyy,   di.drip_iso_end_mm,   di.drip_iso_end_dd,
-  di.drip_iso_d18O_measurement,
-  di.drip_iso_d2H_measurement,
-  (di.drip_iso_d2H_measurement - 8 * di.drip_iso_d18O_measurement) AS d_excess
-FROM site s
-JOIN drip_entity d ON d.site_id = s.site_id
-JOIN drip_iso_sample di ON di.drip_entity_id = d.drip_entity_id
-WHERE s.site_name = :site_name
-ORDER BY d.drip_entity_id, di.drip_iso_start_yyyy, di.drip_iso_start_mm, di.drip_iso_start_dd;
-"""
-
-# 3.2) Drip rate sample for a site_name
-drip_rate_sample_sql = """
-SELECT
-  s.site_name,
-  d.drip_entity_id,
-  d.drip_entity_name,
-  dr.drip_rate_start_yyyy, dr.drip_rate_start_mm, dr.drip_rate_start_dd,
-  dr.drip_rate_end_yyyy,   dr.drip_rate_end_mm,   dr.drip_rate_end_dd,
-  dr.drip_rate_measurement,
-  dr.drip_rate_precision
-FROM site s
-JOIN drip_entity d
-  ON d.site_id = s.site_id
-JOIN drip_rate_sample dr
-  ON dr.drip_entity_id = d.drip_entity_id
-WHERE s.site_name = :site_name
-ORDER BY
-  d.drip_entity_id,
-  dr.drip_rate_start_yyyy,
-  dr.drip_rate_start_mm,
-  dr.drip_rate_start_dd;
-"""
-
-# 3.3) Precip sample for a site_name (using site_link_precip logic)
-precip_sample_sql = """
-SELECT
-  s.site_name,
-  psm.precip_site_name,
-  pem.precip_entity_id,
-  pem.precip_entity_name,
-  p.precip_start_yyyy, p.precip_start_mm, p.precip_start_dd,
-  p.precip_end_yyyy,   p.precip_end_mm,   p.precip_end_dd,
-  p.precip_amount,
-  p.precip_d18O_measurement,
-  p.precip_d2H_measurement,
-  (p.precip_d2H_measurement - 8 * p.precip_d18O_measurement) AS d_excess
-FROM site s
-JOIN site_link_precip slp
-  ON slp.site_id = s.site_id
-JOIN precip_site psm
-  ON psm.precip_site_id = slp.precip_site_id
-JOIN precip_entity pem
-  ON pem.precip_entity_id = slp.precip_entity_id
-JOIN precip_sample p
-  ON p.precip_entity_id = pem.precip_entity_id
-WHERE s.site_name = :site_name
-ORDER BY
-  pem.precip_entity_id,
-  p.precip_start_yyyy,
-  p.precip_start_mm,
-  p.precip_start_dd;
-"""
-
-
-# 3.6) Site-only references for ALL sites
-site_refs_siteonly_sql = """
-SELECT
-  s.site_id,
-  s.site_name,
-  s.latitude,
-  s.longitude,
-  s.elevation,
-  GROUP_CONCAT(DISTINCT r.citation ORDER BY r.citation SEPARATOR ' ; ')        AS citations,
-  GROUP_CONCAT(DISTINCT r.publication_DOI ORDER BY r.publication_DOI SEPARATOR ' ; ') AS publication_DOI
-FROM site s
-LEFT JOIN site_link_reference slr ON slr.site_id = s.site_id
-LEFT JOIN reference r             ON r.ref_id   = slr.ref_id
-GROUP BY s.site_id, s.site_name, s.latitude, s.longitude, s.elevation
-ORDER BY s.site_id;
-"""
-
-# 3.5) Global metadata example (optional; included here because it exists in your R)
-global_sql = """
-SELECT DISTINCT s.site_name, s.site_id, 
-precip.precip_site_id,
-precip.precip_site_name, 
-cave_entity.cave_entity_id,
-cave_entity.cave_entity_name,
-cave_entity.cave_entity_location,
-cave_entity.cave_entity_contact,
-drip_entity.*, s.latitude, s.longitude
-FROM site s
-LEFT JOIN site_link_precip sp_link ON s.site_id = sp_link.site_id
-LEFT JOIN precip_site precip ON precip.precip_site_id = sp_link.precip_site_id
-LEFT JOIN cave_entity ON s.site_id = cave_entity.site_id
-LEFT JOIN drip_entity ON s.site_id = drip_entity.site_id
-WHERE 1 = 1  and s.latitude between -90 and 90
-and s.longitude between -180 and 180
-"""
-
-# -------------------------
-# 4) RUN QUERIES
 # -------------------------
-params = {"site_name": site_name_example}
-
-with engine.begin() as conn:
-    site_summary = pd.read_sql(site_entity_counts_sql, conn)
-    drip_iso_df = pd.read_sql(text(drip_iso_sample_sql), conn, params=params)
-    drip_rate_df = pd.read_sql(text(drip_rate_sample_sql), conn, params=params)
-    precip_df = pd.read_sql(text(precip_sample_sql), conn, params=params)
-    site_refs_siteonly = pd.read_sql(site_refs_siteonly_sql, conn)
-    global_df = pd.read_sql(global_sql, conn)  # optional
-
-# -------------------------
-# 5) EXPORT TO EXCEL
+# 3) SQL QUERIES
 # -------------------------
-out_xlsx = "SISAL_monv1_export_examples_PY.xlsx"
-
-with pd.ExcelWriter(out_xlsx, engine="openpyxl") as writer:
-    site_summary.to_excel(writer, sheet_name="site_summary", index=False)
-    drip_iso_df.to_excel(writer, sheet_name="drip_iso_example", index=False)
-    drip_rate_df.to_excel(writer, sheet_name="drip_rate_example", index=False)
-    precip_df.to_excel(writer, sheet_name="precip_example", index=False)
-    site_refs_siteonly.to_excel(writer, sheet_name="refs_siteonly", index=False)
-    global_df.to_excel(writer, sheet_name="global", index=False)  # optional
-
-print("Wrote Excel file:", out_xlsx)
+# The queries live in sisal/queries.py, shared by the MySQL and the DuckDB backend:
+# 3.0) Site entity counts: SITE_ENTITY_COUNTS_SQL
+# 3.1-3.3) Drip isotope / drip rate / precip samples for a LIST of sites:
+#   SITE_SAMPLE_SQL, one query per data type with an IN-list over site names
+#   (or site_ids) instead of one query per site; site_id + site_name on every row.
+# 3.5) Global metadata example (optional; as Global_sql in the R script): GLOBAL_SQL
+# 3.6) Site-only references for ALL sites (GROUP_CONCAT of citations / DOIs per site):
+#   SITE_REFS_SITEONLY_SQL
+# sisal/report.py runs them and names the sheets as in the R script's workbook.
+
+# Large pulls (e.g. a global precip_sample / drip_rate_sample): stream in chunks through a
+# server-side cursor straight into a file; memory is bounded by chunksize.
+# db.stream_to("SELECT * FROM precip_sample;", "precip_sample.parquet", chunksize=100_000)
+# for chunk in db.stream("SELECT * FROM drip_rate_sample;", chunksize=100_000):
+#     ...
+
+
+def main(site_names=SITE_NAMES, site_ids=None, export_format=EXPORT_FORMAT, out_path=None, db=None) -> dict:
+    """Run the queries and write the export; returns the sheets {name: DataFrame}."""
+    # Profiling (off unless SISAL_PROFILE is set): time, rows and memory per query and
+    # export, JSON report to $SISAL_PROFILE; queries slower than $SISAL_SLOW_QUERY_S
+    # (default 1 s) are logged with their parameters (logger "sisal.slow_query")
+    instrument.enable_from_env()
+
+    if db is None:
+        db = Database.from_env(pool_size=5, pool_recycle=3600)
+    if out_path is None:
+        out_path = "SISAL_monv1_export_examples_PY.xlsx" if export_format == "xlsx" else "SISAL_monv1_export_examples_PY"
+
+    # -------------------------
+    # 4) RUN QUERIES
+    # -------------------------
+    instrument.section("4) Run queries")
+    n_sites = db.query("SELECT COUNT(*) AS n_sites FROM site;")
+    print(n_sites)
+
+    # report queries on ONE pooled connection; per-site sample data: the three data
+    # types run concurrently on separate pooled connections
+    if site_ids is not None:
+        site_names = None
+    sheets = report_tables(db, site_names=site_names, site_ids=site_ids)
+
+    # -------------------------
+    # 5) EXPORT (Excel by default)
+    # -------------------------
+    instrument.section("5) Export")
+    export_tables(sheets, out_path, fmt=export_format)
+    instrument.end_section()
+
+    print("Wrote export:", out_path)
+    return sheets
+
+
+if __name__ == "__main__":
+    main()
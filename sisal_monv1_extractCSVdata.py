@@ -4,659 +4,347 @@ SISAL_monv1 flat-CSV query cookbook (Python / pandas)
 - Loads all CSVs from one folder
 - Builds common "queries" using merges (no SQL)
 ########################################################
+
+Run it as a script (python sisal_monv1_extractCSVdata.py) or call main();
+importing this file runs nothing. Single steps from the command line:
+sisal load / sisal derive / sisal maps (see sisal/cli.py).
 """
 
 # 0) Packages
-# pip install pandas numpy matplotlib
-import os
-import glob
+# pip install pandas numpy matplotlib pyarrow
 import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
+
+from sisal import instrument
+from sisal.intervals import drip_precip_means, drip_precip_pairs
+from sisal.loader import default_cache_dir
+from sisal.isotopes import drip_water_line, lmwl
+from sisal.maps import plot_maps, site_layers
+from sisal.materialize import Materializer
+from sisal.pipeline import Pipeline
+from sisal.registry import SisalDB
+from sisal.schema import CAVE_ENV_TABLES, REQUIRED_TABLES
+from sisal.spatial import SpatialIndex
+from sisal.timeseries import TimeSeriesStore
 
 
 # ========================================================
 # 1) CSV loader
 # Important: put ONLY the SISAL_monv1 CSV tables in this folder.
 # ========================================================
+FOLDER_PATH = r"E:/Google Drive/flat_csv_db_v8.0"   # <-- change
 
-folder_path = r"E:/Google Drive/flat_csv_db_v8.0"   # <-- change
-
-csv_files = glob.glob(os.path.join(folder_path, "*.csv"))
-if len(csv_files) == 0:
-    raise FileNotFoundError("No .csv files found in folder_path. Check the path and contents.")
-
-# Read + store by file name (without .csv) into a dict called `tables`
-tables = {}
-for file in csv_files:
-    name = os.path.splitext(os.path.basename(file))[0]
-    print(f"Reading: {name}")
-    tables[name] = pd.read_csv(file, low_memory=False)
-
-# Optional: also expose as variables (like R GlobalEnv). Use with care.
-globals().update(tables)
-
-
-# ========================================================
-# 2) Sanity checks: required tables present?
-# ========================================================
-
-required_tables = [
-    "site", "notes", "reference",
-    "site_link_precip", "site_link_reference", "entity_link_reference",
-    "precip_site", "precip_entity", "precip_sample",
-    "cave_entity",
-    "drip_entity", "drip_iso_sample", "drip_rate_sample", "mod_carb_sample"
-]
-
-missing = sorted(set(required_tables) - set(tables.keys()))
-if missing:
-    raise KeyError(f"Missing required table(s): {', '.join(missing)}")
-
-
-# ========================================================
-# 3) Helpers
-# ========================================================
-
-def clean_empty_to_na(df: pd.DataFrame) -> pd.DataFrame:
-    """Trim string columns; convert empty strings to NaN."""
-    df = df.copy()
-    obj_cols = df.select_dtypes(include=["object"]).columns
-    for c in obj_cols:
-        df[c] = df[c].astype("string").str.strip()
-        df[c] = df[c].replace("", pd.NA)
-    return df
-
-def collapse_unique(values, sep=" ; "):
-    """Collapse unique non-null values into a single string; return NA if none."""
-    ser = pd.Series(values).dropna().astype(str)
-    if ser.empty:
-        return pd.NA
-    return sep.join(pd.unique(ser))
-
-def make_dt(yyyy, mm=None, dd=None, hhmm=None, tz="UTC",
-            default_mm=6, default_dd=15, default_hhmm=1200) -> pd.Series:
-    """
-    SAFE datetime maker (vectorized).
-    - If year is missing -> NaT
-    - Missing month/day/hhmm are filled with defaults
-    """
-    y = pd.to_numeric(pd.Series(yyyy), errors="coerce")
-    n = len(y)
-
-    if mm is None:
-        m = pd.Series([np.nan] * n)
-    else:
-        m = pd.to_numeric(pd.Series(mm), errors="coerce")
-
-    if dd is None:
-        d = pd.Series([np.nan] * n)
-    else:
-        d = pd.to_numeric(pd.Series(dd), errors="coerce")
-
-    if hhmm is None:
-        hm = pd.Series([np.nan] * n)
-    else:
-        hm = pd.to_numeric(pd.Series(hhmm), errors="coerce")
-
-    m2 = m.fillna(default_mm).astype(int)
-    d2 = d.fillna(default_dd).astype(int)
-    hm2 = hm.fillna(default_hhmm).astype(int)
-
-    hh = (hm2 // 100).astype(int)
-    mi = (hm2 % 100).astype(int)
-
-    # build ISO string
-    iso = (
-        y.astype("Int64").astype(str).str.zfill(4) + "-" +
-        m2.astype(str).str.zfill(2) + "-" +
-        d2.astype(str).str.zfill(2) + " " +
-        hh.astype(str).str.zfill(2) + ":" +
-        mi.astype(str).str.zfill(2) + ":00"
-    )
-
-    out = pd.to_datetime(iso, errors="coerce", utc=True)
-    # If you want naive timestamps instead of UTC-aware:
-    # out = out.dt.tz_convert(None)
-    return out
-
-def classify_freq(unit, time):
-    unit = pd.Series(unit).astype("string").str.lower()
-    time = pd.to_numeric(pd.Series(time), errors="coerce")
-
-    out = pd.Series(["other/unknown"] * len(unit), index=unit.index, dtype="string")
-
-    out[(unit == "hours")   & (time == 1)] = "hourly"
-    out[(unit == "minutes") & (time == 60)] = "hourly"
-
-    out[(unit == "days")    & (time == 1)] = "daily"
-    out[(unit == "hours")   & (time == 24)] = "daily"
-
-    out[(unit == "months")  & (time == 1)] = "monthly"
-    out[(unit == "days")    & (time.between(28, 31, inclusive="both"))] = "monthly"
-    return out
-
-
-# ========================================================
-# 4) Clean tables (convert "" -> NA in char cols)
-# ========================================================
-
-site                  = clean_empty_to_na(site)
-notes                 = clean_empty_to_na(notes)
-reference             = clean_empty_to_na(reference)
-site_link_precip      = clean_empty_to_na(site_link_precip)
-site_link_reference   = clean_empty_to_na(site_link_reference)
-entity_link_reference = clean_empty_to_na(entity_link_reference)
-
-precip_site    = clean_empty_to_na(precip_site)
-precip_entity  = clean_empty_to_na(precip_entity)
-precip_sample  = clean_empty_to_na(precip_sample)
-
-cave_entity    = clean_empty_to_na(cave_entity)
-drip_entity    = clean_empty_to_na(drip_entity)
-drip_iso_sample  = clean_empty_to_na(drip_iso_sample)
-drip_rate_sample = clean_empty_to_na(drip_rate_sample)
-mod_carb_sample  = clean_empty_to_na(mod_carb_sample)
-
-
-# ========================================================
-# 5) SITE SUMMARY: how many entities per site
-# ========================================================
-
-cave_entity_counts = (
-    cave_entity.groupby("site_id", dropna=False)["cave_entity_id"]
-    .nunique()
-    .reset_index(name="cave_entity_count")
-)
 
-drip_counts = (
-    drip_entity.groupby("site_id", dropna=False)["drip_entity_id"]
-    .nunique()
-    .reset_index(name="drip_entity_count")
-)
+def main(folder_path=FOLDER_PATH, show_plots=True) -> dict:
+    """Run every section; returns the result tables {name: DataFrame}."""
+    # Profiling (off unless SISAL_PROFILE is set): wall/CPU time, rows and memory per
+    # section, table load and make_dt call, written as JSON to $SISAL_PROFILE at exit
+    instrument.enable_from_env()
 
-precip_counts = (
-    site_link_precip.groupby("site_id", dropna=False)["precip_entity_id"]
-    .nunique()
-    .reset_index(name="precip_entity_count")
-)
+    instrument.section("1) CSV loader")
 
-site_summary = (
-    site.merge(cave_entity_counts, on="site_id", how="left")
-        .merge(drip_counts, on="site_id", how="left")
-        .merge(precip_counts, on="site_id", how="left")
-)
+    # Arrow cache, per folder in the user cache directory (~/.cache/sisal/..., or $SISAL_CACHE_DIR),
+    # so nothing is written into the data folder; set to None to always parse the CSVs
+    cache_dir = default_cache_dir(folder_path)
 
-site_summary["cave_entity_count"]   = site_summary["cave_entity_count"].fillna(0).astype(int)
-site_summary["drip_entity_count"]   = site_summary["drip_entity_count"].fillna(0).astype(int)
-site_summary["precip_entity_count"] = site_summary["precip_entity_count"].fillna(0).astype(int)
+    # ========================================================
+    # 2) Sanity checks: required tables present?
+    # ========================================================
+    instrument.section("2) Sanity checks")
 
-# If you also want total entity count:
-site_summary["entity_count"] = (
-    site_summary["cave_entity_count"] +
-    site_summary["drip_entity_count"] +
-    site_summary["precip_entity_count"]
-)
+    required_tables = REQUIRED_TABLES
 
-site_summary = site_summary.sort_values("site_id").reset_index(drop=True)
+    # Lazy registry: each table (by file name, without .csv) is read on first access,
+    # e.g. db.drip_iso_sample, db.table("precip_sample", usecols=[...]).
+    # The 2nd and later runs memory-map the cached tables instead of re-parsing the CSVs.
+    # Raises KeyError if a required table is missing from folder_path.
+    db = SisalDB(folder_path, cache_dir=cache_dir, required=required_tables, verbose=True)
+
+    # Optional: load everything up front into a dict (the old `tables`)
+    # tables = db.load_all()
 
+    # Derived tables (site summary, flags, map tables, mod_carb records, coverage,
+    # frequency tables; definitions in sisal/derived.py) are cached in
+    # <cache_dir>/derived, keyed by the content hashes of the CSVs they read: after the
+    # first run they are only recomputed when one of their source tables changes.
+    # mat.status() lists what is fresh; mat.invalidate() forces a rebuild.
+    mat = Materializer(db)
 
-# ========================================================
-# 6) “Do we have entries?” checks for required measurement fields
-# ========================================================
+    # The derived tables of sections 5-14 run as one pipeline (sisal/pipeline.py):
+    # stages whose inputs are ready run concurrently on the shared tables.
+    # Only need a few outputs? pipeline.run(["full_year_both"]) runs just the stages
+    # (and loads just the tables) those outputs need; pipeline.status() shows the plan.
+    pipeline = Pipeline(mat, max_workers=4)
 
-drip_iso_presence_global = pd.DataFrame([{
-    "n_rows": len(drip_iso_sample),
-    "n_d18O": drip_iso_sample["drip_iso_d18O_measurement"].notna().sum(),
-    "n_d2H":  drip_iso_sample["drip_iso_d2H_measurement"].notna().sum(),
-    "n_both": (drip_iso_sample["drip_iso_d18O_measurement"].notna() &
-              drip_iso_sample["drip_iso_d2H_measurement"].notna()).sum()
-}])
-
-mod_carb_presence_global = pd.DataFrame([{
-    "n_rows": len(mod_carb_sample),
-    "n_d18O": mod_carb_sample["mod_carb_d18O_measurement"].notna().sum(),
-    "n_d13C": mod_carb_sample["mod_carb_d13C_measurement"].notna().sum(),
-    "n_both": (mod_carb_sample["mod_carb_d18O_measurement"].notna() &
-              mod_carb_sample["mod_carb_d13C_measurement"].notna()).sum()
-}])
-
-precip_presence_global = pd.DataFrame([{
-    "n_rows": len(precip_sample),
-    "n_amount": precip_sample["precip_amount"].notna().sum(),
-    "n_d18O":   precip_sample["precip_d18O_measurement"].notna().sum(),
-    "n_d2H":    precip_sample["precip_d2H_measurement"].notna().sum(),
-}])
 
+    # ========================================================
+    # 3) Helpers
+    # ========================================================
+    instrument.section("3) Helpers")
+
+    # collapse_unique (unique non-null values joined with " ; ", NA if none):
+    # vectorized per key -> collapse_unique_by in sisal/references.py
+
+    # make_dt(yyyy, mm, dd, hhmm, default_mm=6, default_dd=15, default_hhmm=1200):
+    # SAFE datetime maker (vectorized) -> see sisal/dates.py
+    # - If year is missing -> NaT; missing month/day/hhmm are filled with defaults
+
+    # classify_freq(unit, time): hourly / daily / monthly / other-unknown label of the
+    # accumulation interval -> see sisal/resample.py
+
+
+    # ========================================================
+    # 4) Tables
+    # Strings are already clean: the loader trims text and reads "" as NA while
+    # parsing; names, methods, units and ENUM columns are categoricals (see sisal/schema.py).
+    # ========================================================
+    instrument.section("4) Tables")
 
-# ========================================================
-# 7) Per-site flags: which sites have which data?
-# ========================================================
+    site                  = db.site
+    notes                 = db.notes
+    reference             = db.reference
+    site_link_precip      = db.site_link_precip
+    site_link_reference   = db.site_link_reference
+    entity_link_reference = db.entity_link_reference
 
-# Drip iso flags
-tmp_iso = drip_entity[["site_id", "drip_entity_id"]].merge(drip_iso_sample, on="drip_entity_id", how="inner")
-drip_iso_site_flags = (
-    tmp_iso.groupby("site_id", dropna=False)
-    .agg(
-        has_drip_iso_d18O=("drip_iso_d18O_measurement", lambda s: s.notna().any()),
-        has_drip_iso_d2H =("drip_iso_d2H_measurement",  lambda s: s.notna().any()),
-        has_drip_iso_any =("drip_iso_d18O_measurement", lambda s: s.notna().any())  # will overwrite below
-    )
-    .reset_index()
-)
-# correct "any" as d18O OR d2H
-drip_iso_site_flags["has_drip_iso_any"] = (
-    tmp_iso.groupby("site_id")["drip_iso_d18O_measurement"].apply(lambda s: s.notna().any()).values |
-    tmp_iso.groupby("site_id")["drip_iso_d2H_measurement"].apply(lambda s: s.notna().any()).values
-)
-
-# Drip rate flags
-tmp_rate = drip_entity[["site_id", "drip_entity_id"]].merge(drip_rate_sample, on="drip_entity_id", how="inner")
-drip_rate_site_flags = (
-    tmp_rate.groupby("site_id", dropna=False)
-    .agg(has_drip_rate=("drip_rate_measurement", lambda s: s.notna().any()))
-    .reset_index()
-)
-
-# Mod carb flags
-tmp_mc = drip_entity[["site_id", "drip_entity_id"]].merge(mod_carb_sample, on="drip_entity_id", how="inner")
-mod_carb_site_flags = (
-    tmp_mc.groupby("site_id", dropna=False)
-    .agg(
-        has_mod_carb_d18O=("mod_carb_d18O_measurement", lambda s: s.notna().any()),
-        has_mod_carb_d13C=("mod_carb_d13C_measurement", lambda s: s.notna().any()),
-        has_mod_carb_any =("mod_carb_d18O_measurement", lambda s: s.notna().any())  # will overwrite below
-    )
-    .reset_index()
-)
-mod_carb_site_flags["has_mod_carb_any"] = (
-    tmp_mc.groupby("site_id")["mod_carb_d18O_measurement"].apply(lambda s: s.notna().any()).values |
-    tmp_mc.groupby("site_id")["mod_carb_d13C_measurement"].apply(lambda s: s.notna().any()).values
-)
-
-# Precip flags (site_link_precip joins precip_sample on precip_entity_id)
-tmp_p = site_link_precip.merge(precip_sample, on="precip_entity_id", how="inner")
-precip_site_flags = (
-    tmp_p.groupby("site_id", dropna=False)
-    .agg(
-        has_precip_amount=("precip_amount", lambda s: s.notna().any()),
-        has_precip_d18O  =("precip_d18O_measurement", lambda s: s.notna().any()),
-        has_precip_d2H   =("precip_d2H_measurement", lambda s: s.notna().any()),
-        has_precip_anyiso=("precip_d18O_measurement", lambda s: s.notna().any())  # overwrite below
-    )
-    .reset_index()
-)
-precip_site_flags["has_precip_anyiso"] = (
-    tmp_p.groupby("site_id")["precip_d18O_measurement"].apply(lambda s: s.notna().any()).values |
-    tmp_p.groupby("site_id")["precip_d2H_measurement"].apply(lambda s: s.notna().any()).values
-)
-
-# Counts across sites
-site_data_counts = (
-    site[["site_id"]]
-    .merge(drip_iso_site_flags, on="site_id", how="left")
-    .merge(drip_rate_site_flags, on="site_id", how="left")
-    .merge(mod_carb_site_flags, on="site_id", how="left")
-    .merge(precip_site_flags, on="site_id", how="left")
-)
-
-site_data_counts_summary = pd.DataFrame([{
-    "n_sites_total": site["site_id"].nunique(),
-    "n_sites_precip_iso": site_data_counts["has_precip_anyiso"].fillna(False).sum(),
-    "n_sites_drip_iso":   site_data_counts["has_drip_iso_any"].fillna(False).sum(),
-    "n_sites_drip_rate":  site_data_counts["has_drip_rate"].fillna(False).sum(),
-    "n_sites_mod_carb":   site_data_counts["has_mod_carb_any"].fillna(False).sum(),
-}])
+    precip_site    = db.precip_site
+    precip_entity  = db.precip_entity
+    precip_sample  = db.precip_sample
 
+    cave_entity    = db.cave_entity
+    drip_entity    = db.drip_entity
+    drip_iso_sample  = db.drip_iso_sample
+    drip_rate_sample = db.drip_rate_sample
+    mod_carb_sample  = db.mod_carb_sample
 
-# ========================================================
-# 8) “Map tables”: all sites with each data type
-# ========================================================
-
-sites_drip_iso_map = (
-    site.merge(drip_iso_site_flags.query("has_drip_iso_any == True")[["site_id"]], on="site_id", how="inner")
-        [["site_id", "site_name", "latitude", "longitude", "elevation"]]
-)
-
-sites_drip_rate_map = (
-    site.merge(drip_rate_site_flags.query("has_drip_rate == True")[["site_id"]], on="site_id", how="inner")
-        [["site_id", "site_name", "latitude", "longitude", "elevation"]]
-)
-
-sites_mod_carb_map = (
-    site.merge(mod_carb_site_flags.query("has_mod_carb_any == True")[["site_id"]], on="site_id", how="inner")
-        [["site_id", "site_name", "latitude", "longitude", "elevation"]]
-)
-
-site_precip_map = (
-    site.merge(site_link_precip, on="site_id", how="inner")
-        .merge(precip_site, on="precip_site_id", how="left")
-        .merge(precip_entity, on="precip_entity_id", how="left")
-        [[
-            "site_id", "site_name", "latitude", "longitude", "elevation",
-            "precip_site_id", "precip_site_name", "precip_latitude", "precip_longitude", "precip_elevation",
-            "precip_entity_id", "precip_entity_name", "precip_method"
-        ]]
-        .drop_duplicates()
-)
-
-
-# ========================================================
-# 8.1) Actually “Map tables”: global + 3 zoomed maps
-# - Drip Iso: hollow BLUE triangle
-# - Drip Rate: hollow ORANGE square
-# - Mod Carb: smaller FILLED red dot
-# - Precip: BLACK cross
-# - Legends on ALL plots
-# ========================================================
+    # Cave environment logger tables (temperature, relative humidity, pCO2): optional,
+    # used when present in folder_path
+    cave_env = {name: db[name] for name in CAVE_ENV_TABLES if name in db}
 
-# Combine (deduplicate within each layer)
-combined_sites = pd.concat([
-    sites_drip_iso_map.drop_duplicates("site_id").assign(data_type="Drip Iso"),
-    sites_drip_rate_map.drop_duplicates("site_id").assign(data_type="Drip Rate"),
-    sites_mod_carb_map.drop_duplicates("site_id").assign(data_type="Mod Carb"),
-    site_precip_map.drop_duplicates("site_id").assign(data_type="Precip"),
-], ignore_index=True)
-
-# Split for layered plotting
-combined_hollow  = combined_sites[combined_sites["data_type"].isin(["Drip Iso", "Drip Rate"])].copy()
-combined_modcarb = combined_sites[combined_sites["data_type"].eq("Mod Carb")].copy()
-combined_precip  = combined_sites[combined_sites["data_type"].eq("Precip")].copy()
-
-# Aesthetics
-type_colors = {
-    "Drip Iso":  "blue",
-    "Drip Rate": "orange",
-    "Mod Carb":  "red",
-    "Precip":    "black",
-}
-# Matplotlib marker codes:
-# triangle up: '^', square: 's', filled circle: 'o', cross: 'x'
-type_markers = {
-    "Drip Iso":  "^",
-    "Drip Rate": "s",
-    "Mod Carb":  "o",
-    "Precip":    "x",
-}
-
-marker_lw = 0.5
-size_default = 22   # points^2 (scatter uses area)
-size_modcarb = 16
-
-def plot_world_sites(xlim=(-180, 180), ylim=(-60, 85), title=""):
-    fig, ax = plt.subplots(figsize=(12, 6))
-
-    # quick background: world coastlines from built-in dataset if available
-    # Fallback: no basemap; just plot points.
-    ax.set_xlim(xlim)
-    ax.set_ylim(ylim)
-
-    # Hollow layers
-    for dtype in ["Drip Iso", "Drip Rate"]:
-        df = combined_hollow[combined_hollow["data_type"].eq(dtype)]
-        ax.scatter(
-            df["longitude"], df["latitude"],
-            s=size_default,
-            marker=type_markers[dtype],
-            facecolors="none",                # hollow
-            edgecolors=type_colors[dtype],
-            linewidths=marker_lw,
-            label=dtype,
-            alpha=0.9
-        )
-
-    # Mod Carb: filled smaller dot
-    df = combined_modcarb
-    ax.scatter(
-        df["longitude"], df["latitude"],
-        s=size_modcarb,
-        marker=type_markers["Mod Carb"],
-        c=type_colors["Mod Carb"],
-        edgecolors=type_colors["Mod Carb"],
-        linewidths=0,
-        label="Mod Carb",
-        alpha=0.9
-    )
+    # sections 5-14: all derived tables at once (the sections below pick up the results)
+    pipeline.run()
 
-    # Precip: black cross
-    df = combined_precip
-    ax.scatter(
-        df["longitude"], df["latitude"],
-        s=size_default,
-        marker=type_markers["Precip"],
-        c=type_colors["Precip"],
-        linewidths=marker_lw,
-        label="Precip",
-        alpha=0.9
-    )
 
-    ax.set_title(title)
-    ax.set_xlabel("Longitude [deg]")
-    ax.set_ylabel("Latitude [deg]")
-    ax.grid(True, alpha=0.2)
-    ax.legend(loc="best", frameon=True)
-    return fig, ax
+    # ========================================================
+    # 5) SITE SUMMARY: how many entities per site
+    # ========================================================
+    instrument.section("5) Site summary")
 
-# Global
-plot_world_sites(
-    xlim=(-180, 180), ylim=(-60, 85),
-    title="Site locations with different data types (flat CSV)\nHollow: Drip Iso / Drip Rate; Filled: Mod Carb; Cross: Precip"
-)
+    site_summary = mat["site_summary"]   # + cave/drip/precip_entity_count, entity_count
 
-# North America
-plot_world_sites(
-    xlim=(-140, -50), ylim=(0, 60),
-    title="North America"
-)
+    # ========================================================
+    # 6) “Do we have entries?” checks for required measurement fields
+    # ========================================================
+    instrument.section("6) Entry checks")
 
-# Europe
-plot_world_sites(
-    xlim=(-10, 30), ylim=(30, 70),
-    title="Europe"
-)
+    drip_iso_presence_global = mat["drip_iso_presence_global"]   # n_rows, n_d18O, n_d2H, n_both
+    mod_carb_presence_global = mat["mod_carb_presence_global"]   # n_rows, n_d18O, n_d13C, n_both
+    precip_presence_global = mat["precip_presence_global"]       # n_rows, n_amount, n_d18O, n_d2H
 
-# East Asia
-plot_world_sites(
-    xlim=(95, 130), ylim=(15, 45),
-    title="East Asia"
-)
 
-plt.show()
+    # ========================================================
+    # 7) Per-site flags: which sites have which data?
+    # ========================================================
+    instrument.section("7) Per-site flags")
 
+    # One vectorized pass per sample table (notna -> any per entity -> any per site).
+    # site_flags: one row per site_id, one boolean column per flag (False = no data),
+    # e.g. has_drip_iso_d18O / _d2H / _any, has_drip_rate, has_mod_carb_*, has_precip_*,
+    # has_cave_temperature / _relative_humidity / _pCO2 (precip joined through site_link_precip)
+    site_data_counts = mat["site_data_counts"]
+    site_flags_matrix = site_data_counts.set_index("site_id")
 
-# ========================================================
-# 9) References + notes (site-level and entity-level)
-# ========================================================
+    site_data_counts_summary = pd.DataFrame([{
+        "n_sites_total": site["site_id"].nunique(),
+        "n_sites_precip_iso": site_data_counts["has_precip_anyiso"].fillna(False).sum(),
+        "n_sites_drip_iso":   site_data_counts["has_drip_iso_any"].fillna(False).sum(),
+        "n_sites_drip_rate":  site_data_counts["has_drip_rate"].fillna(False).sum(),
+        "n_sites_mod_carb":   site_data_counts["has_mod_carb_any"].fillna(False).sum(),
+    }])
 
-site_citations = (
-    site_link_reference.merge(reference, on="ref_id", how="left")
-    .groupby("site_id", dropna=False)
-    .agg(
-        site_citations=("citation", collapse_unique),
-        site_DOI=("publication_DOI", collapse_unique),
-    )
-    .reset_index()
-)
-
-drip_entity_citations = (
-    entity_link_reference[entity_link_reference["drip_entity_id"].notna()]
-    .merge(reference, on="ref_id", how="left")
-    .groupby("drip_entity_id", dropna=False)
-    .agg(
-        drip_citations=("citation", collapse_unique),
-        drip_DOI=("publication_DOI", collapse_unique),
-    )
-    .reset_index()
-)
-
-precip_entity_citations = (
-    entity_link_reference[entity_link_reference["precip_entity_id"].notna()]
-    .merge(reference, on="ref_id", how="left")
-    .groupby("precip_entity_id", dropna=False)
-    .agg(
-        precip_citations=("citation", collapse_unique),
-        precip_DOI=("publication_DOI", collapse_unique),
-    )
-    .reset_index()
-)
 
-site_notes = (
-    notes.groupby("site_id", dropna=False)
-    .agg(notes=("notes", collapse_unique))
-    .reset_index()
-)
+    # ========================================================
+    # 8) “Map tables”: all sites with each data type
+    # ========================================================
+    instrument.section("8) Map tables")
 
+    sites_drip_iso_map  = mat["sites_drip_iso_map"]
+    sites_drip_rate_map = mat["sites_drip_rate_map"]
+    sites_mod_carb_map  = mat["sites_mod_carb_map"]
 
-# ========================================================
-# 10) Modern carbonate records (all)
-# ========================================================
+    site_precip_map = mat["site_precip_map"]   # sites + linked precip sites / entities
 
-mod_carb_records = (
-    drip_entity[["site_id", "drip_entity_id", "drip_entity_name", "entity_id"]]
-    .merge(mod_carb_sample, on="drip_entity_id", how="inner")
-    .merge(site, on="site_id", how="left")
-    .merge(site_notes, on="site_id", how="left")
-    .merge(site_citations, on="site_id", how="left")
-    .merge(drip_entity_citations, on="drip_entity_id", how="left")
-)
-
-# Interpret year-only as full-year coverage for mod_carb
-mod_carb_records["start_dt"] = make_dt(
-    mod_carb_records["mod_carb_start_yyyy"],
-    mod_carb_records.get("mod_carb_start_mm"),
-    mod_carb_records.get("mod_carb_start_dd"),
-    default_mm=1, default_dd=1, default_hhmm=0
-)
-mod_carb_records["end_dt"] = make_dt(
-    mod_carb_records["mod_carb_end_yyyy"],
-    mod_carb_records.get("mod_carb_end_mm"),
-    mod_carb_records.get("mod_carb_end_dd"),
-    default_mm=12, default_dd=31, default_hhmm=2359
-)
-mod_carb_records["end_dt"] = mod_carb_records["end_dt"].fillna(mod_carb_records["start_dt"])
-
-mod_carb_records["freq_class"] = classify_freq(
-    mod_carb_records["mod_carb_accumulation_unit"],
-    mod_carb_records["mod_carb_accumulation_time"]
-)
-
-mod_carb_records = mod_carb_records.sort_values(["site_id", "drip_entity_id", "start_dt"]).reset_index(drop=True)
+    # ========================================================
+    # 8.1) Actually “Map tables”: global + 3 zoomed maps
+    # - Drip Iso: hollow BLUE triangle
+    # - Drip Rate: hollow ORANGE square
+    # - Mod Carb: smaller FILLED red dot
+    # - Precip: BLACK cross
+    # - Legends on ALL plots
+    # ========================================================
+    instrument.section("8.1) Map plots")
 
+    # All sites with each data type (deduplicated within each layer), plotted globally
+    # and zoomed on North America, Europe and East Asia (markers / colors: sisal/maps.py)
+    combined_sites = site_layers(sites_drip_iso_map, sites_drip_rate_map, sites_mod_carb_map, site_precip_map)
 
-# ========================================================
-# 11) Filter records with SISAL entities (site_id < 1000)
-# ========================================================
+    if show_plots:
+        import matplotlib.pyplot as plt
 
-sisal_sites = site[site["site_id"] < 1000].copy()
+        plot_maps(combined_sites)
+        plt.show()
+
+
+    # ========================================================
+    # 9) References + notes (site-level and entity-level)
+    # ========================================================
+    instrument.section("9) References + notes")
+
+    # references are joined with the link tables once; citations/DOIs are
+    # deduplicated, sorted and " ; "-joined per site / entity (as GROUP_CONCAT in the SQL)
+    site_citations = mat["site_citations"]
+    drip_entity_citations = mat["drip_entity_citations"]
+    precip_entity_citations = mat["precip_entity_citations"]
+
+    site_notes = mat["site_notes"]
 
+    # lookups: ref_index = ReferenceIndex.build(reference, site_link_reference, entity_link_reference)
+    # e.g. ref_index.lookup("drip_entity_id", [1, 2]) or ref_index.refs("site_id", 7)
 
-# ========================================================
-# 12) >= 1 year of BOTH drip_rate and drip_iso (same drip_entity_id)
-# ========================================================
+    # ========================================================
+    # 10) Modern carbonate records (all)
+    # ========================================================
+    instrument.section("10) Modern carbonate")
 
-iso_cov = drip_entity[["site_id", "drip_entity_id", "drip_entity_name"]].merge(
-    drip_iso_sample, on="drip_entity_id", how="inner"
-)
-
-iso_cov["start_dt"] = make_dt(
-    iso_cov["drip_iso_start_yyyy"], iso_cov.get("drip_iso_start_mm"), iso_cov.get("drip_iso_start_dd"), iso_cov.get("drip_iso_start_hhmm")
-)
-iso_cov["end_dt"] = make_dt(
-    iso_cov["drip_iso_end_yyyy"], iso_cov.get("drip_iso_end_mm"), iso_cov.get("drip_iso_end_dd"), iso_cov.get("drip_iso_end_hhmm")
-)
-iso_cov["end_dt"] = iso_cov["end_dt"].fillna(iso_cov["start_dt"])
-
-iso_cov = iso_cov.dropna(subset=["start_dt", "end_dt"])
-
-drip_iso_coverage = (
-    iso_cov.groupby(["site_id", "drip_entity_id", "drip_entity_name"])
-    .agg(
-        iso_start=("start_dt", "min"),
-        iso_end=("end_dt", "max"),
+    # + site, notes, citations; start_dt / end_dt (year-only = full-year coverage), freq_class
+    mod_carb_records = mat["mod_carb_records"]
+
+    # ========================================================
+    # 11) Filter records with SISAL entities (site_id < 1000)
+    # ========================================================
+    instrument.section("11) SISAL entities")
+
+    sisal_sites = mat["sisal_sites"]
+
+
+    # ========================================================
+    # 12) >= 1 year of BOTH drip_rate and drip_iso (same drip_entity_id)
+    # ========================================================
+    instrument.section("12) Drip rate + iso overlap")
+
+    drip_iso_coverage = mat["drip_iso_coverage"]     # iso_start / iso_end / iso_days per drip entity
+    drip_rate_coverage = mat["drip_rate_coverage"]   # rate_start / rate_end / rate_days
+
+    # iso AND rate samples each spanning >= 365 days, sorted by min_days
+    full_year_both = mat["full_year_both"]
+
+    # Gap-aware variant (coverage index, sisal/coverage.py): every sample -> [start_dt, end_dt],
+    # merged per drip entity; >= 365 days during which iso AND rate samples overlap.
+    # Gaps up to 31 days are bridged and spot samples count as one day
+    # (OVERLAP_GAP_TOLERANCE / OVERLAP_POINT_DURATION in sisal/derived.py).
+    full_year_overlap = mat["full_year_overlap"]
+
+    # ad-hoc queries, e.g. within a window:
+    # coverage_index = CoverageIndex.build({"drip_iso_sample": drip_iso_sample, "drip_rate_sample": drip_rate_sample})
+    # coverage_index.overlap(["drip_iso_sample", "drip_rate_sample"], min_days=365, window=("2010-01-01", None))
+
+    # ========================================================
+    # 13) Lat–lon bounding box filter (sites) + spatial lookups
+    # ========================================================
+    instrument.section("13) Bounding box + spatial")
+
+    # Spatial indexes over cave sites and precip sites (built once; see sisal/spatial.py)
+    site_index = SpatialIndex.from_sites(site)
+    precip_site_index = SpatialIndex.from_precip_sites(precip_site)
+
+    def filter_sites_bbox(lat_min, lat_max, lon_min, lon_max):
+        """Sites inside the box; lon_min > lon_max = box crossing the antimeridian."""
+        return site_index.bbox(lat_min, lat_max, lon_min, lon_max)
+
+    # Other lookups, e.g.:
+    # site_index.within(47.5, 19.0, radius_km=100)         # great-circle radius, nearest first
+    # precip_site_index.nearest(47.5, 19.0, k=3)           # 3 nearest precip stations
+    # site_index.query_nearest(lats, lons, k=1)            # batch: many points at once
+
+    # Nearest precipitation station for every cave site
+    site_nearest_precip = mat["site_nearest_precip"]
+
+
+    # ========================================================
+    # 14) Frequency tables: hourly/daily/monthly
+    # (Most common freq_class per entity)
+    # ========================================================
+    instrument.section("14) Frequency tables")
+
+    drip_iso_freq_by_entity = mat["drip_iso_freq_by_entity"]
+    drip_rate_freq_by_entity = mat["drip_rate_freq_by_entity"]
+    precip_freq_by_entity = mat["precip_freq_by_entity"]
+
+    # Series on a common monthly grid (all entities at once; hourly/daily/annual work the same):
+    # duration-weighted means; precip amount summed, precip isotopes amount-weighted
+    drip_iso_monthly = mat["drip_iso_monthly"]
+    drip_rate_monthly = mat["drip_rate_monthly"]
+    mod_carb_annual = mat["mod_carb_annual"]
+    precip_monthly = mat["precip_monthly"]
+
+
+    # ========================================================
+    # 15) Time-series store: all sample tables in long format
+    # (entity_id, variable, start/end, value, precision); per-entity slices are
+    # contiguous, so queries by variable / entity / time window are lookups.
+    # ========================================================
+    instrument.section("15) Time-series store")
+
+    ts_store = TimeSeriesStore.build({
+        "drip_iso_sample": drip_iso_sample,
+        "drip_rate_sample": drip_rate_sample,
+        "mod_carb_sample": mod_carb_sample,
+        "precip_sample": precip_sample,
+        **cave_env,
+    })
+    ts_summary = ts_store.summary()    # rows + first/last timestamp per variable and entity
+
+    # e.g. one logger series in a time window:
+    # ts_store.series("cave_temperature", entity_id=1, start="2015-01-01", end="2016-01-01")
+
+
+    # ========================================================
+    # 16) Drip isotopes vs the precipitation that fed them
+    # Every drip_iso sample is matched to the precip samples of the precip entities
+    # linked to its site (site_link_precip) that fall in [start - 90 days, end]
+    # (interval join by binary search, no cross product).
+    # ========================================================
+    instrument.section("16) Drip iso vs precip")
+
+    drip_precip_lag = ("0D", "90D")     # (lag_min, lag_max); None = plain overlap
+    drip_iso_precip_pairs = drip_precip_pairs(drip_iso_sample, precip_sample, drip_entity,
+                                              site_link_precip, lag=drip_precip_lag)
+    # per drip sample + precip entity: precip amount in the window, amount-weighted d18O/d2H
+    drip_iso_fed_by = drip_precip_means(drip_iso_sample, precip_sample, drip_entity,
+                                        site_link_precip, lag=drip_precip_lag)
+    drip_iso_vs_precip = (
+        drip_iso_sample.reset_index(drop=True)
+        .assign(drip_row=lambda d: np.arange(len(d)))
+        [["drip_row", "drip_entity_id", "drip_iso_d18O_measurement", "drip_iso_d2H_measurement"]]
+        .merge(drip_iso_fed_by, on=["drip_row", "drip_entity_id"], how="inner")
     )
-    .reset_index()
-)
-drip_iso_coverage["iso_days"] = (drip_iso_coverage["iso_end"] - drip_iso_coverage["iso_start"]).dt.days + 1
-
-
-rate_cov = drip_entity[["site_id", "drip_entity_id", "drip_entity_name"]].merge(
-    drip_rate_sample, on="drip_entity_id", how="inner"
-)
-
-rate_cov["start_dt"] = make_dt(
-    rate_cov["drip_rate_start_yyyy"], rate_cov.get("drip_rate_start_mm"), rate_cov.get("drip_rate_start_dd"), rate_cov.get("drip_rate_start_hhmm")
-)
-rate_cov["end_dt"] = make_dt(
-    rate_cov["drip_rate_end_yyyy"], rate_cov.get("drip_rate_end_mm"), rate_cov.get("drip_rate_end_dd"), rate_cov.get("drip_rate_end_hhmm")
-)
-rate_cov["end_dt"] = rate_cov["end_dt"].fillna(rate_cov["start_dt"])
-
-rate_cov = rate_cov.dropna(subset=["start_dt", "end_dt"])
-
-drip_rate_coverage = (
-    rate_cov.groupby(["site_id", "drip_entity_id", "drip_entity_name"])
-    .agg(
-        rate_start=("start_dt", "min"),
-        rate_end=("end_dt", "max"),
-    )
-    .reset_index()
-)
-drip_rate_coverage["rate_days"] = (drip_rate_coverage["rate_end"] - drip_rate_coverage["rate_start"]).dt.days + 1
-
 
-full_year_both = (
-    drip_iso_coverage.merge(drip_rate_coverage, on=["site_id", "drip_entity_id", "drip_entity_name"], how="inner")
-)
-full_year_both = full_year_both[(full_year_both["iso_days"] >= 365) & (full_year_both["rate_days"] >= 365)]
-full_year_both = full_year_both.merge(site, on="site_id", how="left")
-full_year_both["min_days"] = full_year_both[["iso_days", "rate_days"]].min(axis=1)
-full_year_both = full_year_both.sort_values("min_days", ascending=False).reset_index(drop=True)
 
+    # ========================================================
+    # 17) Water lines: d2H on d18O for every entity at once
+    # ols / rma (/ pwls = precip-amount weighted): n, slope, intercept, r2 per entity
+    # ========================================================
+    instrument.section("17) Water lines")
 
-# ========================================================
-# 13) Lat–lon bounding box filter (sites)
-# ========================================================
+    precip_lmwl = lmwl(precip_sample)                    # local meteoric water lines
+    drip_water_lines = drip_water_line(drip_iso_sample)  # drip water lines
 
-def filter_sites_bbox(lat_min, lat_max, lon_min, lon_max):
-    return site[
-        (site["latitude"] >= lat_min) & (site["latitude"] <= lat_max) &
-        (site["longitude"] >= lon_min) & (site["longitude"] <= lon_max)
-    ].copy()
+    instrument.end_section()
+    print("DONE.")
 
+    # every result table, e.g. main()["full_year_both"]
+    return {name: value for name, value in locals().items() if isinstance(value, pd.DataFrame)}
 
-# ========================================================
-# 14) Frequency tables: hourly/daily/monthly
-# (Most common freq_class per entity)
-# ========================================================
 
-drip_iso_freq_by_entity = (
-    drip_iso_sample.assign(freq_class=classify_freq(drip_iso_sample["drip_iso_accumulation_unit"],
-                                                   drip_iso_sample["drip_iso_accumulation_time"]))
-    .groupby(["drip_entity_id", "freq_class"])
-    .size()
-    .reset_index(name="n")
-    .sort_values(["drip_entity_id", "n"], ascending=[True, False])
-)
-drip_iso_freq_by_entity = drip_iso_freq_by_entity.drop_duplicates("drip_entity_id", keep="first").reset_index(drop=True)
-
-drip_rate_freq_by_entity = (
-    drip_rate_sample.assign(freq_class=classify_freq(drip_rate_sample["drip_rate_accumulation_unit"],
-                                                    drip_rate_sample["drip_rate_accumulation_time"]))
-    .groupby(["drip_entity_id", "freq_class"])
-    .size()
-    .reset_index(name="n")
-    .sort_values(["drip_entity_id", "n"], ascending=[True, False])
-)
-drip_rate_freq_by_entity = drip_rate_freq_by_entity.drop_duplicates("drip_entity_id", keep="first").reset_index(drop=True)
-
-precip_freq_by_entity = (
-    precip_sample.assign(freq_class=classify_freq(precip_sample["precip_accumulation_unit"],
-                                                 precip_sample["precip_accumulation_time"]))
-    .groupby(["precip_entity_id", "freq_class"])
-    .size()
-    .reset_index(name="n")
-    .sort_values(["precip_entity_id", "n"], ascending=[True, False])
-)
-precip_freq_by_entity = precip_freq_by_entity.drop_duplicates("precip_entity_id", keep="first").reset_index(drop=True)
-
-print("DONE.")
+if __name__ == "__main__":
+    main()
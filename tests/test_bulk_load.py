@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from sisal.bulk_load import (SCHEMA_SQL, BulkLoader, _column_type, display_precision, insert_statements,
+                             load_order, round_display, sql_column_types, write_infile)
+
+
+def _mogrify(sql, row):
+    return sql % tuple("NULL" if v is None else repr(v) for v in row)
+
+
+@pytest.mark.parametrize("value, decimals", [
+    (0.0123, 3), (0.105, 3), (0.5, 1), (0.1, 1), (0.0999999999, 1), (0.2000001, 7),
+    (0, 0), (5, 1), (9.99, 1), (12, 0), (12.5, np.nan), (-1, np.nan), (np.nan, np.nan),
+])
+def test_display_precision(value, decimals):
+    got = display_precision([value])[0]
+    assert (np.isnan(got) and np.isnan(decimals)) or got == decimals
+
+
+def test_round_display():
+    np.testing.assert_allclose(round_display([0.012345, 3.14159, 12.5]), [0.012, 3.1, 12.5])
+
+
+def test_write_infile_escapes_and_nulls():
+    df = pd.DataFrame({
+        "text": ["a\tb", "back\\slash", None, "line\nbreak"],
+        "num": [1.5, np.nan, 2.0, 3.0],
+        "id": pd.array([1, None, 3, 4], dtype="Int64"),
+        "cat": pd.Categorical(["x\\", None, "y", "x\\"]),
+    })
+    lines = write_infile(df).split("\n")
+    assert lines[:4] == ["a\\tb\t1.5\t1\tx\\\\", "back\\\\slash\t\\N\t\\N\t\\N",
+                         "\\N\t2.0\t3\ty", "line\\nbreak\t3.0\t4\tx\\\\"]
+
+
+def test_load_order_references_first():
+    waves = load_order(["drip_iso_sample", "drip_entity", "site", "reference", "entity_link_reference"])
+    position = {name: i for i, wave in enumerate(waves) for name in wave}
+    assert position["site"] < position["drip_entity"] < position["drip_iso_sample"]
+    assert position["reference"] < position["entity_link_reference"]
+
+
+def test_schema_types():
+    assert _column_type("ENUM('a', 'b (see notes)') NULL DEFAULT NULL") == "ENUM('a', 'b (see notes)')"
+    assert _column_type("DOUBLE NULL DEFAULT NULL") == "DOUBLE"
+    types = sql_column_types(SCHEMA_SQL)
+    assert types["SITE"]["latitude"] == "DECIMAL(6,4)"
+    assert types["DRIP_RATE"]["drip_rate_accumulation_unit"].startswith("ENUM('days'")
+
+
+def test_insert_statements_split_by_size():
+    rows = [(i, f"name {i}") for i in range(100)]
+    stmts = list(insert_statements("site", ["site_id", "site_name"], rows, _mogrify, max_bytes=300))
+    assert len(stmts) > 1
+    assert all(len(s.encode()) <= 300 for s in stmts)
+    assert stmts[0].startswith("INSERT INTO `site` (`site_id`, `site_name`) VALUES (0, 'name 0'),(1, ")
+    assert sum(s.count("'name ") for s in stmts) == 100
+    assert list(insert_statements("site", ["site_id"], [(None,)], _mogrify)) == \
+        ["INSERT INTO `site` (`site_id`) VALUES (NULL)"]
+
+
+class _Cursor:
+    """Fake pymysql cursor: one warning per statement holding the value 'bad'."""
+
+    def __init__(self):
+        self.statements = []
+        self.warning_count = 0
+
+    mogrify = staticmethod(_mogrify)
+
+    def execute(self, sql, args=None):
+        self.statements.append(sql)
+        self.warning_count = 0 if sql.startswith("SHOW") else sql.count("'bad'")
+
+    def fetchall(self):
+        return [("Warning", 1265, "Data truncated for column 'site_name'")]
+
+
+def test_insert_warnings_counted_per_statement():
+    loader = object.__new__(BulkLoader)
+    loader.batch_size = 3
+    df = pd.DataFrame({"site_id": range(7), "site_name": ["bad", "ok", "ok", "bad", "ok", "ok", "bad"]})
+    cur, found = _Cursor(), [0, []]
+    loader._load_insert(cur, "site", df, found)
+    assert found == [3, ["Data truncated for column 'site_name'"]]
+    assert sum(s.startswith("INSERT") for s in cur.statements) == 3      # one per batch here
+    assert cur.statements.count("SHOW WARNINGS LIMIT 3") == 1
@@ -0,0 +1,52 @@
+import os
+import subprocess
+import sys
+
+import pandas as pd
+import pytest
+
+from sisal.cli import main
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+@pytest.fixture
+def folder(tmp_path):
+    data = tmp_path / "data"
+    data.mkdir()
+    pd.DataFrame({"site_id": [1, 2], "site_name": ["a", "b"], "latitude": [1.0, 2.0], "longitude": [1.0, 2.0],
+                  "elevation": [1.0, 2.0]}).to_csv(data / "site.csv", index=False)
+    return str(data)
+
+
+def test_import_is_cheap():
+    code = "import sys, sisal.cli; print(sorted(m for m in ('pandas', 'numpy', 'sqlalchemy') if m in sys.modules))"
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == "[]"
+
+
+def test_load_and_query(folder, tmp_path, capsys):
+    assert main(["load", folder, "--cache-dir", str(tmp_path / "cache")]) == 0
+    assert capsys.readouterr().out.startswith("site\t2 rows")
+    assert main(["query", "SELECT COUNT(*) AS n FROM site", "--backend", "duckdb", "--folder", folder]) == 0
+    assert capsys.readouterr().out.split() == ["n", "2"]
+
+
+@pytest.mark.parametrize("argv", [
+    ["derive", "{folder}", "no_such_table", "--no-cache"],
+    ["load", "{folder}/missing"],
+    ["query", "SELEC 1", "--backend", "duckdb", "--folder", "{folder}"],
+])
+def test_errors_are_one_line(folder, capsys, argv):
+    assert main([a.format(folder=folder) for a in argv]) == 1
+    err = capsys.readouterr().err
+    assert err.startswith(f"sisal {argv[0]}: error: ") and err.count("\n") == 1
+
+
+def test_mysql_server_down(monkeypatch, capsys):
+    pytest.importorskip("pymysql")
+    monkeypatch.setenv("DB_HOST", "127.0.0.1")
+    monkeypatch.setenv("DB_PORT", "1")
+    assert main(["query", "SELECT 1"]) == 1
+    err = capsys.readouterr().err
+    assert err.startswith("sisal query: error: ") and err.count("\n") == 1
@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+
+from sisal.coverage import CoverageIndex, merge_intervals
+
+
+def test_merge_intervals():
+    out = merge_intervals(np.array([1, 1, 1, 2]), np.array([0, 5, 20, 0]), np.array([10, 12, 30, 1]))
+    assert out[["entity", "start", "end", "n_samples"]].values.tolist() == [[1, 0, 12, 2], [1, 20, 30, 1],
+                                                                             [2, 0, 1, 1]]
+    joined = merge_intervals(np.array([1, 1]), np.array([0, 15]), np.array([10, 20]), gap_tolerance=5)
+    assert len(joined) == 1
+
+
+def test_reversed_samples_keep_first_and_last():
+    nan = np.nan
+    df = pd.DataFrame({
+        "drip_entity_id": [1, 1, 2],
+        "drip_iso_start_yyyy": [2011, 2011, 2012], "drip_iso_start_mm": [1, 5, 1],
+        "drip_iso_start_dd": [1, 10, 1], "drip_iso_start_hhmm": [nan, nan, nan],
+        "drip_iso_end_yyyy": [2011, 2011, 2012], "drip_iso_end_mm": [1, 2, 1],
+        "drip_iso_end_dd": [31, 1, 11], "drip_iso_end_hhmm": [nan, nan, nan],
+    }, dtype="float64")
+    cov = CoverageIndex.build({"drip_iso_sample": df}).coverage("drip_iso_sample").set_index("drip_entity_id")
+    # first / last: min(start) / max(end) of the raw dates, as the cookbook computes them
+    assert cov.loc[1, "first"].date().isoformat() == "2011-01-01"
+    assert cov.loc[1, "last"].date().isoformat() == "2011-02-01"
+    # the reversed sample adds nothing to the covered time
+    assert cov.loc[1, "covered_days"] == 30
+    assert cov.loc[2, "covered_days"] == 10
+
+
+def test_overlap():
+    nan = np.nan
+
+    def sample(prefix, start_mm, end_mm):
+        return pd.DataFrame({
+            "drip_entity_id": [1], f"{prefix}_start_yyyy": [2010], f"{prefix}_start_mm": [start_mm],
+            f"{prefix}_start_dd": [1], f"{prefix}_start_hhmm": [nan], f"{prefix}_end_yyyy": [2010],
+            f"{prefix}_end_mm": [end_mm], f"{prefix}_end_dd": [1], f"{prefix}_end_hhmm": [nan],
+        }, dtype="float64")
+
+    index = CoverageIndex.build({"drip_iso_sample": sample("drip_iso", 1, 5),
+                                 "drip_rate_sample": sample("drip_rate", 3, 9)})
+    out = index.overlap(["drip_iso_sample", "drip_rate_sample"])
+    assert out["drip_entity_id"].tolist() == [1]
+    assert out["overlap_days"].tolist() == [61.0]                  # March + April
+    assert index.overlap(["drip_iso_sample", "drip_rate_sample"], min_days=90).empty
+
+
+def _drip_samples(prefix, dates):
+    """One row per (entity, start, end) with ISO dates; end None = spot sample."""
+    rows = []
+    for entity, start, end in dates:
+        start = pd.Timestamp(start)
+        end = pd.Timestamp(end) if end else None
+        rows.append({
+            "drip_entity_id": entity,
+            f"{prefix}_start_yyyy": start.year, f"{prefix}_start_mm": start.month,
+            f"{prefix}_start_dd": start.day, f"{prefix}_start_hhmm": np.nan,
+            f"{prefix}_end_yyyy": end.year if end else np.nan, f"{prefix}_end_mm": end.month if end else np.nan,
+            f"{prefix}_end_dd": end.day if end else np.nan, f"{prefix}_end_hhmm": np.nan,
+        })
+    return pd.DataFrame(rows, dtype="float64")
+
+
+def test_full_year_both_and_overlap():
+    from sisal.derived import drip_iso_coverage, drip_rate_coverage, full_year_both, full_year_overlap
+
+    site = pd.DataFrame({"site_id": [1], "site_name": ["Cave"]})
+    drip_entity = pd.DataFrame({"site_id": [1, 1], "drip_entity_id": [1, 2], "drip_entity_name": ["a", "b"]})
+    # entity 1: monthly spot samples of both for two years; entity 2: iso 2010, rate 2012
+    months = pd.date_range("2010-01-15", "2011-12-15", freq="MS") + pd.Timedelta(days=14)
+    iso = _drip_samples("drip_iso", [(1, d, None) for d in months] + [(2, "2010-01-01", "2010-12-31"),
+                                                                      (2, "2011-06-01", None)])
+    rate = _drip_samples("drip_rate", [(1, d, None) for d in months] + [(2, "2011-01-01", "2012-12-31")])
+    iso_cov, rate_cov = drip_iso_coverage(drip_entity, iso), drip_rate_coverage(drip_entity, rate)
+
+    # cookbook: each span >= 365 days, by min_days
+    both = full_year_both(site, iso_cov, rate_cov)
+    assert both["drip_entity_id"].tolist() == [1, 2]
+    assert both["min_days"].tolist() == [669, 517]
+    # gap-aware: only entity 1 has both at the same time, its spot samples bridged month to month
+    overlap = full_year_overlap(site, iso, rate, iso_cov, rate_cov)
+    assert overlap["drip_entity_id"].tolist() == [1]
+    assert overlap["overlap_days"].iloc[0] == 669
+    # without bridging, spot samples cover nothing
+    exact = CoverageIndex.build({"drip_iso_sample": iso, "drip_rate_sample": rate})
+    assert exact.overlap(["drip_iso_sample", "drip_rate_sample"]).empty
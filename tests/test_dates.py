@@ -0,0 +1,42 @@
+import importlib.util
+import os
+
+import numpy as np
+import pandas as pd
+
+from sisal.dates import make_dt, sample_start_end
+
+
+def _bench_make_dt():
+    path = os.path.join(os.path.dirname(__file__), "..", "benchmarks", "bench_make_dt.py")
+    spec = importlib.util.spec_from_file_location("bench_make_dt", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_defaults_and_invalid_dates():
+    nan = np.nan
+    out = make_dt([2011, 2011, nan, 2011, 2012, 2011, 2011.5],
+                  [2, nan, 1, 4, 2, 13, 1], [28, nan, 1, 31, 29, 1, 1], [930, nan, nan, nan, 2359, nan, nan])
+    assert out.dt.tz is not None
+    expected = pd.to_datetime(["2011-02-28 09:30", "2011-06-15 12:00", None, None, "2012-02-29 23:59", None, None],
+                              utc=True)
+    pd.testing.assert_series_equal(out.astype("datetime64[ns, UTC]"), pd.Series(expected).astype("datetime64[ns, UTC]"))
+    assert make_dt([2011], default_mm=1, default_dd=1, default_hhmm=0, tz=None).iloc[0] == pd.Timestamp("2011-01-01")
+    assert make_dt([2011], [1], [1], [2460]).isna().all()
+
+
+def test_matches_the_string_based_version():
+    bench = _bench_make_dt()
+    cols = bench.sample_columns(20_000, seed=1)
+    new, old = make_dt(*cols), bench.make_dt_legacy(*cols)
+    pd.testing.assert_series_equal(new.astype("datetime64[ns, UTC]"), old.astype("datetime64[ns, UTC]"),
+                                   check_names=False)
+
+
+def test_sample_start_end_falls_back_to_the_start():
+    df = pd.DataFrame({"mod_carb_start_yyyy": [2010.0, 2010.0], "mod_carb_end_yyyy": [np.nan, 2011.0]})
+    start, end = sample_start_end(df, "mod_carb_sample")
+    assert start.tolist() == [pd.Timestamp("2010-01-01", tz="UTC")] * 2
+    assert end.tolist() == [pd.Timestamp("2010-01-01", tz="UTC"), pd.Timestamp("2011-12-31 23:59", tz="UTC")]
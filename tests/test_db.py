@@ -0,0 +1,40 @@
+import pytest
+
+pytest.importorskip("sqlalchemy")
+pytest.importorskip("pymysql")
+
+from sisal import db as sisal_db  # noqa: E402
+from sisal.db import Database, _chunk_dtypes, _chunk_frame, db_config, dispose_engines  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def _no_config(monkeypatch):
+    for var in [*sisal_db.ENV_VARS.values(), "SISAL_DB_CONFIG"]:
+        monkeypatch.delenv(var, raising=False)
+    yield
+    dispose_engines()
+
+
+def test_config_precedence(tmp_path, monkeypatch):
+    ini = tmp_path / "db.ini"
+    ini.write_text("[mysql]\nhost = inifile\nport = 3307\nuser = reader\n")
+    monkeypatch.setenv("DB_USER", "envuser")
+    cfg = db_config(str(ini), database="other")
+    assert (cfg["host"], cfg["port"], cfg["user"], cfg["database"]) == ("inifile", 3307, "envuser", "other")
+    with pytest.raises(FileNotFoundError):
+        db_config(str(tmp_path / "missing.ini"))
+
+
+def test_from_env_shares_one_engine_per_settings():
+    a, b = Database.from_env(), Database.from_env()
+    assert a.engine is b.engine
+    assert Database.from_env(database="other").engine is not a.engine
+    assert Database.from_env(pool_size=2).engine is not a.engine
+    dispose_engines()
+    assert Database.from_env().engine is not a.engine
+
+
+def test_chunk_dtypes_are_fixed_by_the_column_types():
+    description = [("site_id", 3), ("latitude", 246), ("site_name", 253)]
+    df = _chunk_frame([(None, None, None)], ["site_id", "latitude", "site_name"], _chunk_dtypes(description))
+    assert df["site_id"].dtype == "Int64" and df["latitude"].dtype == "float64"
@@ -0,0 +1,65 @@
+import pandas as pd
+import pytest
+
+from sisal.duck import mysql_to_duckdb
+
+duckdb = pytest.importorskip("duckdb")
+
+
+def test_group_concat_translation():
+    sql = ("SELECT GROUP_CONCAT(DISTINCT r.citation ORDER BY r.citation SEPARATOR ' ; ') AS c, "
+           "GROUP_CONCAT(x) FROM t")
+    assert mysql_to_duckdb(sql) == ("SELECT string_agg(DISTINCT r.citation, ' ; ' ORDER BY r.citation) AS c, "
+                                    "string_agg(x, ',') FROM t")
+    nested = mysql_to_duckdb("SELECT GROUP_CONCAT(CONCAT(a, '(', b) SEPARATOR ')') FROM t")
+    assert nested == "SELECT string_agg(CONCAT(a, '(', b), ')') FROM t"
+
+
+def test_binds_and_identifiers_outside_literals():
+    sql = "SELECT `site_name`, ':not_a_bind', x::INT FROM site WHERE site_id IN :sites AND a = :a"
+    assert mysql_to_duckdb(sql) == ('SELECT "site_name", \':not_a_bind\', x::INT FROM site '
+                                    "WHERE site_id IN $sites AND a = $a")
+
+
+@pytest.fixture
+def db(tmp_path):
+    from sisal.duck import DuckDatabase
+
+    (tmp_path / "site.csv").write_text("site_id,site_name,latitude,longitude,elevation\n"
+                                       "1, Obir ,46.5,14.5,1000\n2,,40.0,2.0,\n3,Cova,41.0,2.5,50\n")
+    (tmp_path / "notes.csv").write_text("site_id,notes\n1,a\n1,b\n3,c\n")
+    database = DuckDatabase.from_folder(str(tmp_path))
+    yield database
+    database.dispose()
+
+
+def test_views_are_typed_and_trimmed(db):
+    df = db.query("SELECT * FROM site ORDER BY site_id")
+    assert df["site_name"].tolist()[0] == "Obir" and pd.isna(df["site_name"].iloc[1])
+    assert df["site_id"].dtype.kind == "i" and df["latitude"].dtype == "float64"
+
+
+def test_mysql_query_with_list_parameter(db):
+    sql = ("SELECT s.site_id, GROUP_CONCAT(n.notes ORDER BY n.notes SEPARATOR ' ; ') AS notes "
+           "FROM site s JOIN notes n ON n.site_id = s.site_id WHERE s.site_id IN :ids "
+           "GROUP BY s.site_id ORDER BY s.site_id")
+    out = db.query(sql, {"ids": (1, 3), "unused": 5})
+    assert out.values.tolist() == [[1, "a ; b"], [3, "c"]]
+    chunks = list(db.stream("SELECT * FROM notes", chunksize=1))
+    assert sum(len(c) for c in chunks) == 3
+
+
+def test_report_queries_run_on_synthetic_tables():
+    from sisal.duck import DuckDatabase
+    from sisal.queries import REPORT_SQL
+    from sisal.synthetic import generate_tables
+
+    db = DuckDatabase.from_frames(generate_tables(scale=0.02, seed=1))
+    try:
+        for name, sql in REPORT_SQL.items():
+            assert len(db.query(sql).columns), name
+        site = db.query("SELECT site_id, site_name FROM site ORDER BY site_id LIMIT 2")
+        frames = db.query_sites(site_ids=site["site_id"].tolist(), kinds=["drip_iso"])
+        assert set(frames["drip_iso"]["site_id"]) <= set(site["site_id"])
+    finally:
+        db.dispose()
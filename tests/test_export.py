@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from sisal.export import write_chunks
+
+pa = pytest.importorskip("pyarrow")
+
+
+@pytest.mark.parametrize("suffix", [".parquet", ".feather"])
+def test_columns_empty_in_the_first_chunk(tmp_path, suffix):
+    chunks = [pd.DataFrame({"id": [1, 2], "value": [np.nan, np.nan], "note": [None, None]}),
+              pd.DataFrame({"id": [3], "value": [1.5], "note": [None]})]
+    path = tmp_path / f"out{suffix}"
+    assert write_chunks(iter(chunks), str(path)) == 3
+    out = pd.read_parquet(path) if suffix == ".parquet" else pd.read_feather(path)
+    assert out["value"].tolist()[2] == 1.5
+    assert out["note"].isna().all()
+
+
+def test_chunk_with_other_types_is_an_error(tmp_path):
+    chunks = [pd.DataFrame({"id": [1, 2]}), pd.DataFrame({"id": ["x"]})]
+    with pytest.raises(ValueError, match="column types"):
+        write_chunks(iter(chunks), str(tmp_path / "out.parquet"))
+    assert not list(tmp_path.iterdir())                   # no partial file left behind
+
+
+def test_csv_and_xlsx_sheet_split(tmp_path):
+    pytest.importorskip("xlsxwriter")
+    from sisal import export
+
+    df = pd.DataFrame({"a": range(5), "b": list("vwxyz")})
+    assert write_chunks(iter([df.iloc[:2], df.iloc[2:]]), str(tmp_path / "out.csv.gz")) == 5
+    assert pd.read_csv(tmp_path / "out.csv.gz").equals(df)
+
+    workbook = export._open_workbook(str(tmp_path / "out.xlsx"))
+    try:
+        assert export._write_xlsx_sheets(workbook, "t", iter([df]), set(), max_rows=3) == 5
+    finally:
+        workbook.close()
+    openpyxl = pytest.importorskip("openpyxl")
+    sheets = openpyxl.load_workbook(tmp_path / "out.xlsx", read_only=True).sheetnames
+    assert sheets == ["t", "t_2", "t_3"]
+
+
+def test_guess_format():
+    from sisal.export import guess_format
+
+    assert guess_format("x/data.csv.gz") == "csv.gz" and guess_format("data.arrow") == "feather"
+    with pytest.raises(ValueError):
+        guess_format("data.txt")
@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from sisal.flags import site_flags, sites_with_flag
+
+
+def _tables():
+    site = pd.DataFrame({"site_id": [1, 2, 3], "site_name": ["a", "b", "c"], "latitude": [0.0, 1.0, 2.0],
+                         "longitude": [0.0, 1.0, 2.0], "elevation": [10.0, 20.0, 30.0]})
+    drip_entity = pd.DataFrame({"site_id": [1, 2, 2], "drip_entity_id": [10, 20, 21]})
+    site_link_precip = pd.DataFrame({"site_id": [3, 1], "precip_entity_id": [30, 30]})
+    drip_iso_sample = pd.DataFrame({"drip_entity_id": [10, 20, 21],
+                                    "drip_iso_d18O_measurement": [-6.0, np.nan, np.nan],
+                                    "drip_iso_d2H_measurement": [np.nan, np.nan, -40.0]})
+    precip_sample = pd.DataFrame({"precip_entity_id": [30, 99], "precip_amount": [1.0, 2.0],
+                                  "precip_d18O_measurement": [np.nan, -5.0],
+                                  "precip_d2H_measurement": [np.nan, np.nan]})
+    return site, drip_entity, site_link_precip, drip_iso_sample, precip_sample
+
+
+def test_site_flags():
+    site, drip_entity, link, iso, precip = _tables()
+    flags = site_flags(site, drip_entity, link, drip_iso_sample=iso, precip_sample=precip)
+    assert flags.index.tolist() == [1, 2, 3]
+    assert flags["has_drip_iso_d18O"].tolist() == [True, False, False]
+    assert flags["has_drip_iso_d2H"].tolist() == [False, True, False]
+    assert flags["has_drip_iso_any"].tolist() == [True, True, False]
+    # precip entity 30 is linked to sites 3 and 1; entity 99 has no site
+    assert flags["has_precip_amount"].tolist() == [True, False, True]
+    assert not flags["has_precip_anyiso"].any()
+    assert (flags.dtypes == bool).all()
+
+
+def test_sites_with_flag():
+    site, drip_entity, link, iso, precip = _tables()
+    flags = site_flags(site, drip_entity, link, drip_iso_sample=iso)
+    assert sites_with_flag(site, flags, "has_drip_iso_any")["site_id"].tolist() == [1, 2]
+
+
+def test_missing_link_or_unknown_table():
+    site, drip_entity, link, iso, precip = _tables()
+    with pytest.raises(ValueError, match="drip_entity"):
+        site_flags(site, site_link_precip=link, drip_iso_sample=iso)
+    with pytest.raises(KeyError, match="notes"):
+        site_flags(site, drip_entity, notes=iso)
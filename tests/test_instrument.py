@@ -0,0 +1,70 @@
+import json
+import logging
+
+import pandas as pd
+import pytest
+
+from sisal import instrument
+
+
+@pytest.fixture(autouse=True)
+def _reset(monkeypatch):
+    monkeypatch.setattr(instrument, "_exit_profiler", None)
+    monkeypatch.setattr(instrument, "_exit_registered", False)
+    yield
+    instrument.disable()
+
+
+def test_disabled_hooks_are_no_ops():
+    assert not instrument.enabled()
+    with instrument.stage("x", rows_in=[1, 2]) as st:
+        st.rows_out = 3
+    assert st is instrument._NULL and instrument.report() is None
+
+
+def test_records_nesting_rows_and_sections():
+    instrument.enable()
+
+    @instrument.timed("double")
+    def double(df):
+        return pd.concat([df, df])
+
+    instrument.section("1) load")
+    with instrument.stage("outer", rows_in=pd.DataFrame({"a": range(4)})) as st:
+        double(pd.DataFrame({"a": range(4)}))
+        st.set(table="site")
+    instrument.section("2) next")
+    instrument.end_section()
+
+    records = {r["name"]: r for r in instrument.report()["records"]}
+    assert records["double"]["parent"] == "outer" and records["double"]["rows_out"] == 8
+    assert records["outer"]["parent"] == "1) load" and records["outer"]["rows_in"] == 4
+    assert records["outer"]["table"] == "site"
+    assert records["1) load"]["kind"] == "section" and "2) next" in records
+
+
+def test_slow_queries_are_logged_with_parameters(caplog):
+    instrument.enable(slow_query_s=0.0)
+    with caplog.at_level(logging.WARNING, logger="sisal.slow_query"):
+        with instrument.query("SELECT *\n  FROM site WHERE site_id IN :ids", {"ids": [1, 2]}) as q:
+            q.rows_out = 2
+    assert "SELECT * FROM site WHERE site_id IN :ids" in caplog.text and "[1, 2]" in caplog.text
+
+
+def test_one_exit_handler_and_earlier_reports_written(tmp_path, monkeypatch):
+    handlers = []
+    monkeypatch.setattr(instrument.atexit, "register", handlers.append)
+    first, second = tmp_path / "first.json", tmp_path / "second.json"
+
+    instrument.enable(report=str(first))
+    with instrument.stage("a"):
+        pass
+    instrument.enable(report=str(second))
+    with instrument.stage("b"):
+        pass
+    assert [r["name"] for r in json.loads(first.read_text())["records"]] == ["a"]
+    assert not second.exists()
+
+    assert handlers == [instrument._write_at_exit]
+    handlers[0]()
+    assert [r["name"] for r in json.loads(second.read_text())["records"]] == ["b"]
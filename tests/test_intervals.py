@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+
+from sisal.intervals import _lag_ns, overlap_join
+
+
+def test_overlap_join_closed_intervals():
+    left, right = overlap_join([1, 1, 2], [0, 10, 0], [5, 20, 5],
+                               [1, 1, 2, 3], [5, 21, 6, 0], [6, 30, 9, 9])
+    assert list(zip(left.tolist(), right.tolist())) == [(0, 0)]
+
+
+def test_overlap_join_matches_brute_force():
+    rng = np.random.default_rng(2)
+    le, ls = rng.integers(0, 4, 60), rng.integers(0, 1000, 60)
+    re, rs = rng.integers(0, 4, 300), rng.integers(0, 1000, 300)
+    lend, rend = ls + rng.integers(0, 80, 60), rs + rng.integers(0, 300, 300)
+    left, right = overlap_join(le, ls, lend, re, rs, rend)
+    got = sorted(zip(left.tolist(), right.tolist()))
+    expected = [(i, j) for i in range(60) for j in range(300)
+                if le[i] == re[j] and rs[j] <= lend[i] and rend[j] >= ls[i]]
+    assert got == expected
+
+
+def test_lag():
+    day = 86_400 * 10**9
+    assert _lag_ns(None) == (0, 0)
+    assert _lag_ns("2D") == (2 * day, 2 * day)
+    assert _lag_ns(("0D", "90D")) == (0, 90 * day)
+    with pytest.raises(ValueError):
+        _lag_ns(("9D", "1D"))
@@ -0,0 +1,105 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from sisal import loader
+from sisal.loader import cache_key, default_cache_dir, read_cached, read_csv_typed, read_table, write_cached
+
+pytest.importorskip("pyarrow")
+
+
+def _write(path, text):
+    path.write_text(text)
+    return str(path)
+
+
+def test_declared_dtypes(tmp_path):
+    path = _write(tmp_path / "site.csv", "site_id,site_name,latitude,longitude,elevation\n1,Obir,46.5,14.5,\n")
+    df = read_csv_typed(path)
+    assert df["site_id"].dtype == "Int64"
+    assert isinstance(df["site_name"].dtype, pd.CategoricalDtype)
+    assert df["latitude"].dtype == "float64"
+
+
+def test_bad_values_only_touch_their_column(tmp_path):
+    path = _write(tmp_path / "site.csv", "site_id,site_name,latitude,longitude,elevation\n"
+                                         "1,Obir,46.5,14.5,1000\n2.5,Gruta,n.d.,-8.0,20\n3,Cova,40.1,2.0,5\n")
+    with pytest.warns(UserWarning, match=r"site_id \(1 values\), latitude \(1 values\)"):
+        df = read_csv_typed(path)
+    assert df["site_id"].dtype == "Int64" and df["site_id"].isna().tolist() == [False, True, False]
+    assert df["latitude"].dtype == "float64" and np.isnan(df["latitude"].iloc[1])
+    assert isinstance(df["site_name"].dtype, pd.CategoricalDtype)
+    assert df["elevation"].tolist() == [1000.0, 20.0, 5.0]
+
+
+def test_cache_is_used_until_the_csv_changes(tmp_path):
+    path = _write(tmp_path / "notes.csv", "site_id,notes\n1,a\n")
+    cache = str(tmp_path / "cache")
+    assert read_table(path, cache)["notes"].tolist() == ["a"]
+    assert read_cached(cache, "notes", cache_key(path)) is not None
+
+    _write(tmp_path / "notes.csv", "site_id,notes\n1,ab\n")
+    assert read_cached(cache, "notes", cache_key(path)) is None
+    assert read_table(path, cache)["notes"].tolist() == ["ab"]
+
+
+def test_content_hash_survives_a_touch(tmp_path):
+    path = _write(tmp_path / "notes.csv", "site_id,notes\n1,a\n")
+    cache = str(tmp_path / "cache")
+    read_table(path, cache, use_hash=True)
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    assert read_cached(cache, "notes", cache_key(path, use_hash=True)) is not None
+    assert read_cached(cache, "notes", cache_key(path)) is None
+
+
+def test_projected_reads_do_not_write_the_cache(tmp_path):
+    path = _write(tmp_path / "notes.csv", "site_id,notes\n1,a\n")
+    cache = str(tmp_path / "cache")
+    assert read_table(path, cache, usecols=["site_id"]).columns.tolist() == ["site_id"]
+    assert not os.path.exists(os.path.join(cache, "notes.arrow"))
+
+
+def test_default_cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv(loader.CACHE_DIR_ENV, str(tmp_path / "root"))
+    a, b = default_cache_dir(tmp_path / "v8" / "db"), default_cache_dir(tmp_path / "v9" / "db")
+    assert os.path.dirname(a) == str(tmp_path / "root")
+    assert os.path.basename(a).startswith("db-") and a != b
+
+
+def test_unwritable_cache_warns(tmp_path):
+    blocker = _write(tmp_path / "file", "")
+    with pytest.warns(UserWarning, match="not cached"):
+        assert not write_cached(os.path.join(blocker, "cache"), "notes", {}, pd.DataFrame({"a": [1]}))
+
+
+def test_text_is_normalized_at_load_time(tmp_path):
+    path = _write(tmp_path / "site.csv", "site_id,site_name,latitude,longitude,elevation\n"
+                                         "1, Obir ,1,1,1\n2,Obir,1,1,1\n3,  ,1,1,1\n")
+    df = read_csv_typed(path)
+    assert df["site_name"].cat.categories.tolist() == ["Obir"]
+    assert df["site_name"].isna().tolist() == [False, False, True]
+    notes = read_csv_typed(_write(tmp_path / "notes.csv", "site_id,notes\n1,  text \n2,\n3, \n"))
+    assert notes["notes"].iloc[0] == "text" and notes["notes"].isna().tolist() == [False, True, True]
+
+
+def test_normalize_strings_keeps_clean_categoricals():
+    s = pd.Series(pd.Categorical(["b", "a", None]))
+    df = loader.normalize_strings(pd.DataFrame({"c": s, "n": [1, 2, 3]}))
+    assert df["c"].cat.categories.tolist() == ["a", "b"] and df["c"].tolist()[:2] == ["b", "a"]
+    merged = loader.normalize_strings(pd.DataFrame({"c": pd.Categorical(["b ", "a", " b", ""])}))
+    assert merged["c"].cat.categories.tolist() == ["a", "b"]
+    assert merged["c"].tolist()[:3] == ["b", "a", "b"] and merged["c"].isna().tolist()[3]
+
+
+def test_cache_stores_the_normalized_table(tmp_path):
+    path = _write(tmp_path / "site.csv", "site_id,site_name,latitude,longitude,elevation\n1, Obir ,1,1,1\n")
+    cache = str(tmp_path / "cache")
+    read_table(path, cache)
+    cached = read_cached(cache, "site", cache_key(path))
+    assert isinstance(cached["site_name"].dtype, pd.CategoricalDtype)
+    assert cached["site_name"].tolist() == ["Obir"]
+    stale = {**cache_key(path), "version": loader.CACHE_VERSION - 1}
+    assert not loader._key_matches(stale, cache_key(path))
@@ -0,0 +1,106 @@
+import os
+
+import pandas as pd
+import pytest
+
+from sisal.materialize import DerivedTable, Materializer, derived, module_closure
+from sisal.registry import SisalDB
+
+pytest.importorskip("pyarrow")
+
+CALLS = []
+REGISTRY = {}
+
+
+@derived(registry=REGISTRY)
+def site_count(site):
+    CALLS.append("site_count")
+    return pd.DataFrame({"n": [len(site)]})
+
+
+@derived(registry=REGISTRY)
+def note_count(notes, cave_pCO2_sample=None):
+    CALLS.append("note_count")
+    return pd.DataFrame({"n": [len(notes)], "pco2": [cave_pCO2_sample is not None]})
+
+
+@derived(registry=REGISTRY)
+def both(site_count, note_count):
+    CALLS.append("both")
+    return pd.DataFrame({"n": [int(site_count["n"].iloc[0] + note_count["n"].iloc[0])]})
+
+
+@pytest.fixture
+def folder(tmp_path):
+    (tmp_path / "data").mkdir()
+    pd.DataFrame({"site_id": [1, 2]}).to_csv(tmp_path / "data" / "site.csv", index=False)
+    pd.DataFrame({"site_id": [1], "notes": ["x"]}).to_csv(tmp_path / "data" / "notes.csv", index=False)
+    return tmp_path
+
+
+def _mat(folder):
+    db = SisalDB(str(folder / "data"), cache_dir=str(folder / "cache"), required=None)
+    return Materializer(db, registry=REGISTRY)
+
+
+def test_results_are_cached(folder):
+    CALLS.clear()
+    assert _mat(folder)["both"]["n"].iloc[0] == 3
+    assert sorted(CALLS) == ["both", "note_count", "site_count"]
+    mat = _mat(folder)
+    assert mat["both"]["n"].iloc[0] == 3 and len(CALLS) == 3
+    assert mat.status().set_index("table")["fresh"].all()
+    assert mat.sources("both") == ["notes", "site"]
+    assert mat.inputs("note_count") == {"notes": "source", "cave_pCO2_sample": "missing"}
+
+
+def test_a_changed_source_invalidates_its_dependents_only(folder):
+    _mat(folder)["both"]
+    CALLS.clear()
+    pd.DataFrame({"site_id": [1, 2, 3]}).to_csv(folder / "data" / "site.csv", index=False)
+    mat = _mat(folder)
+    assert mat.status().set_index("table")["fresh"].to_dict() == {"site_count": False, "note_count": True,
+                                                                   "both": False}
+    assert mat["both"]["n"].iloc[0] == 4
+    assert sorted(CALLS) == ["both", "site_count"]
+
+
+def test_a_touched_source_is_not_recomputed(folder):
+    _mat(folder)["both"]
+    CALLS.clear()
+    path = folder / "data" / "site.csv"
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    _mat(folder)["both"]
+    assert CALLS == []
+
+
+def test_code_hash():
+    def fn(site):
+        return site
+
+    def other(site):
+        return site.copy()
+
+    assert DerivedTable("t", fn).code_hash == DerivedTable("u", fn).code_hash
+    assert DerivedTable("t", fn).code_hash != DerivedTable("t", other).code_hash
+    # a derived table of sisal/derived.py depends on the helpers that module imports
+    closure = module_closure("derived")
+    assert {"derived", "coverage", "dates", "materialize", "references", "spatial"} <= set(closure)
+    assert "cli" not in closure
+
+
+def test_cycles_are_reported(folder):
+    registry = {}
+
+    @derived(registry=registry)
+    def a(b):
+        return b
+
+    @derived(registry=registry)
+    def b(a):
+        return a
+
+    db = SisalDB(str(folder / "data"), required=None)
+    with pytest.raises(ValueError, match="cycle"):
+        Materializer(db, registry=registry).key("a")
@@ -0,0 +1,93 @@
+import threading
+
+import pandas as pd
+import pytest
+
+from sisal.materialize import Materializer, derived
+from sisal.pipeline import Pipeline
+from sisal.registry import SisalDB
+
+REGISTRY = {}
+CALLS = []
+BARRIER = threading.Barrier(2, timeout=5)
+
+
+@derived(registry=REGISTRY)
+def a(site):
+    BARRIER.wait()                          # a and b run at the same time
+    CALLS.append("a")
+    return site
+
+
+@derived(registry=REGISTRY)
+def b(site):
+    BARRIER.wait()
+    CALLS.append("b")
+    return site
+
+
+@derived(registry=REGISTRY)
+def c(a, b):
+    CALLS.append("c")
+    return pd.concat([a, b], ignore_index=True)
+
+
+@derived(registry=REGISTRY)
+def d(c):
+    CALLS.append("d")
+    return c.head(1)
+
+
+@derived(registry=REGISTRY)
+def unrelated(site):
+    CALLS.append("unrelated")
+    return site
+
+
+@pytest.fixture
+def mat(tmp_path):
+    pd.DataFrame({"site_id": [1, 2]}).to_csv(tmp_path / "site.csv", index=False)
+    return Materializer(SisalDB(str(tmp_path), required=None), registry=REGISTRY)
+
+
+def test_plan_waves(mat):
+    pipeline = Pipeline(mat)
+    assert pipeline.plan(["d"]) == [["a", "b"], ["c"], ["d"]]
+    assert sorted(pipeline.stages(["c"])) == ["a", "b", "c"]
+    status = pipeline.status(["d"])
+    assert status["wave"].tolist() == [0, 0, 1, 2] and not status["fresh"].any()
+
+
+def test_run_only_what_the_outputs_need_in_parallel(mat):
+    CALLS.clear()
+    BARRIER.reset()
+    out = Pipeline(mat, max_workers=2).run(["d"])
+    assert list(out) == ["d"] and len(out["d"]) == 1
+    assert sorted(CALLS[:2]) == ["a", "b"] and CALLS[2:] == ["c", "d"]
+    assert not BARRIER.broken
+
+
+def test_cycles_fail_before_running(tmp_path):
+    registry = {}
+
+    @derived(registry=registry)
+    def x(y):
+        return y
+
+    @derived(registry=registry)
+    def y(x):
+        return x
+
+    pd.DataFrame({"site_id": [1]}).to_csv(tmp_path / "site.csv", index=False)
+    pipeline = Pipeline(Materializer(SisalDB(str(tmp_path), required=None), registry=registry))
+    with pytest.raises(ValueError, match="cycle"):
+        pipeline.plan(["x"])
+
+
+def test_cookbook_stages(tmp_path):
+    from sisal.synthetic import write_synthetic
+
+    write_synthetic(str(tmp_path / "db"), scale=0.01, seed=0)
+    pipeline = Pipeline(Materializer(SisalDB(str(tmp_path / "db"), required=None)))
+    assert pipeline.plan(["full_year_both"]) == [["drip_iso_coverage", "drip_rate_coverage"], ["full_year_both"]]
+    assert pipeline.mat.sources("full_year_both") == ["drip_entity", "drip_iso_sample", "drip_rate_sample", "site"]
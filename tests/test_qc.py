@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+
+from sisal.qc import QC_RULES, ForeignKey, Hhmm, OneOf, Range, Referenced, StartBeforeEnd, TableView, run_qc
+from sisal.synthetic import generate_tables
+
+
+def _mask(rule, tables):
+    return np.asarray(rule.mask(TableView(tables)), dtype=bool).tolist()
+
+
+def test_hhmm_minutes_and_digits():
+    typed = {"t": pd.DataFrame({"hhmm": [0, 1230, 1260, 2359, 2400, np.nan]})}
+    assert _mask(Hhmm("x", "t", "hhmm"), typed) == [False, False, True, False, True, False]
+
+    raw = {"t": pd.DataFrame({"hhmm": ["0930", "930", "0975", "930.0", None]}, dtype=object)}
+    assert _mask(Hhmm("x", "t", "hhmm"), raw) == [False, True, True, False, False]
+
+
+def test_range_digits_and_required():
+    raw = {"t": pd.DataFrame({"yyyy": ["2012", "12", "2012.0", "2030", None, " 2012"]}, dtype=object)}
+    rule = Range("x", "t", "yyyy", 1800, 2024, digits=(4, 4))
+    assert _mask(rule, raw) == [False, True, False, True, False, True]
+    required = Range("x", "t", "yyyy", 1800, 2024, digits=(4, 4), required=True)
+    assert _mask(required, raw)[4] is True
+
+
+def test_one_of():
+    t = {"t": pd.DataFrame({"unit": ["days", "weeks", None]})}
+    assert _mask(OneOf("x", "t", "unit", ["days"]), t) == [False, True, False]
+    assert _mask(OneOf("x", "t", "unit", ["days"], required=True), t) == [False, True, True]
+
+
+def test_start_before_end_defaults():
+    nan = np.nan
+    df = pd.DataFrame({
+        "s_start_yyyy": [2011, 2011, 2011, nan, 2012],
+        "s_start_mm": [nan, 3, 2, 5, 1],
+        "s_start_dd": [29, 1, 1, 1, 1],
+        "s_start_hhmm": [nan, nan, 1200, nan, nan],
+        "s_end_yyyy": [2011, 2011, 2011, 2011, 2011],
+        "s_end_mm": [2, 2, 2, 1, nan],
+        "s_end_dd": [nan, nan, 1, 1, nan],
+        "s_end_hhmm": [nan, nan, 1100, nan, nan],
+    })
+    # missing start parts are the earliest, missing end parts the latest value;
+    # only certain inversions are flagged, rows without both years pass
+    assert _mask(StartBeforeEnd("x", "t", "s"), {"t": df}) == [False, True, True, False, True]
+
+
+def test_foreign_key_and_referenced():
+    tables = {
+        "site": pd.DataFrame({"site_id": [1, 2, 3]}),
+        "cave_entity": pd.DataFrame({"site_id": [1, 3]}),
+        "drip_entity": pd.DataFrame({"site_id": pd.array([1, 9, None], dtype="Int64")}),
+        "notes": pd.DataFrame({"site_id": ["1", "x"]}, dtype=object),
+    }
+    assert _mask(ForeignKey("x", "drip_entity", "site_id", "site"), tables) == [False, True, False]
+    assert _mask(ForeignKey("x", "notes", "site_id", "site"), tables) == [False, True]
+    used = Referenced("x", "site", "site_id", by=[("cave_entity", "site_id"), ("drip_entity", "site_id")])
+    assert _mask(used, tables) == [False, True, False]
+
+
+def test_run_qc_report():
+    tables = {"t": pd.DataFrame({"id": [1, 2, 2], "unit": ["days", "weeks", "days"]})}
+    rules = [OneOf("A", "t", "unit", ["days"]), OneOf("B", "missing", "unit", ["days"])]
+    report = run_qc(tables, rules=rules)
+    assert report.count() == 1 and not report.ok
+    assert report.violations["row"].tolist() == [1]
+    assert report.summary.set_index("rule").loc["B", "status"].startswith("skipped")
+
+
+def test_rule_ids_are_unique():
+    ids = [rule.rule_id for rule in QC_RULES]
+    assert len(ids) == len(set(ids))
+    by_id = {rule.rule_id: rule for rule in QC_RULES}
+    assert by_id["T01.03a"].column == "latitude" and by_id["T01.03b"].column == "longitude"
+    assert "T02.x1" in by_id and "T01.01" in by_id
+
+
+def test_synthetic_tables_pass():
+    report = run_qc(generate_tables(scale=0.05, seed=3))
+    assert report.ok, report.failed().to_string()
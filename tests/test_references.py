@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+
+from sisal.references import ReferenceIndex, collapse_unique_by
+
+
+def test_collapse_unique_by_keeps_order_and_missing_keys():
+    df = pd.DataFrame({"site_id": pd.array([2, None, 1, None, 2, 2, 3], dtype="Int64"),
+                       "notes": ["z", "n1", "a", "n2", "b", "z", None]})
+    out = collapse_unique_by(df, "site_id", "notes")
+    assert out["site_id"].isna().tolist() == [False, False, False, True]
+    assert out["notes"].tolist()[:2] == ["a", "z ; b"]          # first appearance, duplicates dropped
+    assert pd.isna(out["notes"].iloc[2]) and out["notes"].iloc[3] == "n1 ; n2"
+    assert collapse_unique_by(df, "site_id", "notes", sort=True)["notes"].iloc[1] == "b ; z"
+
+
+def test_matches_the_groupby_version():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({"k": rng.integers(0, 50, 2000).astype(float), "v": rng.integers(0, 20, 2000).astype(str)})
+    df.loc[rng.random(2000) < 0.1, "k"] = np.nan
+    df.loc[rng.random(2000) < 0.1, "v"] = None
+    expected = df.groupby("k", dropna=False)["v"].agg(
+        lambda v: " ; ".join(pd.unique(v.dropna())) if v.notna().any() else None)
+    out = collapse_unique_by(df, "k", "v").set_index("k")["v"]
+    assert out.index.equals(expected.index)
+    assert out.astype(object).where(out.notna(), None).tolist() == expected.tolist()
+
+
+def test_reference_index():
+    reference = pd.DataFrame({"ref_id": [1, 2, 3], "citation": ["B 2020", "A 2019", "C 2021"],
+                              "publication_DOI": ["doi/b", None, "doi/c"]})
+    site_link = pd.DataFrame({"site_id": pd.array([1, 1, None], dtype="Int64"), "ref_id": [1, 2, 3]})
+    entity_link = pd.DataFrame({"drip_entity_id": pd.array([5, None], dtype="Int64"),
+                                "precip_entity_id": pd.array([None, 7], dtype="Int64"), "ref_id": [3, 1]})
+    refs = ReferenceIndex.build(reference, site_link, entity_link)
+
+    sites = refs.citations("site_id", prefix="site_")
+    assert sites.columns.tolist() == ["site_id", "site_citations", "site_DOI"]
+    assert sites["site_citations"].tolist() == ["A 2019 ; B 2020", "C 2021"]      # citations sorted
+    assert sites["site_id"].isna().tolist() == [False, True]                       # link without site kept
+    assert refs.lookup("drip_entity_id", [5, 6])["citations"].tolist()[0] == "C 2021"
+    assert pd.isna(refs.lookup("drip_entity_id", [5, 6])["citations"].iloc[1])
+    assert refs.refs("precip_entity_id", 7)["ref_id"].tolist() == [1]
@@ -0,0 +1,70 @@
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from sisal import registry
+from sisal.registry import SisalDB, frame_nbytes
+
+
+@pytest.fixture
+def folder(tmp_path):
+    for name in ("site", "notes", "reference"):
+        pd.DataFrame({"site_id": range(200), "text": [f"{name} {i}" for i in range(200)]}).to_csv(
+            tmp_path / f"{name}.csv", index=False)
+    return str(tmp_path)
+
+
+def test_lazy_access_and_projection(folder):
+    db = SisalDB(folder, required=None)
+    assert db.loaded == []
+    assert len(db.site) == 200 and db.loaded == ["site"]
+    assert db.table("site", usecols=["site_id"]).columns.tolist() == ["site_id"]
+    assert db.loaded == ["site"]                            # projected from the loaded table
+    with pytest.raises(KeyError):
+        db.table("missing")
+    with pytest.raises(KeyError, match="drip_entity"):
+        SisalDB(folder, required=["site", "drip_entity"])
+
+
+def test_memory_budget_releases_least_recently_used(folder):
+    size = frame_nbytes(SisalDB(folder, required=None).site)
+    db = SisalDB(folder, required=None, memory_budget=int(2.5 * size))
+    db.site, db.notes
+    db.site                                                 # notes is now the oldest
+    db.reference
+    assert db.loaded == ["site", "reference"]
+    assert db.memory_usage() == frame_nbytes(db.site) + frame_nbytes(db.reference)
+    db.release("site")
+    assert db.loaded == ["reference"] and db.memory_usage() == frame_nbytes(db.reference)
+
+
+def test_memory_usage_without_budget(folder):
+    db = SisalDB(folder, required=None)
+    db.site
+    assert db.memory_usage() == frame_nbytes(db.site)
+
+
+def test_one_reader_per_table(folder, monkeypatch):
+    calls, read = [], registry.read_table
+    barrier = threading.Barrier(2, timeout=5)
+
+    def slow_read(path, **kw):
+        calls.append(path)
+        if "site" not in path:
+            barrier.wait()                                  # notes and reference load at the same time
+        time.sleep(0.05)
+        return read(path, **kw)
+
+    monkeypatch.setattr(registry, "read_table", slow_read)
+    db = SisalDB(folder, required=None)
+    names = ["site"] * 4 + ["notes", "reference"]
+    threads = [threading.Thread(target=db.table, args=(n,)) for n in names]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(db.loaded) == ["notes", "reference", "site"]
+    assert sum("site" in p for p in calls) == 1
+    assert not barrier.broken
@@ -0,0 +1,24 @@
+import pandas as pd
+
+from sisal.spatial import SpatialIndex, haversine_km
+
+
+def _sites():
+    return pd.DataFrame({"site_id": [1, 2, 3], "latitude": [47.5, 48.0, -10.0],
+                         "longitude": [179.5, -179.5, 0.0]})
+
+
+def test_bbox_across_the_antimeridian():
+    index = SpatialIndex.from_sites(_sites())
+    assert index.bbox(40, 50, 170, -170)["site_id"].tolist() == [1, 2]
+    assert index.bbox(-20, 0, -10, 10)["site_id"].tolist() == [3]
+
+
+def test_radius_and_nearest():
+    index = SpatialIndex.from_sites(_sites())
+    hits = index.within(47.5, 179.5, radius_km=100)
+    assert hits["site_id"].tolist() == [1, 2]
+    assert abs(hits["distance_km"].iloc[1] - haversine_km(47.5, 179.5, 48.0, -179.5)) < 1e-6
+    assert index.nearest(-9.0, 1.0, k=1)["site_id"].tolist() == [3]
+    assert index.nearest(47.5, 179.0, k=2)["site_id"].tolist() == [1, 2]
+